@@ -0,0 +1,44 @@
+#!/usr/bin/python
+'''
+    Run a dibase.rpi.gpio pin server.
+
+    The server owns GPIO pins on behalf of client processes, which open
+    them using the dibase.rpi.gpio.pinclient module, so that several
+    processes can share the same pins. It runs until interrupted.
+
+    Examples:
+        gpio-pin-server.py
+        gpio-pin-server.py --socket /tmp/gpio.sock --mode 666
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import argparse
+import sys
+if __name__ == '__main__':
+    sys.path.insert(0, './..')
+import dibase.rpi.gpio.pinprotocol as pinprotocol
+import dibase.rpi.gpio.pinserver as pinserver
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Serve GPIO pins to client processes')
+    parser.add_argument( '--socket', default=pinprotocol.socket_path()
+                       , help='Unix socket path (default: %(default)s)'
+                       )
+    parser.add_argument( '--mode', default='660'
+                       , help='octal socket file permissions (default: %(default)s)'
+                       )
+    args = parser.parse_args(argv)
+    server = pinserver.PinServer(args.socket, socket_mode=int(args.mode, 8))
+    print 'Serving GPIO pins on %s' % server.path()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+'''
+    Measure edge event wake up latency using the dibase.rpi.gpio package.
+
+    Generates edges at a given rate and reports the distribution of times
+    from each edge to a waiting thread waking up, and the number of edges
+    dropped, for each requested event wait path: select, poll and epoll on
+    the pin's file descriptor, and the public PinBlockingReader read and
+    callback paths, which need GPIO pins.
+
+    Edges are generated on a GPIO output pin wired to a GPIO input pin
+    (--output and --input) or, if no pins are given, faked using a pipe.
+    Optionally busy processes load the CPU(s) during measurements (--load).
+
+    Examples:
+        gpio-wakeup-latency.py --rate 500 --count 5000 --load 4
+        gpio-wakeup-latency.py --output 17 --input 18 --path epoll
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import argparse
+import sys
+if __name__ == '__main__':
+    sys.path.insert(0, './..')
+import dibase.rpi.gpio.latency as latency
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Measure GPIO edge event wake up latency')
+    parser.add_argument( '--path', action='append'
+                       , choices=list(latency.PATHS)+sorted(latency.UNAVAILABLE_PATHS)
+                       , help='event wait path to measure, may be repeated (default: all)'
+                       )
+    parser.add_argument('--rate', type=float, default=100.0, help='edges per second')
+    parser.add_argument('--count', type=int, default=1000, help='number of edges')
+    parser.add_argument('--timeout', type=float, default=1.0, help='seconds to wait for late edges')
+    parser.add_argument('--load', type=int, default=0, help='number of CPU loading processes')
+    parser.add_argument('--output', type=int, help='GPIO pin id of the output pin of a loop back pair')
+    parser.add_argument('--input', type=int, help='GPIO pin id of the input pin of a loop back pair')
+    args = parser.parse_args(argv)
+    if (args.output==None) != (args.input==None):
+        parser.error('--output and --input must be given together')
+    with latency.CPULoad(args.load):
+        for path in args.path or latency.PATHS:
+            if path in latency.UNAVAILABLE_PATHS:
+                print '%-8s unavailable: %s' % (path, latency.UNAVAILABLE_PATHS[path])
+                continue
+            if path in latency.READER_PATHS and args.output==None:
+                print '%-8s unavailable: needs --output and --input pins' % path
+                continue
+            if args.output==None:
+                source = latency.PipeEdgeSource()
+            else:
+                source = latency.LoopbackEdgeSource(args.output, args.input)
+            try:
+                print latency.measure( source, path, args.rate, args.count
+                                     , args.timeout ).summary()
+            finally:
+                source.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
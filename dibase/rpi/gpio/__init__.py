@@ -3,3 +3,10 @@
 # Developed by R.E. McArdell / Dibase Limited.
 # Copyright (c) 2012 Dibase Limited
 # License: dual: GPL or BSD.
+#
+# Sub-modules are deliberately not imported here so that importing one
+# module (e.g. dibase.rpi.gpio.pinid) loads only that module and those it
+# depends on. Loading sub-modules lazily on first attribute access would
+# need a module level __getattr__, which Python 2 does not support, so
+# explicit imports are the adaptation: import the required modules
+# explicitly.
@@ -0,0 +1,429 @@
+/*
+    Part of the dibase.rpi.gpio package.
+
+    Optional C implementation of the fastio module's functions: reading
+    and writing GPIO pin value files through their file descriptors, singly
+    and as words of pins, voting on repeated reads of them and busy waiting
+    on the monotonic clock. See fastio.py, which uses these functions if
+    this extension module has been built and otherwise provides pure Python
+    versions with the same behaviour.
+
+    Also reads and writes the sharedstate module's shared memory state as
+    a sequence lock, with the memory barriers Python code cannot express.
+    These have no pure Python versions.
+
+    Value files are read with pread and written with pwrite at offset 0,
+    so each pin operation is a single system call and file positions are
+    not changed.
+
+    To build, from the directory containing this file (the Python
+    development headers are required):
+
+        gcc -O2 -shared -fPIC $(python2-config --includes) -o _fastio.so _fastio.c
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+*/
+
+#include <Python.h>
+#include <sched.h>
+#include <stdint.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+
+#define MAX_FDS 64  /* bits in the words read and written */
+
+/*
+    Sequence locked state: a 64 bit sequence count, odd while the state is
+    being changed, followed by the state's levels word, published pins
+    word and update time double.
+*/
+#define SEQLOCK_WORDS 4
+#define SEQLOCK_ATTEMPTS 1024 /* reads tried before giving up */
+
+static int
+read_level(int fd, int *level)
+{
+    char buffer[2];
+    ssize_t count = pread(fd, buffer, sizeof buffer, 0);
+    if (count < 0)
+    {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    *level = count > 0 && buffer[0] == '1';
+    return 0;
+}
+
+static int
+write_level(int fd, int level)
+{
+    if (pwrite(fd, level ? "1" : "0", 1, 0) < 0)
+    {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    return 0;
+}
+
+static PyObject *
+word_object(unsigned PY_LONG_LONG word)
+{
+    if (word <= (unsigned PY_LONG_LONG)LONG_MAX)
+        return PyInt_FromLong((long)word);
+    return PyLong_FromUnsignedLongLong(word);
+}
+
+/*
+    Returns a new reference to fds as a fast sequence of at most MAX_FDS
+    items, or NULL with an exception set.
+*/
+static PyObject *
+fd_sequence(PyObject *fds)
+{
+    PyObject *sequence = PySequence_Fast(fds, "fds must be a sequence");
+    if (sequence != NULL && PySequence_Fast_GET_SIZE(sequence) > MAX_FDS)
+    {
+        Py_DECREF(sequence);
+        PyErr_SetString(PyExc_ValueError, "too many file descriptors");
+        return NULL;
+    }
+    return sequence;
+}
+
+PyDoc_STRVAR(read_fd_doc,
+"read_fd(fd) -> bool\n\n"
+"Returns True if the value file open on fd reads '1', else False.");
+
+static PyObject *
+fastio_read_fd(PyObject *self, PyObject *args)
+{
+    int fd;
+    int level;
+    if (!PyArg_ParseTuple(args, "i:read_fd", &fd))
+        return NULL;
+    if (read_level(fd, &level) < 0)
+        return NULL;
+    return PyBool_FromLong(level);
+}
+
+PyDoc_STRVAR(write_fd_doc,
+"write_fd(fd, value)\n\n"
+"Writes '1' to the value file open on fd if value is true, else '0'.");
+
+static PyObject *
+fastio_write_fd(PyObject *self, PyObject *args)
+{
+    int fd;
+    PyObject *value;
+    int level;
+    if (!PyArg_ParseTuple(args, "iO:write_fd", &fd, &value))
+        return NULL;
+    level = PyObject_IsTrue(value);
+    if (level < 0 || write_level(fd, level) < 0)
+        return NULL;
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(read_word_doc,
+"read_word(fds) -> int\n\n"
+"Returns the levels read from the value files open on the sequence of\n"
+"file descriptors fds as an integer word, bit 0 from the first file.");
+
+static PyObject *
+fastio_read_word(PyObject *self, PyObject *args)
+{
+    PyObject *fds;
+    PyObject *sequence;
+    Py_ssize_t i;
+    unsigned PY_LONG_LONG word = 0;
+    if (!PyArg_ParseTuple(args, "O:read_word", &fds))
+        return NULL;
+    if ((sequence = fd_sequence(fds)) == NULL)
+        return NULL;
+    for (i = 0; i < PySequence_Fast_GET_SIZE(sequence); ++i)
+    {
+        int level;
+        long fd = PyInt_AsLong(PySequence_Fast_GET_ITEM(sequence, i));
+        if ((fd == -1 && PyErr_Occurred()) || read_level((int)fd, &level) < 0)
+        {
+            Py_DECREF(sequence);
+            return NULL;
+        }
+        if (level)
+            word |= 1ULL << i;
+    }
+    Py_DECREF(sequence);
+    return word_object(word);
+}
+
+PyDoc_STRVAR(write_word_doc,
+"write_word(fds, mask, value)\n\n"
+"Writes the bits of value to the value files open on those of the\n"
+"sequence of file descriptors fds whose bit of mask is set, bit 0 being\n"
+"that of the first file.");
+
+static PyObject *
+fastio_write_word(PyObject *self, PyObject *args)
+{
+    PyObject *fds;
+    PyObject *sequence;
+    Py_ssize_t i;
+    unsigned PY_LONG_LONG mask;
+    unsigned PY_LONG_LONG value;
+    if (!PyArg_ParseTuple(args, "OKK:write_word", &fds, &mask, &value))
+        return NULL;
+    if ((sequence = fd_sequence(fds)) == NULL)
+        return NULL;
+    for (i = 0; i < PySequence_Fast_GET_SIZE(sequence); ++i)
+    {
+        long fd;
+        if (!((mask >> i) & 1))
+            continue;
+        fd = PyInt_AsLong(PySequence_Fast_GET_ITEM(sequence, i));
+        if ( (fd == -1 && PyErr_Occurred())
+          || write_level((int)fd, (int)((value >> i) & 1)) < 0 )
+        {
+            Py_DECREF(sequence);
+            return NULL;
+        }
+    }
+    Py_DECREF(sequence);
+    Py_RETURN_NONE;
+}
+
+static int
+check_samples(int samples)
+{
+    if (samples < 1)
+    {
+        PyErr_SetString(PyExc_ValueError, "samples must be at least 1");
+        return -1;
+    }
+    return 0;
+}
+
+PyDoc_STRVAR(vote_fd_doc,
+"vote_fd(fd, samples) -> bool\n\n"
+"Returns True if the value file open on fd reads '1' more than half of\n"
+"samples times, else False.");
+
+static PyObject *
+fastio_vote_fd(PyObject *self, PyObject *args)
+{
+    int fd;
+    int samples;
+    int sample;
+    int high = 0;
+    if (!PyArg_ParseTuple(args, "ii:vote_fd", &fd, &samples))
+        return NULL;
+    if (check_samples(samples) < 0)
+        return NULL;
+    for (sample = 0; sample < samples; ++sample)
+    {
+        int level;
+        if (read_level(fd, &level) < 0)
+            return NULL;
+        high += level;
+    }
+    return PyBool_FromLong(2*high > samples);
+}
+
+PyDoc_STRVAR(vote_word_doc,
+"vote_word(fds, samples) -> int\n\n"
+"Reads the value files open on the sequence of file descriptors fds\n"
+"samples times, returning the integer word, bit 0 from the first file,\n"
+"whose bits are set for the files reading '1' more than half the times.");
+
+static PyObject *
+fastio_vote_word(PyObject *self, PyObject *args)
+{
+    PyObject *fds;
+    PyObject *sequence;
+    int samples;
+    int sample;
+    int fd_values[MAX_FDS];
+    int high[MAX_FDS];
+    Py_ssize_t count;
+    Py_ssize_t i;
+    unsigned PY_LONG_LONG word = 0;
+    if (!PyArg_ParseTuple(args, "Oi:vote_word", &fds, &samples))
+        return NULL;
+    if (check_samples(samples) < 0 || (sequence = fd_sequence(fds)) == NULL)
+        return NULL;
+    count = PySequence_Fast_GET_SIZE(sequence);
+    for (i = 0; i < count; ++i)
+    {
+        long fd = PyInt_AsLong(PySequence_Fast_GET_ITEM(sequence, i));
+        if (fd == -1 && PyErr_Occurred())
+        {
+            Py_DECREF(sequence);
+            return NULL;
+        }
+        fd_values[i] = (int)fd;
+        high[i] = 0;
+    }
+    Py_DECREF(sequence);
+    for (sample = 0; sample < samples; ++sample)
+    {
+        for (i = 0; i < count; ++i)
+        {
+            int level;
+            if (read_level(fd_values[i], &level) < 0)
+                return NULL;
+            high[i] += level;
+        }
+    }
+    for (i = 0; i < count; ++i)
+    {
+        if (2*high[i] > samples)
+            word |= 1ULL << i;
+    }
+    return word_object(word);
+}
+
+PyDoc_STRVAR(spin_until_doc,
+"spin_until(deadline)\n\n"
+"Busy waits, without holding the global interpreter lock, until the\n"
+"CLOCK_MONOTONIC clock reaches deadline seconds.");
+
+static PyObject *
+fastio_spin_until(PyObject *self, PyObject *args)
+{
+    double deadline;
+    struct timespec now;
+    if (!PyArg_ParseTuple(args, "d:spin_until", &deadline))
+        return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    do
+    {
+        clock_gettime(CLOCK_MONOTONIC, &now);
+    }
+    while (now.tv_sec + now.tv_nsec*1e-9 < deadline);
+    Py_END_ALLOW_THREADS
+    Py_RETURN_NONE;
+}
+
+/*
+    Returns the sequence locked state at offset in buffer as an array of
+    SEQLOCK_WORDS 64 bit words, or NULL with an exception set if it is not
+    within buffer or not aligned for atomic access.
+*/
+static uint64_t *
+seqlock_words(Py_buffer *buffer, Py_ssize_t offset)
+{
+    char *state = (char *)buffer->buf + offset;
+    if ( offset < 0 || buffer->len - offset < SEQLOCK_WORDS*8
+      || (uintptr_t)state % 8 != 0 )
+    {
+        PyErr_SetString(PyExc_ValueError, "state not within buffer or misaligned");
+        return NULL;
+    }
+    return (uint64_t *)state;
+}
+
+PyDoc_STRVAR(seqlock_read_doc,
+"seqlock_read(buffer, offset) -> (levels, published, time) or None\n\n"
+"Returns a consistent copy of the sequence locked state at offset in\n"
+"buffer (a mapped state file), without a system call, or None if it\n"
+"was being changed on every one of a bounded number of attempts, as\n"
+"when its writer stopped part way through a change.");
+
+static PyObject *
+fastio_seqlock_read(PyObject *self, PyObject *args)
+{
+    Py_buffer buffer;
+    Py_ssize_t offset;
+    uint64_t *words;
+    int attempt;
+    if (!PyArg_ParseTuple(args, "s*n:seqlock_read", &buffer, &offset))
+        return NULL;
+    if ((words = seqlock_words(&buffer, offset)) == NULL)
+    {
+        PyBuffer_Release(&buffer);
+        return NULL;
+    }
+    for (attempt = 0; attempt < SEQLOCK_ATTEMPTS; ++attempt)
+    {
+        uint64_t sequence = __atomic_load_n(&words[0], __ATOMIC_ACQUIRE);
+        if (!(sequence & 1))
+        {
+            uint64_t levels = __atomic_load_n(&words[1], __ATOMIC_RELAXED);
+            uint64_t published = __atomic_load_n(&words[2], __ATOMIC_RELAXED);
+            uint64_t time_bits = __atomic_load_n(&words[3], __ATOMIC_RELAXED);
+            /* order the state loads before the sequence is checked again */
+            __atomic_thread_fence(__ATOMIC_ACQUIRE);
+            if (__atomic_load_n(&words[0], __ATOMIC_RELAXED) == sequence)
+            {
+                double time;
+                memcpy(&time, &time_bits, sizeof time);
+                PyBuffer_Release(&buffer);
+                return Py_BuildValue( "(NNd)", word_object(levels)
+                                    , word_object(published), time );
+            }
+        }
+        sched_yield(); /* let a preempted writer finish */
+    }
+    PyBuffer_Release(&buffer);
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(seqlock_store_doc,
+"seqlock_store(buffer, offset, sequence, levels, published, time)\n\n"
+"Changes the sequence locked state at offset in buffer (a writable mapped\n"
+"state file) to levels, published and time, making its sequence count\n"
+"sequence+1 while doing so and sequence+2 afterwards. sequence must be\n"
+"even and the caller the only writer.");
+
+static PyObject *
+fastio_seqlock_store(PyObject *self, PyObject *args)
+{
+    Py_buffer buffer;
+    Py_ssize_t offset;
+    uint64_t *words;
+    unsigned PY_LONG_LONG sequence;
+    unsigned PY_LONG_LONG levels;
+    unsigned PY_LONG_LONG published;
+    double time;
+    uint64_t time_bits;
+    if (!PyArg_ParseTuple( args, "w*nKKKd:seqlock_store", &buffer, &offset
+                         , &sequence, &levels, &published, &time ))
+        return NULL;
+    if ((words = seqlock_words(&buffer, offset)) == NULL)
+    {
+        PyBuffer_Release(&buffer);
+        return NULL;
+    }
+    memcpy(&time_bits, &time, sizeof time_bits);
+    __atomic_store_n(&words[0], (uint64_t)sequence + 1, __ATOMIC_RELAXED);
+    /* order the odd sequence store before the state stores */
+    __atomic_thread_fence(__ATOMIC_RELEASE);
+    __atomic_store_n(&words[1], (uint64_t)levels, __ATOMIC_RELAXED);
+    __atomic_store_n(&words[2], (uint64_t)published, __ATOMIC_RELAXED);
+    __atomic_store_n(&words[3], time_bits, __ATOMIC_RELAXED);
+    __atomic_store_n(&words[0], (uint64_t)sequence + 2, __ATOMIC_RELEASE);
+    PyBuffer_Release(&buffer);
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef fastio_methods[] =
+{ {"read_fd", fastio_read_fd, METH_VARARGS, read_fd_doc}
+, {"write_fd", fastio_write_fd, METH_VARARGS, write_fd_doc}
+, {"read_word", fastio_read_word, METH_VARARGS, read_word_doc}
+, {"write_word", fastio_write_word, METH_VARARGS, write_word_doc}
+, {"vote_fd", fastio_vote_fd, METH_VARARGS, vote_fd_doc}
+, {"vote_word", fastio_vote_word, METH_VARARGS, vote_word_doc}
+, {"spin_until", fastio_spin_until, METH_VARARGS, spin_until_doc}
+, {"seqlock_read", fastio_seqlock_read, METH_VARARGS, seqlock_read_doc}
+, {"seqlock_store", fastio_seqlock_store, METH_VARARGS, seqlock_store_doc}
+, {NULL, NULL, 0, NULL}
+};
+
+PyMODINIT_FUNC
+init_fastio(void)
+{
+    Py_InitModule3( "_fastio", fastio_methods
+                  , "C implementation of the dibase.rpi.gpio fastio functions" );
+}
@@ -0,0 +1,834 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Pluggable GPIO IO backends used by pin and pin group objects.
+
+    A backend opens GPIO lines - claiming a pin and setting its data
+    direction and edge event mode - reads and writes them singly or in
+    bulk, provides the file descriptor notified of their edge events and
+    closes them. Lines are file-like objects read and written as sys
+    filesystem value files are: read returns '1\\n' or '0\\n' after a seek
+    to 0, and writing '1' or '0' sets the pin's level. The provided
+    backends are, fastest first:
+
+        'mmap'      : reads and writes the BCM2835 family GPIO registers
+                      memory mapped from /dev/gpiomem, reading or writing
+                      all lines of a bulk operation with one register
+                      access per bank of 32 pins. No edge events. Lines
+                      have no file descriptors and a pin is only claimed
+                      against other opens in the same process (and other
+                      processes using the ownership table).
+        'gpiochip'  : uses line handles of the Linux GPIO character device
+                      of the SoC's GPIO controller (/dev/gpiochipN),
+                      reading and writing each line with one ioctl. No
+                      edge events.
+        'sysfs'     : uses the sys filesystem GPIO interface, through the
+                      sysfsio module's functions, reading and writing value
+                      files with the fastio module's functions. Always
+                      available and supports edge events.
+
+    Each provided backend can also open bidirectional lines, whose data
+    direction is changed without closing them, for pin.BidirectionalPin.
+
+    select_backend returns the fastest available backend supporting the
+    direction and blocking modes requested, unless a backend is named by
+    the caller, by set_default_backend or by the DIBASE_RPI_GPIO_BACKEND
+    environment variable. Other backends may be added with
+    register_backend.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import abc    # for abstract base classes
+import errno
+import fcntl
+import glob
+import mmap
+import os
+import struct
+import threading
+
+from gpioerror import PinInUseError
+from gpioerror import PinBackendUnavailableError
+from sysfspaths import export_path as sysfs_export_path
+from sysfspaths import unexport_path as sysfs_unexport_path
+from sysfspaths import pin_path as sysfs_pin_path
+from sysfspaths import direction_path as sysfs_direction_path
+from sysfspaths import edgemode_path as sysfs_edgemode_path
+from sysfspaths import value_path as sysfs_value_path
+from sysfspaths import gpio_number as sysfs_gpio_number
+import fastio
+import sysfsio
+
+# open_line reclaim value for a pin handed off to this process by another
+# process that still exists, whose claim on the pin is taken over as it is
+ADOPT = 'adopt'
+
+class GPIOBackend(object):
+    '''
+        Abstract base class of GPIO backends. Sub-classes must provide
+        available and open_line, and should override the other operations
+        where they can be done more efficiently than by the base
+        implementations, which use lines' file-like operations.
+
+        name is the backend's name, used to select it, and speed a number
+        ranking it against other backends - larger is faster.
+
+        open_syscalls, close_syscalls, read_syscalls and write_syscalls are
+        the numbers of system calls the backend makes to open, close, read
+        and write a line, and read_bytes and write_bytes the bytes those
+        reads and writes transfer, as counted by the instrument module. The
+        base values are those of the base read and write of a file: a seek
+        and a read of '0\n' or '1\n', a write of '0' or '1' and a seek.
+    '''
+    __metaclass__ = abc.ABCMeta
+
+    name = None
+    speed = 0
+    open_syscalls = 0
+    close_syscalls = 0
+    read_syscalls = 2
+    write_syscalls = 2
+    read_bytes = 2
+    write_bytes = 1
+
+    @abc.abstractmethod
+    def available(self):
+        ''' Returns True if the backend can be used on this system '''
+        pass
+
+    def supports(self, direction_mode, blocking_mode):
+        '''
+            Returns True if the backend can open lines in direction_mode (a
+            pin.DirectionMode) and blocking_mode (a pin.BlockMode). The base
+            implementation supports only non-blocking modes.
+        '''
+        return not blocking_mode.is_blocking()
+
+    @abc.abstractmethod
+    def open_line(self, pin_id, direction_mode, blocking_mode, reclaim=False):
+        '''
+            Open a line for GPIO pin pin_id (a pinid.PinId), setting its
+            data direction to direction_mode and edge events notified to
+            blocking_mode, and return it. reclaim is True if the pin is
+            owned by this process (see the ownership module) so any
+            existing claim on it is stale and may be taken over, or ADOPT
+            if the pin was handed off to this process by a process that
+            still exists, so any existing claim on it must be taken over
+            without freeing it. Raises PinInUseError if the pin is in use.
+        '''
+        pass
+
+    def open_bidirectional_line(self, pin_id, direction_mode, blocking_mode, reclaim=False):
+        '''
+            Open a line for pin_id, as open_line, that can be both read and
+            written and whose direction can be changed by
+            set_line_direction. The base implementation calls open_line.
+        '''
+        return self.open_line(pin_id, direction_mode, blocking_mode, reclaim)
+
+    def set_line_direction(self, pin_id, line, direction_mode, value=None):
+        '''
+            Change the data direction of line, opened for pin_id by
+            open_bidirectional_line, to direction_mode without reopening it.
+            If direction_mode is output and value is not None the line is
+            set to value as it becomes an output. The base implementation
+            raises PinBackendUnavailableError.
+        '''
+        raise PinBackendUnavailableError( '%s backend cannot change line direction'
+                                        % self.name )
+
+    def close_line(self, pin_id, line, handed_off=False):
+        '''
+            Close line, opened for pin_id, releasing the pin unless
+            handed_off is True, in which case the pin remains claimed for
+            the process it was handed off to.
+        '''
+        line.close()
+
+    def group_lines(self, lines):
+        '''
+            Returns the sequence lines in the form passed to read_lines and
+            write_lines for them, in which backends may keep anything
+            prepared to speed up bulk operations. The base implementation
+            returns the lines as a list.
+        '''
+        return list(lines)
+
+    def raw_fd(self, line):
+        '''
+            Returns a file descriptor through which line may be read and
+            written with the fastio module's read_fd and write_fd, or None
+            if it may not. The base implementation returns None.
+        '''
+        return None
+
+    def read(self, line):
+        ''' Returns True if line is at a high level, False if low '''
+        line.seek(0)
+        return line.read()[0]=='1'
+
+    def write(self, line, value):
+        ''' Set line to a high level if value is True, else low '''
+        line.write('1' if value else '0')
+        line.seek(0)
+
+    def read_lines(self, lines):
+        '''
+            Returns the levels of the sequence of lines as an integer word
+            with bit 0 the level of the first line, bit 1 the next and so on.
+        '''
+        word = 0
+        for bit_number, line in enumerate(lines):
+            if self.read(line):
+                word |= 1<<bit_number
+        return word
+
+    def write_lines(self, lines, mask, value):
+        '''
+            Set the level of each line in the sequence lines whose bit in
+            mask is set (bit 0 for the first line and so on) to the value of
+            the same bit of value.
+        '''
+        for bit_number, line in enumerate(lines):
+            if (mask>>bit_number)&1:
+                self.write(line, (value>>bit_number)&1)
+
+    def vote(self, line, samples):
+        '''
+            Reads line samples times in succession and returns True if it
+            was at a high level more than half the times, else False.
+        '''
+        return bool(fastio.majority(lambda: self.read(line), samples))
+
+    def vote_lines(self, lines, samples):
+        '''
+            Reads the sequence of lines samples times in succession, as
+            read_lines, and returns the word of the level each line was at
+            more than half the times.
+        '''
+        return fastio.majority(lambda: self.read_lines(lines), samples)
+
+    def event_fd(self, line):
+        '''
+            Returns the file descriptor whose priority (exceptional)
+            condition notifies edge events of line, or None if the backend
+            does not support edge events.
+        '''
+        return None
+
+class _FileLines(list):
+    '''
+        Internal list of sys filesystem value file lines also holding the
+        tuple of their file descriptors, as fds.
+    '''
+    def __init__(self, lines):
+        super(_FileLines, self).__init__(lines)
+        self.fds = tuple(line.fileno() for line in lines)
+
+class SysfsBackend(GPIOBackend):
+    '''
+        Backend using the sys filesystem GPIO interface: pins are exported,
+        configured through their direction and edge files and their lines
+        are their value files. Value files are read and written with one
+        system call, pread or pwrite, if the fastio C extension is built,
+        otherwise with two, a seek and a read or write.
+    '''
+    name = 'sysfs'
+    speed = 1
+    open_syscalls = 11  # stat, 3 x (open, write, close) export/edge/direction,
+                        # open value file
+    close_syscalls = 5  # close value file, stat, open, write, close unexport
+    read_syscalls = 1 if fastio.IMPLEMENTATION=='c' else 2
+    write_syscalls = read_syscalls
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__direction_files = {} # line: held open direction file
+
+    def available(self):
+        ''' Returns True: the sys filesystem GPIO interface is assumed '''
+        return True
+
+    def supports(self, direction_mode, blocking_mode):
+        ''' Returns True: all direction and blocking modes are supported '''
+        return True
+
+    def export(self, pin_id):
+        '''
+            Export pin_id, by its sys filesystem GPIO number. Raises IOError
+            if it is already exported.
+        '''
+        number = sysfs_gpio_number(pin_id)
+        with sysfsio.open_file(sysfs_export_path(), 'w') as export_file:
+            export_file.write( str(number) )
+
+    def unexport(self, pin_id):
+        '''
+            Unexport pin_id if it is exported. Returns pin_id if it was
+            unexported or None if it was not exported.
+        '''
+        if not sysfsio.path_exists(sysfs_pin_path(pin_id)):
+            return None
+        with sysfsio.open_file(sysfs_unexport_path(), 'w') as unexport_file:
+            unexport_file.write( str(sysfs_gpio_number(pin_id)) )
+        return pin_id
+
+    def set_edge(self, pin_id, blocking_mode):
+        ''' Set the edge events notified for exported pin_id '''
+        with sysfsio.open_file(sysfs_edgemode_path(pin_id), 'w') as edge_file:
+            edge_file.write( blocking_mode.edge_mode_value() )
+
+    def set_direction(self, pin_id, direction_mode):
+        ''' Set the data direction of exported pin_id '''
+        with sysfsio.open_file(sysfs_direction_path(pin_id), 'w') as direction_file:
+            direction_file.write(direction_mode.direction_mode_value())
+
+    def __claim(self, pin_id, direction_mode, blocking_mode, reclaim):
+        '''
+            Internal method exporting pin_id, or if reclaim is True and it
+            was left exported unexporting and exporting it again, and
+            setting its edge and direction modes. If reclaim is ADOPT and
+            pin_id is exported, as the process that handed it off leaves
+            it, the export is used as it is.
+        '''
+        try:
+            self.export(pin_id)
+        except IOError:
+            if reclaim==ADOPT and sysfsio.path_exists(sysfs_pin_path(pin_id)):
+                pass
+            elif not reclaim or self.unexport(pin_id)==None:
+                raise
+            else:
+                self.export(pin_id)
+        self.set_edge(pin_id, blocking_mode)
+        self.set_direction(pin_id, direction_mode)
+
+    def open_line(self, pin_id, direction_mode, blocking_mode, reclaim=False):
+        '''
+            Export pin_id, set its edge and direction modes and return its
+            value file opened for reading or writing according to
+            direction_mode. If reclaim is True a pin left exported is
+            unexported and exported again, and if it is ADOPT an exported
+            pin is used as it is.
+        '''
+        self.__claim(pin_id, direction_mode, blocking_mode, reclaim)
+        return sysfsio.open_file( sysfs_value_path(pin_id)
+                                , direction_mode.open_mode_value()+'b' )
+
+    def open_bidirectional_line(self, pin_id, direction_mode, blocking_mode, reclaim=False):
+        '''
+            Export and set up pin_id as open_line does and return its value
+            file opened for both reading and writing.
+        '''
+        self.__claim(pin_id, direction_mode, blocking_mode, reclaim)
+        return sysfsio.open_file(sysfs_value_path(pin_id), 'r+b')
+
+    def set_line_direction(self, pin_id, line, direction_mode, value=None):
+        '''
+            Write direction_mode's value - or 'high' or 'low' for output
+            with an initial value - to pin_id's direction file, which is
+            opened on first use and held open until line is closed.
+        '''
+        with self.__lock:
+            direction_file = self.__direction_files.get(line)
+            if direction_file==None:
+                direction_file = sysfsio.open_file(sysfs_direction_path(pin_id), 'w')
+                self.__direction_files[line] = direction_file
+        if direction_mode.is_write() and value!=None:
+            direction_file.write('high' if value else 'low')
+        else:
+            direction_file.write(direction_mode.direction_mode_value())
+        direction_file.seek(0) # seek(0) 'flushes' the value to the pin
+
+    def close_line(self, pin_id, line, handed_off=False):
+        '''
+            Close the value file line, and its direction file if held open,
+            and unexport pin_id unless handed_off is True.
+        '''
+        with self.__lock:
+            direction_file = self.__direction_files.pop(line, None)
+        if direction_file!=None:
+            direction_file.close()
+        line.close()
+        if not handed_off:
+            self.unexport(pin_id)
+
+    def group_lines(self, lines):
+        '''
+            Returns lines as a list, also holding their file descriptors if
+            all are files (rather than, say, replacements made by iotrace)
+            so that bulk operations use fastio.
+        '''
+        if all(type(line) is file for line in lines):
+            return _FileLines(lines)
+        return list(lines)
+
+    def raw_fd(self, line):
+        '''
+            Returns the value file's descriptor if line is a file. Reading
+            through it is faster than through the file object with either
+            fastio implementation, and writing no slower.
+        '''
+        if type(line) is file:
+            return line.fileno()
+        return None
+
+    def read_lines(self, lines):
+        ''' Returns the levels of lines, using fastio.read_word if possible '''
+        if isinstance(lines, _FileLines):
+            return fastio.read_word(lines.fds)
+        return super(SysfsBackend, self).read_lines(lines)
+
+    def vote_lines(self, lines, samples):
+        ''' Returns the majority levels of lines, using fastio.vote_word if possible '''
+        if isinstance(lines, _FileLines):
+            return fastio.vote_word(lines.fds, samples)
+        return super(SysfsBackend, self).vote_lines(lines, samples)
+
+    def write_lines(self, lines, mask, value):
+        ''' Set the masked lines, using fastio.write_word if possible '''
+        if isinstance(lines, _FileLines):
+            fastio.write_word(lines.fds, mask, value)
+        else:
+            super(SysfsBackend, self).write_lines(lines, mask, value)
+
+    def event_fd(self, line):
+        ''' Returns the value file's descriptor '''
+        return line.fileno()
+
+# BCM2835 family GPIO register byte offsets, each register being 32 bits
+_GPFSEL0 = 0x00     # function (direction) select, 3 bits per pin
+_GPSET0 = 0x1c      # write 1 bits to set pins high, one bit per pin
+_GPCLR0 = 0x28      # write 1 bits to set pins low, one bit per pin
+_GPLEV0 = 0x34      # pin levels, one bit per pin
+_REGISTER = struct.Struct('<I')
+_MAP_SIZE = 4096
+
+class _MmapLine(object):
+    '''
+        Internal file-like line of the mmap backend: reads and writes the
+        level of one pin through the backend's register map.
+    '''
+    def __init__(self, backend, pin):
+        self.pin = pin
+        self.__backend = backend
+
+    def seek(self, offset, whence=0):
+        pass
+
+    def read(self, size=-1):
+        return '1\n' if self.__backend._read_pin(self.pin) else '0\n'
+
+    def write(self, data):
+        self.__backend._write_pin(self.pin, data[0]=='1')
+
+    def fileno(self):
+        ''' Returns None: the line has no file descriptor of its own '''
+        return None
+
+    def close(self):
+        self.__backend = None
+
+class MmapBackend(GPIOBackend):
+    '''
+        Backend reading and writing the BCM2835 (BCM2836/7, BCM2711) GPIO
+        registers memory mapped from /dev/gpiomem. The map is shared by all
+        lines, which have no file descriptors: their fileno returns None.
+        Pins are not exported, so are claimed by recording them in a set of
+        pins open through the backend: opening a claimed pin raises
+        PinInUseError. A closed line's pin keeps its direction. Reads and
+        writes make no system calls, nor do opens and closes other than the
+        first open and last close, which map and unmap the registers.
+    '''
+    name = 'mmap'
+    speed = 3
+    read_syscalls = 0
+    write_syscalls = 0
+    read_bytes = 0
+    write_bytes = 0
+
+    def __init__(self, device_path='/dev/gpiomem'):
+        self.__device_path = device_path
+        self.__available = None
+        self.__lock = threading.Lock()
+        self.__fd = None
+        self.__map = None
+        self.__claimed = set()
+
+    def available(self):
+        '''
+            Returns True if the register map device can be opened and the
+            SoC's GPIO controller is a BCM2835 family one.
+        '''
+        if self.__available==None:
+            from .. import hwinfo # deferred: only needed if mmap considered
+            chip = hwinfo.HwInfo.soc_gpio_chip()
+            self.__available = os.access(self.__device_path, os.R_OK|os.W_OK) \
+                               and chip!=None and chip.label.startswith('pinctrl-bcm')
+        return self.__available
+
+    def set_direction(self, pin, direction_mode):
+        ''' Set pin's function to input or output '''
+        offset = _GPFSEL0 + 4*(pin//10)
+        shift = 3*(pin%10)
+        function = 1 if direction_mode.is_write() else 0
+        with self.__lock:
+            register = _REGISTER.unpack_from(self.__map, offset)[0]
+            register = (register & ~(7<<shift)) | (function<<shift)
+            _REGISTER.pack_into(self.__map, offset, register)
+
+    def open_line(self, pin_id, direction_mode, blocking_mode, reclaim=False):
+        '''
+            Claim pin_id, map the registers if not yet mapped and set
+            pin_id's direction. Raises PinInUseError if pin_id is already
+            open through the backend.
+        '''
+        if blocking_mode.is_blocking():
+            raise PinBackendUnavailableError('mmap backend has no edge events')
+        pin = int(pin_id)
+        with self.__lock:
+            if pin in self.__claimed:
+                raise PinInUseError
+            if self.__map==None:
+                self.__fd = os.open(self.__device_path, os.O_RDWR|os.O_SYNC)
+                try:
+                    self.__map = mmap.mmap(self.__fd, _MAP_SIZE)
+                except:
+                    os.close(self.__fd)
+                    self.__fd = None
+                    raise
+            self.__claimed.add(pin)
+        line = _MmapLine(self, pin)
+        try:
+            self.set_direction(line.pin, direction_mode)
+        except:
+            self.close_line(pin_id, line)
+            raise
+        return line
+
+    def set_line_direction(self, pin_id, line, direction_mode, value=None):
+        '''
+            Set line's pin function to input or output. An output's initial
+            value is written to the set or clear register first so the pin
+            drives it from the moment it becomes an output.
+        '''
+        if direction_mode.is_write() and value!=None:
+            self._write_pin(line.pin, value)
+        self.set_direction(line.pin, direction_mode)
+
+    def close_line(self, pin_id, line, handed_off=False):
+        '''
+            Close line and release its pin's claim, unmapping the registers
+            when no lines are open.
+        '''
+        line.close()
+        with self.__lock:
+            self.__claimed.discard(line.pin)
+            if not self.__claimed and self.__map!=None:
+                self.__map.close()
+                self.__map = None
+                os.close(self.__fd)
+                self.__fd = None
+
+    def _read_pin(self, pin):
+        ''' Internal method returning the level of pin as 1 or 0 '''
+        level = _REGISTER.unpack_from(self.__map, _GPLEV0 + 4*(pin>>5))[0]
+        return (level>>(pin&31))&1
+
+    def _write_pin(self, pin, value):
+        ''' Internal method setting pin high if value is True, else low '''
+        offset = (_GPSET0 if value else _GPCLR0) + 4*(pin>>5)
+        _REGISTER.pack_into(self.__map, offset, 1<<(pin&31))
+
+    def read(self, line):
+        ''' Returns True if line is at a high level, False if low '''
+        return self._read_pin(line.pin)==1
+
+    def write(self, line, value):
+        ''' Set line to a high level if value is True, else low '''
+        self._write_pin(line.pin, value)
+
+    def _read_levels(self):
+        ''' Internal method returning the levels of all pins, bit n for pin n '''
+        return _REGISTER.unpack_from(self.__map, _GPLEV0)[0] \
+               | _REGISTER.unpack_from(self.__map, _GPLEV0+4)[0]<<32
+
+    def read_lines(self, lines):
+        ''' Returns the levels of lines read from both level registers '''
+        return self.__line_word(self._read_levels(), lines)
+
+    def vote_lines(self, lines, samples):
+        '''
+            Returns the majority levels of lines, voting on whole reads of
+            both level registers.
+        '''
+        return self.__line_word(fastio.majority(self._read_levels, samples), lines)
+
+    @staticmethod
+    def __line_word(levels, lines):
+        '''
+            Internal method returning the word of the bits of levels, bit n
+            for pin n, for lines.
+        '''
+        word = 0
+        for bit_number, line in enumerate(lines):
+            if (levels>>line.pin)&1:
+                word |= 1<<bit_number
+        return word
+
+    def write_lines(self, lines, mask, value):
+        ''' Set the masked lines with one write per set and clear register '''
+        set_bits = 0
+        clear_bits = 0
+        for bit_number, line in enumerate(lines):
+            if (mask>>bit_number)&1:
+                if (value>>bit_number)&1:
+                    set_bits |= 1<<line.pin
+                else:
+                    clear_bits |= 1<<line.pin
+        for (base, bits) in ((_GPSET0, set_bits), (_GPCLR0, clear_bits)):
+            if bits&0xffffffff:
+                _REGISTER.pack_into(self.__map, base, bits&0xffffffff)
+            if bits>>32:
+                _REGISTER.pack_into(self.__map, base+4, bits>>32)
+
+# Linux GPIO character device (version 1) ioctl structures and requests
+_CHIP_INFO = struct.Struct('=32s32sI')              # name, label, lines
+_HANDLE_REQUEST = struct.Struct('=64II64B32sIi')    # offsets, flags, default
+                                                    # values, consumer, lines, fd
+_HANDLE_DATA_SIZE = 64
+_GPIO_GET_CHIPINFO_IOCTL = 0x8044b401
+_GPIO_GET_LINEHANDLE_IOCTL = 0xc16cb403
+_GPIOHANDLE_GET_LINE_VALUES_IOCTL = 0xc040b408
+_GPIOHANDLE_SET_LINE_VALUES_IOCTL = 0xc040b409
+_HANDLE_CONFIG = struct.Struct('=I64B4I')           # flags, default values,
+                                                    # padding
+_GPIOHANDLE_SET_CONFIG_IOCTL = 0xc054b40a
+_GPIOHANDLE_REQUEST_INPUT = 1
+_GPIOHANDLE_REQUEST_OUTPUT = 2
+_CONSUMER = 'dibase-rpi-gpio'
+
+class _GPIOChipLine(object):
+    '''
+        Internal file-like line of the gpiochip backend: reads and writes
+        the level of one pin through a GPIO character device line handle.
+    '''
+    def __init__(self, fd):
+        self.__fd = fd
+
+    def seek(self, offset, whence=0):
+        pass
+
+    def read(self, size=-1):
+        data = fcntl.ioctl( self.__fd, _GPIOHANDLE_GET_LINE_VALUES_IOCTL
+                          , '\0'*_HANDLE_DATA_SIZE )
+        return '0\n' if data[0]=='\0' else '1\n'
+
+    def write(self, data):
+        fcntl.ioctl( self.__fd, _GPIOHANDLE_SET_LINE_VALUES_IOCTL
+                   , ('\1' if data[0]=='1' else '\0') + '\0'*(_HANDLE_DATA_SIZE-1) )
+
+    def fileno(self):
+        return self.__fd
+
+    def close(self):
+        os.close(self.__fd)
+
+    def _reopen(self, fd):
+        ''' Internal method making the line use the line handle fd '''
+        self.__fd = fd
+
+class GPIOChipBackend(GPIOBackend):
+    '''
+        Backend using the Linux GPIO character device of the SoC's GPIO
+        controller: each line is a line handle requested for one pin. The
+        kernel releases a process's line handles when it exits, so pins are
+        never left claimed. Each read and write is one ioctl passing a
+        line values structure.
+    '''
+    name = 'gpiochip'
+    speed = 2
+    open_syscalls = 3   # open device, ioctl line handle request, close device
+    close_syscalls = 1  # close line handle
+    read_syscalls = 1
+    write_syscalls = 1
+    read_bytes = _HANDLE_DATA_SIZE
+    write_bytes = _HANDLE_DATA_SIZE
+
+    def __init__(self, device_pattern='/dev/gpiochip*'):
+        self.__device_pattern = device_pattern
+        self.__device_path = None
+        self.__searched = False
+
+    def device_path(self):
+        '''
+            Returns the path of the character device of the GPIO controller
+            whose label is that of a BCM2835 family or RP1 controller, or
+            None if there is no such device.
+        '''
+        if not self.__searched:
+            for path in sorted(glob.glob(self.__device_pattern)):
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                    try:
+                        info = fcntl.ioctl( fd, _GPIO_GET_CHIPINFO_IOCTL
+                                          , '\0'*_CHIP_INFO.size )
+                    finally:
+                        os.close(fd)
+                except (IOError, OSError):
+                    continue
+                label = _CHIP_INFO.unpack(info)[1].rstrip('\0')
+                if label.startswith(('pinctrl-bcm', 'pinctrl-rp1')):
+                    self.__device_path = path
+                    break
+            self.__searched = True
+        return self.__device_path
+
+    def available(self):
+        ''' Returns True if the SoC's GPIO character device was found '''
+        return self.device_path()!=None
+
+    def open_line(self, pin_id, direction_mode, blocking_mode, reclaim=False):
+        '''
+            Request a line handle for pin_id for input or output. Raises
+            PinInUseError if the line is in use, including by being
+            exported in the sys filesystem.
+        '''
+        if blocking_mode.is_blocking():
+            raise PinBackendUnavailableError('gpiochip backend has no edge events')
+        return _GPIOChipLine(self.__request_handle(pin_id, direction_mode))
+
+    def __request_handle(self, pin_id, direction_mode, value=None):
+        '''
+            Internal method requesting and returning the file descriptor of
+            a line handle for pin_id for input or output, an output being
+            set to value (0 if None).
+        '''
+        flags = _GPIOHANDLE_REQUEST_OUTPUT if direction_mode.is_write() \
+                else _GPIOHANDLE_REQUEST_INPUT
+        request = _HANDLE_REQUEST.pack( *([int(pin_id)] + [0]*63 + [flags]
+                                          + [1 if value else 0] + [0]*63
+                                          + [_CONSUMER, 1, 0]) )
+        chip_fd = os.open(self.device_path(), os.O_RDWR)
+        try:
+            result = fcntl.ioctl(chip_fd, _GPIO_GET_LINEHANDLE_IOCTL, request)
+        except IOError, e:
+            if e.errno==errno.EBUSY:
+                raise PinInUseError
+            raise
+        finally:
+            os.close(chip_fd)
+        return _HANDLE_REQUEST.unpack(result)[-1]
+
+    def set_line_direction(self, pin_id, line, direction_mode, value=None):
+        '''
+            Reconfigure line's handle for input or output, an output being
+            set to value (0 if None). Kernels older than 5.5 cannot
+            reconfigure a handle, so for them the handle is released and a
+            new one requested.
+        '''
+        flags = _GPIOHANDLE_REQUEST_OUTPUT if direction_mode.is_write() \
+                else _GPIOHANDLE_REQUEST_INPUT
+        config = _HANDLE_CONFIG.pack( *([flags, 1 if value else 0] + [0]*63
+                                        + [0]*4) )
+        try:
+            fcntl.ioctl(line.fileno(), _GPIOHANDLE_SET_CONFIG_IOCTL, config)
+        except IOError, e:
+            if e.errno not in (errno.ENOTTY, errno.EINVAL):
+                raise
+            line.close()
+            line._reopen(self.__request_handle(pin_id, direction_mode, value))
+
+_backends = {}          # name: backend
+_default_name = None
+_lock = threading.Lock()
+
+def register_backend(backend):
+    '''
+        Make backend, a GPIOBackend instance, available for selection by
+        its name, replacing any backend of the same name.
+    '''
+    with _lock:
+        _backends[backend.name] = backend
+
+def unregister_backend(name):
+    ''' Remove the backend called name from those available for selection '''
+    with _lock:
+        _backends.pop(name, None)
+
+def get_backend(name):
+    '''
+        Returns the registered backend called name. Raises a
+        PinBackendUnavailableError if there is none.
+    '''
+    with _lock:
+        backend = _backends.get(name)
+    if backend==None:
+        raise PinBackendUnavailableError('unknown backend %s' % name)
+    return backend
+
+def backend_names():
+    ''' Returns the names of registered backends, fastest first '''
+    with _lock:
+        backends = sorted(_backends.values(), key=lambda b: -b.speed)
+    return [backend.name for backend in backends]
+
+def set_default_backend(name):
+    '''
+        Name the backend select_backend returns when none is requested, or
+        if name is None select backends automatically. Returns the name
+        previously set.
+    '''
+    global _default_name
+    with _lock:
+        previous = _default_name
+        _default_name = name
+    return previous
+
+def default_backend_name():
+    '''
+        Returns the name set by set_default_backend, else the value of the
+        DIBASE_RPI_GPIO_BACKEND environment variable, or None if neither is
+        set (backends are selected automatically).
+    '''
+    return _default_name or os.environ.get('DIBASE_RPI_GPIO_BACKEND') or None
+
+def select_backend(direction_mode, blocking_mode, backend=None):
+    '''
+        Returns the backend to open lines with direction_mode and
+        blocking_mode (pin.DirectionMode and pin.BlockMode values).
+
+        backend may be a GPIOBackend, which is returned, or the name of a
+        registered backend. If it is None the backend named by
+        default_backend_name is returned or, if none is named, the fastest
+        available backend supporting the modes.
+
+        Raises PinBackendUnavailableError if a requested backend is unknown,
+        unavailable or does not support the modes.
+    '''
+    if backend==None:
+        backend = default_backend_name()
+    if backend==None:
+        for name in backend_names():
+            candidate = get_backend(name)
+            if candidate.supports(direction_mode, blocking_mode) \
+               and candidate.available():
+                return candidate
+        raise PinBackendUnavailableError
+    if not isinstance(backend, GPIOBackend):
+        backend = get_backend(backend)
+    if not backend.available():
+        raise PinBackendUnavailableError('%s backend unavailable' % backend.name)
+    if not backend.supports(direction_mode, blocking_mode):
+        raise PinBackendUnavailableError( '%s backend does not support mode %s%s'
+                                        % ( backend.name
+                                          , direction_mode.open_mode_value()
+                                          , blocking_mode.open_mode_value() ) )
+    return backend
+
+for backend in (MmapBackend(), GPIOChipBackend(), SysfsBackend()):
+    register_backend(backend)
+del backend
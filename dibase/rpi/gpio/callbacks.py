@@ -0,0 +1,290 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Edge event callbacks.
+
+    An EventDispatcher runs a single poller thread that waits, using epoll,
+    for edge events on all blocking pin and pin group readers that have
+    callbacks registered. On an event the poller reads the notified pins
+    and passes the value to each callback registered for the reader, either
+    calling it directly (inline callbacks) or queuing it for one of a fixed
+    number of worker threads.
+
+    The worker queue is bounded. When it is full the poller either waits for
+    space, so that further edges are coalesced by the kernel as they would
+    be if read were being called too slowly, or drops the call, as selected
+    when the dispatcher is created. The number of calls, errors, drops and
+    the time spent executing each callback are recorded. Errors reading a
+    reader's notified pins - it may be closed by another thread at any
+    time - are recorded as errors of each of its callbacks, which are not
+    called for that event, and polling continues.
+
+    Readers normally register callbacks with a default dispatcher through
+    their add_event_callback method.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+import select
+import threading
+import Queue
+
+import timing
+
+class CallbackStats(object):
+    '''
+        Counts of calls, exceptions raised by and calls dropped for a
+        callback, and the total and maximum time spent executing it. The
+        most recent exception raised by the callback, or by reading its
+        reader's value after an edge event, is last_error; read failures
+        are also counted in errors.
+    '''
+    def __init__(self):
+        ''' Create with all counts and times zero '''
+        self.calls = 0
+        self.errors = 0
+        self.dropped = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_error = None
+
+    def snapshot(self):
+        ''' Return the values as a dictionary '''
+        return { 'calls':self.calls, 'errors':self.errors
+               , 'dropped':self.dropped, 'total_time':self.total_time
+               , 'max_time':self.max_time
+               }
+
+class CallbackHandle(object):
+    '''
+        Registration of a callback for a reader with an EventDispatcher, as
+        returned by EventDispatcher.add_event_callback.
+    '''
+    def __init__(self, dispatcher, reader, callback, inline):
+        ''' Create for callback called for reader events by dispatcher '''
+        self.dispatcher = dispatcher
+        self.reader = reader
+        self.callback = callback
+        self.inline = inline
+        self.stats = CallbackStats()
+
+    def remove(self):
+        ''' Remove the registration from its dispatcher '''
+        self.dispatcher.remove_event_callback(self)
+
+class EventDispatcher(object):
+    '''
+        Collects edge events for readers with registered callbacks using a
+        single poller thread and calls the callbacks inline or from a pool
+        of worker threads.
+    '''
+    def __init__(self, workers=2, queue_size=64, block_when_full=True):
+        '''
+            Create and start the poller thread and workers worker threads
+            (which may be 0 if only inline callbacks are used).
+
+            queue_size is the maximum number of calls queued for workers.
+            If block_when_full is True the poller waits for space in a full
+            queue, otherwise calls that do not fit are dropped.
+        '''
+        self.__poller = select.epoll()
+        self.__lock = threading.Lock()
+        self.__handles_by_fd = {}
+        self.__closing = False
+        self.__block_when_full = block_when_full
+        self.__blocked = 0
+        self.__queue = Queue.Queue(queue_size)
+        (self.__wake_fd, self.__wake_write_fd) = os.pipe()
+        self.__poller.register(self.__wake_fd, select.EPOLLIN)
+        self.__threads = [threading.Thread(target=self.__poll)]
+        for i in range(workers):
+            self.__threads.append(threading.Thread(target=self.__work))
+        self.__workers = workers
+        for thread in self.__threads:
+            thread.daemon = True
+            thread.start()
+
+    def add_event_callback(self, reader, callback, inline=False):
+        '''
+            Register callback to be called as callback(reader, value, time)
+            for edge events on reader, an open blocking pin or pin group
+            reader. See GPIOBlockingReaderBase.add_event_callback.
+
+            When the first callback is registered for reader it is polled
+            (read with a time out of 0) so that only edges occurring after
+            registration result in calls.
+
+            Returns a CallbackHandle.
+
+            Raises ValueError if reader is not an open blocking reader or if
+            inline is False and the dispatcher has no worker threads.
+        '''
+        if not reader.blocking() or reader.closed():
+            raise ValueError('callbacks require an open blocking reader')
+        if not inline and self.__workers==0:
+            raise ValueError('dispatcher has no worker threads')
+        handle = CallbackHandle(self, reader, callback, inline)
+        with self.__lock:
+            fds = reader.file_descriptors()
+            if fds[0] not in self.__handles_by_fd:
+                reader.read(0) # clear pending notifications
+            for fd in fds:
+                handles = self.__handles_by_fd.get(fd)
+                if handles==None:
+                    self.__handles_by_fd[fd] = [handle]
+                    self.__poller.register(fd, select.EPOLLPRI|select.EPOLLERR)
+                else:
+                    handles.append(handle)
+        return handle
+
+    def remove_event_callback(self, handle):
+        '''
+            Remove a callback registration. Calls already queued for worker
+            threads are still made.
+        '''
+        with self.__lock:
+            for (fd, handles) in self.__handles_by_fd.items():
+                if handle in handles:
+                    handles.remove(handle)
+                    if not handles:
+                        del self.__handles_by_fd[fd]
+                        try:
+                            self.__poller.unregister(fd)
+                        except (IOError, OSError):
+                            pass # already closed
+
+    def stats(self):
+        '''
+            Return a dictionary of dispatcher statistics:
+              'queued'    : calls currently queued for worker threads
+              'blocked'   : times the poller waited for space in the queue
+              'callbacks' : list of (CallbackHandle, CallbackStats.snapshot)
+                            pairs for the registered callbacks
+        '''
+        with self.__lock:
+            handles = []
+            for fd_handles in self.__handles_by_fd.values():
+                for handle in fd_handles:
+                    if handle not in handles:
+                        handles.append(handle)
+            return { 'queued':self.__queue.qsize()
+                   , 'blocked':self.__blocked
+                   , 'callbacks':[(h, h.stats.snapshot()) for h in handles]
+                   }
+
+    def close(self):
+        '''
+            Stop the poller and worker threads, waiting for calls already
+            queued to be made. The dispatcher cannot be used afterwards.
+        '''
+        with self.__lock:
+            if self.__closing:
+                return
+            self.__closing = True
+        os.write(self.__wake_write_fd, 'x')
+        self.__threads[0].join()
+        for thread in self.__threads[1:]:
+            self.__queue.put(None)
+        for thread in self.__threads[1:]:
+            thread.join()
+        self.__poller.close()
+        os.close(self.__wake_fd)
+        os.close(self.__wake_write_fd)
+
+    def __poll(self):
+        ''' Internal poller thread function '''
+        while True:
+            try:
+                events = self.__poller.poll()
+            except IOError:
+                continue # interrupted system call
+            time = timing.monotonic()
+            fds_by_reader = {}
+            with self.__lock:
+                if self.__closing:
+                    return
+                for (fd, event_mask) in events:
+                    handles = self.__handles_by_fd.get(fd)
+                    if handles:
+                        reader = handles[0].reader
+                        if reader not in fds_by_reader:
+                            fds_by_reader[reader] = ([], list(handles))
+                        fds_by_reader[reader][0].append(fd)
+            for (reader, (fds, handles)) in fds_by_reader.items():
+                if reader.closed():
+                    continue
+                try:
+                    value = reader._read_notified(fds)
+                except Exception, e:
+                    # e.g. reader closed by another thread since checked
+                    with self.__lock:
+                        for handle in handles:
+                            handle.stats.errors += 1
+                            handle.stats.last_error = e
+                    continue
+                for handle in handles:
+                    if handle.inline:
+                        self.__call(handle, value, time)
+                    else:
+                        self.__enqueue(handle, value, time)
+
+    def __enqueue(self, handle, value, time):
+        ''' Internal method queuing a callback call for worker threads '''
+        if isinstance(value, list):
+            value = list(value) # readers update their value lists in place
+        item = (handle, value, time)
+        try:
+            self.__queue.put_nowait(item)
+        except Queue.Full:
+            if self.__block_when_full:
+                with self.__lock:
+                    self.__blocked += 1
+                self.__queue.put(item)
+            else:
+                with self.__lock:
+                    handle.stats.dropped += 1
+
+    def __work(self):
+        ''' Internal worker thread function '''
+        while True:
+            item = self.__queue.get()
+            if item==None:
+                return
+            self.__call(*item)
+
+    def __call(self, handle, value, time):
+        ''' Internal method calling a callback and recording its statistics '''
+        start = timing.monotonic()
+        error = None
+        try:
+            handle.callback(handle.reader, value, time)
+        except Exception, e:
+            error = e
+        elapsed = timing.monotonic()-start
+        with self.__lock:
+            stats = handle.stats
+            stats.calls += 1
+            if error!=None:
+                stats.errors += 1
+                stats.last_error = error
+            stats.total_time += elapsed
+            if elapsed>stats.max_time:
+                stats.max_time = elapsed
+
+_default_dispatcher = None
+_default_dispatcher_lock = threading.Lock()
+
+def default_dispatcher():
+    '''
+        Return the EventDispatcher used by readers' add_event_callback
+        method when no dispatcher is given, creating it with default
+        parameters on first call.
+    '''
+    global _default_dispatcher
+    with _default_dispatcher_lock:
+        if _default_dispatcher==None:
+            _default_dispatcher = EventDispatcher()
+        return _default_dispatcher
@@ -0,0 +1,102 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Bounded queue of GPIO pin edge events.
+
+    Blocking pin group readers merge all edges into a single cached value so
+    bursts of edges are collapsed. An EdgeEventQueue records each observed
+    pin change - the pin's index in the group, its new level and the time
+    it was observed - in a ring of preallocated arrays so recording an event
+    allocates no memory. When full the oldest event is discarded to make
+    room and an overflow counted. Events are removed in bulk by drain.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import array
+import collections
+import threading
+
+EdgeEvent = collections.namedtuple('EdgeEvent', 'pin_index level time')
+
+class EdgeEventQueue(object):
+    '''
+        Fixed capacity, thread safe, first in first out queue of edge
+        events that discards the oldest event when full.
+    '''
+    def __init__(self, capacity):
+        '''
+            Create an empty queue able to hold capacity events.
+            Raises ValueError if capacity is less than 1.
+        '''
+        if capacity<1:
+            raise ValueError('event queue capacity must be at least 1')
+        self.__pin_indexes = array.array('H', [0])*capacity
+        self.__levels = array.array('B', [0])*capacity
+        self.__times = array.array('d', [0.0])*capacity
+        self.__capacity = capacity
+        self.__first = 0        # index of oldest event
+        self.__count = 0
+        self.__overflows = 0
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        ''' Return the number of events in the queue '''
+        return self.__count
+
+    def capacity(self):
+        ''' Return the maximum number of events the queue can hold '''
+        return self.__capacity
+
+    def overflows(self):
+        '''
+            Return the number of events discarded because the queue was
+            full since the queue was created.
+        '''
+        return self.__overflows
+
+    def append(self, pin_index, level, time):
+        '''
+            Add an event for the pin at pin_index in a group changing to
+            level (True or 1 for high, False or 0 for low) observed at time
+            (a timing.monotonic value). If the queue is full the oldest
+            event is discarded and the overflow count incremented.
+        '''
+        with self.__lock:
+            if self.__count==self.__capacity:
+                index = self.__first
+                self.__first = (self.__first+1)%self.__capacity
+                self.__overflows += 1
+            else:
+                index = (self.__first+self.__count)%self.__capacity
+                self.__count += 1
+            self.__pin_indexes[index] = pin_index
+            self.__levels[index] = 1 if level else 0
+            self.__times[index] = time
+
+    def drain(self, max_events=None):
+        '''
+            Remove and return, as a list of EdgeEvent named tuples, all
+            events in the queue, oldest first, or just the max_events oldest
+            if max_events is given.
+        '''
+        with self.__lock:
+            count = self.__count
+            if max_events!=None:
+                count = max(0, min(count, max_events))
+            events = []
+            index = self.__first
+            for i in xrange(count):
+                events.append( EdgeEvent( self.__pin_indexes[index]
+                                        , self.__levels[index]==1
+                                        , self.__times[index]
+                                        )
+                             )
+                index += 1
+                if index==self.__capacity:
+                    index = 0
+            self.__first = index
+            self.__count -= count
+            return events
@@ -0,0 +1,154 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Fast paths for the inner loops of GPIO pin IO and paced timing.
+
+    Pin and pin group objects using the sys filesystem backend read and
+    write pins' value files through their file descriptors with these
+    functions, rather than through file objects' seek, read and write
+    methods:
+
+      read_fd(fd)                  : True if the value file reads '1'
+      write_fd(fd, value)          : write '1' if value is True, else '0'
+      read_word(fds)               : integer word of the levels of the value
+                                     files, bit 0 from the first
+      write_word(fds, mask, value) : write the bits of value to the value
+                                     files whose bit of mask is set
+      vote_fd(fd, samples)         : majority level of samples reads of
+                                     the value file
+      vote_word(fds, samples)      : majority level of each bit of samples
+                                     read_word(fds) reads
+      spin_until(deadline)         : busy wait until timing.monotonic()
+                                     reaches deadline
+
+    The functions are those of the optional _fastio C extension module if
+    it has been built (see _fastio.c for how), which reads and writes with
+    one system call per pin and spins without holding the global
+    interpreter lock. Otherwise they are the pure Python versions, also
+    available as py_read_fd, py_write_fd and so on for comparison.
+    IMPLEMENTATION is 'c' or 'python' accordingly.
+
+    The C extension also provides seqlock_read and seqlock_store, which
+    read and change the sharedstate module's shared memory state as a
+    sequence lock, ordering memory accesses with barriers as Python code
+    cannot. They are None if the extension has not been built.
+
+    majority(read, samples) returns the bitwise majority of samples words
+    returned by a function; backends use it to vote on their bulk reads.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+
+import timing
+
+def py_read_fd(fd):
+    ''' Returns True if the value file open on fd reads '1', else False '''
+    os.lseek(fd, 0, os.SEEK_SET)
+    return os.read(fd, 2)[0:1]=='1'
+
+def py_write_fd(fd, value):
+    ''' Write '1' to the value file open on fd if value is True, else '0' '''
+    os.lseek(fd, 0, os.SEEK_SET)
+    os.write(fd, '1' if value else '0')
+
+def py_read_word(fds):
+    '''
+        Returns the levels read from the value files open on the sequence
+        of file descriptors fds as an integer word, bit 0 from the first.
+    '''
+    word = 0
+    for bit_number, fd in enumerate(fds):
+        os.lseek(fd, 0, os.SEEK_SET)
+        if os.read(fd, 2)[0:1]=='1':
+            word |= 1<<bit_number
+    return word
+
+def py_write_word(fds, mask, value):
+    '''
+        Write the bits of value to the value files open on those of the
+        sequence of file descriptors fds whose bit of mask is set, bit 0
+        being that of the first.
+    '''
+    for bit_number, fd in enumerate(fds):
+        if (mask>>bit_number)&1:
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, '1' if (value>>bit_number)&1 else '0')
+
+def majority(read, samples):
+    '''
+        Returns the bitwise majority of samples integer words returned by
+        successive calls of read(): the word whose bits are set if set in
+        more than half the words read, so ties are low. Raises ValueError if
+        samples is less than 1.
+
+        Bits are counted in parallel, whatever the width of the words: each
+        bit position has a lane in a set of words (planes), each holding one
+        bit of every lane's count. Lanes start at a bias that makes them
+        carry out of the top plane on the count reaching a majority.
+    '''
+    if samples<1:
+        raise ValueError('samples must be at least 1')
+    if samples==1:
+        return read()
+    width = samples.bit_length()
+    bias = (1<<width) - (samples//2 + 1)
+    planes = [-((bias>>plane)&1) for plane in range(width)] # -1: all bits set
+    plane_range = range(width)
+    votes = 0
+    for sample in xrange(samples):
+        carry = read()
+        for plane in plane_range:
+            plane_bits = planes[plane]
+            planes[plane] = plane_bits^carry
+            carry &= plane_bits
+        votes |= carry
+    return votes
+
+def py_vote_fd(fd, samples):
+    '''
+        Returns True if the value file open on fd reads '1' more than half
+        of samples times, else False. Raises ValueError if samples is less
+        than 1.
+    '''
+    if samples<1:
+        raise ValueError('samples must be at least 1')
+    high = 0
+    for sample in xrange(samples):
+        os.lseek(fd, 0, os.SEEK_SET)
+        if os.read(fd, 2)[0:1]=='1':
+            high += 1
+    return 2*high>samples
+
+def py_vote_word(fds, samples):
+    '''
+        Returns the bitwise majority of samples reads of the value files
+        open on the sequence of file descriptors fds, as py_read_word
+        words - see majority.
+    '''
+    return majority(lambda: py_read_word(fds), samples)
+
+def py_spin_until(deadline):
+    ''' Busy wait until timing.monotonic() reaches deadline '''
+    while timing.monotonic()<deadline:
+        pass
+
+try:
+    from _fastio import read_fd, write_fd, read_word, write_word
+    from _fastio import vote_fd, vote_word, spin_until
+    from _fastio import seqlock_read, seqlock_store
+    IMPLEMENTATION = 'c'
+except ImportError:
+    read_fd = py_read_fd
+    write_fd = py_write_fd
+    read_word = py_read_word
+    write_word = py_write_word
+    vote_fd = py_vote_fd
+    vote_word = py_vote_word
+    spin_until = py_spin_until
+    seqlock_read = None
+    seqlock_store = None
+    IMPLEMENTATION = 'python'
@@ -21,8 +21,11 @@ class GPIOBase(object):
         Defines common operations for GPIO pins that make sense: close, closed,
         fileno, readable, writable in the style of io.IOBase. Also included is
         the GPIO specific query method blocking.
+        Defines no instance attributes (__slots__ is empty) so that
+        implementations may define __slots__ and have no instance __dict__.
     '''
     __metaclass__ = abc.ABCMeta
+    __slots__ = ()
 
     @abc.abstractmethod
     def close(self):
@@ -70,6 +73,7 @@ class GPIOReaderBase(GPIOBase):
         AND not blocking (see GPIOBlockingReaderBase).
     '''
     __metaclass__ = abc.ABCMeta
+    __slots__ = ()
 
     def readable(self):
         ''' Returns True: readers are readable! '''
@@ -103,6 +107,7 @@ class GPIOWriterBase(GPIOBase):
         this way.
     '''
     __metaclass__ = abc.ABCMeta
+    __slots__ = ()
 
     def readable(self):
         ''' Returns False: not a reader-writer '''
@@ -133,6 +138,7 @@ class GPIOBlockingReaderBase(GPIOBase):
         AND ARE blocking.
     '''
     __metaclass__ = abc.ABCMeta
+    __slots__ = ()
 
     def readable(self):
         ''' Returns True: readers are readable! '''
@@ -163,3 +169,41 @@ class GPIOBlockingReaderBase(GPIOBase):
             edge events occured.
         '''
         pass
+
+    @abc.abstractmethod
+    def _read_notified(self, fds):
+        '''
+            Internal method that should read the GPIO pin(s) whose file
+            descriptors are in fds, which have been notified of edge events,
+            without waiting and return the value as read would.
+            Used by callbacks.EventDispatcher.
+        '''
+        pass
+
+    def add_event_callback(self, callback, inline=False, dispatcher=None):
+        '''
+            Arrange for callback(reader, value, time) to be called after
+            each edge event notification, with this object as reader, the
+            value read would have returned and the timing.monotonic time the
+            event was seen.
+
+            Events are collected by the poller thread of dispatcher, a
+            callbacks.EventDispatcher, or of callbacks.default_dispatcher()
+            if dispatcher is None. If inline is True callback is called by
+            the poller thread, which is best for quick callbacks, otherwise
+            by one of the dispatcher's worker threads. While a callback is
+            registered read should not be called.
+
+            Returns a handle to pass to remove_event_callback.
+        '''
+        import callbacks
+        if dispatcher==None:
+            dispatcher = callbacks.default_dispatcher()
+        return dispatcher.add_event_callback(self, callback, inline)
+
+    def remove_event_callback(self, handle):
+        '''
+            Remove a callback registered by add_event_callback. Callbacks
+            should be removed before the object is closed.
+        '''
+        handle.remove()
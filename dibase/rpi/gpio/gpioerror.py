@@ -10,8 +10,15 @@
 
 class GPIOError(Exception):
     """A general GPIO operation error occured"""
-    def __init__(self):
-        super(GPIOError, self).__init__(self.__doc__)
+    def __init__(self, detail=None):
+        '''
+            The error message is the class documentation string, followed by
+            detail, if given, describing the specific error.
+        '''
+        if detail==None:
+            super(GPIOError, self).__init__(self.__doc__)
+        else:
+            super(GPIOError, self).__init__('%s: %s' % (self.__doc__, detail))
 
 class PinIdInvalidError(GPIOError):
     """Invalid GPIO pin id value for this system"""
@@ -48,3 +55,15 @@ class PinGroupFormatModeInvalidError(PinGroupOpenModeInvalidError):
 class PinGroupIdsInvalidError(GPIOError):
     """Invalid group of pin ids, expected non-empty iterable sequence"""
     pass
+
+class PinServerError(GPIOError):
+    """GPIO pin server request failed"""
+    pass
+
+class PinBackendUnavailableError(GPIOError):
+    """GPIO backend unavailable or unable to open pins in the mode requested"""
+    pass
+
+class PinProtocolError(GPIOError):
+    """Device response to a pin protocol exchange invalid or missing"""
+    pass
@@ -0,0 +1,553 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Run time instrumentation of GPIO pin and pin group IO operations.
+
+    When enabled, counts of operations (opens, closes, reads, writes, edge
+    event wake ups, time outs, edges seen and estimated missed edges) and
+    of the system calls made and bytes transferred for them are kept for
+    each GPIO pin and pin group, along with histograms of operation
+    latencies. The values collected can be obtained as a dictionary by
+    calling snapshot.
+
+    Instrumentation is applied by replacing the IO methods of the pin and
+    pin group classes with instrumented versions when enable is called and
+    restoring the originals when disable is called, so when disabled -
+    the initial state - there is no overhead at all. While enabled each
+    instrumented operation costs two reads of the monotonic clock and a
+    short update of the statistics made while holding a lock. Bulk
+    operations (pin group write_many and read_many) count each value
+    written or read as a write or read, each recorded with the mean latency
+    of the operation's values, including any interval between them. Reads
+    of pins and pin groups notified of edge events by callbacks, pinserver
+    or polling.PinPoller count as wake ups, whose waiting was done by their
+    caller and so is not timed.
+
+    System call counts and bytes transferred are not measured but are those
+    each pin's backend makes for the operation performed, as given by its
+    open_syscalls, read_syscalls, read_bytes and similar attributes (see
+    the backends module's GPIOBackend). For example a sys filesystem pin
+    value file read transfers 2 bytes ('0\\n' or '1\\n') with one pread
+    if the fastio C extension is built, else with a seek and a read, while
+    mmap backend reads make no system calls and gpiochip backend reads one
+    ioctl. Each wait for edge events is counted as one select.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import bisect
+import threading
+
+import backends
+import timing
+
+# Latency histogram bucket upper bounds in seconds - 1us to 1s, plus a final
+# bucket for all values over 1 second (upper bound of infinity).
+LATENCY_BUCKETS = ( 1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5
+                  , 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3
+                  , 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0
+                  )
+
+WAIT_SYSCALLS = 1       # select
+
+class Histogram(object):
+    '''
+        Histogram of observed values (latencies in seconds) held as counts
+        of values falling into each of a fixed set of buckets, together with
+        the total number and sum of all values observed.
+    '''
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        '''
+            Create an empty histogram. bounds is an ascending sequence of
+            bucket upper bound values - a value v is counted in the first
+            bucket whose bound is >= v. One extra bucket counts all values
+            greater than the last bound.
+        '''
+        self.__bounds = tuple(bounds)
+        self.__counts = [0]*(len(self.__bounds)+1)
+        self.__count = 0
+        self.__sum = 0.0
+
+    def observe(self, value):
+        ''' Count value in the histogram '''
+        self.__counts[bisect.bisect_left(self.__bounds, value)] += 1
+        self.__count += 1
+        self.__sum += value
+
+    def count(self):
+        ''' Return the number of values observed '''
+        return self.__count
+
+    def sum(self):
+        ''' Return the sum of the values observed '''
+        return self.__sum
+
+    def snapshot(self):
+        '''
+            Return a dictionary of the histogram state: 'count' and 'sum' of
+            values observed and 'buckets', a list of (upper bound, count)
+            pairs in ascending bound order with cumulative counts of values
+            <= each bound. The last pair has an upper bound of
+            float('inf') and a count equal to 'count'.
+        '''
+        buckets = []
+        cumulative = 0
+        for (bound, count) in zip(self.__bounds+(float('inf'),), self.__counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {'count':self.__count, 'sum':self.__sum, 'buckets':buckets}
+
+class IOStats(object):
+    '''
+        Counters and latency histograms for a single GPIO pin or a pin
+        group. Updated only while holding the module lock. backend is the
+        backends.GPIOBackend (instance or class) whose system calls and
+        bytes transferred are counted.
+    '''
+    COUNTERS = ( 'opens', 'closes', 'reads', 'writes', 'syscalls'
+               , 'bytes_read', 'bytes_written', 'wakeups', 'timeouts'
+               , 'edges', 'missed_edges'
+               )
+    LATENCIES = ('open', 'close', 'read', 'write', 'wait')
+
+    def __init__(self):
+        ''' Create with all counts zero and empty latency histograms '''
+        for counter in IOStats.COUNTERS:
+            setattr(self, counter, 0)
+        self.latency = dict((name, Histogram()) for name in IOStats.LATENCIES)
+        self.is_open = False
+        self.edge_mode = None
+        self.last_value = None
+        self.backend = backends.GPIOBackend
+
+    def snapshot(self):
+        '''
+            Return a dictionary of counter name to count values plus the
+            'open' state and 'latency', a dictionary of latency histogram
+            names to histogram snapshots.
+        '''
+        values = dict((counter, getattr(self, counter)) for counter in IOStats.COUNTERS)
+        values['open'] = self.is_open
+        values['latency'] = dict( (name, histogram.snapshot())
+                                  for (name, histogram) in self.latency.items()
+                                )
+        return values
+
+_lock = threading.Lock()
+_stats_by_pin = {}    # IOStats by int pin id value
+_stats_by_group = {}  # IOStats by tuple of int pin id values
+_originals = None     # list of (class, method name, original method) if enabled
+
+def is_enabled():
+    ''' Return True if instrumentation is enabled '''
+    return _originals!=None
+
+def enable():
+    '''
+        Enable instrumentation by replacing pin and pin group IO methods with
+        instrumented versions. Calling enable when enabled has no effect.
+    '''
+    global _originals
+    with _lock:
+        if _originals!=None:
+            return
+        originals = []
+        for (cls, name, instrumented) in _instrumented_methods():
+            original = cls.__dict__[name]
+            originals.append((cls, name, original))
+            setattr(cls, name, instrumented(original))
+        _originals = originals
+
+def disable():
+    '''
+        Disable instrumentation by restoring the original IO methods. Values
+        collected so far are retained. Calling disable when disabled has
+        no effect.
+    '''
+    global _originals
+    with _lock:
+        if _originals==None:
+            return
+        for (cls, name, original) in _originals:
+            setattr(cls, name, original)
+        _originals = None
+
+def reset():
+    ''' Discard all values collected so far '''
+    with _lock:
+        _stats_by_pin.clear()
+        _stats_by_group.clear()
+
+def record_pin_writes(pins, elapsed):
+    '''
+        Record a write of each of pins, open pin.PinWriters written together
+        with one bulk backend write taking elapsed seconds rather than by
+        their write methods (as timerwheel.TimerWheel does), if
+        instrumentation is enabled.
+    '''
+    if _originals==None:
+        return
+    with _lock:
+        for p in pins:
+            stats = _pin_stats(int(p._pin_id()), p._backend())
+            stats.writes += 1
+            stats.syscalls += stats.backend.write_syscalls
+            stats.bytes_written += stats.backend.write_bytes
+            stats.latency['write'].observe(elapsed)
+
+def snapshot():
+    '''
+        Return a dictionary of the values collected:
+          'enabled' : True if instrumentation is enabled
+          'pins'    : dictionary of int pin id to IOStats.snapshot values
+          'groups'  : dictionary of tuples of int pin ids (in group order) to
+                      IOStats.snapshot values
+        The returned dictionary is not updated by later operations.
+    '''
+    with _lock:
+        return { 'enabled' : _originals!=None
+               , 'pins'    : dict( (pin_id, stats.snapshot())
+                                   for (pin_id, stats) in _stats_by_pin.items()
+                                 )
+               , 'groups'  : dict( (pin_ids, stats.snapshot())
+                                   for (pin_ids, stats) in _stats_by_group.items()
+                                 )
+               }
+
+def _pin_stats(pin_id, backend):
+    '''
+        Internal function returning the IOStats for pin_id, creating it if
+        necessary, whose system calls and bytes transferred are counted as
+        for backend, or for the base backends.GPIOBackend if backend is
+        None. Must be called while holding the module lock.
+    '''
+    stats = _stats_by_pin.get(pin_id)
+    if stats==None:
+        stats = _stats_by_pin[pin_id] = IOStats()
+    if backend!=None:
+        stats.backend = backend
+    return stats
+
+def _group_stats(group):
+    '''
+        Internal function returning the IOStats for pin group object group,
+        creating it if necessary. Must be called while holding the module
+        lock.
+    '''
+    pin_ids = tuple(int(p._pin_id()) for p in group._pins if not p.closed())
+    stats = _stats_by_group.get(pin_ids)
+    if stats==None:
+        stats = _stats_by_group[pin_ids] = IOStats()
+    stats.backend = group._backend
+    return stats
+
+def _changed_pins(before, after, pin_count):
+    '''
+        Internal function returning a list of pin_count Booleans, True for
+        each pin of a group whose value differs between group values before
+        and after - integer words or lists of Booleans. All pins are changed
+        if before is None.
+    '''
+    if before==None:
+        return [True]*pin_count
+    if not isinstance(after, (int, long)):
+        return [a!=b for (a, b) in zip(before, after)]
+    return [bool((before^after)>>bit & 1) for bit in range(pin_count)]
+
+def _record_group_writes(group, before, values, elapsed):
+    '''
+        Internal function updating group and pin statistics for values
+        written in turn to pin group object group, whose value was before
+        before the first, taking elapsed seconds in all. Must be called
+        while holding the module lock.
+    '''
+    stats = _group_stats(group)
+    pin_stats = [_pin_stats(int(p._pin_id()), p._backend()) for p in group._pins]
+    for value in values:
+        stats.writes += 1
+        stats.latency['write'].observe(elapsed/len(values))
+        changed = _changed_pins(before, value, len(pin_stats))
+        for (pin_stat, pin_changed) in zip(pin_stats, changed):
+            if pin_changed:
+                pin_stat.writes += 1
+                pin_stat.syscalls += pin_stat.backend.write_syscalls
+                pin_stat.bytes_written += pin_stat.backend.write_bytes
+        before = value
+
+def _record_group_reads(group, count, elapsed):
+    '''
+        Internal function updating group and pin statistics for count reads
+        of pin group object group taking elapsed seconds in all. Must be
+        called while holding the module lock.
+    '''
+    stats = _group_stats(group)
+    stats.reads += count
+    for read in xrange(count):
+        stats.latency['read'].observe(elapsed/count)
+    for p in group._pins:
+        pin_stats = _pin_stats(int(p._pin_id()), p._backend())
+        pin_stats.reads += count
+        pin_stats.syscalls += count*pin_stats.backend.read_syscalls
+        pin_stats.bytes_read += count*pin_stats.backend.read_bytes
+
+def _record_group_value(group, before, value, waited, elapsed):
+    '''
+        Internal function updating group and pin statistics for a blocking
+        read of pin group object group, whose value was before before the
+        read, which returned value, or None if it timed out, and took
+        elapsed seconds. waited is True if the read waited for edge events,
+        False if it polled, None if its caller waited (the read was
+        notified). Group blocking reads read pin value files directly, so
+        edges counted are changes to the values of pins in the group. Must
+        be called while holding the module lock.
+    '''
+    stats = _group_stats(group)
+    if waited:
+        stats.latency['wait'].observe(elapsed)
+    if value==None:
+        stats.timeouts += 1
+        return
+    if waited!=False:
+        stats.wakeups += 1
+    stats.reads += 1
+    stats.latency['read'].observe(elapsed)
+    changed = _changed_pins(before, value, len(group._pins))
+    for (p, pin_changed) in zip(group._pins, changed):
+        if pin_changed:
+            stats.edges += 1
+            _pin_stats(int(p._pin_id()), p._backend()).edges += 1
+
+def _record_value(stats, value, timeout, elapsed):
+    '''
+        Internal function updating stats for a completed blocking read, which
+        returned value, or None if it timed out, and took elapsed seconds.
+        Must be called while holding the module lock.
+    '''
+    if timeout!=0:
+        stats.syscalls += WAIT_SYSCALLS
+        stats.latency['wait'].observe(elapsed)
+        if value==None:
+            stats.timeouts += 1
+            return
+        _record_edge(stats, value)
+    _record_read(stats, value, elapsed)
+
+def _record_notified_value(stats, value, elapsed):
+    '''
+        Internal function updating stats for a read, which returned value
+        and took elapsed seconds, after the caller waited for and was
+        notified of an edge event. Must be called while holding the module
+        lock.
+    '''
+    _record_edge(stats, value)
+    _record_read(stats, value, elapsed)
+
+def _record_edge(stats, value):
+    '''
+        Internal function updating stats for a wake up on an edge event
+        after which value was read. A read returning the same value as the
+        previous read of a pin blocking on both edges implies at least one
+        edge was missed. Must be called while holding the module lock.
+    '''
+    stats.wakeups += 1
+    stats.edges += 1
+    if stats.edge_mode=='B' and stats.last_value==value:
+        stats.missed_edges += 1
+
+def _record_read(stats, value, elapsed):
+    '''
+        Internal function updating stats for a read of value taking elapsed
+        seconds. Must be called while holding the module lock.
+    '''
+    stats.reads += 1
+    stats.syscalls += stats.backend.read_syscalls
+    stats.bytes_read += stats.backend.read_bytes
+    stats.latency['read'].observe(elapsed)
+    stats.last_value = value
+
+def _instrumented_methods():
+    '''
+        Internal function returning a list of (class, method name,
+        instrumented method factory) tuples for the pin and pin group IO
+        methods to instrument. Each factory takes the original method and
+        returns the instrumented replacement.
+    '''
+    import pin
+    import pingroup
+
+    def pin_init(original):
+        def __init__(self, pin_id, direction_mode, blocking_mode, backend=None):
+            start = timing.monotonic()
+            original(self, pin_id, direction_mode, blocking_mode, backend)
+            elapsed = timing.monotonic()-start
+            with _lock:
+                stats = _pin_stats(int(self._pin_id()), self._backend())
+                stats.opens += 1
+                stats.syscalls += stats.backend.open_syscalls
+                stats.latency['open'].observe(elapsed)
+                stats.is_open = True
+                if isinstance(blocking_mode, pin.BlockMode):
+                    stats.edge_mode = blocking_mode.open_mode_value()
+                else:
+                    stats.edge_mode = blocking_mode
+                stats.last_value = None
+        return __init__
+
+    def pin_close(original):
+        def close(self):
+            pin_id = None if self.closed() else self._pin_id()
+            backend = self._backend()
+            start = timing.monotonic()
+            original(self)
+            elapsed = timing.monotonic()-start
+            if pin_id!=None:
+                with _lock:
+                    stats = _pin_stats(int(pin_id), backend)
+                    stats.closes += 1
+                    stats.syscalls += stats.backend.close_syscalls
+                    stats.latency['close'].observe(elapsed)
+                    stats.is_open = False
+        return close
+
+    def pin_write(original):
+        def write(self, value):
+            start = timing.monotonic()
+            original(self, value)
+            elapsed = timing.monotonic()-start
+            with _lock:
+                stats = _pin_stats(int(self._pin_id()), self._backend())
+                stats.writes += 1
+                stats.syscalls += stats.backend.write_syscalls
+                stats.bytes_written += stats.backend.write_bytes
+                stats.latency['write'].observe(elapsed)
+        return write
+
+    def pin_read(original):
+        def read(self):
+            start = timing.monotonic()
+            value = original(self)
+            elapsed = timing.monotonic()-start
+            with _lock:
+                _record_value(_pin_stats(int(self._pin_id()), self._backend()), value, 0, elapsed)
+            return value
+        return read
+
+    def pin_blocking_read(original):
+        def read(self, timeout=None):
+            start = timing.monotonic()
+            value = original(self, timeout)
+            elapsed = timing.monotonic()-start
+            with _lock:
+                _record_value(_pin_stats(int(self._pin_id()), self._backend()), value, timeout, elapsed)
+            return value
+        return read
+
+    def pin_notified_read(original):
+        def _read_notified(self, fds):
+            start = timing.monotonic()
+            value = original(self, fds)
+            elapsed = timing.monotonic()-start
+            with _lock:
+                _record_notified_value(_pin_stats(int(self._pin_id()), self._backend()), value, elapsed)
+            return value
+        return _read_notified
+
+    # Group reads and writes use their backend's bulk operations or read
+    # pin value files directly rather than pin read and write methods, so
+    # pin statistics are also updated here.
+    def group_write(original):
+        def write(self, value):
+            before = self._cached_value
+            if isinstance(before, list):
+                before = list(before)
+            start = timing.monotonic()
+            original(self, value)
+            elapsed = timing.monotonic()-start
+            with _lock:
+                _record_group_writes(self, before, [self._cached_value], elapsed)
+        return write
+
+    def group_write_many(original):
+        def write_many(self, values, interval=None, realtime=None):
+            values = pingroup._as_list(values) # may be an iterator
+            before = self._cached_value
+            start = timing.monotonic()
+            original(self, values, interval, realtime)
+            elapsed = timing.monotonic()-start
+            if isinstance(self, pingroup.PinWordWriter):
+                values = [int(value) for value in values]
+            if values:
+                with _lock:
+                    _record_group_writes(self, before, values, elapsed)
+        return write_many
+
+    def group_read(original):
+        def read(self):
+            start = timing.monotonic()
+            value = original(self)
+            elapsed = timing.monotonic()-start
+            with _lock:
+                _record_group_reads(self, 1, elapsed)
+            return value
+        return read
+
+    def group_read_many(original):
+        def read_many(self, n, *args, **kwargs):
+            start = timing.monotonic()
+            values = original(self, n, *args, **kwargs)
+            elapsed = timing.monotonic()-start
+            if n:
+                with _lock:
+                    _record_group_reads(self, n, elapsed)
+            return values
+        return read_many
+
+    def group_blocking_read(original):
+        def read(self, timeout=None):
+            before = self._cached_value
+            if isinstance(before, list):
+                before = list(before)
+            start = timing.monotonic()
+            value = original(self, timeout)
+            elapsed = timing.monotonic()-start
+            with _lock:
+                _record_group_value(self, before, value, timeout!=0, elapsed)
+            return value
+        return read
+
+    def group_notified_read(original):
+        def _read_notified(self, fds):
+            before = self._cached_value
+            if isinstance(before, list):
+                before = list(before)
+            start = timing.monotonic()
+            value = original(self, fds)
+            elapsed = timing.monotonic()-start
+            with _lock:
+                _record_group_value(self, before, value, None, elapsed)
+            return value
+        return _read_notified
+
+    return [ (pin._PinIOBase, '__init__', pin_init)
+           , (pin._PinIOBase, 'close', pin_close)
+           , (pin.PinWriter, 'write', pin_write)
+           , (pin.PinReader, 'read', pin_read)
+           , (pin.PinBlockingReader, 'read', pin_blocking_read)
+           , (pin.PinBlockingReader, '_read_notified', pin_notified_read)
+           , (pin.BidirectionalPin, 'write', pin_write)
+           , (pin.BidirectionalPin, 'read', pin_read)
+           , (pingroup.PinWordWriter, 'write', group_write)
+           , (pingroup.PinListWriter, 'write', group_write)
+           , (pingroup.PinWordWriter, 'write_many', group_write_many)
+           , (pingroup.PinListWriter, 'write_many', group_write_many)
+           , (pingroup.PinWordReader, 'read', group_read)
+           , (pingroup.PinListReader, 'read', group_read)
+           , (pingroup.PinWordReader, 'read_many', group_read_many)
+           , (pingroup.PinListReader, 'read_many', group_read_many)
+           , (pingroup.PinWordBlockingReader, 'read', group_blocking_read)
+           , (pingroup.PinListBlockingReader, 'read', group_blocking_read)
+           , (pingroup.PinWordBlockingReader, '_read_notified', group_notified_read)
+           , (pingroup.PinListBlockingReader, '_read_notified', group_notified_read)
+           ]
@@ -0,0 +1,405 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Recording and replay of GPIO sys filesystem IO.
+
+    A TraceRecorder replaces the sysfsio module's functions while started
+    to record, in a compact binary trace file, every sys filesystem file
+    opened and each read, write, path existence check and wait for edge
+    events made by pin and pin group objects, with the time each completed.
+
+    A TraceReplayer replaces the same functions to play a trace back to pin
+    and pin group objects without any GPIO hardware. Opens always succeed,
+    reads of a file return the data recorded for that file in order (then
+    repeat the last data), and each wait for edge events returns the
+    objects recorded as ready by the next recorded wait, or times out if the
+    recorded wait did. Replay is paced to the recorded times, scaled by a
+    speed factor, or runs as fast as possible. Data written is collected so
+    it can be compared with that recorded.
+
+    Synthetic traces, for example of edge events at a chosen rate, can be
+    created using a TraceWriter.
+
+    Edge events collected by callbacks.EventDispatcher use epoll directly
+    and so are neither recorded nor replayed. While started, recorders and
+    replayers make the sys filesystem backend the default (see the backends
+    module) so that pins not opened with a named backend use sysfsio.
+
+    Trace files start with a magic string followed by records of a header -
+    time (seconds since recording started), operation code, file index and
+    payload length - and a payload. Each file is identified by an index,
+    defined by a PATH record whose payload is the file's path.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import collections
+import struct
+import threading
+
+import backends
+import sysfsio
+import timing
+
+_MAGIC = 'DRGT0001'
+_RECORD = struct.Struct('<dBHH')    # time, op, file index, payload length
+_SELECT = struct.Struct('<dBBB')    # timeout (-1 for None), ready list lengths
+_INDEX = struct.Struct('<H')
+
+PATH = ord('P')
+EXISTS = ord('E')
+OPEN = ord('O')
+READ = ord('R')
+WRITE = ord('W')
+SELECT = ord('S')
+
+def _fileno(item):
+    ''' Internal function returning the file descriptor of a select item '''
+    return item if isinstance(item, (int, long)) else item.fileno()
+
+class _TraceSeams(object):
+    '''
+        Internal base class for objects replacing the sysfsio functions,
+        and using the sys filesystem backend by default, between calls to
+        start and stop.
+    '''
+    def start(self):
+        ''' Replace the sysfsio functions. Returns self '''
+        self._originals = (sysfsio.open_file, sysfsio.path_exists, sysfsio.select)
+        sysfsio.open_file = self._open_file
+        sysfsio.path_exists = self._path_exists
+        sysfsio.select = self._select
+        self._default_backend = backends.set_default_backend('sysfs')
+        return self
+
+    def stop(self):
+        ''' Restore the sysfsio functions and default backend replaced by start '''
+        if getattr(self, '_originals', None)!=None:
+            (sysfsio.open_file, sysfsio.path_exists, sysfsio.select) = self._originals
+            self._originals = None
+            backends.set_default_backend(self._default_backend)
+
+    def __enter__(self):
+        ''' Calls start and returns self for use in a with statement '''
+        return self.start()
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        ''' Calls stop '''
+        self.stop()
+
+class TraceWriter(object):
+    '''
+        Writes trace records to a trace file. Used by TraceRecorder, and
+        to create synthetic traces.
+    '''
+    def __init__(self, path):
+        ''' Create the trace file at path '''
+        self.__file = open(path, 'wb')
+        self.__file.write(_MAGIC)
+        self.__lock = threading.Lock()
+        self.__indexes = {}         # path: file index
+        self.__start = timing.monotonic()
+
+    def time(self):
+        ''' Return the time in seconds since the writer was created '''
+        return timing.monotonic()-self.__start
+
+    def write(self, op, path, payload='', time=None):
+        '''
+            Write a record of op (EXISTS, OPEN, READ or WRITE) on the file
+            at path with payload, at time or, if None, the current time().
+        '''
+        if time==None:
+            time = self.time()
+        with self.__lock:
+            self.__write(time, op, self.__index(time, path), payload)
+
+    def write_select(self, ready_paths, timeout=None, time=None):
+        '''
+            Write a record of a wait for edge events with timeout that
+            completed at time (or, if None, the current time()) with the
+            files at the paths in each of the three sequences of ready_paths
+            ready, as for the three lists returned by select.select.
+        '''
+        if time==None:
+            time = self.time()
+        with self.__lock:
+            payload = _SELECT.pack( -1.0 if timeout==None else timeout
+                                  , *[len(paths) for paths in ready_paths] )
+            for paths in ready_paths:
+                for path in paths:
+                    payload += _INDEX.pack(self.__index(time, path))
+            self.__write(time, SELECT, 0, payload)
+
+    def close(self):
+        ''' Close the trace file '''
+        with self.__lock:
+            if not self.__file.closed:
+                self.__file.close()
+
+    def __index(self, time, path):
+        '''
+            Internal method returning the file index of path, writing a
+            PATH record defining it if new.
+        '''
+        index = self.__indexes.get(path)
+        if index==None:
+            index = len(self.__indexes)
+            self.__indexes[path] = index
+            self.__write(time, PATH, index, path)
+        return index
+
+    def __write(self, time, op, index, payload):
+        ''' Internal method writing a record '''
+        if not self.__file.closed:
+            self.__file.write(_RECORD.pack(time, op, index, len(payload)))
+            self.__file.write(payload)
+
+class _RecordingFile(object):
+    ''' Internal file object wrapper recording reads and writes '''
+    def __init__(self, writer, path, real_file):
+        self.__writer = writer
+        self.__path = path
+        self.__file = real_file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def read(self, *args):
+        data = self.__file.read(*args)
+        self.__writer.write(READ, self.__path, data)
+        return data
+
+    def write(self, data):
+        self.__file.write(data)
+        self.__writer.write(WRITE, self.__path, data)
+
+    def seek(self, *args):
+        self.__file.seek(*args)
+
+    def flush(self):
+        self.__file.flush()
+
+    def fileno(self):
+        return self.__file.fileno()
+
+    def close(self):
+        self.__file.close()
+
+class TraceRecorder(_TraceSeams):
+    '''
+        Records GPIO sys filesystem IO made through the sysfsio module to a
+        trace file while started.
+    '''
+    def __init__(self, path):
+        ''' Create a recorder writing the trace file at path '''
+        self.__writer = TraceWriter(path)
+        self.__fd_paths = {}
+
+    def stop(self):
+        ''' Restore the sysfsio functions and close the trace file '''
+        super(TraceRecorder, self).stop()
+        self.__writer.close()
+
+    def _open_file(self, path, mode='r'):
+        ''' Internal replacement for sysfsio.open_file '''
+        real_file = self._originals[0](path, mode)
+        self.__fd_paths[real_file.fileno()] = path
+        self.__writer.write(OPEN, path, mode)
+        return _RecordingFile(self.__writer, path, real_file)
+
+    def _path_exists(self, path):
+        ''' Internal replacement for sysfsio.path_exists '''
+        exists = self._originals[1](path)
+        self.__writer.write(EXISTS, path, '1' if exists else '0')
+        return exists
+
+    def _select(self, rlist, wlist, xlist, timeout=None):
+        ''' Internal replacement for sysfsio.select '''
+        ready = self._originals[2](rlist, wlist, xlist, timeout)
+        self.__writer.write_select( [ [self.__fd_paths.get(_fileno(item), '') for item in items]
+                                      for items in ready
+                                    ]
+                                  , timeout )
+        return ready
+
+def read_trace(path):
+    '''
+        Return the records of the trace file at path as a list of (time,
+        op, path, payload) tuples. The payload of a SELECT record is a
+        tuple of the timeout (or None) and lists of the paths of the ready
+        files in each of the lists waited on, and its path is None. Raises
+        ValueError if the file is not a trace file.
+    '''
+    with open(path, 'rb') as trace_file:
+        data = trace_file.read()
+    if data[0:len(_MAGIC)]!=_MAGIC:
+        raise ValueError('%s is not a GPIO trace file' % path)
+    paths = {}
+    records = []
+    offset = len(_MAGIC)
+    while offset+_RECORD.size<=len(data):
+        (time, op, index, length) = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        payload = data[offset:offset+length]
+        offset += length
+        if op==PATH:
+            paths[index] = payload
+        elif op==SELECT:
+            (timeout, ready) = (_SELECT.unpack_from(payload)[0], [])
+            payload_offset = _SELECT.size
+            for count in _SELECT.unpack_from(payload)[1:]:
+                indexes = struct.unpack_from('<%dH' % count, payload, payload_offset)
+                payload_offset += count*_INDEX.size
+                ready.append([paths.get(i) for i in indexes])
+            records.append( (time, op, None
+                            , (None if timeout<0 else timeout, ready[0], ready[1], ready[2])
+                            ) )
+        else:
+            records.append((time, op, paths.get(index), payload))
+    return records
+
+class _ReplayFile(object):
+    ''' Internal file object returning and collecting replayed data '''
+    def __init__(self, replayer, path, fd):
+        self.__replayer = replayer
+        self.__path = path
+        self.__fd = fd
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def read(self, *args):
+        return self.__replayer._read(self.__path)
+
+    def write(self, data):
+        self.__replayer._write(self.__path, data)
+
+    def seek(self, *args):
+        pass
+
+    def flush(self):
+        pass
+
+    def fileno(self):
+        return self.__fd
+
+    def close(self):
+        pass
+
+class TraceReplayer(_TraceSeams):
+    '''
+        Replays a trace file recorded by TraceRecorder to GPIO sys
+        filesystem IO made through the sysfsio module while started.
+    '''
+    def __init__(self, path, speed=1.0):
+        '''
+            Create a replayer for the trace file at path. Replay is paced at
+            speed times the recorded rate or, if speed is None or 0, is as
+            fast as possible. Raises ValueError if the file is not a trace
+            file.
+        '''
+        self.__speed = speed
+        self.__reads = collections.defaultdict(collections.deque)
+        self.__last_reads = {}
+        self.__exists = collections.defaultdict(collections.deque)
+        self.__selects = collections.deque()
+        self.__recorded_writes = []
+        self.__written = []
+        self.__fd_paths = {}
+        self.__next_fd = 10000  # fake file descriptors, unlikely to be real
+        self.__lock = threading.Lock()
+        for (time, op, path, payload) in read_trace(path):
+            if op==READ:
+                self.__reads[path].append((time, payload))
+            elif op==EXISTS:
+                self.__exists[path].append((time, payload=='1'))
+            elif op==WRITE:
+                self.__recorded_writes.append((path, payload))
+            elif op==SELECT:
+                self.__selects.append((time, payload[1:]))
+
+    def start(self):
+        ''' Replace the sysfsio functions and start the replay clock '''
+        self.__start = timing.monotonic()
+        return super(TraceReplayer, self).start()
+
+    def recorded_writes(self):
+        ''' Return a list of the (path, data) writes in the trace '''
+        return list(self.__recorded_writes)
+
+    def written(self):
+        ''' Return a list of the (path, data) writes made during replay '''
+        with self.__lock:
+            return list(self.__written)
+
+    def __pace(self, time):
+        ''' Internal method waiting until the replay time of a record '''
+        if self.__speed:
+            timing.sleep_until(self.__start + time/self.__speed)
+
+    def _read(self, path):
+        ''' Internal method returning the next data read from path '''
+        with self.__lock:
+            reads = self.__reads.get(path)
+            if reads:
+                (time, data) = reads.popleft()
+                self.__last_reads[path] = data
+            else:
+                (time, data) = (None, self.__last_reads.get(path, '0\n'))
+        if time!=None:
+            self.__pace(time)
+        return data
+
+    def _write(self, path, data):
+        ''' Internal method collecting data written to path '''
+        with self.__lock:
+            self.__written.append((path, data))
+
+    def _open_file(self, path, mode='r'):
+        ''' Internal replacement for sysfsio.open_file '''
+        with self.__lock:
+            fd = self.__next_fd
+            self.__next_fd += 1
+            self.__fd_paths[fd] = path
+        return _ReplayFile(self, path, fd)
+
+    def _path_exists(self, path):
+        ''' Internal replacement for sysfsio.path_exists '''
+        with self.__lock:
+            exists = self.__exists.get(path)
+            (time, result) = exists.popleft() if exists else (None, False)
+        if time!=None:
+            self.__pace(time)
+        return result
+
+    def _select(self, rlist, wlist, xlist, timeout=None):
+        '''
+            Internal replacement for sysfsio.select returning the items of
+            the lists whose files were ready in the next recorded wait.
+            Raises EOFError if the trace has no more waits and timeout is
+            None.
+        '''
+        with self.__lock:
+            record = self.__selects.popleft() if self.__selects else None
+        if record==None:
+            if timeout==None:
+                raise EOFError('end of GPIO trace')
+            if self.__speed:
+                timing.sleep_until(timing.monotonic()+timeout/self.__speed)
+            return ([], [], [])
+        (time, ready_paths) = record
+        self.__pace(time)
+        return tuple( [ item for item in items
+                        if self.__fd_paths.get(_fileno(item)) in ready
+                      ]
+                      for (items, ready) in zip((rlist, wlist, xlist), ready_paths)
+                    )
@@ -0,0 +1,389 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Edge event wake up latency measurement.
+
+    Measures the time from an edge being generated to a thread waiting for
+    edge events waking up. Edges are generated at a given rate by a driver
+    thread, which records the monotonic clock time of each edge, while the
+    calling thread waits for them using one of the event wait paths: select
+    (as used by the blocking pin and pin group readers), poll or epoll on
+    the raw file descriptor, as baselines, or through the library's public
+    paths: a PinBlockingReader's read ('read') or an inline callback called
+    by a callbacks.EventDispatcher ('callback'). The public paths include
+    reading the pin and need an edge source with a blocking reader.
+
+    Edges are generated either by a LoopbackEdgeSource - a GPIO output pin
+    wired to a GPIO input pin opened for blocking on both edges - or by a
+    PipeEdgeSource, which fakes edges by writing their times to a pipe and
+    needs no GPIO hardware.
+
+    As with GPIO edge events, edges that occur before the waiting thread
+    has handled the previous edge are coalesced into a single wake up. Such
+    edges are reported as dropped, as are edges not seen at all.
+
+    The asyncio event path is not available as asyncio requires Python 3.
+    Waiting on gpiochip character device line events is not supported.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import array
+import fcntl
+import math
+import os
+import Queue
+import select
+import struct
+import threading
+
+import timing
+from instrument import Histogram
+
+PATHS = ('select', 'poll', 'epoll', 'read', 'callback')
+READER_PATHS = frozenset(['read', 'callback'])
+
+UNAVAILABLE_PATHS = { 'asyncio' : 'asyncio requires Python 3'
+                    , 'gpiochip': 'gpiochip line events are not supported'
+                    }
+
+class PipeEdgeSource(object):
+    '''
+        Fake edge source that needs no GPIO hardware: each edge writes its
+        time to a pipe, making its read end readable.
+    '''
+    __TIME = struct.Struct('d')
+
+    def __init__(self):
+        ''' Create the pipe '''
+        (self.__read_fd, self.__write_fd) = os.pipe()
+        flags = fcntl.fcntl(self.__read_fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.__read_fd, fcntl.F_SETFL, flags|os.O_NONBLOCK)
+
+    def fire(self, time):
+        ''' Generate an edge, which occurs at monotonic clock time time '''
+        os.write(self.__write_fd, PipeEdgeSource.__TIME.pack(time))
+
+    def fileno(self):
+        ''' Return the file descriptor to wait on for edges '''
+        return self.__read_fd
+
+    def priority_events(self):
+        '''
+            Return True if edges are signalled as exceptional (priority)
+            conditions, False if signalled by the file becoming readable.
+        '''
+        return False
+
+    def reader(self):
+        ''' Return None: there is no blocking reader for the read and callback paths '''
+        return None
+
+    def consume(self):
+        '''
+            Acknowledge all edges signalled so far. Returns a list of their
+            times in the order they occurred.
+        '''
+        data = []
+        try:
+            while True:
+                block = os.read(self.__read_fd, 4096) # whole multiple of 8
+                if not block:
+                    break
+                data.append(block)
+        except OSError:
+            pass # would block: pipe empty
+        data = ''.join(data)
+        size = PipeEdgeSource.__TIME.size
+        return [ PipeEdgeSource.__TIME.unpack_from(data, offset)[0]
+                 for offset in xrange(0, len(data), size)
+               ]
+
+    def close(self):
+        ''' Close the pipe '''
+        if self.__read_fd!=None:
+            os.close(self.__read_fd)
+            os.close(self.__write_fd)
+            self.__read_fd = self.__write_fd = None
+
+class LoopbackEdgeSource(object):
+    '''
+        Edge source using a GPIO output pin wired to a GPIO input pin: each
+        edge toggles the output pin, which the input pin, opened for
+        blocking on both edges, signals as a priority event.
+    '''
+    def __init__(self, output_pin_id, input_pin_id):
+        ''' Open the output and input pins '''
+        import pin
+        self.__writer = pin.PinWriter(output_pin_id)
+        try:
+            self.__reader = pin.PinBlockingReader(input_pin_id, 'B')
+        except:
+            self.__writer.close()
+            raise
+        self.__value = False
+        self.__writer.write(self.__value)
+        self.__reader.read(0) # clear any pending event
+
+    def fire(self, time):
+        ''' Generate an edge. time is the monotonic clock time now '''
+        self.__value = not self.__value
+        self.__writer.write(self.__value)
+
+    def fileno(self):
+        ''' Return the file descriptor to wait on for edges '''
+        return self.__reader.fileno()
+
+    def priority_events(self):
+        ''' Return True: GPIO edges are signalled as priority conditions '''
+        return True
+
+    def reader(self):
+        ''' Return the input pin's PinBlockingReader '''
+        return self.__reader
+
+    def consume(self):
+        '''
+            Acknowledge edges signalled so far by reading the input pin.
+            Returns None: the times of the edges are not known.
+        '''
+        self.__reader.read(0)
+        return None
+
+    def close(self):
+        ''' Close the pins '''
+        self.__reader.close()
+        self.__writer.close()
+
+def _woken(events):
+    ''' Internal function returning the time now if events is not empty, else None '''
+    return timing.monotonic() if events else None
+
+def _select_waiter(source):
+    ''' Internal function returning wait and close functions using select.select '''
+    fds = [source.fileno()]
+    if source.priority_events():
+        return (lambda timeout: _woken(select.select([], [], fds, timeout)[2]), lambda: None)
+    return (lambda timeout: _woken(select.select(fds, [], [], timeout)[0]), lambda: None)
+
+def _poll_waiter(source):
+    ''' Internal function returning wait and close functions using select.poll '''
+    poller = select.poll()
+    if source.priority_events():
+        poller.register(source.fileno(), select.POLLPRI|select.POLLERR)
+    else:
+        poller.register(source.fileno(), select.POLLIN)
+    return ( lambda timeout: _woken(poller.poll(-1 if timeout==None else timeout*1000.0))
+           , lambda: None )
+
+def _epoll_waiter(source):
+    ''' Internal function returning wait and close functions using select.epoll '''
+    poller = select.epoll()
+    if source.priority_events():
+        poller.register(source.fileno(), select.EPOLLPRI|select.EPOLLERR)
+    else:
+        poller.register(source.fileno(), select.EPOLLIN)
+    return (lambda timeout: _woken(poller.poll(-1 if timeout==None else timeout)), poller.close)
+
+def _read_waiter(source):
+    '''
+        Internal function returning wait and close functions using the
+        source's blocking reader's read method.
+    '''
+    reader = source.reader()
+    def wait(timeout):
+        if reader.read(timeout)==None:
+            return None
+        return timing.monotonic()
+    return (wait, lambda: None)
+
+def _callback_waiter(source):
+    '''
+        Internal function returning wait and close functions using an
+        inline callback, registered for the source's blocking reader with
+        a dispatcher of its own, which records the time it is called.
+    '''
+    from callbacks import EventDispatcher
+    dispatcher = EventDispatcher(workers=0)
+    called = Queue.Queue()
+    dispatcher.add_event_callback( source.reader()
+                                 , lambda reader, value, time: called.put(timing.monotonic())
+                                 , inline=True )
+    def wait(timeout):
+        try:
+            return called.get(True, timeout)
+        except Queue.Empty:
+            return None
+    return (wait, dispatcher.close)
+
+WAITERS = { 'select'  : _select_waiter
+          , 'poll'    : _poll_waiter
+          , 'epoll'   : _epoll_waiter
+          , 'read'    : _read_waiter
+          , 'callback': _callback_waiter
+          }
+
+class LatencyReport(object):
+    '''
+        Results of a latency measurement run.
+    '''
+    def __init__(self, path, edges, latencies, dropped, spurious):
+        '''
+            Create from the name of the event wait path used, the number of
+            edges generated, a sequence of wake up latencies in seconds, the
+            number of edges dropped and the number of wake ups not caused
+            by an edge.
+        '''
+        self.path = path
+        self.edges = edges
+        self.latencies = array.array('d', sorted(latencies))
+        self.dropped = dropped
+        self.spurious = spurious
+
+    def wakeups(self):
+        ''' Return the number of wake ups caused by edges '''
+        return len(self.latencies)
+
+    def percentile(self, percent):
+        '''
+            Return the latency in seconds at or below which percent percent
+            of wake up latencies lie (nearest rank) or None if there were
+            no wake ups.
+        '''
+        if not self.latencies:
+            return None
+        rank = int(math.ceil(percent/100.0*len(self.latencies)))
+        return self.latencies[min(max(rank,1),len(self.latencies))-1]
+
+    def histogram(self):
+        ''' Return an instrument.Histogram of the wake up latencies '''
+        histogram = Histogram()
+        for latency in self.latencies:
+            histogram.observe(latency)
+        return histogram
+
+    def summary(self):
+        ''' Return a one line text summary of the results '''
+        if not self.latencies:
+            return '%-8s edges %d dropped %d: no wake ups' \
+                   % (self.path, self.edges, self.dropped)
+        return ( '%-8s edges %d dropped %d spurious %d latency us:'
+                 ' min %.1f p50 %.1f p90 %.1f p99 %.1f p99.9 %.1f max %.1f'
+               % ( self.path, self.edges, self.dropped, self.spurious
+                 , self.latencies[0]*1e6, self.percentile(50)*1e6
+                 , self.percentile(90)*1e6, self.percentile(99)*1e6
+                 , self.percentile(99.9)*1e6, self.latencies[-1]*1e6
+                 )
+               )
+
+def measure(source, path='select', rate=100.0, count=1000, timeout=1.0):
+    '''
+        Measure wake up latency of edges from source, a PipeEdgeSource or
+        LoopbackEdgeSource, waited for using the named event wait path - one
+        of PATHS. count edges are generated at rate edges per second.
+        Waiting ends when all edges have been seen or no wake up occurs for
+        timeout seconds after the last edge is generated. For the read and
+        callback paths the wake up time is when read returns or the
+        callback is called, after the pin is read.
+
+        Returns a LatencyReport.
+
+        Raises ValueError if path is not one of the supported paths or is
+        one of READER_PATHS and source has no blocking reader.
+    '''
+    if path not in WAITERS:
+        raise ValueError( '%s: %s' % ( path
+                                     , UNAVAILABLE_PATHS.get(path, 'unknown event wait path')
+                                     )
+                        )
+    if path in READER_PATHS and source.reader()==None:
+        raise ValueError('%s: edge source has no blocking reader' % path)
+    source.consume()
+    (wait, close) = WAITERS[path](source)
+    try:
+        return _measure(source, path, wait, rate, count, timeout)
+    finally:
+        close()
+
+def _measure(source, path, wait, rate, count, timeout):
+    '''
+        Internal function making a measure measurement with the wait
+        function of path's waiter.
+    '''
+    acknowledged = path in READER_PATHS # pin read by the path itself
+    fire_times = array.array('d')
+    finished = threading.Event()
+
+    def drive():
+        start = timing.monotonic()
+        try:
+            for index in xrange(count):
+                timing.sleep_until(start + index/float(rate))
+                time = timing.monotonic()
+                fire_times.append(time)
+                source.fire(time)
+        finally:
+            finished.set()
+
+    driver = threading.Thread(target=drive)
+    driver.daemon = True
+    driver.start()
+    latencies = []
+    dropped = 0
+    spurious = 0
+    seen = 0
+    while seen<count:
+        now = wait(timeout)
+        if now==None:
+            if finished.is_set():
+                break # timed out after all edges were generated
+            continue
+        times = None if acknowledged else source.consume()
+        if times==None: # edges since the last wake up are those fired by now
+            fired = len(fire_times)
+            times = []
+            while seen+len(times)<fired and fire_times[seen+len(times)]<=now:
+                times.append(fire_times[seen+len(times)])
+        if not times:
+            spurious += 1
+            continue
+        latencies.append(now-times[0])
+        dropped += len(times)-1 # coalesced into this wake up
+        seen += len(times)
+    driver.join()
+    dropped += count-seen
+    return LatencyReport(path, count, latencies, dropped, spurious)
+
+class CPULoad(object):
+    '''
+        Context manager running busy looping processes to load the CPU(s)
+        while a measurement is made.
+    '''
+    def __init__(self, processes):
+        ''' Create to run processes busy processes '''
+        self.__count = processes
+        self.__processes = []
+
+    def __enter__(self):
+        ''' Start the busy processes '''
+        import multiprocessing
+        for i in range(self.__count):
+            process = multiprocessing.Process(target=_spin)
+            process.daemon = True
+            process.start()
+            self.__processes.append(process)
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        ''' Stop the busy processes '''
+        for process in self.__processes:
+            process.terminate()
+            process.join()
+        self.__processes = []
+
+def _spin():
+    ''' Internal function busy looping forever '''
+    while True:
+        pass
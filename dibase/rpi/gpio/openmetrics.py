@@ -0,0 +1,234 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Export of GPIO pin and pin group IO statistics in the OpenMetrics (and
+    Prometheus) text exposition format.
+
+    Values are those collected by the instrument module, so instrumentation
+    must be enabled (instrument.enable()) for them to be updated. Operation
+    counts are exported as counters, from which a metrics server computes
+    rates, and also as per second rate gauges calculated between successive
+    exports by the same Exporter. Latencies are exported as histograms.
+
+    An Exporter can write the metrics to a file, for example for a node
+    exporter text file collector, or serve them over HTTP on a local socket.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+import threading
+import BaseHTTPServer
+
+import instrument
+import timing
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# (IOStats counter name, metric name, help text) of counters exported
+COUNTERS = ( ('opens', 'opens', 'Number of times opened')
+           , ('closes', 'closes', 'Number of times closed')
+           , ('reads', 'reads', 'Number of value reads')
+           , ('writes', 'writes', 'Number of value writes')
+           , ('syscalls', 'syscalls', 'Number of system calls made by operations')
+           , ('bytes_read', 'read_bytes', 'Number of bytes read by system calls')
+           , ('bytes_written', 'written_bytes', 'Number of bytes written by system calls')
+           , ('wakeups', 'wakeups', 'Number of edge event waits ended by an event')
+           , ('timeouts', 'timeouts', 'Number of edge event waits that timed out')
+           , ('edges', 'edges', 'Number of edge events seen')
+           , ('missed_edges', 'missed_edges', 'Estimated number of edge events missed')
+           )
+
+# IOStats counters for which per second rate gauges are exported
+RATES = ('reads', 'writes', 'edges')
+
+def _label_value(value):
+    ''' Internal function returning value escaped for use as a label value '''
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(**labels):
+    ''' Internal function returning a label set string such as {pin="4"} '''
+    return '{%s}' % ','.join( '%s="%s"' % (name, _label_value(value))
+                              for (name, value) in sorted(labels.items())
+                            )
+
+def _number(value):
+    ''' Internal function returning value formatted as an exported number '''
+    if value==float('inf'):
+        return '+Inf'
+    return repr(value)
+
+def render(snapshot, rates=None, prefix='dibase_gpio'):
+    '''
+        Return the values in snapshot, a dictionary as returned by
+        instrument.snapshot, as OpenMetrics text.
+
+        rates, if given, is a dictionary with 'pins' and 'groups' entries
+        that map pin ids, or tuples of group pin ids, to dictionaries of
+        RATES counter names to rate values.
+
+        Metric names are prefixed with prefix + '_pin_' for single pin
+        metrics, which have a pin label, and prefix + '_group_' for pin
+        group metrics, which have a pins label listing the group's pin ids.
+    '''
+    lines = []
+    def family(name, metric_type, help_text):
+        lines.append('# TYPE %s %s' % (name, metric_type))
+        lines.append('# HELP %s %s.' % (name, help_text))
+
+    sources = ( ('pin', 'pin', str)
+              , ('group', 'pins', lambda pin_ids: ','.join(str(id) for id in pin_ids))
+              )
+    rates = rates or {}
+    for (kind, label, label_text) in sources:
+        items = [ (label_text(key), key, stats)
+                  for (key, stats) in sorted(snapshot[kind+'s'].items())
+                ]
+        if not items:
+            continue
+        base = '%s_%s' % (prefix, kind)
+        if kind=='pin':
+            family(base+'_open', 'gauge', 'Whether open (1) or closed (0)')
+            for (text, key, stats) in items:
+                lines.append('%s_open%s %d' % (base, _labels(pin=text), stats['open']))
+        for (counter, metric, help_text) in COUNTERS:
+            family(base+'_'+metric, 'counter', help_text)
+            for (text, key, stats) in items:
+                lines.append( '%s_%s_total%s %d'
+                            % (base, metric, _labels(**{label:text}), stats[counter])
+                            )
+        kind_rates = rates.get(kind+'s', {})
+        if kind_rates:
+            for counter in RATES:
+                family( '%s_%s_per_second' % (base, counter), 'gauge'
+                      , 'Rate of %s per second since the previous export' % counter
+                      )
+                for (text, key, stats) in items:
+                    rate = kind_rates.get(key)
+                    if rate!=None:
+                        lines.append( '%s_%s_per_second%s %s'
+                                    % ( base, counter, _labels(**{label:text})
+                                      , _number(rate[counter]) )
+                                    )
+        family( base+'_latency_seconds', 'histogram'
+              , 'Operation latencies in seconds by operation' )
+        for (text, key, stats) in items:
+            for (operation, histogram) in sorted(stats['latency'].items()):
+                if histogram['count']==0:
+                    continue
+                labels = {label:text, 'operation':operation}
+                for (bound, count) in histogram['buckets']:
+                    lines.append( '%s_latency_seconds_bucket%s %d'
+                                % (base, _labels(le=_number(bound), **labels), count)
+                                )
+                lines.append( '%s_latency_seconds_count%s %d'
+                            % (base, _labels(**labels), histogram['count']) )
+                lines.append( '%s_latency_seconds_sum%s %s'
+                            % (base, _labels(**labels), _number(histogram['sum'])) )
+
+    open_pins = sum(1 for stats in snapshot['pins'].values() if stats['open'])
+    family(prefix+'_open_pins', 'gauge', 'Number of open pins')
+    lines.append('%s_open_pins %d' % (prefix, open_pins))
+    lines.append('# EOF')
+    return '\n'.join(lines)+'\n'
+
+class Exporter(object):
+    '''
+        Exports the current instrument module values as OpenMetrics text,
+        adding rate gauges calculated from the change in counter values
+        since the previous export.
+    '''
+    def __init__(self, prefix='dibase_gpio'):
+        ''' Create with metric names prefixed by prefix '''
+        self.__prefix = prefix
+        self.__lock = threading.Lock()
+        self.__previous = None # (time, snapshot) of previous export
+
+    def render(self):
+        ''' Return the current instrumentation values as OpenMetrics text '''
+        with self.__lock:
+            now = timing.monotonic()
+            snapshot = instrument.snapshot()
+            rates = None
+            if self.__previous!=None:
+                rates = Exporter.__rates(self.__previous, (now, snapshot))
+            self.__previous = (now, snapshot)
+        return render(snapshot, rates, self.__prefix)
+
+    def write_file(self, path):
+        '''
+            Write the current instrumentation values as OpenMetrics text to
+            the file at path. The file is replaced by renaming a temporary
+            file so readers never see partial content. The temporary file
+            is created with a unique name in the same directory, so that
+            another user cannot substitute a file or symbolic link for it,
+            and is removed if rendering or writing fails.
+        '''
+        import tempfile # only needed when writing files
+        (fd, temporary_path) = tempfile.mkstemp( prefix=os.path.basename(path)+'.'
+                                               , dir=os.path.dirname(path) or '.'
+                                               )
+        try:
+            with os.fdopen(fd, 'w') as metrics_file:
+                metrics_file.write(self.render())
+            os.rename(temporary_path, path)
+        except:
+            os.remove(temporary_path)
+            raise
+
+    def serve(self, port=9464, address='127.0.0.1'):
+        '''
+            Start serving the instrumentation values as OpenMetrics text in
+            response to HTTP GET requests to address:port on a daemon thread.
+            port may be 0 to use any free port.
+
+            Returns the BaseHTTPServer.HTTPServer instance: its
+            server_address attribute is the address served, call its
+            shutdown method to stop serving and server_close method to
+            close its socket.
+        '''
+        server = BaseHTTPServer.HTTPServer((address, port), _MetricsRequestHandler)
+        server.exporter = self
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+    @classmethod
+    def __rates(cls, previous, current):
+        '''
+            Internal method returning rates dictionary, as required by
+            render, from two (time, snapshot) pairs.
+        '''
+        interval = current[0]-previous[0]
+        rates = {}
+        for kind in ('pins', 'groups'):
+            kind_rates = rates[kind] = {}
+            if interval<=0:
+                continue
+            for (key, stats) in current[1][kind].items():
+                old = previous[1][kind].get(key)
+                if old!=None:
+                    kind_rates[key] = dict( (counter, (stats[counter]-old[counter])/interval)
+                                            for counter in RATES
+                                          )
+        return rates
+
+class _MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    '''
+        Internal HTTP request handler serving the metrics of the server's
+        exporter attribute.
+    '''
+    def do_GET(self):
+        body = self.server.exporter.render()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        ''' Requests are not logged '''
+        pass
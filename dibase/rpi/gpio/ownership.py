@@ -0,0 +1,329 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Multi-process GPIO pin ownership.
+
+    Pin IO objects normally detect pins in use by checking whether a pin is
+    exported in the sys filesystem, which is racy: two processes can both
+    see a pin unexported and both then try to use it, and a process that
+    dies leaves its pins exported so they have to be freed by hand (see
+    pin.force_free_pin).
+
+    A PinOwnershipTable instead records the owner of each GPIO pin in a
+    small table in a shared memory mapped file (by default in /dev/shm).
+    Each pin's record holds the process id (and process start time, so
+    reused process ids are not mistaken for the owner) of an exclusive
+    owner or of up to MAX_SHARERS processes sharing the pin, and of the
+    process, if any, that handed the pin off to its owner. A record is
+    only read or updated while holding an fcntl lock on its bytes in the
+    file, which the system releases if the process holding it dies, and
+    records of processes that no longer exist are reclaimed when found.
+    An owner can hand a pin off to another process, which takes over the
+    pin's claim while the process handing it off still exists.
+
+    Ownership checking by pin IO objects is opt in: call enable, or set the
+    DIBASE_RPI_GPIO_OWNERSHIP environment variable to the table file path
+    (or to 1 for the default path). When enabled every process using GPIO
+    pins should do so, as pins used by processes not using the table are
+    not detected.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import errno
+import os
+import struct
+import threading
+
+DEFAULT_PATH = '/dev/shm/dibase-rpi-gpio-ownership'
+MAX_PIN_IDS = 54    # BCM2835 GPIO pin ids are in the range [0,54)
+MAX_SHARERS = 8     # maximum number of processes sharing a pin
+
+_MAGIC = 'DRGO0002'
+_SLOT = struct.Struct('<IQ')    # process id, process start time
+_OWNER = 0                      # record slot of the exclusive owner
+_HANDED_OFF_BY = 1              # record slot of the process handing off
+_SHARERS = 2                    # first record slot of sharing processes
+_RECORD_SLOTS = _SHARERS+MAX_SHARERS
+_RECORD_SIZE = _SLOT.size*_RECORD_SLOTS
+_EMPTY = (0, 0)
+_TABLE_SIZE = len(_MAGIC) + _RECORD_SIZE*MAX_PIN_IDS
+
+def _process_start_time(pid):
+    '''
+        Internal function returning the start time of process pid, in clock
+        ticks since boot, or 0 if it cannot be determined.
+    '''
+    try:
+        with open('/proc/%d/stat' % pid) as stat_file:
+            stat = stat_file.read()
+        # fields after the parenthesised command name start at field 3,
+        # start time is field 22
+        return int(stat[stat.rindex(')')+2:].split()[19])
+    except (IOError, ValueError, IndexError):
+        return 0
+
+def _process_exists(pid, start_time):
+    '''
+        Internal function returning True if process pid exists and, if
+        start_time is not 0, started at start_time.
+    '''
+    try:
+        os.kill(pid, 0)
+    except OSError, e:
+        if e.errno!=errno.EPERM:
+            return False
+    return start_time==0 or _process_start_time(pid) in (0, start_time)
+
+class PinOwnershipTable(object):
+    '''
+        Table of GPIO pin owners in a shared memory mapped file.
+    '''
+    def __init__(self, path=None):
+        '''
+            Open (creating if necessary) the table file at path or
+            DEFAULT_PATH if path is None. A new file is readable and
+            writable by its owner and group only, so processes of other
+            users cannot claim or free pins. Raises ValueError if the file
+            exists but is not an ownership table.
+        '''
+        # Imported when a table is first opened as ownership checking is
+        # opt in
+        import fcntl
+        import mmap
+        self.__path = path or DEFAULT_PATH
+        self.__fd = os.open(self.__path, os.O_RDWR|os.O_CREAT, 0660)
+        try:
+            fcntl.lockf(self.__fd, fcntl.LOCK_EX, len(_MAGIC), 0)
+            try:
+                if os.fstat(self.__fd).st_size<_TABLE_SIZE:
+                    os.ftruncate(self.__fd, _TABLE_SIZE)
+                self.__table = mmap.mmap(self.__fd, _TABLE_SIZE)
+                magic = self.__table[0:len(_MAGIC)]
+                if magic=='\0'*len(_MAGIC):
+                    self.__table[0:len(_MAGIC)] = _MAGIC
+                elif magic!=_MAGIC:
+                    self.__table.close()
+                    raise ValueError('%s is not a GPIO pin ownership table' % self.__path)
+            finally:
+                fcntl.lockf(self.__fd, fcntl.LOCK_UN, len(_MAGIC), 0)
+        except:
+            os.close(self.__fd)
+            raise
+        self.__lock = threading.Lock() # fcntl locks do not exclude threads
+        self.__owned = {}               # pin id: shared? for this process
+        self.__owned_pid = os.getpid()
+
+    def path(self):
+        ''' Return the path of the table file '''
+        return self.__path
+
+    def acquire(self, pin_id, shared=False):
+        '''
+            Acquire ownership of pin_id for this process, exclusively or,
+            if shared is True, shared with other processes acquiring it
+            shared. Returns True if acquired or False if owned by another
+            process, if the maximum number of processes share the pin or if
+            already acquired by this process. A pin handed off to this
+            process is acquired exclusively.
+        '''
+        me = self.__me()
+        if int(pin_id) in self.__owned:
+            return False
+        with self.__locked_record(pin_id) as slots:
+            if slots[_OWNER]==me:
+                shared = False # handed off to this process
+            elif slots[_OWNER]!=_EMPTY:
+                return False
+            elif shared:
+                if _EMPTY not in slots[_SHARERS:]:
+                    return False
+                slots[slots.index(_EMPTY, _SHARERS)] = me
+            elif slots[_SHARERS:]!=[_EMPTY]*MAX_SHARERS:
+                return False
+            else:
+                slots[_OWNER] = me
+                slots[_HANDED_OFF_BY] = _EMPTY
+            self.__owned[int(pin_id)] = shared
+            return True
+
+    def release(self, pin_id):
+        '''
+            Release this process's ownership of pin_id. Does nothing if
+            the process does not own pin_id.
+        '''
+        me = self.__me()
+        if int(pin_id) not in self.__owned:
+            return
+        with self.__locked_record(pin_id) as slots:
+            if slots[_OWNER]==me:
+                slots[_OWNER] = slots[_HANDED_OFF_BY] = _EMPTY
+            for index in range(_SHARERS, _RECORD_SLOTS):
+                if slots[index]==me:
+                    slots[index] = _EMPTY
+            del self.__owned[int(pin_id)]
+
+    def hand_off(self, pin_id, pid):
+        '''
+            Transfer this process's exclusive ownership of pin_id to process
+            pid, which takes it on by calling acquire. Returns True if
+            transferred or False if this process is not the exclusive owner
+            of pin_id or process pid does not exist.
+        '''
+        me = self.__me()
+        start_time = _process_start_time(pid)
+        if not _process_exists(pid, start_time):
+            return False
+        with self.__locked_record(pin_id) as slots:
+            if slots[_OWNER]!=me:
+                return False
+            slots[_OWNER] = (pid, start_time)
+            slots[_HANDED_OFF_BY] = me
+            self.__owned.pop(int(pin_id), None)
+            return True
+
+    def handed_off_by(self, pin_id):
+        '''
+            Return the process id of the process that handed pin_id off to
+            this process, or None if pin_id was not handed off to this
+            process or the process that handed it off no longer exists.
+            While that process exists it may still be using the pin's
+            claim, such as a sys filesystem export, so the claim must be
+            taken over as it is rather than freed.
+        '''
+        me = self.__me()
+        with self.__locked_record(pin_id) as slots:
+            if slots[_OWNER]!=me:
+                return None
+            return slots[_HANDED_OFF_BY][0] or None
+
+    def owners(self, pin_id):
+        '''
+            Return a tuple of the exclusive owner process id of pin_id, or
+            None, and a list of the process ids of processes sharing it.
+        '''
+        with self.__locked_record(pin_id) as slots:
+            return ( slots[_OWNER][0] or None
+                   , [slot[0] for slot in slots[_SHARERS:] if slot!=_EMPTY]
+                   )
+
+    def owned(self):
+        ''' Return a set of the pin ids this process owns '''
+        self.__me()
+        return set(self.__owned)
+
+    def close(self):
+        ''' Release all pins this process owns and close the table '''
+        if self.__table!=None:
+            for pin_id in list(self.owned()):
+                self.release(pin_id)
+            self.__table.close()
+            os.close(self.__fd)
+            self.__table = None
+
+    def __me(self):
+        '''
+            Internal method returning the (process id, start time) slot
+            value of this process. After a fork the child process owns no
+            pins, so pins recorded as owned are forgotten.
+        '''
+        pid = os.getpid()
+        if pid!=self.__owned_pid:
+            self.__owned = {}
+            self.__owned_pid = pid
+            self.__start_time = _process_start_time(pid)
+        elif not hasattr(self, '_PinOwnershipTable__start_time'):
+            self.__start_time = _process_start_time(pid)
+        return (pid, self.__start_time)
+
+    def __locked_record(self, pin_id):
+        '''
+            Internal method returning a context manager that locks the
+            record of pin_id, with slots of processes that no longer exist
+            cleared, as a list of (pid, start time) slot values. Any changes
+            made to the list are written back on exit.
+        '''
+        pin_id = int(pin_id)
+        if not 0<=pin_id<MAX_PIN_IDS:
+            raise ValueError('pin id %d out of range' % pin_id)
+        return _LockedRecord( self.__table, self.__fd, self.__lock
+                            , len(_MAGIC)+pin_id*_RECORD_SIZE )
+
+class _LockedRecord(object):
+    '''
+        Internal context manager locking a pin's record in the table file.
+    '''
+    def __init__(self, table, fd, lock, offset):
+        self.__table = table
+        self.__fd = fd
+        self.__lock = lock
+        self.__offset = offset
+
+    def __enter__(self):
+        import fcntl
+        self.__lock.acquire()
+        try:
+            fcntl.lockf(self.__fd, fcntl.LOCK_EX, _RECORD_SIZE, self.__offset)
+        except:
+            self.__lock.release()
+            raise
+        self.__original = [ _SLOT.unpack_from(self.__table, self.__offset+i*_SLOT.size)
+                            for i in range(_RECORD_SLOTS)
+                          ]
+        self.__slots = [ slot if slot==_EMPTY or _process_exists(*slot) else _EMPTY
+                         for slot in self.__original
+                       ]
+        return self.__slots
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        import fcntl
+        try:
+            for (i, slot) in enumerate(self.__slots):
+                if slot!=self.__original[i]:
+                    _SLOT.pack_into(self.__table, self.__offset+i*_SLOT.size, *slot)
+        finally:
+            fcntl.lockf(self.__fd, fcntl.LOCK_UN, _RECORD_SIZE, self.__offset)
+            self.__lock.release()
+
+_table = None
+_table_lock = threading.Lock()
+
+def enable(path=None):
+    '''
+        Enable ownership checking by pin IO objects using the table at path,
+        or DEFAULT_PATH if path is None. Returns the PinOwnershipTable.
+    '''
+    global _table
+    with _table_lock:
+        if _table==None or (path!=None and path!=_table.path()):
+            if _table!=None:
+                _table.close()
+            _table = PinOwnershipTable(path)
+        return _table
+
+def disable():
+    ''' Disable ownership checking, releasing all pins owned '''
+    global _table
+    with _table_lock:
+        if _table!=None:
+            _table.close()
+            _table = None
+
+def table():
+    '''
+        Return the PinOwnershipTable used by pin IO objects or None if
+        ownership checking is not enabled. On first call ownership checking
+        is enabled if the DIBASE_RPI_GPIO_OWNERSHIP environment variable is
+        set to a table path or 1 (for the default path).
+    '''
+    global _environment_checked
+    if _table==None and not _environment_checked:
+        _environment_checked = True
+        path = os.environ.get('DIBASE_RPI_GPIO_OWNERSHIP')
+        if path:
+            return enable(None if path=='1' else path)
+    return _table
+
+_environment_checked = False
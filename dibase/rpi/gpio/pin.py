@@ -2,7 +2,8 @@
     Part of the dibase.rpi.gpio package.
 
     Operations on single GPIO pins.
-    Uses userspace sys filesystem GPIO interface.
+    Uses userspace sys filesystem GPIO interface or another backend - see
+    the backends module.
     Provides a set of pin IO types and operations on instances
     modelled after file objects.
 
@@ -12,24 +13,23 @@
 '''
 
 import os
-import select # select.select used to wait on i/ps with edge interrupts enabled
 
 from gpioerror import PinInUseError
 from gpioerror import PinOpenModeInvalidError
 from gpioerror import PinBlockModeInvalidError
 from gpioerror import PinDirectionModeInvalidError
 from pinid import PinId
-from sysfspaths import export_path as sysfs_export_path
-from sysfspaths import unexport_path as sysfs_unexport_path
 from sysfspaths import pin_path as sysfs_pin_path
-from sysfspaths import direction_path as sysfs_direction_path
-from sysfspaths import edgemode_path as sysfs_edgemode_path
-from sysfspaths import value_path as sysfs_value_path
 
 from gpiobase import GPIOReaderBase
 from gpiobase import GPIOWriterBase
 from gpiobase import GPIOBlockingReaderBase
 
+import backends
+import fastio
+import ownership
+import sysfsio
+
 def force_free_pin( pin_id ):
     '''
         Will 'free' a pin by unexporting it from the sys filesystem if it
@@ -47,18 +47,19 @@ def force_free_pin( pin_id ):
         
         Throws a pin.PinIdInvalidError if the pin_id is invalid
     '''
-    unexported = None
-    if os.path.exists(sysfs_pin_path( pin_id )):
-        unexported = pin_id
-        with open(sysfs_unexport_path(), 'w') as unexport_file:
-            unexport_file.write( str(pin_id) )
-    return unexported
+    return backends.get_backend('sysfs').unexport(pin_id)
 
 class BlockMode(object):
     '''
         Class encapsulating open blocking mode characters and their equivalent
         sys filesystem GPIO edge mode file values.
+
+        Instances are immutable and interned: there is one BlockMode per
+        open blocking mode character, validated when first requested.
     '''
+    __slots__ = ('__value', '__blocking')
+    __instances = {}
+
     @classmethod
     def non_blocking_open_mode( cls ):
         ''' Return character for open non-blocking mode '''
@@ -117,22 +118,31 @@ class BlockMode(object):
         return len(mode)==1 and \
                 (mode in BlockMode.all_blocking_open_mode_characters())
 
-    def __init__(self, blocking_mode):
+    def __new__(cls, blocking_mode):
         '''
-            Creates a BlockMode instance from an open blocking mode character.
+            Returns the BlockMode instance for an open blocking mode
+            character, creating it if it is the first request for the mode.
             Raises a PinBlockModeInvalidError exception if blocking_mode
             is not a valid open blocking mode character.
         '''
+        try:
+            return BlockMode.__instances[blocking_mode]
+        except (KeyError, TypeError):
+            pass
         if not BlockMode.is_valid_blocking_open_mode(blocking_mode):
             raise PinBlockModeInvalidError
+        self = super(BlockMode, cls).__new__(cls)
         self.__value = blocking_mode
+        self.__blocking = blocking_mode != BlockMode.non_blocking_open_mode()
+        BlockMode.__instances[blocking_mode] = self
+        return self
 
     def is_blocking(self):
         '''
             Returns True if BlockMode instance represents a mode which will
             wait for an event. That is for any mode except non blocking.
         '''
-        return self.__value != BlockMode.non_blocking_open_mode()
+        return self.__blocking
 
     def open_mode_value(self):
         '''
@@ -162,7 +172,13 @@ class DirectionMode(object):
     '''
         Class encapsulating open IO direction mode characters and their
         equivalent sys filesystem GPIO direction file values.
+
+        Instances are immutable and interned: there is one DirectionMode per
+        open direction mode character, validated when first requested.
     '''
+    __slots__ = ('__value', '__write')
+    __instances = {}
+
     @classmethod
     def read_open_mode( cls ):
         ''' Return character for open read mode '''
@@ -199,23 +215,32 @@ class DirectionMode(object):
         return len(mode)==1 and \
                 (mode in DirectionMode.all_direction_open_mode_characters())
 
-    def __init__(self, direction_mode):
+    def __new__(cls, direction_mode):
         '''
-            Creates a DirectionMode instance from an open direction mode
-            character. Raises a PinDirectionModeInvalidError exception if
+            Returns the DirectionMode instance for an open direction mode
+            character, creating it if it is the first request for the mode.
+            Raises a PinDirectionModeInvalidError exception if
             direction_mode is not a valid open direction mode character.
         '''
+        try:
+            return DirectionMode.__instances[direction_mode]
+        except (KeyError, TypeError):
+            pass
         if not (DirectionMode.is_valid_direction_open_mode(direction_mode)):
             raise PinDirectionModeInvalidError
+        self = super(DirectionMode, cls).__new__(cls)
         self.__value = direction_mode
+        self.__write = direction_mode == DirectionMode.write_open_mode()
+        DirectionMode.__instances[direction_mode] = self
+        return self
 
     def is_read(self):
         ''' Returns True if DirectionMode instance is read/input mode. '''
-        return self.__value == DirectionMode.read_open_mode()
+        return not self.__write
 
     def is_write(self):
         ''' Returns True if DirectionMode instance is write/output mode. '''
-        return self.__value == DirectionMode.write_open_mode()
+        return self.__write
 
     def open_mode_value(self):
         '''
@@ -237,15 +262,74 @@ class DirectionMode(object):
         else:
             raise PinDirectionModeInvalidError
 
+# _PinIOBase._flags bits
+_READ_FLAG = 0x01       # line is an input
+_WRITE_FLAG = 0x02      # line is an output
+_RISING_FLAG = 0x04     # reads block on rising edges
+_FALLING_FLAG = 0x08    # reads block on falling edges
+_OWNS_PIN_FLAG = 0x10   # ownership of the pin acquired on opening
+_DIRECTION_FLAGS = _READ_FLAG|_WRITE_FLAG
+
+def _direction_flag(direction_mode):
+    '''
+        Internal function returning the _PinIOBase._flags direction bit for
+        a DirectionMode.
+    '''
+    return _WRITE_FLAG if direction_mode.is_write() else _READ_FLAG
+
+def _mode_flags(direction_mode, blocking_mode):
+    '''
+        Internal function returning the _PinIOBase._flags bits for a
+        DirectionMode and BlockMode.
+    '''
+    flags = _direction_flag(direction_mode)
+    if blocking_mode.is_blocking():
+        mode = blocking_mode.open_mode_value()
+        if mode!=BlockMode.block_on_falling_edge_open_mode():
+            flags |= _RISING_FLAG
+        if mode!=BlockMode.block_on_rising_edge_open_mode():
+            flags |= _FALLING_FLAG
+    return flags
+
 class _PinIOBase(object):
     '''
         Internal mixin base class for concrete Pin IO classes.
         Provides common functionality.
+
+        Instances have no __dict__: their attributes are __slots__, as are
+        those of sub-classes, so that processes holding many open pins
+        use less memory per pin and look attributes up faster.
+
+        _raw_fd is the file descriptor through which the pin's value is read
+        and written with the fastio module's functions, C or pure Python,
+        or, if None, the pin's line is read and written using its file-like
+        methods. Only sys filesystem value files have one: other backends'
+        lines are not files, so the line itself is kept, as is the backend,
+        which closes it.
+
+        _flags is an integer of _READ_FLAG, _WRITE_FLAG, _RISING_FLAG,
+        _FALLING_FLAG and _OWNS_PIN_FLAG bits recording the pin's direction
+        and blocking modes and whether ownership of the pin was acquired.
     '''
-    def __init__(self, pin_id, direction_mode, blocking_mode):
+    __slots__ = ('__value_file', '__backend', '__pin_id', '_raw_fd', '_flags')
+
+    def __new__(cls, *args, **kwargs):
+        '''
+            Creates an instance with its slots set to those of a closed pin,
+            so that it is valid even if __init__ fails or is not called.
+        '''
+        self = super(_PinIOBase, cls).__new__(cls)
+        self.__value_file = None
+        self.__backend = None
+        self.__pin_id = None
+        self._raw_fd = None
+        self._flags = 0
+        return self
+
+    def __init__(self, pin_id, direction_mode, blocking_mode, backend=None):
         '''
             Provide common initialisation for GPIO pin IO.
-            Parameterised on pin id, and direction and blocking modes
+            Parameterised on pin id, direction and blocking modes and backend
             - Ensures pin_id is a PinId value. Raises PinIdInvalidError
               if it is not a valid PinId value
             - Ensures direction_mode is a DirectionMode value. Raises
@@ -253,17 +337,25 @@ class _PinIOBase(object):
               value
             - Ensures blocking_mode is a BlockMode value. Raises
               PinBlockModeInvalidError if it is not a valid BlockMode value
+            - Selects the backend used for the pin's IO using
+              backends.select_backend: backend may be a backends.GPIOBackend,
+              the name of one or None to select one automatically. Raises
+              PinBackendUnavailableError if no backend can be used
             - Calls _validate_init_parameters to perform customisable
               validation. Base implementation raises a PinInUseError if
-              the pin is already exported in the sys filesystem
-            - Exports the pin in the sys filesystem
-            - Sets the direction of data in line with direction_mode
-            - Sets the edge file's change event notification mode value
-              to reflect the blocking_mode.
-            - Opens the sys filesystem GPIO pin's value file for reading
+              the pin is already exported in the sys filesystem or, if
+              ownership checking is enabled (see the ownership module),
+              owned by another process
+            - Opens the pin's line with the backend, which for the sys
+              filesystem backend exports the pin (reclaiming it if owned and
+              left exported by a process that no longer exists, or using
+              the export of a pin handed off to this process by a process
+              that still exists), sets the
+              direction of data in line with direction_mode and the edge
+              file's change event notification mode value to reflect the
+              blocking_mode, and opens the GPIO pin's value file for reading
               or writing in accordance with direction_mode and holds it open
         '''
-        self.__value_file = None # *must* have __value_file attribute
         # Ensure we have a good pin_id value
         if not isinstance(pin_id, PinId):
             pin_id = PinId.gpio(pin_id)
@@ -272,25 +364,20 @@ class _PinIOBase(object):
             direction_mode = DirectionMode(direction_mode)
         if not isinstance(blocking_mode, BlockMode):
             blocking_mode = BlockMode(blocking_mode)
+        self._flags = _mode_flags(direction_mode, blocking_mode)
+        backend = backends.select_backend(direction_mode, blocking_mode, backend)
 
-        self.cb_validate_init_parameters(pin_id, direction_mode, blocking_mode)
-
-        # export
-        with open(sysfs_export_path(), 'w') as export_file:
-            export_file.write( str(pin_id) )
-
-        # set edge mode file's value
-        with open(sysfs_edgemode_path(pin_id), 'w') as edge_file:
-            edge_file.write( blocking_mode.edge_mode_value() )
+        try:
+            self.cb_validate_init_parameters(pin_id, direction_mode, blocking_mode)
 
-        # set i/o direction
-        with open(sysfs_direction_path(pin_id), 'w') as direction_file:
-            direction_file.write(direction_mode.direction_mode_value())
-
-        # open value 'file' for reading/writing depending on direction mode
-        self.__value_file = open( sysfs_value_path(pin_id)\
-                                , direction_mode.open_mode_value()+'b'
-                                )
+            self.__value_file = self.cb_open_line( backend, pin_id, direction_mode
+                                                 , blocking_mode
+                                                 , self.__reclaim(pin_id) )
+            self.__backend = backend
+            self._raw_fd = backend.raw_fd(self.__value_file)
+        except:
+            self.__release_ownership()
+            raise
 
     def __del__(self):
         ''' Calls close to try to ensure pin is cleanly freed up '''
@@ -307,17 +394,34 @@ class _PinIOBase(object):
     def cb_validate_init_parameters(self, pin_id, direction_mode, blocking_mode):
         '''
             Check parameters are valid. Raise exception if they are not.
-            Base implementation checks pin_id is not already exported.
+            Base implementation checks pin_id is not already exported or,
+            if ownership checking is enabled, acquires ownership of pin_id.
             Sub-classes should override, add additional checks and call
             this super class implementation. Note that basic parameter
             checks are performed before _validate_init_parameters is called
             by converting parameters to instances of their specific,
             validated, handling types: PinId, DirectionMode and BlockMode.
         '''
+        owners = ownership.table()
+        if owners!=None:
+            # Raise a PinInUseError if pin is owned by another process.
+            # Owning the pin means any export of it is stale so the sys
+            # filesystem need not be checked.
+            if not owners.acquire(pin_id):
+                raise PinInUseError
+            self._flags |= _OWNS_PIN_FLAG
         # Raise a PinInUseError if pin is currently exported
-        if os.path.exists(sysfs_pin_path(pin_id)):
+        elif sysfsio.path_exists(sysfs_pin_path(pin_id)):
             raise PinInUseError
 
+    def cb_open_line(self, backend, pin_id, direction_mode, blocking_mode, reclaim):
+        '''
+            Open and return the pin's line using backend. Base
+            implementation calls backend.open_line. Sub-classes may override
+            to open lines differently.
+        '''
+        return backend.open_line(pin_id, direction_mode, blocking_mode, reclaim)
+
     def closed(self): 
         ''' Returns True if the Pin has been closed, False if it is open '''
         return self.__value_file == None
@@ -325,27 +429,66 @@ class _PinIOBase(object):
     def close(self):
         '''
             Closes the pin. Can be called repeatedly safely on the same
-            object. Closes pin's sys filesystem value file and unexports
-            the pin from the sys filesystem.
+            object. Closes the pin's line, which for the sys filesystem
+            backend closes the pin's value file and unexports the pin
+            unless it has been handed off to another process.
         '''
         if ( not self.closed() ):
-            self.__value_file.close()
+            value_file = self.__value_file
             self.__value_file = None
-            # Unexport if exported (should be unless somone sneaking around
-            # behind our backs!)
-            if os.path.exists(sysfs_pin_path( self.__pin_id )):
-                with open(sysfs_unexport_path(), 'w') as unexport_file:
-                    unexport_file.write( str(self.__pin_id) )
+            self._raw_fd = None
+            backend = self.__backend or backends.get_backend('sysfs')
+            backend.close_line(self.__pin_id, value_file, self.__handed_off())
+            self.__release_ownership()
             self.__pin_id = None
 
+    def __reclaim(self, pin_id):
+        '''
+            Internal method returning the reclaim value the pin's line is
+            opened with. If we own the pin any claim on it, such as a sys
+            filesystem export, was left by an owner that no longer exists
+            and may be reclaimed - unless the pin was handed off to us by
+            a process that still exists, whose claim is adopted instead so
+            it is not freed from under it.
+        '''
+        if not self._flags&_OWNS_PIN_FLAG:
+            return False
+        owners = ownership.table()
+        if owners!=None and owners.handed_off_by(pin_id)!=None:
+            return backends.ADOPT
+        return True
+
+    def __handed_off(self):
+        '''
+            Internal method returning True if ownership of the pin was
+            acquired when the object was created and has since been handed
+            off to another process.
+        '''
+        if not self._flags&_OWNS_PIN_FLAG:
+            return False
+        owners = ownership.table()
+        return owners!=None and int(self.__pin_id) not in owners.owned()
+
+    def __release_ownership(self):
+        '''
+            Internal method releasing ownership of the pin if it was
+            acquired when the object was created.
+        '''
+        if self._flags&_OWNS_PIN_FLAG:
+            self._flags &= ~_OWNS_PIN_FLAG
+            owners = ownership.table()
+            if owners!=None:
+                owners.release(self.__pin_id)
+
     def file_descriptors(self):
         '''
             Returns a list containing the managed GPIO pin sysfs value file
             object's file descriptor value or an empty list if the object is
-            closed.
+            closed or its line has no file descriptor.
         '''
-        if (not self.closed()):
-            return [self.__value_file.fileno()]
+        fd = self.fileno()
+        if fd!=None:
+            return [fd]
         else:
             return []
 
@@ -353,7 +496,8 @@ class _PinIOBase(object):
         '''
             If the Pin IO object is open return the underlying file
             descriptor number of the pin's sys filesystem value file. If the
-            object is closed then returns None.
+            object is closed, or its line has no file descriptor (as lines
+            of the mmap backend), then returns None.
         '''
         if (not self.closed()):
             return self.__value_file.fileno()
@@ -367,6 +511,37 @@ class _PinIOBase(object):
         '''
         return self.__value_file
 
+    def _pin_id(self):
+        '''
+            Internal use function returns the PinId of the pin or None if
+            the object is closed.
+        '''
+        return self.__pin_id
+
+    def _backend(self):
+        '''
+            Internal use function returns the backends.GPIOBackend used for
+            the pin's IO.
+        '''
+        return self.__backend
+
+    def _open_mode(self):
+        '''
+            Internal use function returns the pin's open_pin mode string,
+            for example 'rN' or 'wN', from its _flags.
+        '''
+        flags = self._flags
+        direction = DirectionMode.write_open_mode() if flags&_WRITE_FLAG \
+                    else DirectionMode.read_open_mode()
+        edges = flags&(_RISING_FLAG|_FALLING_FLAG)
+        if edges==_RISING_FLAG|_FALLING_FLAG:
+            return direction+BlockMode.block_on_both_edges_open_mode()
+        elif edges==_RISING_FLAG:
+            return direction+BlockMode.block_on_rising_edge_open_mode()
+        elif edges==_FALLING_FLAG:
+            return direction+BlockMode.block_on_falling_edge_open_mode()
+        return direction+BlockMode.non_blocking_open_mode()
+
 class PinWriter(_PinIOBase, GPIOWriterBase):
     '''
         Concrete GPIOWriterBase implementation for a single GPIO pin.
@@ -374,11 +549,14 @@ class PinWriter(_PinIOBase, GPIOWriterBase):
         pin, which will have been exported and set up for output as part
         of the initialisation.
     '''
-    def __init__(self, pin_id):
+    __slots__ = ()
+
+    def __init__(self, pin_id, backend=None):
         '''
-            Initialise a PinWriter instance for writing, non-blocking.
+            Initialise a PinWriter instance for writing, non-blocking, using
+            backend (see _PinIOBase.__init__).
         '''
-        super(PinWriter, self).__init__(pin_id, 'w','N')
+        super(PinWriter, self).__init__(pin_id, 'w','N', backend)
 
     def write(self, value):
         '''
@@ -392,8 +570,11 @@ class PinWriter(_PinIOBase, GPIOWriterBase):
         if self.closed():
             raise ValueError
         value = 0 if value == '0' else value
-        self._value_file().write('1' if value else '0')
-        self._value_file().seek(0) # seek(0) 'flushes' the value to the pin
+        if self._raw_fd!=None:
+            fastio.write_fd(self._raw_fd, value)
+        else:
+            self._value_file().write('1' if value else '0')
+            self._value_file().seek(0) # seek(0) 'flushes' the value to the pin
 
 class PinReader(_PinIOBase, GPIOReaderBase):
     '''
@@ -403,20 +584,52 @@ class PinReader(_PinIOBase, GPIOReaderBase):
         initialisation. Note that the read operation does not wait for a
         state change of the pin - it returns the current pin value 'now'
         and so is only blocking in terms of IO operation timing.
+
+        _samples is the number of samples voted on by each read.
     '''
+    __slots__ = ('_samples',)
+
+    def __new__(cls, *args, **kwargs):
+        ''' Creates an instance reading 1 sample, see _PinIOBase.__new__ '''
+        self = super(PinReader, cls).__new__(cls, *args, **kwargs)
+        self._samples = 1
+        return self
+
+    def __init__(self, pin_id, backend=None, samples=1):
+        '''
+            Initialise a PinReader instance for reading, non-blocking, using
+            backend (see _PinIOBase.__init__).
+
+            samples is optional. If greater than 1 each read samples the pin
+            that many times in succession and returns the majority value,
+            filtering out glitches on noisy lines shorter than about half
+            the time taken. An odd number avoids ties, which read as False.
+            Raises ValueError if samples is less than 1.
+        '''
+        if samples<1:
+            raise ValueError('samples must be at least 1')
+        self._samples = samples
+        super(PinReader, self).__init__(pin_id, 'r','N', backend)
 
-    def __init__(self, pin_id):
-        ''' Initialise a PinReader instance for reading, non-blocking. '''
-        super(PinReader, self).__init__(pin_id, 'r','N')
+    def samples(self):
+        ''' Returns the number of samples voted on by each read '''
+        return self._samples
 
     def read(self):
         '''
-            Returns a True if 1 read from an open pin GPIO line, else False.
+            Returns a True if 1 read from an open pin GPIO line, else False,
+            voting on samples reads if more than 1 sample was requested.
             Raises a ValueError if the object is closed.
         '''
         if self.closed():
             raise ValueError
 
+        if self._samples>1:
+            if self._raw_fd!=None:
+                return fastio.vote_fd(self._raw_fd, self._samples)
+            return self._backend().vote(self._value_file(), self._samples)
+        if self._raw_fd!=None:
+            return fastio.read_fd(self._raw_fd)
         self._value_file().seek(0)
         return self._value_file().read()[0] == '1'
 
@@ -430,13 +643,15 @@ class PinBlockingReader(_PinIOBase, GPIOBlockingReaderBase):
         transition, or 'B':both) before readind and returning the pin value
         or the operation times out.
     '''
+    __slots__ = ()
 
-    def __init__(self, pin_id, blocking_mode):
+    def __init__(self, pin_id, blocking_mode, backend=None):
         '''
             Initialise a PinBlockingReader instance for reading with the
-            requested blocking mode.
+            requested blocking mode, using backend (see
+            _PinIOBase.__init__).
         '''
-        super(PinBlockingReader, self).__init__(pin_id, 'r', blocking_mode)
+        super(PinBlockingReader, self).__init__(pin_id, 'r', blocking_mode, backend)
 
     def cb_validate_init_parameters(self,pin_id,direction_mode,blocking_mode):
         if ( not blocking_mode.is_blocking() ):
@@ -465,14 +680,157 @@ class PinBlockingReader(_PinIOBase, GPIOBlockingReaderBase):
             raise ValueError
 
         if timeout != 0:
-            changed = select.select( [], [], [self], timeout )
+            changed = sysfsio.select( [], [], [self], timeout )
             if changed == ([], [], []): # Triple of empty lists=>timed-out
                 return None
-        
+        return self._read_line()
+
+    def _read_notified(self, fds):
+        '''
+            Internal method returning the value of the pin without waiting,
+            after its file descriptor has been notified of an edge event.
+        '''
+        if self.closed():
+            raise ValueError
+        return self._read_line()
+
+    def _read_line(self):
+        ''' Internal method returning the value read from the pin's line '''
+        if self._raw_fd!=None:
+            return fastio.read_fd(self._raw_fd)
         self._value_file().seek(0)
         return self._value_file().read()[0]=='1'
 
-def open_pin( pin_id, mode='' ):
+class BidirectionalPin(_PinIOBase, GPIOReaderBase, GPIOWriterBase):
+    '''
+        Concrete GPIOReaderBase and GPIOWriterBase implementation for a
+        single GPIO pin whose data direction can be turned around - as
+        needed to emulate 1-Wire or I2C or to talk to DHT sensors - without
+        closing and reopening the pin: the pin stays claimed and its line
+        open and only its direction is changed, for the sys filesystem
+        backend by writing its direction file, which is held open.
+        Reading returns the pin's level in either direction. Writing is
+        only valid while the pin is an output.
+    '''
+    __slots__ = ()
+
+    def __init__(self, pin_id, direction_mode='r', backend=None):
+        '''
+            Initialise a BidirectionalPin instance, non-blocking, initially
+            for input if direction_mode is 'r' or output if 'w', using
+            backend (see _PinIOBase.__init__).
+        '''
+        super(BidirectionalPin, self).__init__(pin_id, direction_mode, 'N', backend)
+
+    def cb_open_line(self, backend, pin_id, direction_mode, blocking_mode, reclaim):
+        ''' Opens the line with backend.open_bidirectional_line '''
+        return backend.open_bidirectional_line( pin_id, direction_mode
+                                              , blocking_mode, reclaim )
+
+    def direction(self):
+        ''' Returns 'w' if the pin is currently an output, else 'r' '''
+        return DirectionMode.write_open_mode() if self._flags&_WRITE_FLAG \
+               else DirectionMode.read_open_mode()
+
+    def set_direction(self, direction_mode, value=None):
+        '''
+            Change the pin's data direction to input if direction_mode is
+            'r' or output if 'w'. If value is given when changing to output
+            the pin is set to value as it becomes an output, otherwise it
+            outputs whatever level it last held. Nothing is done if the pin
+            already has the direction, other than writing value if given.
+
+            Raises ValueError if the object is closed and
+            PinBackendUnavailableError if the pin's backend cannot change
+            line directions.
+        '''
+        if self.closed():
+            raise ValueError
+        if not isinstance(direction_mode, DirectionMode):
+            direction_mode = DirectionMode(direction_mode)
+        value = 0 if value == '0' else value
+        is_output = self._flags&_WRITE_FLAG!=0
+        if direction_mode.is_write()==is_output:
+            if is_output and value!=None:
+                self.write(value)
+            return
+        self._backend().set_line_direction( self._pin_id(), self._value_file()
+                                          , direction_mode, value )
+        self._flags = (self._flags&~_DIRECTION_FLAGS)|_direction_flag(direction_mode)
+
+    def input(self):
+        ''' Make the pin an input. See set_direction '''
+        self.set_direction(DirectionMode.read_open_mode())
+
+    def output(self, value=None):
+        ''' Make the pin an output, set to value if given. See set_direction '''
+        self.set_direction(DirectionMode.write_open_mode(), value)
+
+    def read(self):
+        '''
+            Returns a True if 1 read from an open pin GPIO line, else False,
+            whichever the pin's direction. Raises a ValueError if the object
+            is closed.
+        '''
+        if self.closed():
+            raise ValueError
+        if self._raw_fd!=None:
+            return fastio.read_fd(self._raw_fd)
+        self._value_file().seek(0)
+        return self._value_file().read()[0] == '1'
+
+    def write(self, value):
+        '''
+            Output a 1 or 0 to the pin, as PinWriter.write. Raises a
+            ValueError if the object is closed or the pin is an input.
+        '''
+        if self.closed() or not self._flags&_WRITE_FLAG:
+            raise ValueError
+        value = 0 if value == '0' else value
+        if self._raw_fd!=None:
+            fastio.write_fd(self._raw_fd, value)
+        else:
+            self._value_file().seek(0) # line may have been read since
+            self._value_file().write('1' if value else '0')
+            self._value_file().seek(0) # seek(0) 'flushes' the value to the pin
+
+_parsed_open_modes = {}
+
+def parse_open_mode( mode ):
+    '''
+        Returns a (DirectionMode, BlockMode) tuple for an open_pin mode
+        string, raising the same PinOpenModeInvalidError exceptions as
+        open_pin for invalid mode strings.
+
+        Each valid mode string is parsed once: the tuple is remembered and
+        returned by later calls for the same string.
+    '''
+    try:
+        return _parsed_open_modes[mode]
+    except KeyError:
+        parsed = _parse_open_mode( mode )
+        _parsed_open_modes[mode] = parsed
+        return parsed
+    except TypeError: # unhashable, so not remembered
+        return _parse_open_mode( mode )
+
+def _parse_open_mode( mode ):
+    ''' Internal function parsing a mode string for parse_open_mode '''
+    mode_len = len(mode)
+    direction_mode = DirectionMode(DirectionMode.read_open_mode())
+    edge_mode = BlockMode(BlockMode.non_blocking_open_mode())
+    if mode_len >= 1:
+        direction_mode = DirectionMode( mode[0] )
+        if mode_len == 2:
+            edge_mode = BlockMode( mode[1] )
+        elif mode_len > 2:
+            raise PinOpenModeInvalidError
+    if direction_mode.is_write():
+        if edge_mode.is_blocking(): # any other blocking mode meaningless for output
+            raise PinBlockModeInvalidError
+    return (direction_mode, edge_mode)
+
+def open_pin( pin_id, mode='', backend=None, samples=1 ):
     '''
         Factory function creating GPIO pin objects of appropriate types for
         the requested operational mode.
@@ -495,6 +853,15 @@ def open_pin( pin_id, mode='' ):
         No mode argument or an empty mode string defaults to read/input and
         not waiting for any edge events.
 
+        backend is optional. If passed it is the backends.GPIOBackend, or
+        the name of the backend, used for the pin's IO. If not passed the
+        default backend is used or, if there is none, the fastest available
+        backend supporting mode - see backends.select_backend.
+
+        samples is optional and only used for non-blocking reads. If greater
+        than 1 it is the number of times the pin is sampled by each read,
+        which returns the majority value - see PinReader.__init__.
+
         Returns an object that implements one of the sub-types of GPIOBase:
             If write requested then returned object implements GPIOWriterBase
             If read requested then object returned implements GPIOReaderBase
@@ -511,26 +878,18 @@ def open_pin( pin_id, mode='' ):
                 specified for the specified data direction mode 
             PinInUseError if the requested pin_id to use was already
             exported (indicting some other process may be using it).
+            PinBackendUnavailableError if the requested backend is
+            unavailable or does not support mode.
         In addition general Python exceptions such as IOError may be raised.
     '''
-    mode_len = len(mode)
-    direction_mode = DirectionMode(DirectionMode.read_open_mode())
-    edge_mode = BlockMode(BlockMode.non_blocking_open_mode())
-    if mode_len >= 1:
-        direction_mode = DirectionMode( mode[0] )
-        if mode_len == 2:
-            edge_mode = BlockMode( mode[1] )
-        elif mode_len > 2:
-            raise PinOpenModeInvalidError
+    (direction_mode, edge_mode) = parse_open_mode( mode )
     if direction_mode.is_write():
-        if edge_mode.is_blocking(): # any other blocking mode meaningless for output
-            raise PinBlockModeInvalidError
-        return PinWriter( pin_id )
+        return PinWriter( pin_id, backend )
     else: # direction mode only read or write...
         assert( direction_mode.is_read() )
         if edge_mode.is_blocking():
-            return PinBlockingReader( pin_id, edge_mode.open_mode_value() )
+            return PinBlockingReader( pin_id, edge_mode.open_mode_value(), backend )
         else:
-            return PinReader( pin_id )
+            return PinReader( pin_id, backend, samples )
 
 #
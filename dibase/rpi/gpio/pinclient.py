@@ -0,0 +1,476 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Client for the GPIO pin server (see pinserver).
+
+    A PinClient connects to a pin server and opens pins and pin groups
+    with open_pin and open_pingroup methods taking the same arguments as
+    pin.open_pin and pingroup.open_pingroup. The objects returned are used
+    in the same way as local pin and pin group objects but their reads and
+    writes are performed by the server. The module functions open_pin and
+    open_pingroup use a default client connected to the server at
+    pinprotocol.socket_path().
+
+    Writes are not acknowledged by the server, so a failed write raises an
+    exception from the next request made through the same client. Within a
+    PinClient.batch() block writes are buffered and sent together.
+
+    Blocking readers receive edge events from the server. As with local
+    readers read returns immediately if an edge event has occurred since
+    the previous read, and edges are coalesced. Remote objects have no file
+    descriptors so cannot be waited on using select or have event
+    callbacks registered.
+
+    A PinClient and its objects should be used by only one thread at a
+    time.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import select
+import socket
+import threading
+
+import gpioerror
+from gpioerror import PinIdInvalidError
+from gpioerror import PinServerError
+from gpiobase import GPIOReaderBase
+from gpiobase import GPIOWriterBase
+from gpiobase import GPIOBlockingReaderBase
+import pin
+import pingroup
+import pinprotocol
+import timing
+
+MAX_BATCH_BYTES = 4096 # buffered writes are sent when this size is reached
+
+_BUILTIN_ERRORS = dict((e.__name__, e) for e in (ValueError, TypeError, IOError, OSError))
+
+def _error(name, message):
+    ''' Internal function returning the exception for an ERROR message '''
+    error_class = getattr(gpioerror, name, None)
+    if isinstance(error_class, type) and issubclass(error_class, gpioerror.GPIOError):
+        error = error_class()
+        error.args = (message,)
+        return error
+    if name in _BUILTIN_ERRORS:
+        return _BUILTIN_ERRORS[name](message)
+    return PinServerError('%s: %s' % (name, message))
+
+class _Batch(object):
+    ''' Internal context manager buffering a PinClient's writes '''
+    def __init__(self, client):
+        self.__client = client
+
+    def __enter__(self):
+        self.__client._batch(1)
+        return self.__client
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.__client._batch(-1)
+
+class PinClient(object):
+    '''
+        Connection to a GPIO pin server used to open remote pins and pin
+        groups.
+    '''
+    def __init__(self, path=None):
+        '''
+            Connect to the pin server listening on the Unix socket at path,
+            or pinprotocol.socket_path() if path is None. Raises
+            socket.error if the server cannot be connected to.
+        '''
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__socket.connect(path or pinprotocol.socket_path())
+        self.__received = ''
+        self.__outgoing = ''
+        self.__batching = 0
+        self.__events = {}      # handle: (value, time) of last unread event
+                                # or exception if events failed
+        self.__write_error = None
+        self.__lock = threading.RLock()
+
+    def __enter__(self):
+        ''' Just returns self as object for use 'as' in 'with' statement '''
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        ''' Ensures close called on exit from 'with' statement '''
+        self.close()
+
+    def closed(self):
+        ''' Returns True if the connection has been closed '''
+        return self.__socket==None
+
+    def close(self):
+        '''
+            Close the connection. The server closes any pins and pin groups
+            still open through it.
+        '''
+        with self.__lock:
+            if self.__socket!=None:
+                try:
+                    self.__flush()
+                except PinServerError:
+                    pass
+                self.__socket.close()
+                self.__socket = None
+
+    def open_pin(self, pin_id, mode=''):
+        '''
+            Open a remote GPIO pin. Arguments, return value and exceptions
+            are as for pin.open_pin, except that the objects returned are
+            remote pin objects.
+        '''
+        (direction_mode, edge_mode) = pin.parse_open_mode(mode)
+        handle = self.__open( False
+                            , direction_mode.open_mode_value()+edge_mode.open_mode_value()
+                            , [pin_id]
+                            )
+        if direction_mode.is_write():
+            return RemoteWriter(self, handle, 1, None)
+        elif edge_mode.is_blocking():
+            return RemoteBlockingReader(self, handle, 1, None)
+        else:
+            return RemoteReader(self, handle, 1, None)
+
+    def open_pingroup(self, pin_ids, mode='rNI'):
+        '''
+            Open a remote group of GPIO pins. Arguments, return value and
+            exceptions are as for pingroup.open_pingroup, except that the
+            objects returned are remote pin group objects.
+        '''
+        (direction_mode, edge_mode, format_mode) = pingroup.parse_open_mode(mode)
+        try:
+            pin_ids = list(pin_ids)
+        except TypeError:
+            raise gpioerror.PinGroupIdsInvalidError
+        if not pin_ids:
+            raise gpioerror.PinGroupIdsInvalidError
+        handle = self.__open( True
+                            , direction_mode.open_mode_value()+edge_mode.open_mode_value()
+                            , pin_ids
+                            )
+        if direction_mode.is_write():
+            remote_class = RemoteWriter
+        elif edge_mode.is_blocking():
+            remote_class = RemoteBlockingReader
+        else:
+            remote_class = RemoteReader
+        return remote_class(self, handle, len(pin_ids), format_mode.is_integer())
+
+    def batch(self):
+        '''
+            Return a context manager for a with statement block within which
+            writes are buffered and sent to the server together when the
+            block ends (or MAX_BATCH_BYTES of writes are buffered).
+        '''
+        return _Batch(self)
+
+    def flush(self):
+        ''' Send any buffered writes to the server '''
+        with self.__lock:
+            self.__flush()
+
+    def _batch(self, change):
+        ''' Internal method entering (1) or leaving (-1) a batch block '''
+        with self.__lock:
+            self.__batching += change
+            if self.__batching==0:
+                self.__flush()
+
+    def _write(self, handle, values):
+        ''' Internal method sending a write of values for handle '''
+        with self.__lock:
+            self.__check_write_error()
+            self.__outgoing += pinprotocol.message( pinprotocol.WRITE, handle
+                                                  , pinprotocol.write_payload(values)
+                                                  )
+            if self.__batching==0 or len(self.__outgoing)>=MAX_BATCH_BYTES:
+                self.__flush()
+
+    def _read(self, handle):
+        ''' Internal method returning the value read for handle '''
+        (op, payload) = self.__request(pinprotocol.READ, handle)
+        return pinprotocol.WORD.unpack(payload)[0]
+
+    def _wait_for_event(self, handle, timeout):
+        '''
+            Internal method returning the (value, time) of an edge event for
+            handle, waiting up to timeout seconds (or forever if timeout is
+            None) if none has been received since the last call, or None if
+            timed out. Raises the exception of an ERROR sent by the server
+            for the handle's edge events.
+        '''
+        with self.__lock:
+            self.__flush()
+            deadline = None if timeout==None else timing.monotonic()+timeout
+            while handle not in self.__events:
+                remaining = None if deadline==None else deadline-timing.monotonic()
+                if remaining!=None and remaining<=0:
+                    return None
+                self.__receive(remaining)
+            event = self.__events.pop(handle)
+            if isinstance(event, Exception):
+                raise event
+            return event
+
+    def _close_handle(self, handle):
+        ''' Internal method closing handle '''
+        with self.__lock:
+            if self.__socket!=None:
+                self.__events.pop(handle, None)
+                self.__outgoing += pinprotocol.message(pinprotocol.CLOSE, handle)
+                if self.__batching==0:
+                    self.__flush()
+
+    def __open(self, group, mode, pin_ids):
+        ''' Internal method returning the handle of an opened pin or group '''
+        for pin_id in pin_ids:
+            if not 0<=int(pin_id)<=255:
+                raise PinIdInvalidError
+        payload = pinprotocol.open_payload(group, mode, [int(i) for i in pin_ids])
+        (op, handle) = self.__request(pinprotocol.OPEN, 0, payload, True)
+        return handle
+
+    def __request(self, op, handle, payload='', want_handle=False):
+        '''
+            Internal method sending a request and returning the reply's
+            operation code and payload, or handle if want_handle is True.
+            Raises the exception of an ERROR reply.
+        '''
+        with self.__lock:
+            self.__check_write_error()
+            self.__outgoing += pinprotocol.message(op, handle, payload)
+            self.__flush()
+            while True:
+                reply = self.__receive(None)
+                if reply!=None:
+                    break
+            self.__check_write_error()
+            (reply_op, reply_handle, reply_payload) = reply
+            if reply_op==pinprotocol.ERROR:
+                raise _error(*pinprotocol.parse_error_payload(reply_payload)[1:])
+            return (reply_op, reply_handle if want_handle else reply_payload)
+
+    def __check_write_error(self):
+        ''' Internal method raising the exception of a failed write '''
+        if self.__write_error!=None:
+            error = self.__write_error
+            self.__write_error = None
+            raise error
+
+    def __flush(self):
+        ''' Internal method sending buffered messages '''
+        if self.__socket==None:
+            raise PinServerError('connection closed')
+        if self.__outgoing:
+            try:
+                self.__socket.sendall(self.__outgoing)
+            except socket.error, e:
+                raise PinServerError(str(e))
+            finally:
+                self.__outgoing = ''
+
+    def __receive(self, timeout):
+        '''
+            Internal method waiting up to timeout seconds (or forever if
+            timeout is None) for messages from the server. Edge events and
+            write errors are recorded and any reply returned as an (op,
+            handle, payload) tuple, otherwise None is returned.
+        '''
+        if self.__socket==None:
+            raise PinServerError('connection closed')
+        if timeout!=None:
+            (readable, writable, exceptional) = select.select([self.__socket], [], [], timeout)
+            if not readable:
+                return None
+        try:
+            data = self.__socket.recv(65536)
+        except socket.error, e:
+            raise PinServerError(str(e))
+        if not data:
+            raise PinServerError('connection closed by server')
+        try:
+            (messages, self.__received) = pinprotocol.split_messages(self.__received+data)
+        except ValueError, e:
+            raise PinServerError(str(e))
+        reply = None
+        for (op, handle, payload) in messages:
+            if op==pinprotocol.EVENT:
+                self.__events[handle] = pinprotocol.EVENT_PAYLOAD.unpack(payload)
+            elif op==pinprotocol.ERROR and \
+                 pinprotocol.parse_error_payload(payload)[0]==pinprotocol.EVENT:
+                self.__events[handle] = _error(*pinprotocol.parse_error_payload(payload)[1:])
+            elif op==pinprotocol.ERROR and \
+                 pinprotocol.parse_error_payload(payload)[0]==pinprotocol.WRITE:
+                self.__write_error = _error(*pinprotocol.parse_error_payload(payload)[1:])
+            else:
+                reply = (op, handle, payload)
+        return reply
+
+class _RemoteIOBase(object):
+    '''
+        Internal mixin base class for remote pin and pin group classes.
+        Converts between values in the form used by local pin or pin group
+        objects and the value words sent to and from the server.
+    '''
+    def __init__(self, client, handle, pin_count, integer_format):
+        '''
+            Initialise for handle opened through client for pin_count pins
+            with values as for a single pin if integer_format is None,
+            otherwise as for a pin group in integer or sequence format.
+        '''
+        self._client = client
+        self._handle = handle
+        self._pin_count = pin_count
+        self._integer_format = integer_format
+
+    def __del__(self):
+        ''' Calls close to try to ensure the handle is cleanly closed '''
+        if hasattr(self, '_client'):
+            self.close()
+
+    def __enter__(self):
+        ''' Just returns self as object for use 'as' in 'with' statement '''
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        ''' Ensures close called on exit from 'with' statement '''
+        self.close()
+
+    def close(self):
+        ''' Close the remote pin or pin group. Can be called repeatedly '''
+        if self._handle!=None:
+            if not self._client.closed():
+                self._client._close_handle(self._handle)
+            self._handle = None
+
+    def closed(self):
+        ''' Returns True if closed, False if open '''
+        return self._handle==None or self._client.closed()
+
+    def file_descriptors(self):
+        ''' Returns an empty list: remote objects have no file descriptors '''
+        return []
+
+    def _to_word(self, value):
+        '''
+            Internal method returning the word for a value written. Raises
+            ValueError if value is out of range or of the wrong length.
+        '''
+        if self._integer_format==None:
+            value = 0 if value == '0' else value
+            return 1 if value else 0
+        if self._integer_format:
+            value = int(value)
+            if not 0<=value<2**self._pin_count:
+                raise ValueError
+            return value
+        if len(value)!=self._pin_count:
+            raise ValueError
+        word = 0
+        for (bit_number, bit) in enumerate(value):
+            if bit and bit!='0':
+                word |= 1<<bit_number
+        return word
+
+    def _from_word(self, word):
+        ''' Internal method returning the value read for a word '''
+        if self._integer_format==None:
+            return word!=0
+        if self._integer_format:
+            return word
+        return [(word>>bit_number)&1==1 for bit_number in range(self._pin_count)]
+
+class RemoteWriter(_RemoteIOBase, GPIOWriterBase):
+    ''' GPIOWriterBase implementation for a remote pin or pin group '''
+    def write(self, value):
+        '''
+            Write value to the pin or pin group as for the equivalent local
+            writer. Raises ValueError if closed or value is out of range.
+        '''
+        if self.closed():
+            raise ValueError
+        self._client._write(self._handle, [self._to_word(value)])
+
+    def write_many(self, values, interval=None):
+        '''
+            Write each of a sequence of values in turn as for the equivalent
+            local writer. Values are sent in a single batch unless interval
+            is given and not zero, in which case each is sent at its time on
+            a schedule of interval seconds between writes.
+        '''
+        if self.closed():
+            raise ValueError
+        words = [self._to_word(value) for value in values]
+        if interval:
+            start = timing.monotonic()
+            for (index, word) in enumerate(words):
+                self._client._write(self._handle, [word])
+                timing.sleep_until(start + (index+1)*interval)
+        else:
+            limit = pinprotocol.MAX_PAYLOAD/pinprotocol.WORD.size
+            with self._client.batch():
+                for index in xrange(0, len(words), limit):
+                    self._client._write(self._handle, words[index:index+limit])
+
+class RemoteReader(_RemoteIOBase, GPIOReaderBase):
+    ''' GPIOReaderBase implementation for a remote pin or pin group '''
+    def read(self):
+        '''
+            Return the value of the pin or pin group as for the equivalent
+            local reader. Raises ValueError if closed.
+        '''
+        if self.closed():
+            raise ValueError
+        return self._from_word(self._client._read(self._handle))
+
+class RemoteBlockingReader(_RemoteIOBase, GPIOBlockingReaderBase):
+    ''' GPIOBlockingReaderBase implementation for a remote pin or pin group '''
+    def read(self, timeout=None):
+        '''
+            Return the value of the pin or pin group after an edge event,
+            or None if timeout seconds pass first, as for the equivalent
+            local blocking reader. Returns immediately if an edge event has
+            occurred since the previous read or with the polled value if
+            timeout is 0. Raises ValueError if closed.
+        '''
+        if self.closed():
+            raise ValueError
+        if timeout==0:
+            return self._from_word(self._client._read(self._handle))
+        event = self._client._wait_for_event(self._handle, timeout)
+        return None if event==None else self._from_word(event[0])
+
+    def _read_notified(self, fds):
+        ''' Internal method returning the polled value '''
+        return self.read(0)
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def default_client():
+    '''
+        Return the PinClient used by the module open_pin and open_pingroup
+        functions, connecting to the server at pinprotocol.socket_path() on
+        first call (or if the previous connection has been closed).
+    '''
+    global _default_client
+    with _default_client_lock:
+        if _default_client==None or _default_client.closed():
+            _default_client = PinClient()
+        return _default_client
+
+def open_pin(pin_id, mode=''):
+    ''' Open a remote pin through default_client(), see PinClient.open_pin '''
+    return default_client().open_pin(pin_id, mode)
+
+def open_pingroup(pin_ids, mode='rNI'):
+    '''
+        Open a remote pin group through default_client(), see
+        PinClient.open_pingroup.
+    '''
+    return default_client().open_pingroup(pin_ids, mode)
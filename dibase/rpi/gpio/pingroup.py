@@ -2,9 +2,11 @@
     Part of the dibase.rpi.gpio package.
 
     Operations on groups of GPIO pins.
-    Uses userspace sys filesystem GPIO interface.
+    Uses userspace sys filesystem GPIO interface or another backend - see
+    the backends module.
     Provides a set of types and operations to more easily perform IO on
-    groups of GPIO pins modelled after file objects.
+    groups of GPIO pins modelled after file objects. Non-blocking groups
+    read and write their pins using their backend's bulk operations.
 
     Developed by R.E. McArdell / Dibase Limited.
     Copyright (c) 2012 Dibase Limited
@@ -12,8 +14,8 @@
 '''
 
 import os
-import select # select.select used to wait on i/ps with edge interrupts enabled
 import collections
+import array
 
 from pinid import PinId
 from gpioerror import GPIOError
@@ -26,11 +28,61 @@ from gpiobase import GPIOReaderBase
 from gpiobase import GPIOWriterBase
 from gpiobase import GPIOBlockingReaderBase
 from pin import open_pin
+from pin import parse_open_mode as parse_pin_open_mode
 from pin import BlockMode
 from pin import DirectionMode
+from events import EdgeEventQueue
+from realtime import section as realtime_section
+import backends
+import fastio
+import timing
+import sysfsio
+
+def _word_typecode(bit_count):
+    '''
+        Returns the typecode of the smallest unsigned integer array.array
+        item type able to hold words of bit_count bits.
+        Raises ValueError if there is no such item type.
+    '''
+    for typecode in 'BHIL':
+        if array.array(typecode).itemsize*8 >= bit_count:
+            return typecode
+    raise ValueError
+
+def _as_list(values):
+    '''
+        Returns the items of the iterable values as a list (or values itself
+        if it is a list or tuple). Sequence types providing a tolist method,
+        such as array.array and numpy arrays, are converted using it so that
+        items are plain Python values.
+    '''
+    if isinstance(values, (list, tuple)):
+        return values
+    if hasattr(values, 'tolist'):
+        return values.tolist()
+    return list(values)
+
+def _read_pin_line(pin):
+    '''
+        Returns True if the line of pin, an open pin object, is at a high
+        level, reading it directly rather than by calling the pin's read
+        method.
+    '''
+    if pin._raw_fd!=None:
+        return fastio.read_fd(pin._raw_fd)
+    pin._value_file().seek(0)
+    return pin._value_file().read()[0]=='1'
 
 class FormatMode(object):
-    '''Class encapsulating open IO data format mode characters'''
+    '''
+        Class encapsulating open IO data format mode characters.
+
+        Instances are immutable and interned: there is one FormatMode per
+        open format mode character, validated when first requested.
+    '''
+    __slots__ = ('__value', '__integer')
+    __instances = {}
+
     @classmethod
     def integer_open_mode(cls):
         '''Return character for open integer data format mode'''
@@ -57,23 +109,32 @@ class FormatMode(object):
         return len(mode)==1 and \
                 (mode in FormatMode.all_format_open_mode_characters())
 
-    def __init__(self, format_mode):
+    def __new__(cls, format_mode):
         '''
-            Creates a FormatMode instance from an open format mode
-            character. Raises a PinGroupFormatModeInvalidError exception if
+            Returns the FormatMode instance for an open format mode
+            character, creating it if it is the first request for the mode.
+            Raises a PinGroupFormatModeInvalidError exception if
             format_mode is not a valid open format mode character.
         '''
+        try:
+            return FormatMode.__instances[format_mode]
+        except (KeyError, TypeError):
+            pass
         if not (FormatMode.is_valid_format_open_mode(format_mode)):
             raise PinGroupFormatModeInvalidError
+        self = super(FormatMode, cls).__new__(cls)
         self.__value = format_mode
+        self.__integer = format_mode == FormatMode.integer_open_mode()
+        FormatMode.__instances[format_mode] = self
+        return self
 
     def is_integer(self):
         '''Returns True if FormatMode instance is integer format mode.'''
-        return self.__value == FormatMode.integer_open_mode()
+        return self.__integer
 
     def is_sequence(self):
         '''Returns True if FormatMode instance is sequence format mode.'''
-        return self.__value == FormatMode.sequence_open_mode()
+        return not self.__integer
 
     def open_mode_value(self):
         '''
@@ -87,8 +148,14 @@ class _PinGroupIOBase(object):
     '''
         Internal mixin base class for concrete Pin group IO classes.
         Provides common functionality.
+
+        Instances have no __dict__: their attributes are __slots__, as are
+        those of sub-classes, and the group's pins are pin objects with
+        __slots__ - see pin._PinIOBase.
     '''
-    def __init__(self, pin_ids, mode):
+    __slots__ = ('_pins', '_backend', '_lines')
+
+    def __init__(self, pin_ids, mode, backend=None):
         '''
             Common initalisation for GPIO pin group IO classes.
 
@@ -99,6 +166,11 @@ class _PinGroupIOBase(object):
             
             mode is the required open mode for each _single_ pin in the pin
             group and is provided by sub classes.
+
+            backend is the backends.GPIOBackend, name of a backend or None
+            as passed to pin.open_pin. One backend is selected for all the
+            pins in the group, which is available as _backend, the pins'
+            lines being available in group order as _lines.
             
             Additionally any exception that might be raised by pin.open_pin
             may be raised (other than those relating to bad mode values
@@ -109,9 +181,12 @@ class _PinGroupIOBase(object):
         self._pins = []
         if not (pin_ids and isinstance(pin_ids, collections.Iterable)):
             raise PinGroupIdsInvalidError
+        (direction_mode, blocking_mode) = parse_pin_open_mode(mode)
+        self._backend = backends.select_backend( direction_mode, blocking_mode
+                                               , backend )
         for id in pin_ids:
             try:
-                p = open_pin(id, mode)
+                p = open_pin(id, mode, self._backend)
                 self._pins.append(p)
             except GPIOError, e:
             # Close open pins ASAP - do not wait for __del__ to be called
@@ -119,6 +194,7 @@ class _PinGroupIOBase(object):
                     p.close()
                 self._pins = []
                 raise e
+        self._lines = self._backend.group_lines([p._value_file() for p in self._pins])
 
     def __del__(self):
         '''Calls close to try to ensure pin group is cleanly freed up'''
@@ -148,14 +224,14 @@ class _PinGroupIOBase(object):
             If an instance is closed returns an empty list otherwise returns
             a list containing the file descriptor of the open value
             file of each pin of the group in the order of the pin ids passed
-            to __init__.
+            to __init__, omitting those of pins without file descriptors.
         '''
         if self.closed():
             return []
         else:
             fds = []
             for p in self._pins:
-                fds.append(p.fileno())
+                fds.extend(p.file_descriptors())
             return fds
 
 class PinWordWriter(_PinGroupIOBase, GPIOWriterBase):
@@ -165,7 +241,9 @@ class PinWordWriter(_PinGroupIOBase, GPIOWriterBase):
         as bits in an integer. Each GPIO pin in the group will have been
         exported and set up for output as part of the initialisation.
     '''
-    def __init__(self, pin_ids):
+    __slots__ = ('_cached_value', '_pin_bit_range', '_pin_max_value')
+
+    def __init__(self, pin_ids, backend=None):
         '''
             Creates a group of GPIO pins for writing (output) with pin bit
             values expressed to write as bits in an integer with bit 0
@@ -183,7 +261,7 @@ class PinWordWriter(_PinGroupIOBase, GPIOWriterBase):
             On successful return an open pin group object will be open and
             ready to write to. Otherwise it will be closed.
         '''
-        super(PinWordWriter, self).__init__(pin_ids, 'wN')
+        super(PinWordWriter, self).__init__(pin_ids, 'wN', backend)
         self._cached_value = None
         self._pin_bit_range = range(len(self._pins))
         self._pin_max_value = 2**len(self._pins)-1
@@ -199,22 +277,72 @@ class PinWordWriter(_PinGroupIOBase, GPIOWriterBase):
             group and so on.
 
             Raises Value error if value is out of range or a string that
-            cannot be converted to an integer; TypeError is raised if value
-            is not a string or a number.
+            cannot be converted to an integer or if the pin group is closed;
+            TypeError is raised if value is not a string or a number.
         '''
+        if self.closed():
+            raise ValueError
         value = int(value)
         if value>=0 and value<=self._pin_max_value:
             if self._cached_value==None:
                 self._cached_value = ~value & self._pin_max_value
-            for bit_number in self._pin_bit_range:
-                mask = (1<<bit_number)
-                value_bit = value&mask
-                if value_bit != (self._cached_value&mask):
-                    self._pins[bit_number].write(value_bit)
+            self._backend.write_lines(self._lines, value^self._cached_value, value)
             self._cached_value = value
         else:
             raise ValueError
 
+    def write_many(self, values, interval=None, realtime=None):
+        '''
+            Writes each of a sequence of values to the pins in the group in
+            turn, as if write were called for each value.
+
+            values is an iterable sequence of integers such as a list, an
+            array.array (e.g. of typecode 'H') or a numpy integer array. Each
+            value is converted to an integer, as by write, and must then be
+            in the range [0, 2**<number of pins in the group>). All values
+            are converted and checked before any are written, so if any value
+            is out of range or cannot be converted a ValueError (or TypeError,
+            as for write) is raised and no pins are changed.
+
+            interval is optional. If given and not zero it is the time in
+            seconds between successive writes. Writes are paced against a
+            schedule of deadlines measured on a monotonic clock from the time
+            of the first write so that time spent writing does not
+            accumulate as drift. Otherwise values are written as fast as
+            possible.
+
+            realtime is optional. If given it is a realtime.RealTime, or True
+            for one with default settings, under which the writes are made
+            to reduce timing jitter - see the realtime module.
+
+            Raises ValueError if the pin group is closed.
+        '''
+        if self.closed():
+            raise ValueError
+        values = [int(value) for value in _as_list(values)]
+        if not values:
+            return
+        if min(values)<0 or max(values)>self._pin_max_value:
+            raise ValueError
+        write_lines = self._backend.write_lines
+        lines = self._lines
+        cached_value = self._cached_value
+        if cached_value==None:
+            cached_value = ~values[0] & self._pin_max_value
+        try:
+            with realtime_section(realtime):
+                if interval:
+                    start = timing.monotonic()
+                for index, value in enumerate(values):
+                    changed = value ^ cached_value
+                    if changed:
+                        write_lines(lines, changed, value)
+                        cached_value = value
+                    if interval:
+                        timing.sleep_until(start + (index+1)*interval)
+        finally:
+            self._cached_value = cached_value
+
 class PinListWriter(_PinGroupIOBase, GPIOWriterBase):
     '''
         Concrete GPIOWriterBase implementation for a group of GPIO pins.
@@ -223,7 +351,9 @@ class PinListWriter(_PinGroupIOBase, GPIOWriterBase):
         the group will have been exported and set up for output as part of
         the initialisation.
     '''
-    def __init__(self, pin_ids):
+    __slots__ = ('_cached_value', '_pin_bit_range')
+
+    def __init__(self, pin_ids, backend=None):
         '''
             Creates a group of GPIO pins for writing (output) with pin bit
             values expressed to write as Boolean values in an iterable
@@ -239,7 +369,7 @@ class PinListWriter(_PinGroupIOBase, GPIOWriterBase):
             On successful return an open pin group object will be open and
             ready to write to. Otherwise it will be closed.
         '''
-        super(PinListWriter, self).__init__(pin_ids, 'wN')
+        super(PinListWriter, self).__init__(pin_ids, 'wN', backend)
         self._cached_value = None
         self._pin_bit_range = range(len(self._pins))
 
@@ -255,20 +385,85 @@ class PinListWriter(_PinGroupIOBase, GPIOWriterBase):
 
             Raises TypeError if value is not an iterable sequence of items
             with the same length as that of the pin_ids argument passed to
-            __init__.
+            __init__ and ValueError if the pin group is closed.
         '''
+        if self.closed():
+            raise ValueError
         if isinstance(value, collections.Iterable) and len(value)==len(self._pins):
             if self._cached_value==None:
                 self._cached_value = []
                 for bit_number in self._pin_bit_range:
                     self._cached_value.append(not value[bit_number])
-            for bit_number in self._pin_bit_range:
-                if value[bit_number] != self._cached_value[bit_number]:
-                    self._pins[bit_number].write(value[bit_number])
+            (mask, word) = self._changes(value, self._cached_value)
+            self._backend.write_lines(self._lines, mask, word)
             self._cached_value = value
         else:
             raise TypeError
 
+    def _changes(self, value, cached_value):
+        '''
+            Internal method returning a (mask, word) tuple of the pins whose
+            element of value differs from that of cached_value and of the
+            pins whose element of value is True, as bits of integers.
+        '''
+        mask = 0
+        word = 0
+        for bit_number in self._pin_bit_range:
+            if value[bit_number] != cached_value[bit_number]:
+                mask |= 1<<bit_number
+            if value[bit_number]:
+                word |= 1<<bit_number
+        return (mask, word)
+
+    def write_many(self, values, interval=None, realtime=None):
+        '''
+            Writes each of a sequence of values to the pins in the group in
+            turn, as if write were called for each value.
+
+            values is an iterable sequence whose elements are each an
+            iterable sequence of Boolean values (or values convertible to
+            Boolean) as accepted by write. All elements are checked before any
+            are written, so if any element is not a sequence of the same
+            length as the pin_ids argument passed to __init__ a TypeError is
+            raised and no pins are changed.
+
+            interval is optional. If given and not zero it is the time in
+            seconds between successive writes, paced as for
+            PinWordWriter.write_many.
+
+            realtime is optional, as for PinWordWriter.write_many.
+
+            Raises ValueError if the pin group is closed.
+        '''
+        if self.closed():
+            raise ValueError
+        values = _as_list(values)
+        pin_count = len(self._pins)
+        for value in values:
+            if not (isinstance(value, collections.Iterable) and len(value)==pin_count):
+                raise TypeError
+        if not values:
+            return
+        write_lines = self._backend.write_lines
+        lines = self._lines
+        changes = self._changes
+        cached_value = self._cached_value
+        if cached_value==None:
+            cached_value = [not bit for bit in values[0]]
+        try:
+            with realtime_section(realtime):
+                if interval:
+                    start = timing.monotonic()
+                for index, value in enumerate(values):
+                    (mask, word) = changes(value, cached_value)
+                    if mask:
+                        write_lines(lines, mask, word)
+                    cached_value = value
+                    if interval:
+                        timing.sleep_until(start + (index+1)*interval)
+        finally:
+            self._cached_value = cached_value
+
 
 class PinWordReader(_PinGroupIOBase, GPIOReaderBase):
     '''
@@ -276,8 +471,12 @@ class PinWordReader(_PinGroupIOBase, GPIOReaderBase):
         It handles reading 0 or 1 values from the related GPIO pins presented
         as bits in an integer. Each GPIO pin in the group will have been
         exported and set up for input as part of the initialisation.
+
+        _samples is the number of samples voted on by each read.
     '''
-    def __init__(self, pin_ids):
+    __slots__ = ('_pin_bit_range', '_word_typecode', '_samples')
+
+    def __init__(self, pin_ids, backend=None, samples=1):
         '''
             Creates a group of GPIO pins for reading (input) with read pin
             bit values expressed as bits in an integer with bit 0 indicating
@@ -292,25 +491,93 @@ class PinWordReader(_PinGroupIOBase, GPIOReaderBase):
             pin.open_pin may be raised other than those relating to bad mode
             values.
             
+            samples is optional. If greater than 1 each read samples the
+            group that many times in succession - with one bulk read of all
+            the pins each time - and returns the majority value of each pin,
+            filtering out glitches on noisy lines. An odd number avoids
+            ties, which read as 0. ValueError is raised if samples is less
+            than 1.
+
             On successful return an open pin group object will be open and
             ready to read from. Otherwise it will be closed.
         '''
-        super(PinWordReader, self).__init__(pin_ids, 'rN')
+        if samples<1:
+            raise ValueError('samples must be at least 1')
+        super(PinWordReader, self).__init__(pin_ids, 'rN', backend)
         self._pin_bit_range = range(len(self._pins))
+        self._word_typecode = _word_typecode(len(self._pins))
+        self._samples = samples
+
+    def samples(self):
+        ''' Returns the number of samples voted on by each read '''
+        return self._samples
 
     def read(self):
         '''
             Returns an integer whose bits represent the read state of all
             bits in the pin group with bit 0 representing the pin specified by
             the 0th element of pin_ids argument passed to __init__ and so on.
+            If more than 1 sample was requested each bit is the majority
+            value of the pin's samples.
 
             Note that read polls the pin states and does not wait for any
             state change event to occur.
+
+            Raises ValueError if the pin group is closed.
         '''
-        value = 0
-        for bit_number in self._pin_bit_range:
-            value += (self._pins[bit_number].read() << bit_number)
-        return value
+        if self.closed():
+            raise ValueError
+        if self._samples>1:
+            return self._backend.vote_lines(self._lines, self._samples)
+        return self._backend.read_lines(self._lines)
+
+    def read_many(self, n, interval=None, out=None, realtime=None):
+        '''
+            Reads the pin group n times in succession, as if read were
+            called n times, returning the read integer values in order. If
+            more than 1 sample was requested each value is voted on as by
+            read.
+
+            interval is optional. If given and not zero it is the time in
+            seconds between successive reads. Reads are paced against a
+            schedule of deadlines measured on a monotonic clock from the time
+            of the first read so that time spent reading does not accumulate
+            as drift. Otherwise reads are performed as fast as possible.
+
+            realtime is optional. If given it is a realtime.RealTime, or True
+            for one with default settings, under which the reads are made to
+            reduce timing jitter - see the realtime module.
+
+            out is optional. If given it is a preallocated mutable sequence of
+            integers, such as an array.array or numpy integer array, having
+            at least n elements into which the values read are stored and
+            which is returned. If not given a new array.array is returned
+            whose items are the smallest unsigned integer type able to hold a
+            value for the group - e.g. 'H' for groups of 9 to 16 pins.
+
+            Raises ValueError if the pin group is closed or out has fewer
+            than n elements.
+        '''
+        if self.closed() or n<0:
+            raise ValueError
+        if out is None:
+            out = array.array(self._word_typecode, [0])*n
+        elif len(out)<n:
+            raise ValueError
+        read_lines = self._backend.read_lines
+        lines = self._lines
+        samples = self._samples
+        if samples>1:
+            vote_lines = self._backend.vote_lines
+            read_lines = lambda lines: vote_lines(lines, samples)
+        with realtime_section(realtime):
+            if interval:
+                start = timing.monotonic()
+            for index in xrange(n):
+                out[index] = read_lines(lines)
+                if interval:
+                    timing.sleep_until(start + (index+1)*interval)
+        return out
 
 class PinListReader(_PinGroupIOBase, GPIOReaderBase):
     '''
@@ -320,7 +587,9 @@ class PinListReader(_PinGroupIOBase, GPIOReaderBase):
         the group will have been exported and set up for output as part of
         the initialisation.
     '''
-    def __init__(self, pin_ids):
+    __slots__ = ('_pin_bit_range',)
+
+    def __init__(self, pin_ids, backend=None):
         '''
             Creates a group of GPIO pins for reading (input) with read pin
             bit values expressed as Boolean values in an iterable
@@ -336,7 +605,7 @@ class PinListReader(_PinGroupIOBase, GPIOReaderBase):
             On successful return an open pin group object will be open and
             ready to read from. Otherwise it will be closed.
         '''
-        super(PinListReader, self).__init__(pin_ids, 'rN')
+        super(PinListReader, self).__init__(pin_ids, 'rN', backend)
         self._pin_bit_range = range(len(self._pins))
 
     def read(self):
@@ -348,11 +617,43 @@ class PinListReader(_PinGroupIOBase, GPIOReaderBase):
 
             Note that read polls the pin states and does not wait for any
             state change event to occur.
+
+            Raises ValueError if the pin group is closed.
         '''
-        value = []
-        for bit_number in self._pin_bit_range:
-            value.append(self._pins[bit_number].read())
-        return value
+        if self.closed():
+            raise ValueError
+        word = self._backend.read_lines(self._lines)
+        return [bool((word>>bit_number)&1) for bit_number in self._pin_bit_range]
+
+    def read_many(self, n, interval=None, realtime=None):
+        '''
+            Reads the pin group n times in succession, as if read were
+            called n times, returning a list of the n read lists of Boolean
+            values in order.
+
+            interval is optional. If given and not zero it is the time in
+            seconds between successive reads, paced as for
+            PinWordReader.read_many.
+
+            realtime is optional, as for PinWordReader.read_many.
+
+            Raises ValueError if the pin group is closed.
+        '''
+        if self.closed() or n<0:
+            raise ValueError
+        read_lines = self._backend.read_lines
+        lines = self._lines
+        bit_range = self._pin_bit_range
+        values = []
+        with realtime_section(realtime):
+            if interval:
+                start = timing.monotonic()
+            for index in xrange(n):
+                word = read_lines(lines)
+                values.append([bool((word>>bit_number)&1) for bit_number in bit_range])
+                if interval:
+                    timing.sleep_until(start + (index+1)*interval)
+        return values
 
 class PinWordBlockingReader(_PinGroupIOBase, GPIOBlockingReaderBase):
     '''
@@ -361,7 +662,10 @@ class PinWordBlockingReader(_PinGroupIOBase, GPIOBlockingReaderBase):
         presented as bits in an integer. Each GPIO pin in the group will
         have been exported and set up for input as part of initialisation.
     '''
-    def __init__(self, pin_ids, blocking_mode):
+    __slots__ = ( '_event_queue', '_cached_value', '_fd_to_bit_value'
+                , '_fd_to_pin_index' )
+
+    def __init__(self, pin_ids, blocking_mode, event_queue_size=0, backend=None):
         '''
             Creates a group of GPIO pins for blocking read (input) with read
             pin bit values expressed as bits in an integer with bit 0
@@ -380,18 +684,29 @@ class PinWordBlockingReader(_PinGroupIOBase, GPIOBlockingReaderBase):
             relate to blocking on input pin edge events - 'R', 'F' or 'B'.
             Other strings will raise a gpioerror.PinBlockModeInvalidError
             while values of other types will rasie a TypeError.
+
+            event_queue_size, if not 0, is the capacity of an
+            events.EdgeEventQueue, returned by event_queue, in which read
+            records each pin read after an edge event wake up, and each pin
+            whose value changed on a polling read, as an (index of pin in
+            group, new level, time) event.
             
             On successful return an open pin group object will be open and
             ready to read from. Otherwise it will be closed.
         '''
         if blocking_mode==BlockMode.non_blocking_open_mode():
             raise PinBlockModeInvalidError
-        super(PinWordBlockingReader, self).__init__(pin_ids,'r'+blocking_mode)
+        self._event_queue = None
+        if event_queue_size:
+            self._event_queue = EdgeEventQueue(event_queue_size)
+        super(PinWordBlockingReader, self).__init__(pin_ids,'r'+blocking_mode, backend)
         self._cached_value = 0 #can be any int between 0 & 2**len(self._pins)-1
         self._fd_to_bit_value = {}
+        self._fd_to_pin_index = {}
         fds = self.file_descriptors()
         for i in range(len(fds)):
             self._fd_to_bit_value[fds[i]] = 2**i
+            self._fd_to_pin_index[fds[i]] = i
 
     def read(self, timeout=None):
         '''
@@ -424,20 +739,51 @@ class PinWordBlockingReader(_PinGroupIOBase, GPIOBlockingReaderBase):
             raise ValueError
 
         if timeout != 0:
-            changed = select.select( [], [], self._pins, timeout )
+            changed = sysfsio.select( [], [], self._pins, timeout )
             if changed == ([], [], []): # Triple of empty lists=>timed-out
                 return None
+            return self._update(changed[2], True) # only supplied 3rd list
         else: # polling, so have to read from all pins in group
-            changed = ([], [], self._pins)
+            return self._update(self._pins, False)
 
-        for pin in changed[2]: # we only supplied fds in third list, index 2
-            pin._value_file().seek(0)
-            if pin._value_file().read()[0]=='1':
-                self._cached_value |= self._fd_to_bit_value[pin.fileno()]
+    def _read_notified(self, fds):
+        '''
+            Internal method returning the value read would return after the
+            pins with file descriptors in fds were notified of edge events.
+        '''
+        return self._update([p for p in self._pins if p.fileno() in fds], True)
+
+    def _update(self, pins, notified):
+        '''
+            Internal method reading the values of pins, a sequence of pins
+            of the group, updating and returning the cached group value.
+            notified is True if the pins were notified of edge events, False
+            for a polling read.
+        '''
+        event_queue = self._event_queue
+        if event_queue!=None:
+            time = timing.monotonic()
+        for pin in pins:
+            bit_value = self._fd_to_bit_value[pin.fileno()]
+            previous_value = self._cached_value
+            if _read_pin_line(pin):
+                self._cached_value |= bit_value
             else:
-                self._cached_value &= ~(self._fd_to_bit_value[pin.fileno()])
+                self._cached_value &= ~bit_value
+            if event_queue!=None and \
+               (notified or previous_value!=self._cached_value):
+                event_queue.append( self._fd_to_pin_index[pin.fileno()]
+                                  , self._cached_value & bit_value, time )
         return self._cached_value
 
+    def event_queue(self):
+        '''
+            Returns the events.EdgeEventQueue recording the changes observed
+            by read, or None if the group was created without an event
+            queue (event_queue_size of 0).
+        '''
+        return self._event_queue
+
 class PinListBlockingReader(_PinGroupIOBase, GPIOBlockingReaderBase):
     '''
         Concrete GPIOBlockingReaderBase implementation for groups of GPIO
@@ -445,8 +791,14 @@ class PinListBlockingReader(_PinGroupIOBase, GPIOBlockingReaderBase):
         presented as Boolean value elements in an iterable sequence. Each
         GPIO pin in the group will have been exported and set up for input
         as part of initialisation.
+
+        _reuse_value is True if read returns the same list each time.
     '''
-    def __init__(self, pin_ids, blocking_mode):
+    __slots__ = ( '_event_queue', '_reuse_value', '_cached_value', '_fds'
+                , '_fd_to_pin_index' )
+
+    def __init__( self, pin_ids, blocking_mode, event_queue_size=0, backend=None
+                , reuse_value=False ):
         '''
             Creates a group of GPIO pins for blocking read (input) with read
             pin bit values expressed as Boolean values in an iterable
@@ -463,19 +815,46 @@ class PinListBlockingReader(_PinGroupIOBase, GPIOBlockingReaderBase):
             relate to blocking on input pin edge events - 'R', 'F' or 'B'.
             Other strings will raise a gpioerror.PinBlockModeInvalidError
             while values of other types will rasie a TypeError.
+
+            event_queue_size, if not 0, is the capacity of an
+            events.EdgeEventQueue, returned by event_queue, in which read
+            records each pin read after an edge event wake up, and each pin
+            whose value changed on a polling read, as an (index of pin in
+            group, new level, time) event.
+
+            reuse_value, if True, makes read return the same list, updated
+            in place, each time rather than a new one, so that high rate
+            event processing allocates no lists. The list must not be
+            modified and its values are only valid until the next read.
+            Value files are also read without allocating strings only if
+            the fastio C extension is built: the pure Python fastio.read_fd
+            returns a new string from each os.read.
             
             On successful return an open pin group object will be open and
             ready to read from. Otherwise it will be closed.
         '''
         if blocking_mode==BlockMode.non_blocking_open_mode():
             raise PinBlockModeInvalidError
-        super(PinListBlockingReader, self).__init__(pin_ids,'r'+blocking_mode)
-        self._cached_value = []
-        self._fd_to_pin_index = {}
-        fds = self.file_descriptors()
-        for i in range(len(fds)):
-            self._cached_value.append(False)
-            self._fd_to_pin_index[fds[i]] = i
+        self._event_queue = None
+        if event_queue_size:
+            self._event_queue = EdgeEventQueue(event_queue_size)
+        super(PinListBlockingReader, self).__init__(pin_ids,'r'+blocking_mode, backend)
+        self._reuse_value = reuse_value
+        self._cached_value = [False]*len(self._pins)
+        self._index_fds()
+
+    def _index_fds(self):
+        '''
+            Internal method precomputing what reads need to find the pins
+            waited on by file descriptor: the list of the pins' file
+            descriptors in group order and the list indexed by file
+            descriptor of the index in the group of the pin using it (None
+            for file descriptors of no pin).
+        '''
+        self._fds = [p.fileno() for p in self._pins]
+        self._fd_to_pin_index = [None]*(max(self._fds)+1)
+        for (pin_index, fd) in enumerate(self._fds):
+            self._fd_to_pin_index[fd] = pin_index
 
     def read(self, timeout=None):
         '''
@@ -490,8 +869,9 @@ class PinListBlockingReader(_PinGroupIOBase, GPIOBlockingReaderBase):
             pin in the group, read sequentially in order of pin ids passed
             to __init__.
 
-            Returns a list of Boolean values whose elements represent the
-            notified read state of all bits in the pin group since the 
+            Returns a list of Boolean values, the same list each time if the
+            group was created with reuse_value True, whose elements represent
+            the notified read state of all bits in the pin group since the
             _last_ polling read (timeout of 0) with the 0th element
             representing the pin specified by the 0th element of pin_ids
             argument passed to __init__ and so on.  This means that reads
@@ -509,18 +889,100 @@ class PinListBlockingReader(_PinGroupIOBase, GPIOBlockingReaderBase):
             raise ValueError
 
         if timeout != 0:
-            changed = select.select( [], [], self._pins, timeout )
+            changed = sysfsio.select( [], [], self._fds, timeout )
             if changed == ([], [], []): # Triple of empty lists=>timed-out
                 return None
+            return self._update(changed[2], True) # only supplied 3rd list
         else: # polling, so have to read from all pins in group
-            changed = ([], [], self._pins)
+            return self._update(self._fds, False)
 
-        for pin in changed[2]: # we only supplied fds in third list, index 2
-            pin._value_file().seek(0)
-            self._cached_value[self._fd_to_pin_index[pin.fileno()]] = pin._value_file().read()[0]=='1'
-        return self._cached_value
+    def _read_notified(self, fds):
+        '''
+            Internal method returning the value read would return after the
+            pins with file descriptors in fds were notified of edge events.
+        '''
+        return self._update([fd for fd in self._fds if fd in fds], True)
+
+    def _update(self, fds, notified):
+        '''
+            Internal method reading the values of the pins with file
+            descriptors fds, a sequence of those of pins of the group,
+            updating and returning the cached group value, or a copy unless
+            reuse_value was True. notified is True if the pins were notified
+            of edge events, False for a polling read.
+        '''
+        event_queue = self._event_queue
+        if event_queue!=None:
+            time = timing.monotonic()
+        value = self._cached_value
+        pins = self._pins
+        fd_to_pin_index = self._fd_to_pin_index
+        for fd in fds:
+            pin_index = fd_to_pin_index[fd]
+            previous_level = value[pin_index]
+            level = _read_pin_line(pins[pin_index])
+            value[pin_index] = level
+            if event_queue!=None and (notified or previous_level!=level):
+                event_queue.append(pin_index, level, time)
+        if self._reuse_value:
+            return value
+        return list(value)
+
+    def event_queue(self):
+        '''
+            Returns the events.EdgeEventQueue recording the changes observed
+            by read, or None if the group was created without an event
+            queue (event_queue_size of 0).
+        '''
+        return self._event_queue
+
+_parsed_open_modes = {}
+
+def parse_open_mode(mode):
+    '''
+        Returns a (DirectionMode, BlockMode, FormatMode) tuple for an
+        open_pingroup mode string, raising the same PinOpenModeInvalidError
+        exceptions as open_pingroup for invalid mode strings.
+
+        Each valid mode string is parsed once: the tuple is remembered and
+        returned by later calls for the same string.
+    '''
+    try:
+        return _parsed_open_modes[mode]
+    except KeyError:
+        parsed = _parse_open_mode(mode)
+        _parsed_open_modes[mode] = parsed
+        return parsed
+    except TypeError: # unhashable, so not remembered
+        return _parse_open_mode(mode)
+
+def _parse_open_mode(mode):
+    '''Internal function parsing a mode string for parse_open_mode'''
+    mode_len = len(mode)
+    direction_mode = DirectionMode(DirectionMode.read_open_mode())
+    edge_mode = BlockMode(BlockMode.non_blocking_open_mode())
+    format_mode = FormatMode(FormatMode.integer_open_mode())
+    if mode_len >= 1:
+        direction_mode = DirectionMode(mode[0])
+        if mode_len == 3:
+            edge_mode = BlockMode(mode[1])
+            format_mode = FormatMode(mode[2])
+        elif mode_len == 2: # 2nd char. could be blocking mode or format mode
+            try:
+                edge_mode = BlockMode(mode[1])
+            except PinBlockModeInvalidError:
+                try:
+                    format_mode = FormatMode(mode[1])
+                except PinGroupFormatModeInvalidError:
+                    raise PinGroupOpenModeInvalidError
+        elif mode_len > 3:
+            raise PinGroupOpenModeInvalidError
+    if direction_mode.is_write():
+        if edge_mode.is_blocking(): # any other blocking mode meaningless for output
+            raise PinBlockModeInvalidError
+    return (direction_mode, edge_mode, format_mode)
 
-def open_pingroup(pin_ids, mode='rNI'):
+def open_pingroup(pin_ids, mode='rNI', event_queue_size=0, backend=None, samples=1):
     '''
         Open a group of GPIO pins managed as a single entity for IO purposes.
 
@@ -566,42 +1028,39 @@ def open_pingroup(pin_ids, mode='rNI'):
         'rB'                : same as 'rBI'
         'w', 'wN', 'wI'     : all the same as 'wNI'
         'wS'                : same as 'wNS'
+
+        event_queue_size is optional and only used for blocking read
+        groups. If not 0 it is the capacity of a queue of edge events
+        recorded by read - see PinWordBlockingReader.__init__.
+
+        backend is optional. If passed it is the backends.GPIOBackend, or
+        the name of the backend, used for the IO of all pins in the group.
+        If not passed the default backend is used or, if there is none, the
+        fastest available backend supporting mode - see
+        backends.select_backend.
+
+        samples is optional and only used for non-blocking integer format
+        read groups. If greater than 1 it is the number of times the group
+        is sampled by each read, which returns the majority value of each
+        pin - see PinWordReader.__init__.
     '''
-    mode_len = len(mode)
-    direction_mode = DirectionMode(DirectionMode.read_open_mode())
-    edge_mode = BlockMode(BlockMode.non_blocking_open_mode())
-    format_mode = FormatMode(FormatMode.integer_open_mode())
-    if mode_len >= 1:
-        direction_mode = DirectionMode(mode[0])
-        if mode_len == 3:
-            edge_mode = BlockMode(mode[1])
-            format_mode = FormatMode(mode[2])
-        elif mode_len == 2: # 2nd char. could be blocking mode or format mode
-            try:
-                edge_mode = BlockMode(mode[1])
-            except PinBlockModeInvalidError:
-                try:
-                    format_mode = FormatMode(mode[1])
-                except PinGroupFormatModeInvalidError:
-                    raise PinGroupOpenModeInvalidError
-        elif mode_len > 3:
-            raise PinGroupOpenModeInvalidError
+    (direction_mode, edge_mode, format_mode) = parse_open_mode(mode)
     if direction_mode.is_write():
-        if edge_mode.is_blocking(): # any other blocking mode meaningless for output
-            raise PinBlockModeInvalidError
         if format_mode.is_integer():
-            return PinWordWriter(pin_ids)
+            return PinWordWriter(pin_ids, backend)
         else:
-            return PinListWriter(pin_ids)
+            return PinListWriter(pin_ids, backend)
     else: # direction mode only read or write...
         assert( direction_mode.is_read() )
         if edge_mode.is_blocking():
             if format_mode.is_integer():
-                return PinWordBlockingReader(pin_ids, edge_mode.open_mode_value())
+                return PinWordBlockingReader( pin_ids, edge_mode.open_mode_value()
+                                            , event_queue_size, backend )
             else:
-                return PinListBlockingReader(pin_ids, edge_mode.open_mode_value())
+                return PinListBlockingReader( pin_ids, edge_mode.open_mode_value()
+                                            , event_queue_size, backend )
         else:
             if format_mode.is_integer():
-                return PinWordReader(pin_ids)
+                return PinWordReader(pin_ids, backend, samples)
             else:
-                return PinListReader(pin_ids)
+                return PinListReader(pin_ids, backend)
@@ -25,7 +25,16 @@
 '''
 from gpioerror import PinIdInvalidError
 from gpioerror import PinIdInvalidRevisionError
-from .. import hwinfo
+
+def _pin_registry():
+    '''
+        Internal function returning the pinregistry.PinRegistry class. The
+        pinregistry module, and the json module it loads its data with, are
+        imported on first use so that importing pinid and pin id operations
+        not needing connector pin assignments do not pay for them.
+    '''
+    from pinregistry import PinRegistry
+    return PinRegistry
 
 class PinIdValidator(object):
     '''
@@ -38,6 +47,10 @@ class PinIdValidator(object):
         When called an instance returns True if the value under validation
         can be converted to an int AND is in the set of valid values passed
         to the constructor.
+
+        Pin id values are small non-negative integers so the set of valid
+        values is held as a table of flags indexed by pin id value, making
+        validation of int values a range check and a single index operation.
     '''
     def __init__(self, valid_ids):
         '''
@@ -46,7 +59,10 @@ class PinIdValidator(object):
             valid_ids is an set of valid pin id integer values to which the
             in operation can be applied.
         '''
-        self.__valid_ids = valid_ids
+        valid_ids = [id for id in valid_ids if id>=0]
+        self.__valid_id_flags = bytearray(max(valid_ids)+1 if valid_ids else 0)
+        for id in valid_ids:
+            self.__valid_id_flags[id] = 1
 
     def __call__(self, pin_id):
         '''
@@ -58,85 +74,37 @@ class PinIdValidator(object):
             of valid values passed to the functor constructor.
             Otherwise returns False.
         '''
-        try:
-            pin_id = int(pin_id) # can we convert id to an int?
-            if (pin_id in self.__valid_ids ):
-                return True
-        except StandardError:
-            pass
-        return False
+        if not isinstance(pin_id, int):
+            try:
+                pin_id = int(pin_id) # can we convert id to an int?
+            except StandardError:
+                return False
+        return 0<=pin_id<len(self.__valid_id_flags) \
+               and self.__valid_id_flags[pin_id]==1
     
 class RPiPinIdSet(object):
     '''
         Provides validation and pin mapping facilities for the set of pin
         ids for GPIO lines connected to the Raspberry Pi P1 connector.
+        The connector pin assignments of each board revision are obtained
+        from the pin registry (see pinregistry.PinRegistry).
     '''
-    __RPI_P1_PIN_TO_IDS = ( # Raspberry Pi revision 1 P1 pins GPIO pins
-                            (None,None,None,   0,None,   1,None,   4
-                            ,  14,None,  15,  17,  18,  21,None,  22
-                            ,  23,None,  24,  10,None,   9,  25,  11
-                            ,   8,None,   7,None,None,None,None,None
-                            ,None,None,None,None,None,None,None,None,None)
-                          , # Raspberry Pi revision 2 P1 pins GPIO pins
-                            (None,None,None,   2,None,   3,None,   4
-                            ,  14,None,  15,  17,  18,  27,None,  22
-                            ,  23,None,  24,  10,None,   9,  25,  11
-                            ,   8,None,   7,None,None,None,None,None
-                            ,None,None,None,None,None,None,None,None,None)
-                          , # Raspberry Pi A+/B+ 2.0 B J8 pins GPIO pins
-                            (None,None,None,   2,None,   3,None,   4
-                            ,  14,None,  15,  17,  18,  27,None,  22
-                            ,  23,None,  24,  10,None,   9,  25,  11
-                            ,   8,None,   7,None,None,   5,None,   6
-                            ,  12,  13,None,  19,  16,  26,  20,None,  21)
-                          , # Raspberry Pi compute module (no GPIO connectors)
-                            (None,None,None,None,None,None,None,None
-                            ,None,None,None,None,None,None,None,None
-                            ,None,None,None,None,None,None,None,None
-                            ,None,None,None,None,None,None,None,None
-                            ,None,None,None,None,None,None,None,None,None)
-                          )
-    __RPI_P5_PIN_TO_IDS = ( # Raspberry Pi revision 1 P5 pins GPIO pins (no P5)
-                            ( None,None,None,None,None,None,None,None,None)
-                          , # Raspberry Pi revision 2 P5 pins GPIO pins
-                            (None,None,None,  28,  29,  30,  31,None,None)
-                          , # Raspberry Pi A+/B+ 2.0 B - P5 pins GPIO pins (no P5)
-                            ( None,None,None,None,None,None,None,None,None)
-                          , # Raspberry Pi compute module (no GPIO connectors)
-                            ( None,None,None,None,None,None,None,None,None)
-                          )
-
-    __RPI_IDS = ( # Raspberry Pi revision 1 P1/J8 and P5 pins
-                  frozenset( ( set(__RPI_P1_PIN_TO_IDS[0])
-                             | set(__RPI_P5_PIN_TO_IDS[0])
-                             ) - frozenset([None]) 
-                           )
-                , # Raspberry Pi revision 2 P1/J8 and P5 pins
-                  frozenset( ( set(__RPI_P1_PIN_TO_IDS[1]) 
-                             | set(__RPI_P5_PIN_TO_IDS[1]) 
-                             ) - frozenset([None]) 
-                           )
-                , # Raspberry Pi A+/B+ 2.0 B P1/J8 and P5 pins
-                  frozenset( ( set(__RPI_P1_PIN_TO_IDS[2]) 
-                             | set(__RPI_P5_PIN_TO_IDS[2]) 
-                             ) - frozenset([None]) 
-                           )
-                , # Raspberry Pi compute module P1/J8 and P5 pins
-                  frozenset( ( set(__RPI_P1_PIN_TO_IDS[3]) 
-                             | set(__RPI_P5_PIN_TO_IDS[3]) 
-                             ) - frozenset([None]) 
-                           )
-                )
+    __validators = {} # validator instances, created on demand, by board
 
     @classmethod
     def validator( cls, rev_idx ):
         '''
-            Returns a PinIdValidator instance for the Raspberry Pi P1/J8 and P5
-            connector GPIO pin id value set.
+            Returns the PinIdValidator instance for the Raspberry Pi P1/J8 and
+            P5 connector GPIO pin id value set.
             rev_idx is the Raspberry Pi board revision index (zero based value
             that is one less than the board GPIO revision value)
        '''
-        return PinIdValidator( RPiPinIdSet.valid_ids(rev_idx) )
+        board = _pin_registry().board(rev_idx)
+        validator = RPiPinIdSet.__validators.get(board)
+        if validator==None:
+            validator = PinIdValidator( board.valid_ids() )
+            RPiPinIdSet.__validators[board] = validator
+        return validator
 
     @classmethod
     def valid_ids( cls, rev_idx ):
@@ -146,7 +114,7 @@ class RPiPinIdSet(object):
             rev_idx is the Raspberry Pi board revision index (zero based value
             that is one less than the major board revision value)
         '''
-        return RPiPinIdSet.__RPI_IDS[rev_idx]
+        return _pin_registry().board(rev_idx).valid_ids()
 
     @classmethod
     def p1_pin_to_gpio_pin_id( cls, p1_pin_number, rev_idx ):
@@ -168,12 +136,9 @@ class RPiPinIdSet(object):
         '''
         try:
             p1_pin_number = int(p1_pin_number)
-            if ( p1_pin_number not in
-                    range(0,len(RPiPinIdSet.__RPI_P1_PIN_TO_IDS[rev_idx])) ):
-                return None
         except StandardError:
             return None
-        return RPiPinIdSet.__RPI_P1_PIN_TO_IDS[rev_idx][p1_pin_number]
+        return _pin_registry().board(rev_idx).gpio_pin_id('P1', p1_pin_number)
 
     @classmethod
     def p5_pin_to_gpio_pin_id( cls, p5_pin_number, rev_idx ):
@@ -195,12 +160,9 @@ class RPiPinIdSet(object):
         '''
         try:
             p5_pin_number = int(p5_pin_number)
-            if ( p5_pin_number not in
-                    range(0,len(RPiPinIdSet.__RPI_P5_PIN_TO_IDS[rev_idx])) ):
-                return None
         except StandardError:
             return None
-        return RPiPinIdSet.__RPI_P5_PIN_TO_IDS[rev_idx][p5_pin_number]
+        return _pin_registry().board(rev_idx).gpio_pin_id('P5', p5_pin_number)
 
     @classmethod
     def p1_pin_to_gpio_pin_id_tuple( cls, rev_idx ):
@@ -212,7 +174,7 @@ class RPiPinIdSet(object):
             rev_idx is the Raspberry Pi board GPIO revision index (zero based
             value that is one less than the major board revision value)
         '''
-        return RPiPinIdSet.__RPI_P1_PIN_TO_IDS[rev_idx]
+        return _pin_registry().board(rev_idx).gpio_pin_ids('P1')
 
     @classmethod
     def p5_pin_to_gpio_pin_id_tuple( cls, rev_idx ):
@@ -224,7 +186,7 @@ class RPiPinIdSet(object):
             rev_idx is the Raspberry Pi board GPIO revision index (zero based
             value that is one less than the major board revision value)
         '''
-        return RPiPinIdSet.__RPI_P5_PIN_TO_IDS[rev_idx]
+        return _pin_registry().board(rev_idx).gpio_pin_ids('P5')
 
 class AllChipPinIdSet(object):
     '''
@@ -235,10 +197,12 @@ class AllChipPinIdSet(object):
     @classmethod
     def validator( cls ):
         '''
-            Returns a PinIdValidator instance for all BCM2835 chip GPIO
+            Returns the PinIdValidator instance for all BCM2835 chip GPIO
             pin id value set.
         '''
-        return PinIdValidator( AllChipPinIdSet.valid_ids() )
+        if AllChipPinIdSet.__validator==None:
+            AllChipPinIdSet.__validator = PinIdValidator( AllChipPinIdSet.valid_ids() )
+        return AllChipPinIdSet.__validator
 
     @classmethod
     def valid_ids( cls ):
@@ -247,6 +211,8 @@ class AllChipPinIdSet(object):
         '''
         return range(0, AllChipPinIdSet.__NUM_IDS)
 
+    __validator = None
+
 class PinId(int):
     '''
         A sub-class of int that only supports a specific (small) subset of
@@ -258,6 +224,11 @@ class PinId(int):
         
         Provides specific support for GPIO pin ids for GPIO lines connected
         to Raspberry Pi P1 connectors.
+
+        PinId values are immutable so the factory class methods return
+        shared instances: each valid pin id value is created only once and
+        the pin ids of each connector pin are looked up by indexing tables
+        built, for the board revision in use, on first use.
     '''
 
     def __new__( cls, pin_id, validator ):
@@ -281,7 +252,19 @@ class PinId(int):
             Pi P1/J8 or P5 connector with the value id - which represents the
             pin id values used by the Linux sys filesystem GPIO support.
         '''
-        return PinId( pin_id, RPiPinIdSet.validator(PinId._get_rpi_gpio_revision_index()) )
+        try:
+            shared_pin_id = PinId._rpi_pin_ids().get(pin_id)
+            if shared_pin_id!=None:
+                return shared_pin_id
+        except TypeError: # unhashable pin_id value
+            pass
+        rev_idx = PinId._get_rpi_gpio_revision_index()
+        if not RPiPinIdSet.validator(rev_idx)(pin_id):
+            raise PinIdInvalidError( 'GPIO pin id %r is not connected to a '
+                                     'connector pin on %s boards'
+                                   % (pin_id, _pin_registry().board(rev_idx).name())
+                                   )
+        return PinId._rpi_pin_ids()[int(pin_id)]
 
     @classmethod
     def any_chip_gpio( cls, pin_id ):
@@ -290,7 +273,9 @@ class PinId(int):
             the BCM2835 chip with the value pin_id - which represents the pin
             id values used by the Linux sys filesystem GPIO support.
         '''
-        return PinId( pin_id, AllChipPinIdSet.validator() )
+        if not AllChipPinIdSet.validator()(pin_id):
+            raise PinIdInvalidError
+        return PinId.__chip_pin_ids()[int(pin_id)]
 
     @classmethod
     def p1_pin( cls, pin ):
@@ -308,10 +293,7 @@ class PinId(int):
             numbers that are not connected to GPIO lines will raise a
             PinIdInvalidError.
         '''
-        pin_id = RPiPinIdSet.p1_pin_to_gpio_pin_id(pin,PinId._get_rpi_gpio_revision_index())
-        if ( pin_id == None ):
-            raise PinIdInvalidError
-        return PinId.gpio(pin_id)
+        return PinId.__connector_pin_id('P1', PinId._p1_pin_ids(), pin)
 
     @classmethod
     def p5_pin( cls, pin ):
@@ -328,10 +310,7 @@ class PinId(int):
             numbers that are not connected to GPIO lines will raise a
             PinIdInvalidError.
         '''
-        pin_id = RPiPinIdSet.p5_pin_to_gpio_pin_id(pin,PinId._get_rpi_gpio_revision_index())
-        if ( pin_id == None ):
-            raise PinIdInvalidError
-        return PinId.gpio(pin_id)
+        return PinId.__connector_pin_id('P5', PinId._p5_pin_ids(), pin)
 
     @classmethod
     def p1_sda( cls ):
@@ -444,11 +423,15 @@ class PinId(int):
           GPIO revision. Note: exposed mainly for testing purposes.
 
           Param   revision  Small positive value representing a Raspberry Pi
-                            board major revision number. As of Jan 2015
-                            values of 1, 2, 3 or 4 are valid
+                            board major revision number. Valid values are
+                            those of the boards in the pin registry - as of
+                            Jan 2015 values of 1, 2, 3 or 4.
       '''
-      if PinIdValidator({1,2,3,4})(revision):
+      if PinIdValidator(_pin_registry().gpio_revisions())(revision):
         PinId.__rpi_revision_index = revision - 1 # 0 based version of revision
+        PinId.__rpi_pin_ids = None # revision specific tables rebuilt on demand
+        PinId.__p1_pin_ids = None
+        PinId.__p5_pin_ids = None
       else:
         raise PinIdInvalidRevisionError()
 
@@ -465,7 +448,89 @@ class PinId(int):
                   As of Jan 2015 returned value may be 0, 1,2 or 3.
       '''
       if PinId.__rpi_revision_index==None:
+        from .. import hwinfo # deferred: only needed if revision not yet known
         PinId._set_rpi_gpio_revision(hwinfo.HwInfo.gpio_revision())
       return PinId.__rpi_revision_index
 
+    @classmethod
+    def _rpi_pin_ids(cls):
+      ''' Return dictionary mapping valid Raspberry Pi connector GPIO pin id
+          int values to their shared PinId instances for the board revision.
+      '''
+      if PinId.__rpi_pin_ids==None:
+        chip_pin_ids = PinId.__chip_pin_ids()
+        PinId.__rpi_pin_ids = dict( (id, chip_pin_ids[id]) for id in
+                                      RPiPinIdSet.valid_ids(PinId._get_rpi_gpio_revision_index())
+                                  )
+      return PinId.__rpi_pin_ids
+
+    @classmethod
+    def _p1_pin_ids(cls):
+      ''' Return tuple, indexed by P1/J8 connector pin number, of the shared
+          PinId instances (or None for non-GPIO pins) for the board revision.
+      '''
+      if PinId.__p1_pin_ids==None:
+        PinId.__p1_pin_ids = PinId.__connector_pin_ids(
+                RPiPinIdSet.p1_pin_to_gpio_pin_id_tuple(PinId._get_rpi_gpio_revision_index()))
+      return PinId.__p1_pin_ids
+
+    @classmethod
+    def _p5_pin_ids(cls):
+      ''' Return tuple, indexed by P5 connector pin number, of the shared
+          PinId instances (or None for non-GPIO pins) for the board revision.
+      '''
+      if PinId.__p5_pin_ids==None:
+        PinId.__p5_pin_ids = PinId.__connector_pin_ids(
+                RPiPinIdSet.p5_pin_to_gpio_pin_id_tuple(PinId._get_rpi_gpio_revision_index()))
+      return PinId.__p5_pin_ids
+
+    @classmethod
+    def __chip_pin_ids(cls):
+      ''' Return the tuple of shared PinId instances indexed by pin id value
+          for all BCM2835 chip GPIO pin ids, creating them on first call.
+      '''
+      if PinId.__all_chip_pin_ids==None:
+        validator = AllChipPinIdSet.validator()
+        PinId.__all_chip_pin_ids = tuple( PinId(id, validator) for id in
+                                            AllChipPinIdSet.valid_ids()
+                                        )
+      return PinId.__all_chip_pin_ids
+
+    @classmethod
+    def __connector_pin_ids(cls, pin_to_gpio_pin_id):
+      ''' Return a tuple mapping connector pin numbers to shared PinId
+          instances from a tuple mapping them to GPIO pin id int values.
+      '''
+      chip_pin_ids = PinId.__chip_pin_ids()
+      return tuple( None if id==None else chip_pin_ids[id]
+                    for id in pin_to_gpio_pin_id
+                  )
+
+    @classmethod
+    def __connector_pin_id(cls, connector, connector_pin_ids, pin):
+      ''' Return the shared PinId instance for connector pin number pin from
+          the tuple connector_pin_ids or raise PinIdInvalidError if pin is
+          not the number of a connector pin connected to a GPIO line. The
+          error message describes the pin of the named connector requested.
+      '''
+      if not isinstance(pin, int):
+        try:
+          pin = int(pin)
+        except StandardError:
+          raise PinIdInvalidError('%s pin %r is not a pin number' % (connector, pin))
+      if 0<=pin<len(connector_pin_ids) and connector_pin_ids[pin]!=None:
+        return connector_pin_ids[pin]
+      board = _pin_registry().board(PinId._get_rpi_gpio_revision_index())
+      if not board.has_connector(connector):
+        raise PinIdInvalidError( '%s boards have no %s connector'
+                               % (board.name(), connector)
+                               )
+      raise PinIdInvalidError( '%s is not a GPIO pin'
+                             % board.describe_connector_pin(connector, pin)
+                             )
+
     __rpi_revision_index = None
+    __all_chip_pin_ids = None
+    __rpi_pin_ids = None
+    __p1_pin_ids = None
+    __p5_pin_ids = None
@@ -0,0 +1,131 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Binary protocol used between the GPIO pin server (see pinserver) and
+    its clients (see pinclient) over a Unix stream socket.
+
+    Each message is a header - an operation code byte, a 16 bit handle and
+    a 32 bit payload length, in network byte order - followed by the
+    payload. Pin and pin group values are sent as 64 bit unsigned integer
+    words, bit 0 being the value of the first pin of a group.
+
+    Client requests:
+      OPEN  : handle 0, payload is a group flag byte, the open mode length
+              byte, the open mode and a byte for each pin id. Reply is
+              OPENED or ERROR.
+      CLOSE : no payload, no reply.
+      READ  : no payload, reply is VALUE or ERROR.
+      WRITE : payload is one or more values written in order. No reply
+              unless the write fails, when an ERROR is sent.
+
+    Server messages:
+      OPENED : reply to OPEN; handle is that of the opened pin or group.
+      VALUE  : reply to READ; payload is the value.
+      EVENT  : sent to every client that has a blocking reader open after
+               an edge event; payload is the value and the server's
+               timing.monotonic time of the event.
+      ERROR  : payload is the failing operation code byte, the exception
+               class name length byte, the class name and the message.
+               Sent with operation EVENT to every client that has a
+               blocking reader open if its edge events could not be read,
+               after which the server has closed the reader.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+import struct
+
+DEFAULT_SOCKET_PATH = '/var/run/dibase-rpi-gpio.sock'
+MAX_PAYLOAD = 4096
+
+HEADER = struct.Struct('!BHI')
+WORD = struct.Struct('!Q')
+EVENT_PAYLOAD = struct.Struct('!Qd')
+
+OPEN = 1
+CLOSE = 2
+READ = 3
+WRITE = 4
+
+OPENED = 65
+VALUE = 66
+EVENT = 67
+ERROR = 68
+
+def socket_path():
+    '''
+        Return the path of the server socket: the value of the
+        DIBASE_RPI_GPIO_SOCKET environment variable if set, otherwise
+        DEFAULT_SOCKET_PATH.
+    '''
+    return os.environ.get('DIBASE_RPI_GPIO_SOCKET', DEFAULT_SOCKET_PATH)
+
+def message(op, handle, payload=''):
+    ''' Return the message bytes for op, handle and payload '''
+    return HEADER.pack(op, handle, len(payload)) + payload
+
+def split_messages(data):
+    '''
+        Split the messages at the start of data, returning a list of
+        complete (op, handle, payload) message tuples and the remaining,
+        incomplete, data. Raises ValueError if a message payload is longer
+        than MAX_PAYLOAD.
+    '''
+    messages = []
+    start = 0
+    while len(data)-start>=HEADER.size:
+        (op, handle, length) = HEADER.unpack_from(data, start)
+        if length>MAX_PAYLOAD:
+            raise ValueError('message payload too long')
+        end = start+HEADER.size+length
+        if end>len(data):
+            break
+        messages.append((op, handle, data[start+HEADER.size:end]))
+        start = end
+    return (messages, data[start:])
+
+def open_payload(group, mode, pin_ids):
+    ''' Return the OPEN payload for a pin or pin group '''
+    return struct.pack('!BB', 1 if group else 0, len(mode)) + mode \
+           + struct.pack('!%dB' % len(pin_ids), *pin_ids)
+
+def parse_open_payload(payload):
+    '''
+        Return a (group, mode, pin_ids) tuple from an OPEN payload. Raises
+        ValueError if payload is malformed.
+    '''
+    try:
+        (group, mode_len) = struct.unpack_from('!BB', payload)
+    except struct.error:
+        raise ValueError('malformed open request')
+    mode = payload[2:2+mode_len]
+    pin_ids = [ord(c) for c in payload[2+mode_len:]]
+    if len(mode)!=mode_len or not pin_ids or (not group and len(pin_ids)!=1):
+        raise ValueError('malformed open request')
+    return (group==1, mode, pin_ids)
+
+def write_payload(values):
+    ''' Return the WRITE payload for a sequence of values '''
+    return struct.pack('!%dQ' % len(values), *values)
+
+def parse_write_payload(payload):
+    '''
+        Return the list of values in a WRITE payload. Raises ValueError if
+        payload is malformed.
+    '''
+    if not payload or len(payload)%WORD.size:
+        raise ValueError('malformed write request')
+    return list(struct.unpack('!%dQ' % (len(payload)/WORD.size), payload))
+
+def error_payload(op, exception):
+    ''' Return the ERROR payload for exception raised performing op '''
+    name = type(exception).__name__
+    return struct.pack('!BB', op, len(name)) + name + str(exception)
+
+def parse_error_payload(payload):
+    ''' Return an (op, class name, message) tuple from an ERROR payload '''
+    (op, name_len) = struct.unpack_from('!BB', payload)
+    return (op, payload[2:2+name_len], payload[2+name_len:])
@@ -0,0 +1,255 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Registry of Raspberry Pi GPIO connector pin assignments.
+
+    For each board GPIO revision (see dibase.rpi.hwinfo.HwInfo.gpio_revision)
+    the registry records the pins of each connector (P1, P5, J8 ...): which
+    GPIO pin id, if any, each connector pin is connected to and the pin's
+    name. It also records the BCM2835 alternate functions of GPIO pins.
+    Lookups in both directions - from connector pin to GPIO pin id and from
+    GPIO pin id to connector pin - are table index operations.
+
+    The assignments are loaded, on first use, from a small JSON data file:
+    by default pinregistry.json in the same directory as this module, or
+    the file named by the DIBASE_RPI_PIN_REGISTRY environment variable.
+    Support for new boards can be added by editing the data file.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import array
+import collections
+import os
+
+ConnectorPin = collections.namedtuple('ConnectorPin', 'connector pin')
+
+class BoardPins(object):
+    '''
+        Connector pin assignments for one board GPIO revision.
+    '''
+    MAX_PIN_IDS = 54 # BCM2835 GPIO pin id values are in the range [0,54)
+
+    def __init__(self, gpio_revision, name, connectors, aliases):
+        '''
+            Create from the board GPIO revision value, descriptive name,
+            a mapping of connector names to lists of pin description strings
+            (in pin number order from pin 1) and a mapping of alternative
+            connector names to the connector names they refer to.
+
+            Pin description strings are either GPIO<id>, optionally followed
+            by :<function name>, for pins connected to GPIO lines or a pin
+            name such as 'GND' for other pins.
+
+            Raises ValueError if a description names an invalid GPIO pin id.
+        '''
+        self.__gpio_revision = gpio_revision
+        self.__name = name
+        self.__aliases = dict(aliases)
+        self.__connector_names = tuple(sorted(connectors))
+        self.__gpio_pin_ids = {}
+        self.__pin_names = {}
+        self.__gpio_connector = array.array('b', [-1])*BoardPins.MAX_PIN_IDS
+        self.__gpio_connector_pin = array.array('b', [-1])*BoardPins.MAX_PIN_IDS
+        self.__gpio_names = [None]*BoardPins.MAX_PIN_IDS
+        for (connector_index, connector) in enumerate(self.__connector_names):
+            gpio_pin_ids = [None] # connector pins are numbered from 1
+            pin_names = [None]
+            for (pin, description) in enumerate(connectors[connector], 1):
+                (gpio_pin_id, pin_name) = BoardPins.__parse_pin(description)
+                gpio_pin_ids.append(gpio_pin_id)
+                pin_names.append(pin_name)
+                if gpio_pin_id!=None and self.__gpio_connector[gpio_pin_id]<0:
+                    self.__gpio_connector[gpio_pin_id] = connector_index
+                    self.__gpio_connector_pin[gpio_pin_id] = pin
+                    self.__gpio_names[gpio_pin_id] = pin_name
+            self.__gpio_pin_ids[connector] = tuple(gpio_pin_ids)
+            self.__pin_names[connector] = tuple(pin_names)
+        self.__gpio_names = tuple(self.__gpio_names)
+        self.__valid_ids = frozenset( id for id in range(BoardPins.MAX_PIN_IDS)
+                                      if self.__gpio_connector[id]>=0
+                                    )
+
+    def gpio_revision(self):
+        ''' Return the board GPIO revision value '''
+        return self.__gpio_revision
+
+    def name(self):
+        ''' Return the descriptive name of the board(s) '''
+        return self.__name
+
+    def connector_names(self):
+        ''' Return a tuple of the board's connector names '''
+        return self.__connector_names
+
+    def has_connector(self, connector):
+        ''' Return True if the board has the named connector (or an alias) '''
+        return self.__aliases.get(connector, connector) in self.__gpio_pin_ids
+
+    def valid_ids(self):
+        ''' Return frozenset of GPIO pin ids connected to connector pins '''
+        return self.__valid_ids
+
+    def gpio_pin_ids(self, connector):
+        '''
+            Return a tuple mapping connector pin numbers, as indexes, to the
+            GPIO pin id of each pin or None for pins not connected to GPIO
+            lines. Element 0 is always None as pins are numbered from 1.
+            connector is a connector name, or alias. If the board does not
+            have such a connector a tuple containing only None is returned.
+        '''
+        return self.__gpio_pin_ids.get( self.__aliases.get(connector, connector)
+                                      , (None,)
+                                      )
+
+    def pin_names(self, connector):
+        '''
+            Return a tuple mapping connector pin numbers, as indexes, to the
+            name of each pin ('GND', 'SDA', 'GPIO_GEN0' ...). Element 0 is
+            always None. If the board does not have the connector a tuple
+            containing only None is returned.
+        '''
+        return self.__pin_names.get( self.__aliases.get(connector, connector)
+                                   , (None,)
+                                   )
+
+    def gpio_pin_id(self, connector, pin):
+        '''
+            Return the GPIO pin id connected to pin number pin of connector
+            or None if there is no such pin or it is not a GPIO pin.
+        '''
+        gpio_pin_ids = self.gpio_pin_ids(connector)
+        if isinstance(pin, int) and 0<=pin<len(gpio_pin_ids):
+            return gpio_pin_ids[pin]
+        return None
+
+    def connector_pin(self, gpio_pin_id):
+        '''
+            Return a ConnectorPin(connector, pin) named tuple for the
+            connector pin connected to GPIO pin gpio_pin_id or None if it is
+            not connected to any connector pin.
+        '''
+        if isinstance(gpio_pin_id, int) and 0<=gpio_pin_id<BoardPins.MAX_PIN_IDS:
+            connector_index = self.__gpio_connector[gpio_pin_id]
+            if connector_index>=0:
+                return ConnectorPin( self.__connector_names[connector_index]
+                                   , self.__gpio_connector_pin[gpio_pin_id]
+                                   )
+        return None
+
+    def function_name(self, gpio_pin_id):
+        '''
+            Return the connector pin name of GPIO pin gpio_pin_id, e.g. 'SDA'
+            or 'GPIO_GEN0', or None if it is not connected to any connector
+            pin.
+        '''
+        if isinstance(gpio_pin_id, int) and 0<=gpio_pin_id<BoardPins.MAX_PIN_IDS:
+            return self.__gpio_names[gpio_pin_id]
+        return None
+
+    def describe_connector_pin(self, connector, pin):
+        '''
+            Return a short string describing a connector pin for use in
+            messages, e.g. 'P1 pin 2 (5V)' or 'P1 pin 3 (GPIO 2 SDA)'.
+        '''
+        pin_names = self.pin_names(connector)
+        if not (isinstance(pin, int) and 0<pin<len(pin_names)):
+            return '%s pin %s (no such pin on this board)' % (connector, pin)
+        gpio_pin_id = self.gpio_pin_id(connector, pin)
+        if gpio_pin_id==None:
+            return '%s pin %d (%s)' % (connector, pin, pin_names[pin])
+        return '%s pin %d (GPIO %d %s)' % (connector, pin, gpio_pin_id, pin_names[pin])
+
+    @classmethod
+    def __parse_pin(cls, description):
+        '''
+            Internal method returning a (gpio pin id, pin name) tuple from a
+            pin description string. gpio pin id is None for non GPIO pins.
+        '''
+        (gpio, separator, name) = description.partition(':')
+        if gpio.startswith('GPIO') and gpio[4:].isdigit():
+            gpio_pin_id = int(gpio[4:])
+            if gpio_pin_id>=BoardPins.MAX_PIN_IDS:
+                raise ValueError('invalid GPIO pin id in %r' % description)
+            return (gpio_pin_id, name or gpio)
+        return (None, description)
+
+class PinRegistry(object):
+    '''
+        Access to the connector pin assignments of all known boards and
+        the GPIO alternate functions, loaded from the registry data file on
+        first use.
+    '''
+    @classmethod
+    def default_path(cls):
+        ''' Return the path of the registry data file to load by default '''
+        return os.environ.get( 'DIBASE_RPI_PIN_REGISTRY'
+                             , os.path.join( os.path.dirname(os.path.abspath(__file__))
+                                           , 'pinregistry.json'
+                                           )
+                             )
+
+    @classmethod
+    def load(cls, path=None):
+        '''
+            (Re)load the registry from the JSON data file at path, or the
+            default path if path is None. Raises IOError if the file cannot
+            be read and ValueError if its content is invalid.
+        '''
+        import json # deferred: only needed when the registry is loaded
+        with open(path or PinRegistry.default_path(), 'r') as data_file:
+            data = json.load(data_file)
+        boards = {}
+        for board in data['boards']:
+            gpio_revision = int(board['gpio_revision'])
+            boards[gpio_revision] = BoardPins( gpio_revision
+                                             , board.get('name','')
+                                             , board.get('connectors',{})
+                                             , board.get('aliases',{})
+                                             )
+        alt_functions = [()]*BoardPins.MAX_PIN_IDS
+        for (gpio_pin_id, functions) in data.get('alt_functions',{}).items():
+            alt_functions[int(gpio_pin_id)] = tuple(f or None for f in functions)
+        PinRegistry.__boards = boards
+        PinRegistry.__alt_functions = tuple(alt_functions)
+
+    @classmethod
+    def gpio_revisions(cls):
+        ''' Return a sorted tuple of the board GPIO revisions registered '''
+        return tuple(sorted(PinRegistry.__registry()))
+
+    @classmethod
+    def board(cls, rev_idx):
+        '''
+            Return the BoardPins instance for a board revision index - a zero
+            based value one less than the board GPIO revision value.
+            Raises IndexError if there is no such board revision registered.
+        '''
+        board = PinRegistry.__registry().get(rev_idx+1)
+        if board==None:
+            raise IndexError('no board GPIO revision %s registered' % (rev_idx+1))
+        return board
+
+    @classmethod
+    def alt_functions(cls, gpio_pin_id):
+        '''
+            Return a tuple of names of the ALT0..ALT5 alternate functions of
+            the GPIO pin gpio_pin_id, with None for reserved or unused
+            functions. An empty tuple is returned if not known.
+        '''
+        PinRegistry.__registry()
+        if isinstance(gpio_pin_id, int) and 0<=gpio_pin_id<len(PinRegistry.__alt_functions):
+            return PinRegistry.__alt_functions[gpio_pin_id]
+        return ()
+
+    @classmethod
+    def __registry(cls):
+        ''' Internal method returning the boards mapping, loading if needed '''
+        if PinRegistry.__boards==None:
+            PinRegistry.load()
+        return PinRegistry.__boards
+
+    __boards = None
+    __alt_functions = ()
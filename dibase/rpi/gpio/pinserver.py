@@ -0,0 +1,432 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    GPIO pin server daemon.
+
+    The sys filesystem GPIO interface allows a pin to be exported, and so
+    used, by only one process at a time. A PinServer owns pins on behalf of
+    several client processes (see pinclient), opening them with open_pin
+    and open_pingroup, and serving requests to read and write them over a
+    Unix stream socket using the binary protocol of pinprotocol.
+
+    Clients opening the same pins in the same mode share one pin or pin
+    group object, which is closed when the last client closes it. Edge
+    events on shared blocking readers are fanned out to every client that
+    has the reader open. If a shared reader's edge events cannot be read it
+    is closed and each client that has it open is sent an ERROR for the
+    EVENT operation; the clients' handles then only accept CLOSE.
+    Consecutive writes received together from a client for the same pin
+    group are applied in a single write_many call.
+
+    A single thread waits, using epoll, on the listening socket, client
+    connections and the sys filesystem value files of blocking readers.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import errno
+import os
+import select
+import socket
+import threading
+
+import pinprotocol
+import timing
+
+MAX_PENDING_EVENT_BYTES = 65536 # events to a slower client are dropped
+
+def _open(group, mode, pin_ids):
+    '''
+        Internal function opening the pin or pin group for an OPEN request.
+        Groups are always opened in integer format.
+    '''
+    if group:
+        import pingroup
+        return pingroup.open_pingroup(pin_ids, mode+'I')
+    else:
+        import pin
+        return pin.open_pin(pin_ids[0], mode)
+
+def _canonical_mode(group, mode):
+    '''
+        Internal function returning the direction and blocking mode
+        characters of a pin or pin group open mode string, raising a
+        PinOpenModeInvalidError if mode is invalid.
+    '''
+    if group:
+        import pingroup
+        (direction_mode, edge_mode, format_mode) = pingroup.parse_open_mode(mode)
+    else:
+        import pin
+        (direction_mode, edge_mode) = pin.parse_open_mode(mode)
+    return direction_mode.open_mode_value()+edge_mode.open_mode_value()
+
+class _SharedIO(object):
+    '''
+        Internal class for a pin or pin group object and the (connection,
+        handle) pairs of the clients sharing it.
+    '''
+    def __init__(self, key, io):
+        self.key = key
+        self.io = io
+        self.handles = []
+
+class _Connection(object):
+    ''' Internal class for the state of a client connection '''
+    def __init__(self, client_socket):
+        self.socket = client_socket
+        self.received = ''
+        self.pending = ''
+        self.handles = {}
+        self.next_handle = 1
+
+class PinServer(object):
+    '''
+        Serves pin and pin group IO requests from clients connected to a
+        Unix stream socket.
+    '''
+    def __init__(self, path=None, open_function=None, socket_mode=0660):
+        '''
+            Create a server listening on the Unix socket at path, or
+            pinprotocol.socket_path() if path is None, with file permissions
+            socket_mode. Requests are not served until serve_forever or
+            start is called.
+
+            open_function(group, mode, pin_ids) opens pins and pin groups
+            and defaults to calling pin.open_pin or pingroup.open_pingroup.
+
+            Raises socket.error if another server is listening at path.
+        '''
+        self.__path = path or pinprotocol.socket_path()
+        self.__open_function = open_function or _open
+        if os.path.exists(self.__path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.__path)
+            except socket.error:
+                os.remove(self.__path) # left by a server that no longer exists
+            else:
+                raise socket.error(errno.EADDRINUSE, 'GPIO pin server already running')
+            finally:
+                probe.close()
+        self.__listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__listener.bind(self.__path)
+        os.chmod(self.__path, socket_mode)
+        self.__listener.listen(16)
+        self.__listener.setblocking(0)
+        self.__poller = select.epoll()
+        self.__poller.register(self.__listener.fileno(), select.EPOLLIN)
+        (self.__wake_fd, self.__wake_write_fd) = os.pipe()
+        self.__poller.register(self.__wake_fd, select.EPOLLIN)
+        self.__connections = {}     # socket fd: _Connection
+        self.__shared = {}          # (group, mode, pin ids): _SharedIO
+        self.__shared_by_fd = {}    # blocking reader fd: _SharedIO
+        self.__events = 0
+        self.__dropped_events = 0
+        self.__closing = False
+        self.__stopped = threading.Event()
+        self.__stopped.set()
+        self.__thread = None
+
+    def path(self):
+        ''' Return the path of the server's Unix socket '''
+        return self.__path
+
+    def stats(self):
+        '''
+            Return a dictionary of server statistics:
+              'connections'    : number of connected clients
+              'open'           : number of open pin and pin group objects
+              'events'         : edge events read from blocking readers
+              'dropped_events' : event messages not sent to clients because
+                                 too many were waiting to be sent
+        '''
+        return { 'connections':len(self.__connections)
+               , 'open':len(self.__shared)
+               , 'events':self.__events
+               , 'dropped_events':self.__dropped_events
+               }
+
+    def start(self):
+        ''' Serve requests in a new daemon thread '''
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.serve_forever)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def serve_forever(self):
+        ''' Serve requests until close is called '''
+        self.__stopped.clear()
+        try:
+            while not self.__closing:
+                try:
+                    events = self.__poller.poll()
+                except IOError:
+                    continue # interrupted system call
+                notified = {}
+                for (fd, event_mask) in events:
+                    if fd==self.__listener.fileno():
+                        self.__accept()
+                    elif fd in self.__connections:
+                        connection = self.__connections[fd]
+                        if event_mask&select.EPOLLOUT:
+                            self.__send(connection)
+                        if event_mask&(select.EPOLLIN|select.EPOLLHUP|select.EPOLLERR):
+                            self.__receive(connection)
+                    elif fd in self.__shared_by_fd:
+                        notified.setdefault(self.__shared_by_fd[fd], []).append(fd)
+                for (shared, fds) in notified.items():
+                    if self.__shared.get(shared.key) is shared:
+                        self.__fan_out(shared, fds)
+        finally:
+            self.__stopped.set()
+
+    def close(self):
+        '''
+            Stop serving, waiting for serve_forever to return if it is
+            running in another thread, close all client connections and
+            pin and pin group objects and remove the socket.
+        '''
+        if self.__closing:
+            return
+        self.__closing = True
+        os.write(self.__wake_write_fd, 'x')
+        self.__stopped.wait()
+        for connection in self.__connections.values():
+            self.__drop(connection)
+        self.__poller.close()
+        self.__listener.close()
+        os.close(self.__wake_fd)
+        os.close(self.__wake_write_fd)
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+
+    def __accept(self):
+        ''' Internal method accepting a client connection '''
+        try:
+            (client_socket, address) = self.__listener.accept()
+        except socket.error:
+            return
+        client_socket.setblocking(0)
+        self.__connections[client_socket.fileno()] = _Connection(client_socket)
+        self.__poller.register(client_socket.fileno(), select.EPOLLIN)
+
+    def __receive(self, connection):
+        ''' Internal method reading and acting on client requests '''
+        try:
+            data = connection.socket.recv(65536)
+        except socket.error, e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return
+            data = ''
+        if not data:
+            self.__drop(connection)
+            return
+        try:
+            (messages, connection.received) = \
+                pinprotocol.split_messages(connection.received+data)
+        except ValueError:
+            self.__drop(connection)
+            return
+        index = 0
+        while index<len(messages):
+            (op, handle, payload) = messages[index]
+            index += 1
+            try:
+                if op==pinprotocol.WRITE:
+                    values = pinprotocol.parse_write_payload(payload)
+                    # batch consecutive writes to the same handle
+                    while index<len(messages) and messages[index][0:2]==(op, handle):
+                        values.extend(pinprotocol.parse_write_payload(messages[index][2]))
+                        index += 1
+                    self.__write(connection, handle, values)
+                elif op==pinprotocol.READ:
+                    self.__read(connection, handle)
+                elif op==pinprotocol.OPEN:
+                    self.__open(connection, payload)
+                elif op==pinprotocol.CLOSE:
+                    self.__close_handle(connection, handle)
+                else:
+                    raise ValueError('unknown operation %d' % op)
+            except Exception, e:
+                self.__queue( connection
+                            , pinprotocol.message( pinprotocol.ERROR, handle
+                                                 , pinprotocol.error_payload(op, e)
+                                                 )
+                            )
+            if connection.socket==None:
+                return # dropped
+
+    def __shared_io(self, connection, handle):
+        ''' Internal method returning the _SharedIO for a client handle '''
+        if handle not in connection.handles:
+            raise ValueError('invalid handle %d' % handle)
+        shared = connection.handles[handle]
+        if shared==None:
+            raise IOError( 'handle %d closed as its edge events could not be read'
+                         % handle )
+        return shared
+
+    def __open(self, connection, payload):
+        ''' Internal method opening a pin or pin group for a client '''
+        (group, mode, pin_ids) = pinprotocol.parse_open_payload(payload)
+        if connection.next_handle>0xFFFF:
+            raise ValueError('too many handles')
+        mode = _canonical_mode(group, mode)
+        key = (group, mode, tuple(pin_ids))
+        shared = self.__shared.get(key)
+        if shared==None:
+            shared = _SharedIO(key, self.__open_function(group, mode, pin_ids))
+            try:
+                if shared.io.blocking():
+                    shared.io.read(0) # clear pending notifications
+                    for fd in shared.io.file_descriptors():
+                        self.__poller.register(fd, select.EPOLLPRI|select.EPOLLERR)
+                        self.__shared_by_fd[fd] = shared
+            except:
+                self.__unwatch(shared)
+                shared.io.close()
+                raise
+            self.__shared[key] = shared
+        handle = connection.next_handle
+        connection.next_handle += 1
+        connection.handles[handle] = shared
+        shared.handles.append((connection, handle))
+        self.__queue(connection, pinprotocol.message(pinprotocol.OPENED, handle))
+
+    def __close_handle(self, connection, handle):
+        '''
+            Internal method closing a client handle, and the pin or pin
+            group object if no other client handles share it.
+        '''
+        if handle in connection.handles and connection.handles[handle]==None:
+            del connection.handles[handle] # reader closed by __fail
+            return
+        shared = self.__shared_io(connection, handle)
+        del connection.handles[handle]
+        shared.handles.remove((connection, handle))
+        if not shared.handles:
+            del self.__shared[shared.key]
+            self.__unwatch(shared)
+            shared.io.close()
+
+    def __unwatch(self, shared):
+        '''
+            Internal method no longer waiting for edge events on the file
+            descriptors of a blocking reader.
+        '''
+        for fd in [fd for (fd, s) in self.__shared_by_fd.items() if s is shared]:
+            self.__poller.unregister(fd)
+            del self.__shared_by_fd[fd]
+
+    def __read(self, connection, handle):
+        ''' Internal method reading a pin or pin group for a client '''
+        io = self.__shared_io(connection, handle).io
+        value = io.read(0) if io.blocking() else io.read()
+        self.__queue( connection
+                    , pinprotocol.message( pinprotocol.VALUE, handle
+                                         , pinprotocol.WORD.pack(int(value))
+                                         )
+                    )
+
+    def __write(self, connection, handle, values):
+        ''' Internal method writing values to a pin or pin group in order '''
+        io = self.__shared_io(connection, handle).io
+        if len(values)>1 and hasattr(io, 'write_many'):
+            io.write_many(values)
+        else:
+            for value in values:
+                io.write(value)
+
+    def __fan_out(self, shared, fds):
+        '''
+            Internal method reading a blocking reader notified of edge events
+            and sending the value to each client sharing it.
+        '''
+        time = timing.monotonic()
+        try:
+            value = shared.io._read_notified(fds)
+        except Exception, e:
+            self.__fail(shared, e)
+            return
+        self.__events += 1
+        payload = pinprotocol.EVENT_PAYLOAD.pack(int(value), time)
+        for (connection, handle) in list(shared.handles):
+            if len(connection.pending)>MAX_PENDING_EVENT_BYTES:
+                self.__dropped_events += 1
+            else:
+                self.__queue( connection
+                            , pinprotocol.message(pinprotocol.EVENT, handle, payload)
+                            )
+
+    def __fail(self, shared, exception):
+        '''
+            Internal method closing a blocking reader whose edge events
+            could not be read, so one failing pin does not stop the server,
+            and sending an ERROR for the EVENT operation with exception to
+            each client sharing it. The clients' handles remain until they
+            close them, but requests other than CLOSE fail.
+        '''
+        (handles, shared.handles) = (shared.handles, [])
+        for (connection, handle) in handles:
+            connection.handles[handle] = None
+        del self.__shared[shared.key]
+        self.__unwatch(shared)
+        try:
+            shared.io.close()
+        except (IOError, OSError):
+            pass
+        payload = pinprotocol.error_payload(pinprotocol.EVENT, exception)
+        for (connection, handle) in handles:
+            self.__queue( connection
+                        , pinprotocol.message(pinprotocol.ERROR, handle, payload)
+                        )
+
+    def __queue(self, connection, data):
+        ''' Internal method sending data to a client as soon as possible '''
+        if connection.socket==None:
+            return
+        was_pending = connection.pending!=''
+        connection.pending += data
+        if not was_pending:
+            self.__send(connection)
+
+    def __send(self, connection):
+        '''
+            Internal method sending as much pending data to a client as it
+            will accept without blocking, waiting for it to become writable
+            if any data remains.
+        '''
+        was_pending = connection.pending!=''
+        try:
+            sent = connection.socket.send(connection.pending)
+        except socket.error, e:
+            if e.errno not in (errno.EAGAIN, errno.EINTR):
+                self.__drop(connection)
+                return
+            sent = 0
+        connection.pending = connection.pending[sent:]
+        if (connection.pending!='')!=was_pending or sent==0:
+            self.__poller.modify( connection.socket.fileno()
+                                , select.EPOLLIN|(select.EPOLLOUT if connection.pending else 0)
+                                )
+
+    def __drop(self, connection):
+        '''
+            Internal method closing a client connection and the client's
+            pin and pin group handles.
+        '''
+        if connection.socket==None:
+            return
+        for handle in connection.handles.keys():
+            try:
+                self.__close_handle(connection, handle)
+            except (IOError, OSError):
+                pass
+        fd = connection.socket.fileno()
+        self.__poller.unregister(fd)
+        del self.__connections[fd]
+        connection.socket.close()
+        connection.socket = None
@@ -0,0 +1,306 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Change detecting polling readers with adaptive poll intervals.
+
+    Where edge events are not available - pins opened with the 'mmap' or
+    'gpiochip' backends, or sys filesystem pins without interrupt support
+    - changes are found by polling. A PollingReader polls an open non
+    blocking pin or pin group reader and presents it as a blocking reader:
+    read waits for a change (a rising, falling or either edge of any pin)
+    and edge event callbacks may be registered, as for PinBlockingReader
+    and PinWordBlockingReader.
+
+    Polling fixed rate either wastes CPU time while nothing changes or
+    misses short lived changes. A PollingReader adapts: after each poll
+    finding no change the interval to the next is multiplied by a back
+    off factor, up to a maximum, and after a change it returns to its
+    minimum. The number of polls and effective sample rate achieved are
+    reported by stats.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import threading
+
+from callbacks import CallbackHandle
+from gpiobase import GPIOBlockingReaderBase
+from gpioerror import PinBlockModeInvalidError
+from events import EdgeEventQueue
+from pin import BlockMode
+import timing
+
+def _as_word(value):
+    '''
+        Internal function returning a reader's value - a Boolean, an integer
+        word or a sequence of Booleans - as an integer word.
+    '''
+    if isinstance(value, (list, tuple)):
+        word = 0
+        for bit_number, level in enumerate(value):
+            if level:
+                word |= 1<<bit_number
+        return word
+    return int(value)
+
+class PollingReader(GPIOBlockingReaderBase):
+    '''
+        GPIOBlockingReaderBase implementation polling an open non-blocking
+        reader - a pin.PinReader or pingroup.PinWordReader or PinListReader
+        - at an adaptive interval.
+    '''
+    def __init__( self, reader, blocking_mode='B', min_interval=0.001
+                , max_interval=0.1, backoff=2.0, event_queue_size=0 ):
+        '''
+            Create for reader, which the PollingReader owns: closing the
+            PollingReader closes it. reader is read once to find its initial
+            value, changes from which are waited for by read.
+
+            blocking_mode is one of the blocking mode characters: 'R' to
+            wait for a rising edge (0 to 1 transition) of any pin, 'F' for a
+            falling edge or 'B' for either. Other strings raise
+            gpioerror.PinBlockModeInvalidError.
+
+            min_interval and max_interval are the least and greatest time in
+            seconds between polls. After a poll finding no change the
+            interval is multiplied by backoff, up to max_interval; after a
+            change it returns to min_interval. Raises ValueError unless
+            0 < min_interval <= max_interval and backoff >= 1.
+
+            event_queue_size, if not 0, is the capacity of an
+            events.EdgeEventQueue, returned by event_queue, in which polls
+            record each pin whose value changed, as an (index of pin in
+            group, new level, time) event.
+        '''
+        if not isinstance(blocking_mode, BlockMode):
+            blocking_mode = BlockMode(blocking_mode)
+        if not blocking_mode.is_blocking():
+            raise PinBlockModeInvalidError
+        if min_interval<=0 or max_interval<min_interval or backoff<1:
+            raise ValueError
+        self.__reader = reader
+        mode = blocking_mode.open_mode_value()
+        self.__rising = mode!=BlockMode.block_on_falling_edge_open_mode()
+        self.__falling = mode!=BlockMode.block_on_rising_edge_open_mode()
+        self.__min_interval = float(min_interval)
+        self.__max_interval = float(max_interval)
+        self.__backoff = float(backoff)
+        self.__interval = self.__min_interval
+        self.__event_queue = None
+        if event_queue_size:
+            self.__event_queue = EdgeEventQueue(event_queue_size)
+        self.__polls = 0
+        self.__changes = 0
+        self.__last_poll_time = None    # of this read or callback thread
+        self.__paced_polls = 0
+        self.__paced_time = 0.0
+        self.__callbacks = []
+        self.__thread = None
+        self.__stop = None      # event set to stop the thread
+        self.__lock = threading.Lock()
+        self.__word = _as_word(reader.read())
+
+    def __del__(self):
+        if hasattr(self, '_PollingReader__word'):
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def close(self):
+        ''' Stop any callback polling thread and close the reader '''
+        self.__stop_thread()
+        self.__reader.close()
+
+    def closed(self):
+        ''' Returns True if the reader is closed '''
+        return self.__reader.closed()
+
+    def file_descriptors(self):
+        ''' Returns an empty list: changes are not notified on any file '''
+        return []
+
+    def reader(self):
+        ''' Returns the polled reader '''
+        return self.__reader
+
+    def interval(self):
+        ''' Returns the current poll interval in seconds '''
+        return self.__interval
+
+    def read(self, timeout=None):
+        '''
+            Polls the reader until it reads a value with a pin changed by an
+            edge of the blocking mode or timeout expires, unless timeout is
+            0.
+
+            Timeout values are floating point values in seconds. If timeout
+            is not given or None then call will not timeout and will return
+            only when a change is seen. A 0 timeout will poll once and
+            return the value read.
+
+            Returns the value read by the reader, None if the call timed
+            out.
+
+            Throws a ValueError if the instance is not open (that is
+            self.closed() returns True).
+        '''
+        if self.closed():
+            raise ValueError
+        self.__last_poll_time = None
+        if timeout==0:
+            return self.__poll()[0]
+        deadline = None if timeout==None else timing.monotonic()+timeout
+        while True:
+            (value, matched, time) = self.__poll()
+            if matched:
+                return value
+            if deadline!=None and time>=deadline:
+                return None
+            next_time = time+self.__interval
+            if deadline!=None:
+                next_time = min(next_time, deadline)
+            timing.sleep_until(next_time)
+
+    def _read_notified(self, fds):
+        ''' Internal method polling the reader once, as read(0) '''
+        return self.read(0)
+
+    def __poll(self):
+        '''
+            Internal method reading the reader and recording and adapting
+            the poll interval to any change. Returns (value, matched, time):
+            the value read, whether it changed by an edge of the blocking
+            mode and the timing.monotonic time of the poll.
+        '''
+        value = self.__reader.read()
+        time = timing.monotonic()
+        word = _as_word(value)
+        previous = self.__word
+        self.__word = word
+        self.__polls += 1
+        if self.__last_poll_time!=None:
+            self.__paced_polls += 1
+            self.__paced_time += time-self.__last_poll_time
+        self.__last_poll_time = time
+        if word==previous:
+            self.__interval = min(self.__interval*self.__backoff, self.__max_interval)
+            return (value, False, time)
+        self.__changes += 1
+        self.__interval = self.__min_interval
+        event_queue = self.__event_queue
+        if event_queue!=None:
+            changed = word^previous
+            while changed:
+                bit = changed & -changed
+                event_queue.append(bit.bit_length()-1, word&bit, time)
+                changed &= ~bit
+        matched = (self.__rising and word&~previous) \
+                  or (self.__falling and previous&~word)
+        return (value, bool(matched), time)
+
+    def stats(self):
+        '''
+            Return a dictionary of polling statistics:
+              'polls'       : number of times the reader has been read
+              'changes'     : polls finding a changed value
+              'interval'    : the current poll interval in seconds
+              'sample_rate' : effective sample rate - polls per second
+                              over the time between successive polls of
+                              each read, or of the callback thread
+        '''
+        rate = 0.0
+        if self.__paced_time>0:
+            rate = self.__paced_polls/self.__paced_time
+        return { 'polls':self.__polls, 'changes':self.__changes
+               , 'interval':self.__interval, 'sample_rate':rate
+               }
+
+    def add_event_callback(self, callback, inline=False, dispatcher=None):
+        '''
+            Arrange for callback(reader, value, time) to be called after
+            each change of the blocking mode's edges, with this object as
+            reader, the value read would have returned and the
+            timing.monotonic time of the poll that saw it.
+
+            Changes are polled for by a thread started for the reader when
+            its first callback is registered, which calls the callbacks
+            directly: inline and dispatcher are accepted for compatibility
+            with other blocking readers and ignored. While a callback is
+            registered read should not be called.
+
+            Returns a callbacks.CallbackHandle to pass to
+            remove_event_callback, recording the callback's statistics.
+        '''
+        handle = CallbackHandle(self, self, callback, True)
+        with self.__lock:
+            self.__callbacks = self.__callbacks+[handle]
+            if self.__thread==None:
+                self.__stop = threading.Event()
+                self.__thread = threading.Thread(target=self.__run, args=(self.__stop,))
+                self.__thread.daemon = True
+                self.__thread.start()
+        return handle
+
+    def remove_event_callback(self, handle):
+        '''
+            Remove a callback registered by add_event_callback, stopping
+            the polling thread when the last is removed.
+        '''
+        with self.__lock:
+            self.__callbacks = [h for h in self.__callbacks if h is not handle]
+            if self.__callbacks:
+                return
+        self.__stop_thread()
+
+    def __stop_thread(self):
+        ''' Internal method stopping the callback polling thread if running '''
+        with self.__lock:
+            (thread, stop) = (self.__thread, self.__stop)
+            self.__thread = None
+        if thread==None:
+            return
+        stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def __run(self, stop):
+        ''' Internal callback polling thread function, running until stop is set '''
+        self.__last_poll_time = None
+        while not stop.is_set():
+            try:
+                (value, matched, time) = self.__poll()
+            except ValueError:
+                return # reader closed
+            if matched:
+                for handle in self.__callbacks:
+                    self.__call(handle, value, time)
+            timing.sleep_until(time+self.__interval)
+
+    def __call(self, handle, value, time):
+        ''' Internal method calling a callback and recording its statistics '''
+        stats = handle.stats
+        start = timing.monotonic()
+        try:
+            handle.callback(self, value, time)
+        except Exception, e:
+            stats.errors += 1
+            stats.last_error = e
+        elapsed = timing.monotonic()-start
+        stats.calls += 1
+        stats.total_time += elapsed
+        if elapsed>stats.max_time:
+            stats.max_time = elapsed
+
+    def event_queue(self):
+        '''
+            Returns the events.EdgeEventQueue recording the changes observed
+            by polls, or None if the reader was created without an event
+            queue (event_queue_size of 0).
+        '''
+        return self.__event_queue
@@ -0,0 +1,362 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Single wire sensor protocol drivers: DHT11/DHT22 (AM2302) humidity and
+    temperature sensors and 1-Wire devices such as the DS18B20 thermometer.
+
+    These protocols signal with pulses a few to a few tens of microseconds
+    long, too short to follow with blocking reads and select. Instead a
+    device's response is captured as a burst of timestamped edges by
+    reading the pin's level in a tight loop (capture_edges) and decoded
+    afterwards from the pulse widths, which are measured rather than
+    sampled at fixed times so are less sensitive to the polling loop's
+    jitter. Capturing is fastest with the 'mmap' backend; running it in a
+    real time section (see the realtime module) avoids preemption.
+
+    Edges are lists of (time, level) pairs: the first is the time capture
+    started and the level then and each following one the time the level
+    was seen to change and the new level. save_edges and load_edges store
+    captures in text files so that decoders can be tested and benchmarked
+    against recorded traces.
+
+    Decoders check the devices' checksums - a byte sum for DHT sensors and
+    the Dallas/Maxim CRC-8 for 1-Wire - and raise PinProtocolError if a
+    response is incomplete or corrupt. The drivers (read_dht, OneWireBus,
+    read_ds18b20), which turn a BidirectionalPin around to signal the
+    device, retry failed exchanges.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import time
+
+from gpioerror import PinProtocolError
+from realtime import section as realtime_section
+import fastio
+import timing
+
+def _level_reader(pin):
+    '''
+        Internal function returning a function of no arguments returning
+        the level of the open pin, by the quickest means available.
+    '''
+    if pin.closed():
+        raise ValueError
+    if pin._raw_fd!=None:
+        fd = pin._raw_fd
+        return lambda: fastio.read_fd(fd)
+    read = pin._backend().read
+    line = pin._value_file()
+    return lambda: read(line)
+
+def capture_edges(pin, duration, max_edges=None, start=None):
+    '''
+        Read the level of pin, an open pin reader or BidirectionalPin, as
+        fast as possible for duration seconds, or until max_edges edges
+        have been seen, and return the edges: a list of (time, level)
+        pairs, the first the capture start time and level. Times are
+        timing.monotonic() times and levels Booleans.
+
+        start is optional. If given it is the time the capture is timed
+        from, in place of the time capture starts.
+    '''
+    read_level = _level_reader(pin)
+    clock = timing.monotonic
+    now = clock()
+    level = read_level()
+    edges = [(now, level)]
+    end = (now if start==None else start) + duration
+    max_items = None if max_edges==None else max_edges+1
+    while now<end:
+        now = clock()
+        current = read_level()
+        if current!=level:
+            level = current
+            edges.append((now, level))
+            if len(edges)==max_items:
+                break
+    return edges
+
+def pulses(edges, level):
+    '''
+        Returns the list of (start time, width) pairs of the complete pulses
+        at level (True for high) in edges - those both starting and ending
+        within the capture.
+    '''
+    result = []
+    for ((start, start_level), (end, end_level)) in zip(edges[1:], edges[2:]):
+        if start_level==level:
+            result.append((start, end-start))
+    return result
+
+def save_edges(path, edges):
+    ''' Write edges to a text file, one 'time level' line per edge '''
+    with open(path, 'w') as edges_file:
+        for (when, level) in edges:
+            edges_file.write('%.9f %d\n' % (when, level))
+
+def load_edges(path):
+    ''' Returns the edges read from a text file written by save_edges '''
+    edges = []
+    with open(path) as edges_file:
+        for line in edges_file:
+            (when, level) = line.split()
+            edges.append((float(when), level=='1'))
+    return edges
+
+def crc8(data):
+    '''
+        Returns the Dallas/Maxim 1-Wire CRC-8 (polynomial x^8+x^5+x^4+1) of
+        data, a sequence of byte values. The CRC of data ending with its
+        own CRC is 0.
+    '''
+    crc = 0
+    for byte in bytearray(data):
+        for bit in range(8):
+            mix = (crc ^ byte) & 1
+            crc >>= 1
+            if mix:
+                crc ^= 0x8c
+            byte >>= 1
+    return crc
+
+DHT11 = 11
+DHT22 = 22
+DHT_BIT_THRESHOLD = 0.000048    # high pulses longer than this are 1 bits
+DHT_RETRY_INTERVAL = 2.0        # minimum time between DHT sensor readings
+
+def decode_dht(edges, model=DHT22, threshold=DHT_BIT_THRESHOLD):
+    '''
+        Decode a DHT sensor response captured as edges, returning the
+        (relative humidity %, temperature Celsius) pair. Each of the 40
+        data bits is a high pulse, 26-28us for 0 or 70us for 1; they are
+        the last 40 complete high pulses captured. model is DHT11 or DHT22
+        (which also covers the AM2302 and DHT21), whose data formats differ.
+
+        Raises PinProtocolError if fewer than 40 bits were captured or the
+        checksum does not match.
+    '''
+    bit_pulses = pulses(edges, True)[-40:]
+    if len(bit_pulses)<40:
+        raise PinProtocolError('%d of 40 DHT bits received' % len(bit_pulses))
+    data = bytearray(5)
+    for (index, (start, width)) in enumerate(bit_pulses):
+        if width>threshold:
+            data[index//8] |= 0x80>>(index%8)
+    if (sum(data[0:4]) & 0xff)!=data[4]:
+        raise PinProtocolError('DHT checksum mismatch')
+    if model==DHT11:
+        return (data[0]+data[1]*0.1, data[2]+(data[3]&0x7f)*0.1)
+    humidity = ((data[0]<<8)|data[1])*0.1
+    temperature = (((data[2]&0x7f)<<8)|data[3])*0.1
+    if data[2]&0x80:
+        temperature = -temperature
+    return (humidity, temperature)
+
+def read_dht( pin, model=DHT22, retries=3, retry_interval=DHT_RETRY_INTERVAL
+            , realtime=None ):
+    '''
+        Read a DHT sensor on pin, an open BidirectionalPin with a pull-up
+        on its line, returning the (relative humidity %, temperature
+        Celsius) pair. The pin is driven low to request a reading, for 1ms
+        (DHT22) or 18ms (DHT11), then made an input and the response
+        captured and decoded by decode_dht.
+
+        Failed readings are retried, up to retries times, after
+        retry_interval seconds, the least time the sensors allow between
+        readings. The last PinProtocolError is raised if all fail.
+
+        realtime is optional. If given the response is captured in a real
+        time section - see realtime.section.
+    '''
+    start_pulse = 0.018 if model==DHT11 else 0.0011
+    for attempt in range(retries+1):
+        if attempt>0:
+            time.sleep(retry_interval)
+        pin.output(0)
+        time.sleep(start_pulse)
+        with realtime_section(realtime):
+            pin.input()
+            edges = capture_edges(pin, 0.006, max_edges=90)
+        try:
+            return decode_dht(edges, model)
+        except PinProtocolError, e:
+            error = e
+    raise error
+
+# 1-Wire standard speed timing, in seconds
+ONEWIRE_RESET = 0.00048             # reset pulse and presence window
+ONEWIRE_SLOT = 0.00007              # time slot including recovery
+ONEWIRE_WRITE_0 = 0.00006           # low time writing a 0
+ONEWIRE_WRITE_1 = 0.000006          # low time writing a 1 or starting a read
+ONEWIRE_BIT_THRESHOLD = 0.000015    # low pulses longer than this are 0 bits
+ONEWIRE_RESET_THRESHOLD = 0.0004    # low pulses longer than this are resets
+ONEWIRE_SAMPLE = 0.00003            # devices sample and hold bits until about here
+
+def decode_onewire(edges):
+    '''
+        Decode a 1-Wire bus capture, returning a list with a pair for each
+        reset: whether a device signalled presence - pulled the bus low
+        within ONEWIRE_RESET of the end of the reset pulse - and a bytearray
+        of the bytes (sent by the master or devices) following the reset.
+        Each later low pulse is a time slot: short (up to
+        ONEWIRE_BIT_THRESHOLD) for 1 bits, long for 0 bits, bytes being
+        sent least significant bit first. Incomplete final bytes are
+        ignored.
+    '''
+    transactions = []
+    presence = None
+    bits = []
+    def end_transaction():
+        if presence!=None:
+            data = bytearray(len(bits)//8)
+            for (index, bit) in enumerate(bits[0:8*len(data)]):
+                data[index//8] |= bit<<(index%8)
+            transactions.append((presence, data))
+    previous_end = None
+    for (start, width) in pulses(edges, False):
+        if width>=ONEWIRE_RESET_THRESHOLD:
+            end_transaction()
+            (presence, bits, previous_end) = (False, [], start+width)
+            continue
+        if presence==False and not bits and start-previous_end<ONEWIRE_RESET:
+            presence = True # in the presence window following the reset
+            continue
+        if presence!=None:
+            bits.append(0 if width>ONEWIRE_BIT_THRESHOLD else 1)
+    end_transaction()
+    return transactions
+
+def decode_ds18b20_scratchpad(data):
+    '''
+        Returns the temperature in Celsius from the 9 bytes of a DS18B20
+        scratchpad. Raises PinProtocolError if there are not 9 bytes or
+        their CRC does not match.
+    '''
+    data = bytearray(data)
+    if len(data)!=9:
+        raise PinProtocolError('%d of 9 scratchpad bytes received' % len(data))
+    if crc8(data)!=0:
+        raise PinProtocolError('1-Wire CRC mismatch')
+    value = data[0]|(data[1]<<8)
+    if value&0x8000:
+        value -= 0x10000
+    return value/16.0
+
+class OneWireBus(object):
+    '''
+        1-Wire bus master on a GPIO pin, an open BidirectionalPin whose line
+        has a pull-up resistor (usually 4.7K). The bus is driven low by
+        making the pin an output of 0 and released by making it an input.
+        Read slots are captured with capture_edges and decoded from the
+        width of the low pulse. Pulses are timed from when driving the bus
+        low has completed, so are never shorter than the protocol's
+        minimums however slow the backend. Timing is kept with
+        fastio.spin_until, so this needs a fast backend, such as 'mmap',
+        and preferably a real time section.
+    '''
+    def __init__(self, pin):
+        ''' Create for pin, which is released (made an input) '''
+        self.__pin = pin
+        pin.input()
+
+    def reset(self):
+        '''
+            Send a reset pulse and return True if a device responded with a
+            presence pulse.
+        '''
+        pin = self.__pin
+        pin.output(0)
+        start = timing.monotonic()
+        fastio.spin_until(start+ONEWIRE_RESET)
+        pin.input()
+        edges = capture_edges(pin, ONEWIRE_RESET)
+        return any(not level for (when, level) in edges)
+
+    def write_bit(self, bit):
+        ''' Write one bit in a time slot '''
+        pin = self.__pin
+        pin.output(0)
+        start = timing.monotonic()
+        fastio.spin_until(start+(ONEWIRE_WRITE_1 if bit else ONEWIRE_WRITE_0))
+        pin.input()
+        fastio.spin_until(start+ONEWIRE_SLOT)
+
+    def read_bit(self):
+        '''
+            Read one bit in a time slot: a device holding the bus low after
+            the master's short low pulse sends a 0. The bus is taken as
+            held if it is still low ONEWIRE_SAMPLE into the slot, later than
+            the 15us the standard allows the master, to tolerate the time
+            taken to release the bus from Python.
+        '''
+        pin = self.__pin
+        pin.output(0)
+        start = timing.monotonic()
+        pin.input()
+        edges = capture_edges(pin, ONEWIRE_SLOT, max_edges=1, start=start)
+        bit = 1 if self.low_width(start, edges)<=ONEWIRE_SAMPLE else 0
+        fastio.spin_until(start+ONEWIRE_SLOT)
+        return bit
+
+    @staticmethod
+    def low_width(start, edges):
+        '''
+            Returns the time from start, when the master drove the bus low,
+            until the bus was first seen high in edges, which is infinite
+            if it was not.
+        '''
+        for (when, level) in edges:
+            if level:
+                return when-start
+        return float('inf')
+
+    def write_bytes(self, data):
+        ''' Write the bytes of data, least significant bit first '''
+        for byte in bytearray(data):
+            for bit_number in range(8):
+                self.write_bit((byte>>bit_number)&1)
+
+    def read_bytes(self, count):
+        ''' Read and return a bytearray of count bytes '''
+        data = bytearray(count)
+        for index in range(count):
+            for bit_number in range(8):
+                data[index] |= self.read_bit()<<bit_number
+        return data
+
+# DS18B20 function and ROM commands
+_SKIP_ROM = 0xcc
+_CONVERT_T = 0x44
+_READ_SCRATCHPAD = 0xbe
+DS18B20_CONVERSION_TIME = 0.75
+
+def read_ds18b20(bus, retries=3, realtime=None):
+    '''
+        Read the temperature in Celsius from the only device, a DS18B20, on
+        bus, a OneWireBus: start a conversion, wait for it and read and
+        check the scratchpad. Failed reads are retried up to retries times;
+        the last PinProtocolError is raised if all fail.
+
+        realtime is optional. If given the bus exchanges are made in a real
+        time section - see realtime.section.
+    '''
+    section = realtime_section(realtime)
+    for attempt in range(retries+1):
+        try:
+            with section:
+                if not bus.reset():
+                    raise PinProtocolError('no 1-Wire presence pulse')
+                bus.write_bytes([_SKIP_ROM, _CONVERT_T])
+            time.sleep(DS18B20_CONVERSION_TIME)
+            with section:
+                if not bus.reset():
+                    raise PinProtocolError('no 1-Wire presence pulse')
+                bus.write_bytes([_SKIP_ROM, _READ_SCRATCHPAD])
+                data = bus.read_bytes(9)
+            return decode_ds18b20_scratchpad(data)
+        except PinProtocolError, e:
+            error = e
+    raise error
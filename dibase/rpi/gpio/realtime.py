@@ -0,0 +1,274 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Real time scheduling support for timing critical GPIO sections.
+
+    A RealTime object, used in a with statement or passed as the realtime
+    argument of pin group write_many and read_many, runs a section of code
+    with the calling thread scheduled with a real time policy (SCHED_FIFO
+    by default) so it is not preempted by ordinary processes, optionally
+    restricted to a set of CPUs - ideally ones isolated from the scheduler
+    by the isolcpus kernel parameter, see isolated_cpus - and with the
+    process's memory locked (mlockall) after prefaulting stack and heap
+    pages so that page faults do not occur in the section. The previous
+    scheduling policy, priority, CPU affinity and memory locking are
+    restored at the end of the section.
+
+    Python 2 has no interfaces to these Linux facilities so the C library
+    functions are called via ctypes, loaded when first used. Changing the
+    scheduling policy and locking memory usually need root privileges (or
+    the CAP_SYS_NICE and CAP_IPC_LOCK capabilities); failures raise
+    OSError.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+import threading
+
+SCHED_OTHER = 0
+SCHED_FIFO = 1
+SCHED_RR = 2
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+DEFAULT_PRIORITY = 50
+DEFAULT_PREFAULT_STACK_DEPTH = 200  # Python calls, each using C stack
+DEFAULT_PREFAULT_HEAP_BYTES = 1<<20
+ISOLATED_CPUS_PATH = '/sys/devices/system/cpu/isolated'
+
+_CPU_SETSIZE = 1024
+
+_libc = None
+_lock = threading.Lock()
+_memory_lock_count = 0  # sections currently holding memory locked
+
+def _c_library():
+    '''
+        Internal function returning the C library, loaded via ctypes with
+        the functions used given their argument and result types.
+    '''
+    global _libc
+    if _libc==None:
+        import ctypes
+        import ctypes.util
+        try:
+            libc = ctypes.CDLL('libc.so.6', use_errno=True)
+        except OSError:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        sched_param_p = ctypes.POINTER(ctypes.c_int) # struct sched_param
+        cpu_set_p = ctypes.POINTER(ctypes.c_ulong)
+        for (name, argtypes) in \
+            ( ('sched_getscheduler', [ctypes.c_int])
+            , ('sched_setscheduler', [ctypes.c_int, ctypes.c_int, sched_param_p])
+            , ('sched_getparam', [ctypes.c_int, sched_param_p])
+            , ('sched_getaffinity', [ctypes.c_int, ctypes.c_size_t, cpu_set_p])
+            , ('sched_setaffinity', [ctypes.c_int, ctypes.c_size_t, cpu_set_p])
+            , ('mlockall', [ctypes.c_int])
+            , ('munlockall', [])
+            ):
+            function = getattr(libc, name)
+            function.argtypes = argtypes
+            function.restype = ctypes.c_int
+        _libc = libc
+    return _libc
+
+def _check(result):
+    '''
+        Internal function raising OSError for the C library errno value if
+        result, returned by a C library function, is -1.
+    '''
+    if result==-1:
+        import ctypes
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return result
+
+def _cpu_set(cpus=()):
+    ''' Internal function returning a C cpu_set_t of the CPU numbers cpus '''
+    import ctypes
+    bits = 8*ctypes.sizeof(ctypes.c_ulong)
+    cpu_set = (ctypes.c_ulong*(_CPU_SETSIZE//bits))()
+    for cpu in cpus:
+        cpu_set[cpu//bits] |= 1<<(cpu%bits)
+    return cpu_set
+
+def parse_cpu_list(text):
+    '''
+        Returns the sorted list of CPU numbers in a Linux CPU list string,
+        such as '1,3-5' (an empty string being no CPUs).
+    '''
+    cpus = set()
+    for item in text.strip().split(','):
+        if not item:
+            continue
+        (first, separator, last) = item.partition('-')
+        cpus.update(range(int(first), int(last or first)+1))
+    return sorted(cpus)
+
+def isolated_cpus(path=ISOLATED_CPUS_PATH):
+    '''
+        Returns the list of CPUs isolated from the scheduler by the isolcpus
+        kernel parameter, read from path, or an empty list if there are none
+        or the file cannot be read.
+    '''
+    try:
+        with open(path) as isolated_file:
+            return parse_cpu_list(isolated_file.read())
+    except IOError:
+        return []
+
+def get_scheduler():
+    ''' Returns the calling thread's (policy, priority) '''
+    import ctypes
+    libc = _c_library()
+    policy = _check(libc.sched_getscheduler(0))
+    priority = ctypes.c_int()
+    _check(libc.sched_getparam(0, ctypes.byref(priority)))
+    return (policy, priority.value)
+
+def set_scheduler(policy, priority):
+    '''
+        Set the calling thread's scheduling policy (e.g. SCHED_FIFO) and
+        priority - 1 to 99 for real time policies, 0 for SCHED_OTHER.
+    '''
+    import ctypes
+    _check(_c_library().sched_setscheduler(0, policy, ctypes.byref(ctypes.c_int(priority))))
+
+def get_affinity():
+    ''' Returns the list of CPUs the calling thread may run on '''
+    import ctypes
+    cpu_set = _cpu_set()
+    _check(_c_library().sched_getaffinity(0, ctypes.sizeof(cpu_set), cpu_set))
+    bits = 8*ctypes.sizeof(ctypes.c_ulong)
+    return [cpu for cpu in range(_CPU_SETSIZE) if (cpu_set[cpu//bits]>>(cpu%bits))&1]
+
+def set_affinity(cpus):
+    ''' Restrict the calling thread to running on the CPUs in cpus '''
+    import ctypes
+    cpu_set = _cpu_set(cpus)
+    _check(_c_library().sched_setaffinity(0, ctypes.sizeof(cpu_set), cpu_set))
+
+def lock_memory():
+    '''
+        Lock the process's current and future memory pages into RAM.
+        Memory stays locked until unlock_memory has been called as many
+        times as lock_memory.
+    '''
+    global _memory_lock_count
+    with _lock:
+        if _memory_lock_count==0:
+            _check(_c_library().mlockall(MCL_CURRENT|MCL_FUTURE))
+        _memory_lock_count += 1
+
+def unlock_memory():
+    ''' Undo a call to lock_memory '''
+    global _memory_lock_count
+    with _lock:
+        _memory_lock_count -= 1
+        if _memory_lock_count==0:
+            _check(_c_library().munlockall())
+
+def prefault(stack_depth=DEFAULT_PREFAULT_STACK_DEPTH, heap_bytes=DEFAULT_PREFAULT_HEAP_BYTES):
+    '''
+        Touch stack and heap pages so they are present before a timing
+        critical section: makes stack_depth nested Python calls, each of
+        which uses C stack, and allocates and frees heap_bytes bytes, which
+        the C library keeps for reuse.
+    '''
+    def nest(depth):
+        if depth>0:
+            nest(depth-1)
+    nest(stack_depth)
+    bytearray(heap_bytes)
+
+class RealTime(object):
+    '''
+        Context manager running a timing critical section of code with the
+        calling thread scheduled in real time. Instances may be reused and
+        nested but are not intended to be shared between threads.
+    '''
+    def __init__( self, priority=DEFAULT_PRIORITY, cpus=None, lock_memory=True
+                , prefault_stack_depth=DEFAULT_PREFAULT_STACK_DEPTH
+                , prefault_heap_bytes=DEFAULT_PREFAULT_HEAP_BYTES
+                , policy=SCHED_FIFO ):
+        '''
+            Define a real time section.
+
+            priority is the scheduling priority, 1 to 99, given to the
+            calling thread with scheduling policy policy (SCHED_FIFO or
+            SCHED_RR). If None the scheduling policy is not changed.
+
+            cpus, if not None, is a sequence of the CPU numbers the thread
+            is restricted to, such as that returned by isolated_cpus.
+
+            lock_memory, if True, locks the process's memory after touching
+            prefault_stack_depth nested calls' stack and prefault_heap_bytes
+            bytes of heap (see prefault).
+        '''
+        self.__priority = priority
+        self.__policy = policy
+        self.__cpus = None if cpus==None else list(cpus)
+        self.__lock_memory = lock_memory
+        self.__prefault = (prefault_stack_depth, prefault_heap_bytes)
+        self.__saved = []   # stack of restore functions for each entry
+
+    def __enter__(self):
+        ''' Calls start and returns self '''
+        self.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        ''' Calls stop '''
+        self.stop()
+
+    def start(self):
+        '''
+            Start the real time section, saving the state to be restored by
+            stop. Raises OSError, leaving the state unchanged, if any change
+            could not be made.
+        '''
+        restores = []
+        try:
+            if self.__cpus!=None:
+                cpus = get_affinity()
+                set_affinity(self.__cpus)
+                restores.append(lambda: set_affinity(cpus))
+            if self.__lock_memory:
+                prefault(*self.__prefault)
+                lock_memory()
+                restores.append(unlock_memory)
+            if self.__priority!=None:
+                (policy, priority) = get_scheduler()
+                set_scheduler(self.__policy, self.__priority)
+                restores.append(lambda: set_scheduler(policy, priority))
+        except:
+            for restore in reversed(restores):
+                restore()
+            raise
+        self.__saved.append(restores)
+
+    def stop(self):
+        ''' End the real time section started by the last call to start '''
+        for restore in reversed(self.__saved.pop()):
+            restore()
+
+class _NoSection(object):
+    ''' Internal context manager for sections that are not real time '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        pass
+
+def section(realtime):
+    '''
+        Returns a context manager for a realtime argument: realtime itself
+        if it is a RealTime, a RealTime with default settings if it is True
+        or one doing nothing if it is None or False.
+    '''
+    if isinstance(realtime, RealTime):
+        return realtime
+    return RealTime() if realtime else _NoSection()
@@ -0,0 +1,327 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Shared memory mirror of GPIO input pin levels.
+
+    A StatePublisher keeps the latest level of GPIO input pins in a small
+    shared memory mapped file (by default in /dev/shm), updating it from
+    the edge events of blocking pin and pin group readers (using an
+    inline callback of a callbacks.EventDispatcher) or explicitly through
+    update. Other processes read pin levels with a SharedStateReader, which
+    reads the mapped file's memory rather than making a system call per
+    pin.
+
+    The state is a 64 bit word of levels, bit n being the level of GPIO
+    pin n, a word of the same form with a bit set for each pin being
+    published and the timing.monotonic time of the last update. The
+    publisher makes a sequence count odd before and even after changing
+    the state. Using the fastio module's C extension readers copy the
+    state with no system call, retrying if the sequence count was odd or
+    changed, with memory barriers so reads are consistent on
+    multi-processor systems whose memory ordering is weaker than the
+    program's, such as ARM. Without the extension, which pure Python
+    cannot do, the publisher changes the state holding an exclusive fcntl
+    record lock on it and readers copy it holding a shared one, at the
+    cost of two system calls per read; the publisher always takes the
+    lock, so readers of either kind may share a file. Readers finding the
+    sequence count odd (for as long as a few retries with the extension)
+    report the publisher stopped mid update, as it does if it dies. There
+    is a single publisher for each file, holding an exclusive flock lock
+    on it.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+from gpiobase import GPIOReaderBase
+import fastio
+import timing
+
+DEFAULT_PATH = '/dev/shm/dibase-rpi-gpio-state'
+
+_MAGIC = 'DRGS0001'
+_SEQUENCE = struct.Struct('<Q')
+_STATE = struct.Struct('<QQd')      # levels, published pins, update time
+_SEQUENCE_OFFSET = len(_MAGIC)
+_STATE_OFFSET = _SEQUENCE_OFFSET+_SEQUENCE.size
+_FILE_SIZE = _STATE_OFFSET+_STATE.size
+_LOCKED_SIZE = _FILE_SIZE-_SEQUENCE_OFFSET  # record lock of sequence & state
+
+# fcntl record locks are per process, not per file descriptor - closing any
+# descriptor of the state file releases them all - so publishers and readers
+# in one process also exclude each other with a thread lock.
+_state_lock = threading.Lock()
+
+def _lock_state(fd, operation):
+    ''' Internal function applying operation to the state's record lock '''
+    fcntl.lockf(fd, operation, _LOCKED_SIZE, _SEQUENCE_OFFSET, os.SEEK_SET)
+
+def state_path():
+    '''
+        Return the path of the shared state file: the value of the
+        DIBASE_RPI_GPIO_STATE environment variable if set, otherwise
+        DEFAULT_PATH.
+    '''
+    return os.environ.get('DIBASE_RPI_GPIO_STATE', DEFAULT_PATH)
+
+def _group_pin_ids(reader):
+    '''
+        Internal function returning the GPIO pin ids of the pins read by a
+        pin or pin group reader, in group order.
+    '''
+    if hasattr(reader, '_pins'):
+        return [int(p._pin_id()) for p in reader._pins]
+    return [int(reader._pin_id())]
+
+def _as_bits(value, count):
+    '''
+        Internal function returning a value read from a reader of count
+        pins - a Boolean, integer word or sequence of Booleans - as an
+        integer word.
+    '''
+    if isinstance(value, (list, tuple)):
+        word = 0
+        for (bit_number, bit) in enumerate(value):
+            if bit:
+                word |= 1<<bit_number
+        return word
+    return int(value) & (2**count-1)
+
+class StatePublisher(object):
+    '''
+        Publishes GPIO pin levels to a shared memory state file.
+    '''
+    def __init__(self, path=None):
+        '''
+            Open (creating if necessary) the state file at path, or
+            state_path() if path is None, clearing any state in it.
+            Raises IOError if another publisher is publishing to the file and
+            ValueError if the file exists but is not a state file.
+        '''
+        self.__path = path or state_path()
+        self.__map = None
+        self.__fd = os.open(self.__path, os.O_RDWR|os.O_CREAT, 0644)
+        try:
+            # flock locks, unlike fcntl record locks, exclude other
+            # publishers in this process and are kept when other
+            # descriptors of the file are closed
+            fcntl.flock(self.__fd, fcntl.LOCK_EX|fcntl.LOCK_NB)
+        except:
+            os.close(self.__fd)
+            raise
+        try:
+            if os.fstat(self.__fd).st_size<_FILE_SIZE:
+                os.ftruncate(self.__fd, _FILE_SIZE)
+            self.__map = mmap.mmap(self.__fd, _FILE_SIZE)
+            magic = self.__map[0:len(_MAGIC)]
+            if magic not in (_MAGIC, '\0'*len(_MAGIC)):
+                self.__map.close()
+                raise ValueError('%s is not a GPIO state file' % self.__path)
+        except:
+            self.__release_file()
+            raise
+        self.__lock = threading.Lock()
+        self.__sequence = _SEQUENCE.unpack_from(self.__map, _SEQUENCE_OFFSET)[0]
+        self.__sequence += self.__sequence&1 # previous publisher may have died mid update
+        self.__levels = 0
+        self.__published = 0
+        self.__handles = {}     # reader: (callback handle, pin mask)
+        self.__store(0, 0, 0)
+        self.__map[0:len(_MAGIC)] = _MAGIC
+
+    def path(self):
+        ''' Return the path of the state file '''
+        return self.__path
+
+    def add_reader(self, reader, pin_ids=None, dispatcher=None):
+        '''
+            Publish the levels of the pins read by reader, an open blocking
+            pin or pin group reader, polling it now and then updating the
+            state after each of its edge events. pin_ids are the GPIO pin
+            ids of the reader's pins in group order and are determined from
+            reader if not given. Events are collected by dispatcher, or
+            callbacks.default_dispatcher() if dispatcher is None.
+        '''
+        if pin_ids==None:
+            pin_ids = _group_pin_ids(reader)
+        pin_ids = [int(pin_id) for pin_id in pin_ids]
+        mask = 0
+        for pin_id in pin_ids:
+            mask |= 1<<pin_id
+        def update(reader, value, time):
+            self.update(pin_ids, _as_bits(value, len(pin_ids)), time)
+        update(reader, reader.read(0), timing.monotonic())
+        handle = reader.add_event_callback(update, inline=True, dispatcher=dispatcher)
+        with self.__lock:
+            self.__handles[reader] = (handle, mask)
+
+    def remove_reader(self, reader):
+        '''
+            Stop publishing the levels of the pins read by reader, which
+            should be done before reader is closed.
+        '''
+        with self.__lock:
+            (handle, mask) = self.__handles.pop(reader)
+        reader.remove_event_callback(handle)
+        with self.__lock:
+            self.__store(self.__levels&~mask, self.__published&~mask, timing.monotonic())
+
+    def update(self, pin_ids, value, time=None):
+        '''
+            Publish the levels of the GPIO pins with ids pin_ids, given by
+            the bits of value as for PinWordReader.read, observed at time
+            (timing.monotonic() if None).
+        '''
+        if time==None:
+            time = timing.monotonic()
+        levels = 0
+        mask = 0
+        for (bit_number, pin_id) in enumerate(pin_ids):
+            mask |= 1<<int(pin_id)
+            if (value>>bit_number)&1:
+                levels |= 1<<int(pin_id)
+        with self.__lock:
+            self.__store((self.__levels&~mask)|levels, self.__published|mask, time)
+
+    def close(self):
+        '''
+            Stop publishing the pins of all readers added and close the
+            state file, marking all pins unpublished.
+        '''
+        if self.__map!=None:
+            for reader in self.__handles.keys():
+                self.remove_reader(reader)
+            with self.__lock:
+                self.__store(0, 0, timing.monotonic())
+            self.__map.close()
+            self.__map = None
+            self.__release_file()
+
+    def __release_file(self):
+        ''' Internal method closing the state file and unlocking it '''
+        with _state_lock:
+            os.close(self.__fd)
+
+    def __store(self, levels, published, time):
+        ''' Internal method updating the state under the state's record lock '''
+        self.__levels = levels
+        self.__published = published
+        with _state_lock:
+            _lock_state(self.__fd, fcntl.LOCK_EX)
+            try:
+                if fastio.seqlock_store!=None:
+                    fastio.seqlock_store( self.__map, _SEQUENCE_OFFSET, self.__sequence
+                                        , levels, published, time )
+                else:
+                    _SEQUENCE.pack_into(self.__map, _SEQUENCE_OFFSET, self.__sequence+1)
+                    _STATE.pack_into(self.__map, _STATE_OFFSET, levels, published, time)
+                    _SEQUENCE.pack_into(self.__map, _SEQUENCE_OFFSET, self.__sequence+2)
+                self.__sequence += 2
+            finally:
+                _lock_state(self.__fd, fcntl.LOCK_UN)
+
+class SharedStateReader(GPIOReaderBase):
+    '''
+        Reads a group of GPIO pins' levels from a shared memory state file
+        written by a StatePublisher, presented as for PinWordReader.
+    '''
+    def __init__(self, pin_ids, path=None):
+        '''
+            Create a reader for pins pin_ids from the state file at path, or
+            state_path() if path is None. read returns values with bit 0
+            the level of the pin with the first id in pin_ids, bit 1 that of
+            the next and so on. Raises IOError if the state file does not
+            exist and ValueError if it is not a state file.
+        '''
+        self.__pin_ids = [int(pin_id) for pin_id in pin_ids]
+        if not self.__pin_ids:
+            raise ValueError('no pin ids')
+        self.__mask = 0
+        for pin_id in self.__pin_ids:
+            self.__mask |= 1<<pin_id
+        first = self.__pin_ids[0]
+        self.__shift = None
+        if self.__pin_ids==range(first, first+len(self.__pin_ids)):
+            self.__shift = first # contiguous ids: extract with one shift
+        self.__map = None
+        self.__fd = None
+        self.__fd = os.open(path or state_path(), os.O_RDONLY)
+        try:
+            self.__map = mmap.mmap(self.__fd, _FILE_SIZE, access=mmap.ACCESS_READ)
+        except:
+            self.close()
+            raise
+        if self.__map[0:len(_MAGIC)]!=_MAGIC:
+            self.close()
+            raise ValueError('not a GPIO state file')
+
+    def close(self):
+        ''' Close the reader '''
+        if self.__map!=None:
+            self.__map.close()
+            self.__map = None
+        if self.__fd!=None:
+            with _state_lock:
+                os.close(self.__fd)
+            self.__fd = None
+
+    def closed(self):
+        ''' Returns True if the reader is closed '''
+        return self.__map==None
+
+    def file_descriptors(self):
+        ''' Returns an empty list: the state file has no edge events '''
+        return []
+
+    def state(self):
+        '''
+            Return a consistent (levels, published, time) snapshot of the
+            state: the levels word and published pins word of all GPIO pins
+            and the timing.monotonic time of the last update. Raises
+            ValueError if the reader is closed or IOError if the publisher
+            stopped part way through an update.
+        '''
+        if self.__map==None:
+            raise ValueError
+        if fastio.seqlock_read!=None:
+            state = fastio.seqlock_read(self.__map, _SEQUENCE_OFFSET)
+            if state==None:
+                raise IOError('GPIO state publisher stopped during an update')
+            return state
+        with _state_lock:
+            _lock_state(self.__fd, fcntl.LOCK_SH)
+            try:
+                sequence = _SEQUENCE.unpack_from(self.__map, _SEQUENCE_OFFSET)[0]
+                state = _STATE.unpack_from(self.__map, _STATE_OFFSET)
+            finally:
+                _lock_state(self.__fd, fcntl.LOCK_UN)
+        if sequence&1:
+            raise IOError('GPIO state publisher stopped during an update')
+        return state
+
+    def published(self):
+        ''' Returns True if the levels of all the reader's pins are published '''
+        return self.state()[1]&self.__mask==self.__mask
+
+    def read(self):
+        '''
+            Returns the pins' levels as an integer with bit 0 the level of
+            the first pin, as for PinWordReader.read. Pins whose levels are
+            not published read as 0. Raises ValueError if the reader is
+            closed.
+        '''
+        levels = self.state()[0]
+        if self.__shift!=None:
+            return (levels>>self.__shift)&(2**len(self.__pin_ids)-1)
+        value = 0
+        for (bit_number, pin_id) in enumerate(self.__pin_ids):
+            if (levels>>pin_id)&1:
+                value |= 1<<bit_number
+        return value
@@ -0,0 +1,24 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Sys filesystem GPIO interface access.
+
+    The pin and pingroup modules access the sys filesystem GPIO interface
+    only through the functions of this module, which may be replaced to
+    redirect GPIO IO - as the iotrace module does to record and replay it:
+      open_file(path, mode)                : open a file, as open
+      path_exists(path)                    : as os.path.exists
+      select(rlist, wlist, xlist, timeout) : as select.select, used to wait
+                                             for pin edge events
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+import select as _select
+
+open_file = open
+path_exists = os.path.exists
+select = _select.select
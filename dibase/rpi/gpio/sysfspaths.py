@@ -4,11 +4,48 @@
     Definitions and support for creating various Linux sys filsystem paths
     for GPIO operations.
 
+    The sys filesystem numbers GPIO lines across all GPIO chips: a SoC GPIO
+    pin's number is its pin id plus the base number of the SoC's GPIO
+    controller, which is 0 on older kernels but may be 512 or, on the
+    Raspberry Pi 5, 571 on kernels allocating GPIO numbers dynamically.
+    Paths are made with, and export and unexport requests should write,
+    the number returned by gpio_number. The SoC GPIO controller's base and
+    line count are looked up once, from dibase.rpi.hwinfo, when first
+    needed.
+
     Developed by R.E. McArdell / Dibase Limited.
     Copyright (c) 2012 Dibase Limited
     License: dual: GPL or BSD.
 '''
 
+_soc_chip_lines = None # (base, ngpio) of SoC GPIO controller once known
+
+def soc_chip_lines():
+    '''
+        Returns (base, ngpio): the sys filesystem GPIO number of the SoC
+        GPIO controller's first line and its number of lines, or (0, None)
+        if the controller cannot be identified.
+    '''
+    global _soc_chip_lines
+    if _soc_chip_lines==None:
+        from .. import hwinfo # deferred: only needed when a pin is exported
+        chip = hwinfo.HwInfo.soc_gpio_chip()
+        _soc_chip_lines = (0, None) if chip==None else (chip.base, chip.ngpio)
+    return _soc_chip_lines
+
+def gpio_number(pin_id):
+    '''
+        Returns the sys filesystem GPIO number of the SoC GPIO pin pin_id,
+        a PinId or integer: pin_id plus the SoC GPIO controller's base.
+        Raises ValueError if pin_id is negative or, if the SoC GPIO
+        controller is known, not less than its number of lines.
+    '''
+    (base, ngpio) = soc_chip_lines()
+    pin = int(pin_id)
+    if pin<0 or (ngpio!=None and pin>=ngpio):
+        raise ValueError('GPIO pin %d is not a line of the SoC GPIO controller' % pin)
+    return base+pin
+
 def gpio_path():
     ''' Return base path for GPIO 'files' and 'directories' '''
     return '/sys/class/gpio'
@@ -52,10 +89,11 @@ def pin_path(pin_id):
         pin_id should be a positive integer value that should have been
         validated as being acceptable as a BCM2835/BCM2807 GPIO pin -
         possibly the subset available on the Raspberry Pi P1 connector.
-        Note that no validation is done by pin_Path.
+        The directory is named with the pin's gpio_number, which raises
+        ValueError for pins that are not lines of the SoC GPIO controller.
     '''
     return ''.join([gpio_path(), '/'\
-                  , pin_dir_base(), str(pin_id)]\
+                  , pin_dir_base(), str(gpio_number(pin_id))]\
                   )
 
 def direction_path(pin_id):
@@ -65,7 +103,7 @@ def direction_path(pin_id):
         pin_id should be a positive integer value that should have been
         validated as being acceptable as a BCM2835/BCM2807 GPIO pin -
         possibly the subset available on the Raspberry Pi P1 connector.
-        Note that no validation is done by direction_Path.
+        pin_id is validated by pin_path.
     '''
     return ''.join([pin_path(pin_id), '/'\
                   , pin_direction_file()]\
@@ -78,7 +116,7 @@ def edgemode_path(pin_id):
         pin_id should be a positive integer value that should have been
         validated as being acceptable as a BCM2835/BCM2807 GPIO pin -
         possibly the subset available on the Raspberry Pi P1 connector.
-        Note that no validation is done by edgemode_Path.
+        pin_id is validated by pin_path.
     '''
     return ''.join([pin_path(pin_id), '/'\
                   , pin_edgemode_file()]\
@@ -91,6 +129,6 @@ def value_path(pin_id):
         pin_id should be a positive integer value that should have been
         validated as being acceptable as a BCM2835/BCM2807 GPIO pin -
         possibly the subset available on the Raspberry Pi P1 connector.
-        Note that no validation is done by value_Path.
+        pin_id is validated by pin_path.
     '''
     return ''.join( [pin_path(pin_id), '/', pin_value_file()] )
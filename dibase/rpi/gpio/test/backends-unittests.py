@@ -0,0 +1,406 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    GPIO backend unit tests.
+
+    Pin and pin group IO is tested through the in memory backend of the
+    test support module. The mmap backend's register handling is tested on an
+    ordinary file standing in for /dev/gpiomem. Bidirectional pins with
+    the sysfs backend are tested with the sysfsio functions replaced to
+    use ordinary files.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import errno
+import sys
+import os
+import struct
+import tempfile
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import backends
+from dibase.rpi.gpio import iotrace
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio import sysfsio
+from dibase.rpi.gpio import sysfspaths
+from dibase.rpi.gpio.gpioerror import PinBackendUnavailableError
+from dibase.rpi.gpio.gpioerror import PinInUseError
+from dibase.rpi.gpio.test import support
+from dibase.rpi.gpio.test.support import gpio
+
+def modes(mode):
+    return pin.parse_open_mode(mode)
+
+class BackendSelectionUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.fake = support.MemoryBackend()
+        backends.register_backend(self.fake)
+
+    def tearDown(self):
+        backends.unregister_backend('memory')
+        backends.set_default_backend(None)
+        os.environ.pop('DIBASE_RPI_GPIO_BACKEND', None)
+
+    def test_backends_ordered_fastest_first(self):
+        self.assertEqual( backends.backend_names()
+                        , ['memory', 'mmap', 'gpiochip', 'sysfs'] )
+
+    def test_fastest_available_supporting_backend_selected(self):
+        self.assertIs(backends.select_backend(*modes('rN')), self.fake)
+        self.assertEqual(backends.select_backend(*modes('rB')).name, 'sysfs')
+        self.fake.is_available = False
+        self.assertIsNot(backends.select_backend(*modes('wN')), self.fake)
+
+    def test_named_backend_selected(self):
+        self.assertEqual(backends.select_backend(*modes('rN'), backend='sysfs').name, 'sysfs')
+        self.assertIs(backends.select_backend(*modes('rN'), backend=self.fake), self.fake)
+
+    def test_unusable_named_backend_rejected(self):
+        with self.assertRaises(PinBackendUnavailableError):
+            backends.select_backend(*modes('rN'), backend='nosuchbackend')
+        with self.assertRaises(PinBackendUnavailableError):
+            backends.select_backend(*modes('rB'), backend='memory')
+        self.fake.is_available = False
+        with self.assertRaises(PinBackendUnavailableError):
+            backends.select_backend(*modes('rN'), backend='memory')
+
+    def test_default_backend(self):
+        self.assertEqual(backends.set_default_backend('sysfs'), None)
+        self.assertEqual(backends.select_backend(*modes('rN')).name, 'sysfs')
+        self.assertEqual(backends.set_default_backend(None), 'sysfs')
+        os.environ['DIBASE_RPI_GPIO_BACKEND'] = 'sysfs'
+        self.assertEqual(backends.select_backend(*modes('rN')).name, 'sysfs')
+
+    def test_tracing_uses_sysfs_backend(self):
+        (fd, path) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with iotrace.TraceRecorder(path):
+                self.assertEqual(backends.default_backend_name(), 'sysfs')
+            self.assertEqual(backends.default_backend_name(), None)
+        finally:
+            os.remove(path)
+
+class BackendIOUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.fake = support.MemoryBackend()
+        backends.register_backend(self.fake)
+
+    def tearDown(self):
+        backends.unregister_backend('memory')
+
+    def test_pin_io(self):
+        with pin.open_pin(gpio(4), 'w', self.fake) as writer:
+            self.assertIs(writer._backend(), self.fake)
+            writer.write(1)
+            self.assertEqual(self.fake.lines[4].level, '1')
+        self.assertTrue(self.fake.lines[4].is_closed)
+        with pin.open_pin(gpio(17), 'r', 'memory') as reader:
+            self.assertFalse(reader.read())
+            self.fake.lines[17].level = '1'
+            self.assertTrue(reader.read())
+
+    def test_group_writes_are_bulk_writes(self):
+        with pingroup.open_pingroup([gpio(4), gpio(17), gpio(18)], 'w', backend='memory') as group:
+            group.write(5)
+            group.write(4)
+            group.write_many([6, 6, 7])
+            self.assertEqual(self.fake.bulk_writes, [(7, 5), (1, 4), (2, 6), (1, 7)])
+            self.assertEqual([self.fake.lines[i].level for i in (4, 17, 18)], ['1', '1', '1'])
+        with pingroup.open_pingroup([gpio(22), gpio(23)], 'wS', backend='memory') as group:
+            group.write([True, False])
+            group.write([True, True])
+            self.assertEqual(self.fake.bulk_writes[-2:], [(3, 1), (2, 3)])
+
+    def test_group_write_many_values_converted_and_checked_before_writing(self):
+        with pingroup.open_pingroup([gpio(4), gpio(17)], 'w', backend='memory') as group:
+            for values in ([1, 2.5, 'x'], [1, 1.5, 4], [1, None]):
+                self.assertRaises((ValueError, TypeError), group.write_many, values)
+            self.assertEqual(self.fake.bulk_writes, [])
+            group.write_many([1.5, '2', 3L])
+            self.assertEqual(self.fake.bulk_writes, [(3, 1), (3, 2), (1, 3)])
+
+    def test_group_reads_are_bulk_reads(self):
+        with pingroup.open_pingroup([gpio(4), gpio(17)], 'rI', backend='memory') as group:
+            self.fake.lines[17].level = '1'
+            self.assertEqual(group.read(), 2)
+            self.assertEqual(list(group.read_many(2)), [2, 2])
+            self.assertEqual(self.fake.bulk_reads, 3)
+        with pingroup.open_pingroup([gpio(4), gpio(17)], 'rS', backend='memory') as group:
+            self.fake.lines[4].level = '1'
+            self.assertEqual(group.read(), [True, False])
+            self.assertEqual(group.read_many(1), [[True, False]])
+
+    def test_sampled_reads_vote(self):
+        class NoisyLine(support.MemoryLine):
+            ''' Line reading the levels of a sequence in turn '''
+            def __init__(self, levels):
+                super(NoisyLine, self).__init__()
+                self.levels = iter(levels)
+            def read(self, size=-1):
+                return self.levels.next()+'\n'
+        with pin.open_pin(gpio(4), 'r', self.fake, samples=3) as reader:
+            self.assertEqual(reader.samples(), 3)
+            reader._PinIOBase__value_file = NoisyLine('010110')
+            self.assertFalse(reader.read())
+            self.assertTrue(reader.read())
+        with pingroup.open_pingroup([gpio(4), gpio(17)], 'rI', backend='memory', samples=3) as group:
+            group._lines[1] = NoisyLine('101000111')
+            self.fake.lines[4].level = '1'
+            self.assertEqual(group.read(), 3)
+            self.assertEqual(list(group.read_many(2)), [1, 3])
+            self.assertEqual(self.fake.bulk_reads, 9)
+        with self.assertRaises(ValueError):
+            pin.PinReader(gpio(4), self.fake, samples=0)
+
+    def test_closed_group_rejects_io(self):
+        group = pingroup.open_pingroup([gpio(4)], 'w', backend='memory')
+        group.close()
+        with self.assertRaises(ValueError):
+            group.write(1)
+
+    def test_direction_changes_unsupported(self):
+        with pin.BidirectionalPin(gpio(4), 'w', self.fake) as bidirectional:
+            bidirectional.write(1)
+            self.assertEqual(self.fake.lines[4].level, '1')
+            with self.assertRaises(PinBackendUnavailableError):
+                bidirectional.input()
+            self.assertEqual(bidirectional.direction(), 'w')
+
+    def test_pins_and_groups_are_slotted(self):
+        with pin.open_pin(gpio(4), 'r', self.fake) as reader:
+            self.assertFalse(hasattr(reader, '__dict__'))
+            with self.assertRaises(AttributeError):
+                reader.extra = 1
+        with pingroup.open_pingroup([gpio(4), gpio(17)], 'w', backend='memory') as group:
+            self.assertFalse(hasattr(group, '__dict__'))
+            self.assertFalse(hasattr(group._pins[0], '__dict__'))
+        unopened = pin.PinReader.__new__(pin.PinReader)
+        self.assertTrue(unopened.closed())
+        self.assertEqual(unopened.samples(), 1)
+        unopened.close()
+
+    def test_open_modes_held_as_flags(self):
+        for mode in ('rN', 'wN'):
+            with pin.open_pin(gpio(4), mode, self.fake) as p:
+                self.assertEqual(p._open_mode(), mode)
+        self.assertEqual( [pin._mode_flags(*modes(mode)) for mode in ('rR', 'rF', 'rB')]
+                        , [ pin._READ_FLAG|pin._RISING_FLAG
+                          , pin._READ_FLAG|pin._FALLING_FLAG
+                          , pin._READ_FLAG|pin._RISING_FLAG|pin._FALLING_FLAG ] )
+        reader = pin.PinBlockingReader.__new__(pin.PinBlockingReader)
+        for mode in ('rR', 'rF', 'rB'):
+            reader._flags = pin._mode_flags(*modes(mode))
+            self.assertEqual(reader._open_mode(), mode)
+        with pin.BidirectionalPin(gpio(4), 'r', self.fake) as bidirectional:
+            self.assertEqual(bidirectional._open_mode(), 'rN')
+            bidirectional._flags ^= pin._DIRECTION_FLAGS  # as if turned around
+            self.assertEqual(bidirectional.direction(), 'w')
+            bidirectional.write(1)
+            self.assertEqual(self.fake.lines[4].level, '1')
+
+class RecordingSysfsFile(object):
+    ''' Sys filesystem control file recording what is written to it '''
+    def __init__(self, writes):
+        self.writes = writes
+
+    def write(self, data):
+        self.writes.append(data)
+
+    def seek(self, offset, whence=0):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        pass
+
+class SysfsBidirectionalUnitTests(unittest.TestCase):
+    def setUp(self):
+        (fd, self.value_path) = tempfile.mkstemp()
+        os.write(fd, '0\n')
+        os.close(fd)
+        self.writes = {}
+        self.opens = {}
+        def open_file(path, mode):
+            self.opens[path] = self.opens.get(path, 0)+1
+            if path.endswith('/value'):
+                return open(self.value_path, mode)
+            return RecordingSysfsFile(self.writes.setdefault(path, []))
+        sysfsio.open_file = open_file
+        sysfsio.path_exists = lambda path: False
+        sysfspaths._soc_chip_lines = (0, None)
+
+    def tearDown(self):
+        sysfsio.open_file = open
+        sysfsio.path_exists = os.path.exists
+        sysfspaths._soc_chip_lines = None
+        os.remove(self.value_path)
+
+    def test_pins_exported_by_sysfs_gpio_number(self):
+        sysfspaths._soc_chip_lines = (512, 54)
+        with pin.PinReader(gpio(4), 'sysfs') as reader:
+            self.assertEqual(self.writes['/sys/class/gpio/export'], ['516'])
+            self.assertEqual(self.opens['/sys/class/gpio/gpio516/value'], 1)
+        sysfsio.path_exists = lambda path: True
+        backends.get_backend('sysfs').unexport(gpio(4))
+        self.assertEqual(self.writes['/sys/class/gpio/unexport'], ['516'])
+
+    def test_direction_changed_through_held_open_file(self):
+        direction_path = '/sys/class/gpio/gpio4/direction'
+        with pin.BidirectionalPin(gpio(4), 'r', 'sysfs') as bidirectional:
+            self.assertEqual(self.writes['/sys/class/gpio/export'], ['4'])
+            self.assertEqual(bidirectional.direction(), 'r')
+            self.assertFalse(bidirectional.read())
+            with self.assertRaises(ValueError):
+                bidirectional.write(1)
+            bidirectional.output(1)
+            self.assertEqual(bidirectional.direction(), 'w')
+            bidirectional.write('0')
+            bidirectional.write(1)
+            self.assertTrue(bidirectional.read())
+            bidirectional.input()
+            bidirectional.output()
+            bidirectional.set_direction('w', 0)
+            self.assertFalse(bidirectional.read())
+            self.assertEqual(self.writes[direction_path], ['in', 'high', 'in', 'out'])
+            self.assertEqual(self.opens[direction_path], 2)
+            self.assertEqual(self.opens['/sys/class/gpio/gpio4/value'], 1)
+        self.assertTrue(bidirectional.closed())
+        with self.assertRaises(ValueError):
+            bidirectional.input()
+
+    def exported_pin_open_line(self, reclaim):
+        ''' Open pin 4's line with reclaim, as if left exported '''
+        def export(pin_id):
+            if not self.writes.get('/sys/class/gpio/unexport'):
+                raise IOError(errno.EBUSY, 'Device or resource busy')
+        sysfs = backends.SysfsBackend()
+        sysfs.export = export
+        sysfsio.path_exists = lambda path: True
+        sysfs.open_line(gpio(4), pin.DirectionMode('r'), pin.BlockMode('N'), reclaim).close()
+
+    def test_exported_pin_not_reclaimed_in_use(self):
+        with self.assertRaises(IOError):
+            self.exported_pin_open_line(False)
+        self.assertNotIn('/sys/class/gpio/unexport', self.writes)
+
+    def test_exported_pin_reclaimed(self):
+        self.exported_pin_open_line(True)
+        self.assertEqual(self.writes['/sys/class/gpio/unexport'], ['4'])
+        self.assertEqual(self.writes['/sys/class/gpio/gpio4/direction'], ['in'])
+
+    def test_exported_pin_adopted(self):
+        self.exported_pin_open_line(backends.ADOPT)
+        self.assertNotIn('/sys/class/gpio/unexport', self.writes)
+        self.assertEqual(self.writes['/sys/class/gpio/gpio4/direction'], ['in'])
+
+class MmapBackendUnitTests(unittest.TestCase):
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp()
+        os.write(fd, '\0'*4096)
+        os.close(fd)
+        self.backend = backends.MmapBackend(self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def register(self, offset):
+        with open(self.path, 'rb') as registers:
+            registers.seek(offset)
+            return struct.unpack('<I', registers.read(4))[0]
+
+    def set_register(self, offset, value):
+        with open(self.path, 'r+b') as registers:
+            registers.seek(offset)
+            registers.write(struct.pack('<I', value))
+
+    def test_blocking_modes_not_supported(self):
+        self.assertFalse(self.backend.supports(*modes('rR')))
+        self.assertTrue(self.backend.supports(*modes('w')))
+
+    def test_open_line_sets_direction(self):
+        self.set_register(0x04, 0x3f<<9) # GPFSEL1: pins 13 & 14 'alt' functions
+        writer = self.backend.open_line(14, *modes('w'))
+        reader = self.backend.open_line(13, *modes('r'))
+        self.assertEqual(self.register(0x04), 1<<12)
+        self.backend.close_line(14, writer)
+        self.backend.close_line(13, reader)
+
+    def test_set_line_direction(self):
+        line = self.backend.open_bidirectional_line(14, *modes('r'))
+        try:
+            self.backend.set_line_direction(14, line, modes('w')[0], 1)
+            self.assertEqual(self.register(0x1c), 1<<14)            # GPSET0
+            self.assertEqual(self.register(0x04), 1<<12)            # GPFSEL1
+            self.backend.set_line_direction(14, line, modes('r')[0])
+            self.assertEqual(self.register(0x04), 0)
+        finally:
+            self.backend.close_line(14, line)
+
+    def test_single_and_bulk_io(self):
+        self.set_register(0x34, 1<<4)   # GPLEV0
+        self.set_register(0x38, 1<<8)   # GPLEV1: pin 40
+        lines = [self.backend.open_line(pin_id, *modes('r')) for pin_id in (4, 17, 40)]
+        try:
+            self.assertTrue(self.backend.read(lines[0]))
+            lines[1].seek(0)
+            self.assertEqual(lines[1].read(), '0\n')
+            self.assertEqual(self.backend.read_lines(lines), 5)
+            self.assertEqual(self.backend.vote_lines(lines, 3), 5)
+            self.assertIs(self.backend.vote(lines[2], 3), True)
+            self.backend.write_lines(lines, 7, 4)
+            self.assertEqual(self.register(0x20), 1<<8)             # GPSET1
+            self.assertEqual(self.register(0x28), (1<<4)|(1<<17))   # GPCLR0
+            lines[1].write('1')
+            self.assertEqual(self.register(0x1c), 1<<17)            # GPSET0
+        finally:
+            for (pin_id, line) in zip((4, 17, 40), lines):
+                self.backend.close_line(pin_id, line)
+
+    def test_pins_claimed_while_open(self):
+        line = self.backend.open_line(14, *modes('w'))
+        self.assertEqual(line.fileno(), None)
+        with self.assertRaises(PinInUseError):
+            self.backend.open_line(14, *modes('r'))
+        self.assertEqual(self.register(0x04), 1<<12)    # still an output
+        self.backend.close_line(14, line)
+        line = self.backend.open_line(14, *modes('r'))
+        self.backend.close_line(14, line)
+
+    def test_pins_opened_once(self):
+        self.backend._MmapBackend__available = True    # not a Raspberry Pi
+        with pin.open_pin(gpio(14), 'w', self.backend) as writer:
+            self.assertEqual(writer.file_descriptors(), [])
+            self.assertEqual(writer.fileno(), None)
+            for mode in ('w', 'r'):
+                with self.assertRaises(PinInUseError):
+                    pin.open_pin(gpio(14), mode, self.backend)
+            with pingroup.open_pingroup([gpio(4), gpio(17)], 'r', backend=self.backend) as group:
+                self.assertEqual(group.file_descriptors(), [])
+        pin.open_pin(gpio(14), 'r', self.backend).close()
+
+class GPIOChipBackendUnitTests(unittest.TestCase):
+    def test_unavailable_without_device(self):
+        backend = backends.GPIOChipBackend('/nonexistent/gpiochip*')
+        self.assertFalse(backend.available())
+        self.assertEqual(backend.device_path(), None)
+
+    def test_line_handle_request_size(self):
+        self.assertEqual(backends._HANDLE_REQUEST.size, 364)
+
+    def test_line_handle_config_size(self):
+        self.assertEqual(backends._HANDLE_CONFIG.size, 84)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Pin direction turnaround benchmarks.
+
+    Times turning a pin around from output to input and back by closing
+    and reopening it as a PinWriter or PinReader against changing the
+    direction of an open BidirectionalPin. Needs GPIO access, so run on a
+    Raspberry Pi with permission to use the pins. Pass the GPIO pin number
+    (default 4) and optionally a backend name as arguments. The pin is
+    driven as an output, so must not be connected to anything that also
+    drives it.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import sys
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pinid
+from dibase.rpi.gpio import timing
+from dibase.rpi.gpio.gpioerror import GPIOError
+
+NUMBER = 200
+REPEAT = 3
+
+def reopen_turnarounds(pin_id, backend):
+    ''' Turn the pin around NUMBER times by closing and reopening it '''
+    for i in xrange(NUMBER):
+        with pin.PinWriter(pin_id, backend) as writer:
+            writer.write(1)
+        with pin.PinReader(pin_id, backend) as reader:
+            reader.read()
+
+def bidirectional_turnarounds(pin_id, backend):
+    ''' Turn the pin around NUMBER times by changing its direction '''
+    with pin.BidirectionalPin(pin_id, 'r', backend) as bidirectional:
+        for i in xrange(NUMBER):
+            bidirectional.output(1)
+            bidirectional.input()
+            bidirectional.read()
+
+def best_time(function, *args):
+    ''' Returns the best of REPEAT runs of function(*args) in seconds '''
+    times = []
+    for run in xrange(REPEAT):
+        start = timing.monotonic()
+        function(*args)
+        times.append(timing.monotonic()-start)
+    return min(times)
+
+if __name__ == '__main__':
+    try:
+        pin_id = pinid.PinId.gpio(int(sys.argv[1]) if len(sys.argv)>1 else 4)
+    except GPIOError, e:
+        sys.exit('Cannot benchmark without GPIO pins: %s' % e)
+    backend = sys.argv[2] if len(sys.argv)>2 else None
+    print 'Best of', REPEAT, 'runs of', NUMBER, 'output-input turnarounds:'
+    for (name, function) in ( ('close and reopen', reopen_turnarounds)
+                            , ('BidirectionalPin', bidirectional_turnarounds) ):
+        try:
+            best = best_time(function, pin_id, backend)
+        except (GPIOError, IOError, OSError), e:
+            print '%-34s failed: %s' % (name, e)
+            continue
+        print '%-34s %8.3f us/turnaround %10.0f turnarounds/s' \
+              % (name, best/NUMBER*1e6, NUMBER/best)
@@ -0,0 +1,192 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Edge event callback dispatcher unit tests.
+
+    GPIO edge events are signalled to epoll as priority conditions. So
+    that no GPIO hardware is needed the readers used in these tests signal
+    edge events by sending TCP out of band data over a loop back connection,
+    which is also signalled as a priority condition.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import socket
+import threading
+import time
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import callbacks
+from dibase.rpi.gpio.gpiobase import GPIOBlockingReaderBase
+
+class OutOfBandReader(GPIOBlockingReaderBase):
+    '''
+        Blocking reader whose 'edge events' are bytes of out of band data,
+        the value read being the last such byte received.
+    '''
+    def __init__(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        self.sender = socket.create_connection(listener.getsockname())
+        (self.receiver, address) = listener.accept()
+        listener.close()
+        self.value = None
+
+    def close(self):
+        self.sender.close()
+        self.receiver.close()
+        self.receiver = None
+
+    def closed(self):
+        return self.receiver==None
+
+    def file_descriptors(self):
+        return [self.receiver.fileno()]
+
+    def read(self, timeout=None):
+        try:
+            self.value = self.receiver.recv(1, socket.MSG_OOB)
+        except socket.error:
+            pass # no out of band data
+        return self.value
+
+    def _read_notified(self, fds):
+        return self.read(0)
+
+    def edge(self, value):
+        self.sender.send(value, socket.MSG_OOB)
+
+class FailingReader(OutOfBandReader):
+    ''' OutOfBandReader whose first failures reads after an edge raise IOError '''
+    def __init__(self, failures):
+        super(FailingReader, self).__init__()
+        self.failures = failures
+
+    def _read_notified(self, fds):
+        if self.failures>0:
+            self.failures -= 1
+            raise IOError('read failed')
+        return super(FailingReader, self)._read_notified(fds)
+
+def wait_for(predicate, timeout=5.0):
+    ''' Wait until predicate() is True or timeout seconds have passed '''
+    deadline = time.time()+timeout
+    while not predicate() and time.time()<deadline:
+        time.sleep(0.001)
+    return predicate()
+
+class EventDispatcherUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.reader = OutOfBandReader()
+        self.calls = []
+
+    def tearDown(self):
+        self.reader.close()
+
+    def record(self, reader, value, time):
+        self.calls.append((reader, value, threading.current_thread()))
+
+    def test_inline_callback_called_by_poller_thread(self):
+        dispatcher = callbacks.EventDispatcher(workers=0)
+        try:
+            handle = self.reader.add_event_callback(self.record, inline=True, dispatcher=dispatcher)
+            self.reader.edge('1')
+            self.assertTrue(wait_for(lambda: len(self.calls)==1))
+            self.assertIs(self.calls[0][0], self.reader)
+            self.assertEqual(self.calls[0][1], '1')
+            self.assertIsNot(self.calls[0][2], threading.current_thread())
+            self.assertEqual(handle.stats.calls, 1)
+        finally:
+            dispatcher.close()
+
+    def test_worker_callback_and_removal(self):
+        dispatcher = callbacks.EventDispatcher(workers=1)
+        try:
+            handle = self.reader.add_event_callback(self.record, dispatcher=dispatcher)
+            self.reader.edge('1')
+            self.assertTrue(wait_for(lambda: len(self.calls)==1))
+            stats = dispatcher.stats()['callbacks']
+            self.assertEqual(len(stats), 1)
+            self.assertIs(stats[0][0], handle)
+            self.assertEqual(stats[0][1]['calls'], 1)
+            self.reader.remove_event_callback(handle)
+            self.assertEqual(dispatcher.stats()['callbacks'], [])
+            self.reader.edge('0')
+            time.sleep(0.05)
+            self.assertEqual(len(self.calls), 1)
+        finally:
+            dispatcher.close()
+
+    def test_callback_errors_counted(self):
+        def fail(reader, value, time):
+            raise RuntimeError('callback failed')
+        dispatcher = callbacks.EventDispatcher(workers=0)
+        try:
+            handle = self.reader.add_event_callback(fail, inline=True, dispatcher=dispatcher)
+            self.reader.edge('1')
+            self.assertTrue(wait_for(lambda: handle.stats.calls==1))
+            self.assertEqual(handle.stats.errors, 1)
+            self.assertIsInstance(handle.stats.last_error, RuntimeError)
+        finally:
+            dispatcher.close()
+
+    def test_read_errors_counted_and_polling_continues(self):
+        failing = FailingReader(1)
+        dispatcher = callbacks.EventDispatcher(workers=0)
+        try:
+            handle = failing.add_event_callback(self.record, inline=True, dispatcher=dispatcher)
+            self.reader.add_event_callback(self.record, inline=True, dispatcher=dispatcher)
+            failing.edge('1')
+            self.assertTrue(wait_for(lambda: handle.stats.calls==1))
+            self.assertEqual(handle.stats.errors, 1)
+            self.assertIsInstance(handle.stats.last_error, IOError)
+            self.assertEqual(self.calls[0][0:2], (failing, '1'))
+            self.reader.edge('2')
+            self.assertTrue(wait_for(lambda: len(self.calls)==2))
+            self.assertEqual(self.calls[1][0:2], (self.reader, '2'))
+        finally:
+            dispatcher.close()
+            failing.close()
+
+    def test_full_queue_drops_calls_if_not_blocking(self):
+        release = threading.Event()
+        def slow(reader, value, time):
+            release.wait()
+        dispatcher = callbacks.EventDispatcher(workers=1, queue_size=1, block_when_full=False)
+        try:
+            handle = self.reader.add_event_callback(slow, dispatcher=dispatcher)
+            for value in '0123':
+                self.reader.edge(value)
+                time.sleep(0.02)
+            self.assertTrue(wait_for(lambda: handle.stats.dropped>0))
+            release.set()
+        finally:
+            release.set()
+            dispatcher.close()
+
+    def test_worker_callback_needs_workers(self):
+        dispatcher = callbacks.EventDispatcher(workers=0)
+        try:
+            with self.assertRaises(ValueError):
+                dispatcher.add_event_callback(self.reader, self.record)
+        finally:
+            dispatcher.close()
+
+    def test_closed_reader_rejected(self):
+        dispatcher = callbacks.EventDispatcher(workers=0)
+        try:
+            self.reader.close()
+            with self.assertRaises(ValueError):
+                dispatcher.add_event_callback(self.reader, self.record, True)
+        finally:
+            dispatcher.close()
+            self.reader = OutOfBandReader()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Edge event queue unit tests.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import tempfile
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import events
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio import pinid
+
+class EdgeEventQueueUnitTests(unittest.TestCase):
+    def test_capacity_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            events.EdgeEventQueue(0)
+
+    def test_new_queue_is_empty(self):
+        queue = events.EdgeEventQueue(4)
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.capacity(), 4)
+        self.assertEqual(queue.overflows(), 0)
+        self.assertEqual(queue.drain(), [])
+
+    def test_drain_returns_events_oldest_first(self):
+        queue = events.EdgeEventQueue(4)
+        queue.append(0, True, 1.0)
+        queue.append(3, 0, 2.0)
+        self.assertEqual(len(queue), 2)
+        self.assertEqual( queue.drain()
+                        , [ events.EdgeEvent(0, True, 1.0)
+                          , events.EdgeEvent(3, False, 2.0)
+                          ]
+                        )
+        self.assertEqual(len(queue), 0)
+
+    def test_drain_max_events(self):
+        queue = events.EdgeEventQueue(4)
+        for i in range(3):
+            queue.append(i, 1, float(i))
+        self.assertEqual([e.pin_index for e in queue.drain(2)], [0,1])
+        self.assertEqual([e.pin_index for e in queue.drain(2)], [2])
+
+    def test_full_queue_discards_oldest_and_counts_overflows(self):
+        queue = events.EdgeEventQueue(3)
+        for i in range(5):
+            queue.append(i, 1, float(i))
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(queue.overflows(), 2)
+        self.assertEqual([e.pin_index for e in queue.drain()], [2,3,4])
+
+    def test_wraps_around(self):
+        queue = events.EdgeEventQueue(2)
+        for i in range(7):
+            queue.append(i, 1, float(i))
+            self.assertEqual([e.pin_index for e in queue.drain()], [i])
+        self.assertEqual(queue.overflows(), 0)
+
+class BlockingReaderEventQueueUnitTests(unittest.TestCase):
+    '''
+        Blocking group readers are created without opening GPIO pins, using
+        temporary files as pin value files. Only polling reads (timeout 0)
+        are used as these do not wait for edge events.
+    '''
+    def setUp(self):
+        self.value_files = [tempfile.TemporaryFile() for i in range(2)]
+        self.pins = []
+        for (pin_id, value_file) in zip((4,17), self.value_files):
+            p = pin.PinBlockingReader.__new__(pin.PinBlockingReader)
+            p._PinIOBase__value_file = value_file
+            p._PinIOBase__pin_id = pinid.PinId.any_chip_gpio(pin_id)
+            self.pins.append(p)
+
+    def tearDown(self):
+        for p in self.pins:
+            p._PinIOBase__value_file = None # closed without unexporting
+            p._PinIOBase__pin_id = None
+        for value_file in self.value_files:
+            value_file.close()
+
+    def set_values(self, *values):
+        for (value, value_file) in zip(values, self.value_files):
+            value_file.seek(0)
+            value_file.write('1\n' if value else '0\n')
+            value_file.flush()
+
+    def make_group(self, group_class, event_queue_size, reuse_value=False):
+        group = group_class.__new__(group_class)
+        group._event_queue = None
+        if event_queue_size:
+            group._event_queue = events.EdgeEventQueue(event_queue_size)
+        group._pins = self.pins
+        if group_class==pingroup.PinWordBlockingReader:
+            group._fd_to_pin_index = dict((p.fileno(), i) for (i, p) in enumerate(self.pins))
+            group._cached_value = 0
+            group._fd_to_bit_value = dict((p.fileno(), 2**i) for (i, p) in enumerate(self.pins))
+        else:
+            group._cached_value = [False, False]
+            group._reuse_value = reuse_value
+            group._index_fds()
+        return group
+
+    def test_word_reader_polling_read_records_changes(self):
+        group = self.make_group(pingroup.PinWordBlockingReader, 8)
+        self.set_values(1, 0)
+        self.assertEqual(group.read(0), 1)
+        self.set_values(1, 1)
+        self.assertEqual(group.read(0), 3)
+        self.assertEqual( [(e.pin_index, e.level) for e in group.event_queue().drain()]
+                        , [(0, True), (1, True)]
+                        )
+
+    def test_list_reader_polling_read_records_changes(self):
+        group = self.make_group(pingroup.PinListBlockingReader, 1)
+        self.set_values(0, 1)
+        self.assertEqual(group.read(0), [False, True])
+        self.set_values(1, 0)
+        group.read(0)
+        self.assertEqual(group.event_queue().overflows(), 2)
+        self.assertEqual( [(e.pin_index, e.level) for e in group.event_queue().drain()]
+                        , [(1, False)]
+                        )
+
+    def test_list_reader_returns_new_or_reused_list(self):
+        copying = self.make_group(pingroup.PinListBlockingReader, 0)
+        reusing = self.make_group(pingroup.PinListBlockingReader, 0, reuse_value=True)
+        self.set_values(1, 0)
+        first = copying.read(0)
+        first[0] = False
+        self.assertEqual(copying.read(0), [True, False])
+        self.assertIsNot(copying.read(0), copying.read(0))
+        value = reusing.read(0)
+        self.assertEqual(value, [True, False])
+        self.set_values(0, 1)
+        self.assertIs(reusing.read(0), value)
+        self.assertEqual(value, [False, True])
+
+    def test_list_reader_notified_pins_read_by_fd(self):
+        group = self.make_group(pingroup.PinListBlockingReader, 4)
+        fds = [p.fileno() for p in self.pins]
+        self.assertEqual(group._fd_to_pin_index[fds[1]], 1)
+        self.set_values(1, 1)
+        self.assertEqual(group._read_notified([fds[1]]), [False, True])
+        self.assertEqual(group._read_notified(fds[::-1]), [True, True])
+        self.assertEqual( [(e.pin_index, e.level) for e in group.event_queue().drain()]
+                        , [(1, True), (0, True), (1, True)] )
+
+    def test_no_event_queue_by_default(self):
+        group = self.make_group(pingroup.PinWordBlockingReader, 0)
+        self.set_values(1, 1)
+        self.assertEqual(group.read(0), 3)
+        self.assertIsNone(group.event_queue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Fast pin IO path microbenchmarks.
+
+    Times reading and writing a value file through a file object, as pins
+    did before the fastio module, against the pure Python and (if built)
+    C extension fastio functions, singly and as 8 pin words, and voting on
+    5 samples against reading them and voting in Python. Ordinary files in
+    a temporary directory stand in for pin value files so the benchmarks
+    can be run on any system; pass a directory to use instead, such as one
+    on a RAM disk, as an argument.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+import shutil
+import tempfile
+import sys
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio.test.support import run_benchmarks
+
+NUMBER = 100000
+REPEAT = 3
+
+SETUP = '''
+from dibase.rpi.gpio import fastio
+try:
+    from dibase.rpi.gpio import _fastio
+except ImportError:
+    pass
+value_files = [open(path, 'r+b') for path in %r]
+value_file = value_files[0]
+fd = value_file.fileno()
+fds = tuple(f.fileno() for f in value_files)
+'''
+
+# Statements, formatted with the prefix of an implementation's function
+# names if timed for each implementation
+CASES = [ ('file object read', "value_file.seek(0); value_file.read()[0]=='1'", False)
+        , ('file object write', "value_file.write('1'); value_file.seek(0)", False)
+        , ('%s read_fd', '%sread_fd(fd)', True)
+        , ('%s write_fd', '%swrite_fd(fd, 1)', True)
+        , ('%s read_word (8 pins)', '%sread_word(fds)', True)
+        , ('%s write_word (8 pins)', '%swrite_word(fds, 0xff, 0x55)', True)
+        , ('%s vote_fd (5 samples)', '%svote_fd(fd, 5)', True)
+        , ( 'read_word x 5, voting in Python'
+          , "words = [fastio.read_word(fds) for sample in range(5)]; "
+            "[2*sum((word>>bit)&1 for word in words)>5 for bit in range(8)]"
+          , False )
+        , ('%s vote_word (8 pins x 5)', '%svote_word(fds, 5)', True)
+        ]
+
+def implementations():
+    ''' Returns (name, function name prefix) pairs of fastio implementations '''
+    result = [('python', 'fastio.py_')]
+    try:
+        from dibase.rpi.gpio import _fastio
+        result.append(('C', '_fastio.'))
+    except ImportError:
+        print 'C extension not built: timing pure Python functions only'
+    return result
+
+if __name__ == '__main__':
+    directory = tempfile.mkdtemp(dir=sys.argv[1] if len(sys.argv)>1 else None)
+    try:
+        paths = []
+        for i in range(8):
+            paths.append(os.path.join(directory, str(i)))
+            with open(paths[-1], 'wb') as value_file:
+                value_file.write('0\n')
+        prefixes = implementations()
+        runs = []
+        for (name, statement, per_implementation) in CASES:
+            if per_implementation:
+                runs.extend( (name % implementation, statement % prefix)
+                             for (implementation, prefix) in prefixes )
+            else:
+                runs.append((name, statement))
+        run_benchmarks(runs, NUMBER, REPEAT, SETUP % paths)
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,197 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Fast pin IO path unit tests.
+
+    The pure Python functions are always tested and the C extension's, if
+    it has been built, are tested for the same behaviour. Ordinary files
+    stand in for pin value files.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import os
+import tempfile
+import random
+import mmap
+import struct
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import backends
+from dibase.rpi.gpio import fastio
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pinid
+from dibase.rpi.gpio import timing
+
+class PythonFastIOUnitTests(unittest.TestCase):
+    functions = dict( read_fd=fastio.py_read_fd, write_fd=fastio.py_write_fd
+                    , read_word=fastio.py_read_word, write_word=fastio.py_write_word
+                    , vote_fd=fastio.py_vote_fd, vote_word=fastio.py_vote_word
+                    , spin_until=fastio.py_spin_until )
+
+    def setUp(self):
+        self.paths = []
+        self.fds = []
+        for level in '0101':
+            (fd, path) = tempfile.mkstemp()
+            os.write(fd, level+'\n')
+            self.paths.append(path)
+            self.fds.append(fd)
+
+    def tearDown(self):
+        for (fd, path) in zip(self.fds, self.paths):
+            os.close(fd)
+            os.remove(path)
+
+    def call(self, name, *args):
+        return self.functions[name](*args)
+
+    def levels(self):
+        levels = ''
+        for path in self.paths:
+            with open(path) as value_file:
+                levels += value_file.read()[0]
+        return levels
+
+    def test_read_fd(self):
+        self.assertIs(self.call('read_fd', self.fds[0]), False)
+        self.assertIs(self.call('read_fd', self.fds[1]), True)
+        self.assertIs(self.call('read_fd', self.fds[1]), True)
+
+    def test_write_fd(self):
+        self.call('write_fd', self.fds[0], 1)
+        self.call('write_fd', self.fds[1], False)
+        self.assertEqual(self.levels(), '1001')
+
+    def test_read_word(self):
+        self.assertEqual(self.call('read_word', self.fds), 10)
+        self.assertEqual(self.call('read_word', self.fds[0:1]), 0)
+
+    def test_write_word(self):
+        self.call('write_word', self.fds, 0xe, 0x7)
+        self.assertEqual(self.levels(), '0110')
+
+    def test_vote_fd(self):
+        self.assertIs(self.call('vote_fd', self.fds[0], 3), False)
+        self.assertIs(self.call('vote_fd', self.fds[1], 4), True)
+        with self.assertRaises(ValueError):
+            self.call('vote_fd', self.fds[1], 0)
+
+    def test_vote_word(self):
+        self.assertEqual(self.call('vote_word', self.fds, 5), 10)
+        self.assertEqual(self.call('vote_word', self.fds[1:2], 1), 1)
+        with self.assertRaises(ValueError):
+            self.call('vote_word', self.fds, 0)
+
+    def test_majority(self):
+        words = iter([0x5, 0x4, 0x7, 0x1, 0x6])
+        self.assertEqual(fastio.majority(words.next, 5), 0x5)
+        self.assertEqual(fastio.majority(iter([1, 0]).next, 2), 0)
+        self.assertEqual(fastio.majority(iter([1, 1]).next, 2), 1)
+        self.assertEqual(fastio.majority(iter([6]).next, 1), 6)
+        with self.assertRaises(ValueError):
+            fastio.majority(words.next, 0)
+        for samples in (3, 4, 7, 8, 16, 33):
+            words = [random.getrandbits(64) for sample in range(samples)]
+            expected = 0
+            for bit_number in range(64):
+                if 2*sum((word>>bit_number)&1 for word in words)>samples:
+                    expected |= 1<<bit_number
+            self.assertEqual(fastio.majority(iter(words).next, samples), expected)
+
+    def test_spin_until(self):
+        deadline = timing.monotonic()+0.01
+        self.call('spin_until', deadline)
+        self.assertTrue(timing.monotonic()>=deadline)
+
+    def test_bad_fd(self):
+        (read_fd, write_fd) = os.pipe()
+        os.close(read_fd)
+        os.close(write_fd)
+        with self.assertRaises(OSError):
+            self.call('read_fd', read_fd)
+
+    def test_sysfs_backend_bulk_operations(self):
+        value_files = [os.fdopen(os.dup(fd), 'r+b') for fd in self.fds]
+        try:
+            backend = backends.get_backend('sysfs')
+            lines = backend.group_lines(value_files)
+            self.assertEqual(backend.raw_fd(value_files[0]), value_files[0].fileno())
+            self.assertEqual(backend.raw_fd(lines), None)
+            self.assertEqual(backend.read_lines(lines), 10)
+            backend.write_lines(lines, 0x3, 0x1)
+            self.assertEqual(self.levels(), '1001')
+        finally:
+            for value_file in value_files:
+                value_file.close()
+
+    def test_pin_io(self):
+        path = self.paths[0]
+        class FileBackend(backends.SysfsBackend):
+            ''' Backend opening an ordinary file as every pin's value file '''
+            name = 'file'
+            def open_line(self, pin_id, direction_mode, blocking_mode, reclaim=False):
+                return open(path, 'r+b')
+            def close_line(self, pin_id, line, handed_off=False):
+                line.close()
+        writer = pin.PinWriter(pinid.PinId.any_chip_gpio(4), FileBackend())
+        reader = pin.PinReader(pinid.PinId.any_chip_gpio(17), FileBackend())
+        try:
+            self.assertEqual(writer._raw_fd, writer.fileno())
+            self.assertEqual(reader._raw_fd, reader.fileno())
+            writer.write(1)
+            self.assertTrue(reader.read())
+            writer.write('0')
+            self.assertFalse(reader.read())
+        finally:
+            writer.close()
+            reader.close()
+        self.assertEqual(writer._raw_fd, None)
+
+try:
+    from dibase.rpi.gpio import _fastio
+except ImportError:
+    _fastio = None
+
+@unittest.skipIf(_fastio==None, 'C extension not built')
+class CFastIOUnitTests(PythonFastIOUnitTests):
+    if _fastio!=None:
+        functions = dict( read_fd=_fastio.read_fd, write_fd=_fastio.write_fd
+                        , read_word=_fastio.read_word, write_word=_fastio.write_word
+                        , vote_fd=_fastio.vote_fd, vote_word=_fastio.vote_word
+                        , spin_until=_fastio.spin_until )
+
+    def test_too_many_fds(self):
+        with self.assertRaises(ValueError):
+            _fastio.read_word([self.fds[0]]*65)
+
+    def test_seqlock_store_and_read(self):
+        state = mmap.mmap(-1, 48)
+        self.assertEqual(_fastio.seqlock_read(state, 8), (0, 0, 0.0))
+        _fastio.seqlock_store(state, 8, 0, 2**63+1, 5, 1.5)
+        self.assertEqual(_fastio.seqlock_read(state, 8), (2**63+1, 5, 1.5))
+        self.assertEqual(struct.unpack_from('<Q', state, 8)[0], 2)
+        _fastio.seqlock_store(state, 8, 2, 3, 4, 2.5)
+        self.assertEqual(_fastio.seqlock_read(state, 8), (3, 4, 2.5))
+        self.assertEqual(struct.unpack_from('<Q', state, 8)[0], 4)
+
+    def test_seqlock_read_of_odd_sequence(self):
+        state = mmap.mmap(-1, 48)
+        struct.pack_into('<Q', state, 8, 3)
+        self.assertEqual(_fastio.seqlock_read(state, 8), None)
+
+    def test_seqlock_state_outside_buffer_or_misaligned(self):
+        state = mmap.mmap(-1, 48)
+        for offset in (-8, 17, 24):
+            with self.assertRaises(ValueError):
+                _fastio.seqlock_read(state, offset)
+            with self.assertRaises(ValueError):
+                _fastio.seqlock_store(state, offset, 0, 0, 0, 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Cold start benchmarks: time taken by a new Python process to import
+    gpio package modules and to determine the Raspberry Pi board revision
+    with and without the on-disk hardware information cache.
+
+    Each case is run in a fresh interpreter process, and the time of an
+    interpreter that does nothing is reported for comparison.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = 20
+
+def dibase_parent_directory():
+    ''' Returns the directory containing the dibase package directory '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    return os.path.normpath(os.path.join(here, '..', '..', '..', '..'))
+
+def time_process(statement, environment):
+    '''
+        Returns the mean wall clock time in seconds of RUNS executions of
+        a new Python interpreter process executing statement.
+    '''
+    command = [sys.executable, '-c', statement]
+    start = time.time()
+    for run in range(RUNS):
+        subprocess.check_call(command, env=environment)
+    return (time.time()-start)/RUNS
+
+def report(name, statement, environment):
+    print '%-40s %8.2f ms' % (name, time_process(statement, environment)*1000)
+
+if __name__ == '__main__':
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = dibase_parent_directory()
+    environment['PYTHONDONTWRITEBYTECODE'] = ''
+    cache_path = os.path.join(tempfile.mkdtemp(), 'hwinfo-cache')
+    revision = 'from dibase.rpi.hwinfo import HwInfo; HwInfo.gpio_revision()'
+    print 'Mean of', RUNS, 'process runs:'
+    report('python -c pass', 'pass', environment)
+    report('import dibase.rpi.gpio.pinid', 'import dibase.rpi.gpio.pinid', environment)
+    report('import dibase.rpi.gpio.pin', 'import dibase.rpi.gpio.pin', environment)
+    report('import dibase.rpi.gpio.pingroup', 'import dibase.rpi.gpio.pingroup', environment)
+    environment['DIBASE_RPI_HWINFO_CACHE'] = ''
+    report('board revision, no cache', revision, environment)
+    environment['DIBASE_RPI_HWINFO_CACHE'] = cache_path
+    report('board revision, on-disk cache', revision, environment)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    os.rmdir(os.path.dirname(cache_path))
@@ -0,0 +1,279 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    GPIO IO instrumentation unit tests. Pin IO objects are created without
+    opening GPIO pins, their value files being replaced by in memory files,
+    or opened with the test support module's in memory backend.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import StringIO
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import backends
+from dibase.rpi.gpio import fastio
+from dibase.rpi.gpio import instrument
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio import pinid
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+from dibase.rpi.gpio.test.support import MemoryLine
+
+def fake_pin(pin_class, pin_id, value_file_content=''):
+    '''
+        Return a pin_class instance for pin_id that has not exported the
+        pin and has an in memory value file.
+    '''
+    p = pin_class.__new__(pin_class)
+    p._PinIOBase__value_file = StringIO.StringIO(value_file_content)
+    p._PinIOBase__pin_id = pinid.PinId.any_chip_gpio(pin_id)
+    return p
+
+def forget_pin(p):
+    ''' Mark fake_pin instance closed without trying to unexport its pin '''
+    p._PinIOBase__value_file = None
+    p._PinIOBase__pin_id = None
+
+class NumberedLine(MemoryLine):
+    ''' In memory line with a distinct, never polled, file descriptor '''
+    next_fileno = 1000
+
+    def __init__(self):
+        super(NumberedLine, self).__init__()
+        self.number = NumberedLine.next_fileno
+        NumberedLine.next_fileno += 1
+
+    def fileno(self):
+        return self.number
+
+class EdgeBackend(MemoryBackend):
+    ''' In memory backend of NumberedLines supporting blocking modes '''
+    line_class = NumberedLine
+
+    def supports(self, direction_mode, blocking_mode):
+        return True
+
+class RegisterBackend(MemoryBackend):
+    ''' In memory backend counted as making system calls as mmap does '''
+    open_syscalls = 0
+    close_syscalls = 0
+    read_syscalls = 0
+    write_syscalls = 0
+    read_bytes = 0
+    write_bytes = 0
+
+class HistogramUnitTests(unittest.TestCase):
+    def test_new_histogram_is_empty(self):
+        h = instrument.Histogram((1,2))
+        self.assertEqual( h.snapshot()
+                        , {'count':0, 'sum':0.0, 'buckets':[(1,0),(2,0),(float('inf'),0)]}
+                        )
+
+    def test_buckets_are_cumulative_and_inclusive(self):
+        h = instrument.Histogram((1,2))
+        for v in (0.5, 1, 1.5, 3):
+            h.observe(v)
+        snapshot = h.snapshot()
+        self.assertEqual(snapshot['buckets'], [(1,2),(2,3),(float('inf'),4)])
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual(h.count(), 4)
+        self.assertAlmostEqual(snapshot['sum'], 6.0)
+
+class EnableDisableUnitTests(unittest.TestCase):
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_initially_disabled(self):
+        self.assertFalse(instrument.is_enabled())
+        self.assertFalse(instrument.snapshot()['enabled'])
+
+    def test_enable_replaces_and_disable_restores_methods(self):
+        original_write = pin.PinWriter.__dict__['write']
+        instrument.enable()
+        self.assertTrue(instrument.is_enabled())
+        self.assertIsNot(pin.PinWriter.__dict__['write'], original_write)
+        instrument.enable() # no effect if already enabled
+        instrument.disable()
+        self.assertFalse(instrument.is_enabled())
+        self.assertIs(pin.PinWriter.__dict__['write'], original_write)
+
+class PinInstrumentationUnitTests(unittest.TestCase):
+    def setUp(self):
+        instrument.reset()
+        instrument.enable()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_writes_counted(self):
+        p = fake_pin(pin.PinWriter, 4)
+        p.write(1)
+        p.write(0)
+        forget_pin(p)
+        stats = instrument.snapshot()['pins'][4]
+        self.assertEqual(stats['writes'], 2)
+        self.assertEqual(stats['bytes_written'], 2*backends.GPIOBackend.write_bytes)
+        self.assertEqual(stats['syscalls'], 2*backends.GPIOBackend.write_syscalls)
+        self.assertEqual(stats['latency']['write']['count'], 2)
+        self.assertEqual(stats['reads'], 0)
+
+    def test_reads_counted(self):
+        p = fake_pin(pin.PinReader, 17, '1\n')
+        self.assertTrue(p.read())
+        forget_pin(p)
+        stats = instrument.snapshot()['pins'][17]
+        self.assertEqual(stats['reads'], 1)
+        self.assertEqual(stats['bytes_read'], backends.GPIOBackend.read_bytes)
+        self.assertEqual(stats['latency']['read']['count'], 1)
+        self.assertEqual(stats['wakeups'], 0)
+
+    def test_polling_blocking_read_is_not_a_wakeup(self):
+        p = fake_pin(pin.PinBlockingReader, 22, '0\n')
+        self.assertFalse(p.read(0))
+        forget_pin(p)
+        stats = instrument.snapshot()['pins'][22]
+        self.assertEqual(stats['reads'], 1)
+        self.assertEqual(stats['wakeups'], 0)
+        self.assertEqual(stats['latency']['wait']['count'], 0)
+
+    def test_disabled_operations_not_counted(self):
+        instrument.disable()
+        p = fake_pin(pin.PinWriter, 4)
+        p.write(1)
+        forget_pin(p)
+        self.assertEqual(instrument.snapshot()['pins'], {})
+
+    def test_missed_edges_estimated_for_both_edges_mode(self):
+        stats = instrument.IOStats()
+        stats.edge_mode = 'B'
+        for value in (True, False, False, True):
+            instrument._record_value(stats, value, None, 0.001)
+        self.assertEqual(stats.wakeups, 4)
+        self.assertEqual(stats.edges, 4)
+        self.assertEqual(stats.missed_edges, 1)
+
+    def test_timeouts_counted(self):
+        stats = instrument.IOStats()
+        instrument._record_value(stats, None, 0.5, 0.5)
+        self.assertEqual(stats.timeouts, 1)
+        self.assertEqual(stats.reads, 0)
+        self.assertEqual(stats.latency['wait'].count(), 1)
+
+class BulkAndNotifiedInstrumentationUnitTests(unittest.TestCase):
+    def setUp(self):
+        instrument.reset()
+        instrument.enable()
+        self.backend = EdgeBackend()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_bidirectional_pin_reads_and_writes_counted(self):
+        with pin.BidirectionalPin(gpio(4), 'w', self.backend) as bidirectional:
+            bidirectional.write(1)
+            self.assertTrue(bidirectional.read())
+        stats = instrument.snapshot()['pins'][4]
+        self.assertEqual(stats['writes'], 1)
+        self.assertEqual(stats['reads'], 1)
+
+    def test_word_write_many_counts_each_value_and_changed_pins(self):
+        with pingroup.PinWordWriter([gpio(4), gpio(17)], self.backend) as group:
+            group.write_many(iter([1, 1, 3, 2]))
+        snapshot = instrument.snapshot()
+        stats = snapshot['groups'][(4, 17)]
+        self.assertEqual(stats['writes'], 4)
+        self.assertEqual(stats['latency']['write']['count'], 4)
+        # all pins written first, then only those that change
+        self.assertEqual(snapshot['pins'][4]['writes'], 2)
+        self.assertEqual(snapshot['pins'][17]['writes'], 2)
+        self.assertEqual( snapshot['pins'][17]['bytes_written']
+                        , 2*backends.GPIOBackend.write_bytes )
+
+    def test_list_write_many_counts_each_value_and_changed_pins(self):
+        with pingroup.PinListWriter([gpio(4), gpio(17)], self.backend) as group:
+            group.write([False, False])
+            group.write_many([(True, False), (True, True)])
+        snapshot = instrument.snapshot()
+        self.assertEqual(snapshot['groups'][(4, 17)]['writes'], 3)
+        self.assertEqual(snapshot['pins'][4]['writes'], 2)
+        self.assertEqual(snapshot['pins'][17]['writes'], 2)
+
+    def test_read_many_counts_each_read(self):
+        with pingroup.PinWordReader([gpio(4), gpio(17)], self.backend) as group:
+            group.read_many(3)
+        with pingroup.PinListReader([gpio(22)], self.backend) as group:
+            group.read_many(2, 0)
+        snapshot = instrument.snapshot()
+        self.assertEqual(snapshot['groups'][(4, 17)]['reads'], 3)
+        self.assertEqual(snapshot['groups'][(4, 17)]['latency']['read']['count'], 3)
+        self.assertEqual(snapshot['pins'][17]['reads'], 3)
+        self.assertEqual( snapshot['pins'][17]['bytes_read']
+                        , 3*backends.GPIOBackend.read_bytes )
+        self.assertEqual(snapshot['groups'][(22,)]['reads'], 2)
+
+    def test_syscalls_and_bytes_counted_for_pins_backend(self):
+        for backend in (backends.get_backend('mmap'), RegisterBackend()):
+            self.assertEqual(backend.read_syscalls, 0)
+            self.assertEqual(backend.write_syscalls, 0)
+        self.assertEqual(backends.get_backend('gpiochip').read_syscalls, 1)
+        with pin.PinWriter(gpio(4), RegisterBackend()) as p:
+            p.write(1)
+        with pin.PinWriter(gpio(17), EdgeBackend()) as p:
+            p.write(1)
+        with pingroup.PinWordReader([gpio(22)], RegisterBackend()) as group:
+            group.read_many(2)
+        snapshot = instrument.snapshot()
+        self.assertEqual(snapshot['pins'][4]['writes'], 1)
+        self.assertEqual(snapshot['pins'][4]['syscalls'], 0)
+        self.assertEqual(snapshot['pins'][4]['bytes_written'], 0)
+        self.assertEqual( snapshot['pins'][17]['syscalls']
+                        , backends.GPIOBackend.write_syscalls )
+        self.assertEqual(snapshot['pins'][22]['reads'], 2)
+        self.assertEqual(snapshot['pins'][22]['syscalls'], 0)
+
+    def test_sysfs_value_file_syscalls_depend_on_fastio(self):
+        sysfs = backends.get_backend('sysfs')
+        expected = 1 if fastio.IMPLEMENTATION=='c' else 2
+        self.assertEqual(sysfs.read_syscalls, expected)
+        self.assertEqual(sysfs.write_syscalls, expected)
+
+    def test_notified_pin_read_is_an_unwaited_wakeup(self):
+        with pin.PinBlockingReader(gpio(4), 'B', self.backend) as reader:
+            self.backend.lines[4].level = '1'
+            self.assertTrue(reader._read_notified([reader.fileno()]))
+            self.assertTrue(reader._read_notified([reader.fileno()]))
+        stats = instrument.snapshot()['pins'][4]
+        self.assertEqual(stats['reads'], 2)
+        self.assertEqual(stats['wakeups'], 2)
+        self.assertEqual(stats['edges'], 2)
+        self.assertEqual(stats['missed_edges'], 1)
+        self.assertEqual(stats['latency']['wait']['count'], 0)
+
+    def test_notified_group_reads_are_unwaited_wakeups(self):
+        for (group_class, high) in ( (pingroup.PinWordBlockingReader, 2)
+                                   , (pingroup.PinListBlockingReader, [False, True])
+                                   ):
+            instrument.reset()
+            with group_class([gpio(4), gpio(17)], 'B', backend=self.backend) as group:
+                self.backend.lines[17].level = '1'
+                fds = group.file_descriptors()
+                self.assertEqual(group._read_notified(fds[1:]), high)
+            stats = instrument.snapshot()['groups'][(4, 17)]
+            self.assertEqual(stats['reads'], 1)
+            self.assertEqual(stats['wakeups'], 1)
+            self.assertEqual(stats['edges'], 1)
+            self.assertEqual(stats['latency']['wait']['count'], 0)
+            self.assertEqual(instrument.snapshot()['pins'][17]['edges'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
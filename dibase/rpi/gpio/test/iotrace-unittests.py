@@ -0,0 +1,160 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    GPIO IO trace recording and replay unit tests.
+
+    Recording is tested on ordinary files and a pipe. Replay is tested by
+    replaying synthetic traces of the sys filesystem GPIO interface to pin
+    and pin group objects, so no GPIO hardware is needed.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import os
+import tempfile
+import time
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import iotrace
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio import sysfspaths
+from dibase.rpi.gpio import sysfsio
+from dibase.rpi.gpio.test.support import gpio
+
+
+class TraceUnitTests(unittest.TestCase):
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+class TraceRecorderUnitTests(TraceUnitTests):
+    def test_not_a_trace_file(self):
+        with self.assertRaises(ValueError):
+            iotrace.read_trace(self.path)
+
+    def test_records_file_io(self):
+        (fd, data_path) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with iotrace.TraceRecorder(self.path):
+                with sysfsio.open_file(data_path, 'w') as data_file:
+                    data_file.write('1\n')
+                with sysfsio.open_file(data_path, 'r') as data_file:
+                    self.assertEqual(data_file.read(), '1\n')
+                self.assertTrue(sysfsio.path_exists(data_path))
+            self.assertIs(sysfsio.open_file, open)
+            self.assertEqual( [record[1:] for record in iotrace.read_trace(self.path)]
+                            , [ (iotrace.OPEN, data_path, 'w')
+                              , (iotrace.WRITE, data_path, '1\n')
+                              , (iotrace.OPEN, data_path, 'r')
+                              , (iotrace.READ, data_path, '1\n')
+                              , (iotrace.EXISTS, data_path, '1')
+                              ]
+                            )
+        finally:
+            os.remove(data_path)
+
+    def test_records_select(self):
+        (read_fd, write_fd) = os.pipe()
+        try:
+            os.write(write_fd, 'x')
+            with iotrace.TraceRecorder(self.path):
+                self.assertEqual(sysfsio.select([read_fd], [], [], 0.5), ([read_fd], [], []))
+                os.read(read_fd, 1)
+                self.assertEqual(sysfsio.select([read_fd], [], [], 0.01), ([], [], []))
+            records = iotrace.read_trace(self.path)
+            self.assertEqual( [record[1:] for record in records]
+                            , [ (iotrace.SELECT, None, (0.5, [''], [], []))
+                              , (iotrace.SELECT, None, (0.01, [], [], []))
+                              ]
+                            )
+            self.assertTrue(records[0][0]<=records[1][0])
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+class TraceReplayerUnitTests(TraceUnitTests):
+    def write_trace(self, *records):
+        writer = iotrace.TraceWriter(self.path)
+        for record in records:
+            if record[0]==iotrace.SELECT:
+                writer.write_select(record[1], record[2], record[3])
+            else:
+                writer.write(*record)
+        writer.close()
+
+    def test_blocking_reader_replay(self):
+        value_path = sysfspaths.value_path(4)
+        self.write_trace( (iotrace.READ, value_path, '1\n', 0.0)
+                        , (iotrace.SELECT, ([], [], [value_path]), None, 0.0)
+                        , (iotrace.READ, value_path, '0\n', 0.0)
+                        , (iotrace.SELECT, ([], [], []), 0.5, 0.0)
+                        )
+        replayer = iotrace.TraceReplayer(self.path, None)
+        with replayer:
+            reader = pin.PinBlockingReader(gpio(4), 'B')
+            try:
+                self.assertTrue(reader.read(0))
+                self.assertFalse(reader.read())
+                self.assertEqual(reader.read(0.5), None)
+                with self.assertRaises(EOFError):
+                    reader.read()
+            finally:
+                reader.close()
+        self.assertEqual( replayer.written()
+                        , [ (sysfspaths.export_path(), '4')
+                          , (sysfspaths.edgemode_path(4), 'both')
+                          , (sysfspaths.direction_path(4), 'in')
+                          ]
+                        )
+
+    def test_group_reader_replay(self):
+        value_paths = [sysfspaths.value_path(i) for i in (4, 17)]
+        self.write_trace( (iotrace.SELECT, ([], [], value_paths[1:]), None, 0.0)
+                        , (iotrace.READ, value_paths[1], '1\n', 0.0)
+                        )
+        with iotrace.TraceReplayer(self.path, None):
+            group = pingroup.PinWordBlockingReader([gpio(4), gpio(17)], 'B')
+            try:
+                self.assertEqual(group.read(), 2)
+            finally:
+                group.close()
+
+    def test_writes_collected(self):
+        value_path = sysfspaths.value_path(18)
+        self.write_trace((iotrace.WRITE, value_path, '1', 0.0))
+        replayer = iotrace.TraceReplayer(self.path, None)
+        with replayer:
+            writer = pin.PinWriter(gpio(18))
+            try:
+                writer.write(1)
+            finally:
+                writer.close()
+        self.assertEqual(replayer.recorded_writes(), [(value_path, '1')])
+        self.assertEqual(replayer.written()[-1], (value_path, '1'))
+
+    def test_replay_paced_at_speed(self):
+        value_path = sysfspaths.value_path(4)
+        self.write_trace((iotrace.SELECT, ([], [], [value_path]), None, 0.2))
+        for (speed, minimum, maximum) in ((1.0, 0.19, 1.0), (10.0, 0.019, 0.15)):
+            with iotrace.TraceReplayer(self.path, speed):
+                reader = pin.PinBlockingReader(gpio(4), 'R')
+                try:
+                    start = time.time()
+                    reader.read()
+                    elapsed = time.time()-start
+                finally:
+                    reader.close()
+            self.assertTrue(minimum<=elapsed<=maximum, elapsed)
+
+if __name__ == '__main__':
+    unittest.main()
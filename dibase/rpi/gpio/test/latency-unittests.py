@@ -0,0 +1,160 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Wake up latency measurement unit tests using the pipe edge source and,
+    for the read and callback paths, a blocking reader of the test support
+    module's in memory backend whose edges are signalled by socket out of
+    band data, a priority condition as GPIO edges are.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import socket
+import unittest
+import sys
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import latency
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+from dibase.rpi.gpio.test.support import MemoryLine
+
+class OutOfBandLine(MemoryLine):
+    ''' Line whose edges are signalled by out of band data on a socket '''
+    def __init__(self, receiver):
+        super(OutOfBandLine, self).__init__()
+        self.receiver = receiver
+
+    def fileno(self):
+        return self.receiver.fileno()
+
+    def read(self, size=-1):
+        try:
+            self.receiver.recv(1, socket.MSG_OOB)
+        except socket.error:
+            pass # no edge signalled
+        return super(OutOfBandLine, self).read(size)
+
+class OutOfBandBackend(MemoryBackend):
+    def supports(self, direction_mode, blocking_mode):
+        return True
+
+class OutOfBandEdgeSource(object):
+    ''' Edge source with a PinBlockingReader, as LoopbackEdgeSource '''
+    def __init__(self):
+        (self.sender, self.receiver) = socket.socketpair()
+        backend = OutOfBandBackend(OutOfBandLine(self.receiver))
+        self.__reader = pin.PinBlockingReader(gpio(4), 'B', backend)
+
+    def fire(self, time):
+        self.sender.send('x', socket.MSG_OOB)
+
+    def fileno(self):
+        return self.__reader.fileno()
+
+    def priority_events(self):
+        return True
+
+    def reader(self):
+        return self.__reader
+
+    def consume(self):
+        self.__reader.read(0)
+        return None
+
+    def close(self):
+        self.__reader.close()
+        self.sender.close()
+        self.receiver.close()
+
+def out_of_band_supported():
+    ''' Returns True if sockets support out of band data, signalling edges '''
+    (sender, receiver) = socket.socketpair()
+    try:
+        sender.send('x', socket.MSG_OOB)
+        return True
+    except socket.error:
+        return False
+    finally:
+        sender.close()
+        receiver.close()
+
+class PipeEdgeSourceUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.source = latency.PipeEdgeSource()
+
+    def tearDown(self):
+        self.source.close()
+
+    def test_consume_returns_edge_times_in_order(self):
+        self.source.fire(1.5)
+        self.source.fire(2.5)
+        self.assertEqual(self.source.consume(), [1.5, 2.5])
+        self.assertEqual(self.source.consume(), [])
+
+    def test_no_reader_for_read_and_callback_paths(self):
+        self.assertIsNone(self.source.reader())
+        for path in latency.READER_PATHS:
+            with self.assertRaises(ValueError):
+                latency.measure(self.source, path, count=1)
+
+class LatencyReportUnitTests(unittest.TestCase):
+    def test_percentiles_nearest_rank(self):
+        report = latency.LatencyReport('select', 4, [0.4,0.1,0.3,0.2], 0, 0)
+        self.assertEqual(report.percentile(50), 0.2)
+        self.assertEqual(report.percentile(100), 0.4)
+        self.assertEqual(report.percentile(0), 0.1)
+        self.assertEqual(report.wakeups(), 4)
+        self.assertEqual(report.histogram().count(), 4)
+
+    def test_no_wakeups(self):
+        report = latency.LatencyReport('poll', 4, [], 4, 0)
+        self.assertIsNone(report.percentile(50))
+        self.assertIn('no wake ups', report.summary())
+
+class MeasureUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.source = latency.PipeEdgeSource()
+
+    def tearDown(self):
+        self.source.close()
+
+    def check_path(self, path):
+        report = latency.measure(self.source, path, rate=2000.0, count=50, timeout=0.5)
+        self.assertEqual(report.path, path)
+        self.assertEqual(report.edges, 50)
+        self.assertEqual(report.wakeups()+report.dropped, 50)
+        self.assertGreater(report.wakeups(), 0)
+        self.assertGreaterEqual(report.latencies[0], 0.0)
+        self.assertIn(path, report.summary())
+
+    def test_select(self):
+        self.check_path('select')
+
+    def test_poll(self):
+        self.check_path('poll')
+
+    def test_epoll(self):
+        self.check_path('epoll')
+
+    def test_unavailable_path_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            latency.measure(self.source, 'asyncio', count=1)
+
+@unittest.skipUnless(out_of_band_supported(), 'sockets do not support out of band data')
+class MeasureReaderPathsUnitTests(MeasureUnitTests):
+    def setUp(self):
+        self.source = OutOfBandEdgeSource()
+
+    def test_read(self):
+        self.check_path('read')
+
+    def test_callback(self):
+        self.check_path('callback')
+
+if __name__ == '__main__':
+    unittest.main()
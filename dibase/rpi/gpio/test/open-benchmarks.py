@@ -0,0 +1,50 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Pin and pin group open overhead microbenchmarks.
+
+    Times parsing open_pin and open_pingroup mode strings, remembered and
+    parsed afresh, and opening and closing pins and 8 pin groups. Pins are
+    opened with the test support module's in memory backend, sharing one
+    line, and the sys filesystem export check replaced so that only the
+    library's own open overhead is timed, on any system.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import sys
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio import sysfsio
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+from dibase.rpi.gpio.test.support import MemoryLine
+from dibase.rpi.gpio.test.support import run_benchmarks
+
+NUMBER = 20000
+REPEAT = 3
+GROUP_PINS = 8
+
+def open_and_close(open_function, *args):
+    ''' Returns a function opening and closing the result of open_function(*args) '''
+    def run():
+        open_function(*args).close()
+    return run
+
+if __name__ == '__main__':
+    sysfsio.path_exists = lambda path: False
+    backend = MemoryBackend(MemoryLine())
+    pin_ids = [gpio(i) for i in range(GROUP_PINS)]
+    run_benchmarks( [ ('pin mode parsed afresh', lambda: pin._parse_open_mode('rB'))
+                    , ('pin mode remembered', lambda: pin.parse_open_mode('rB'))
+                    , ('group mode parsed afresh', lambda: pingroup._parse_open_mode('rS'))
+                    , ('group mode remembered', lambda: pingroup.parse_open_mode('rS'))
+                    , ('open_pin and close', open_and_close(pin.open_pin, pin_ids[0], 'r', backend))
+                    , ( '%d pin open_pingroup and close' % GROUP_PINS
+                      , open_and_close(pingroup.open_pingroup, pin_ids, 'rS', 0, backend) ) ]
+                  , NUMBER, REPEAT )
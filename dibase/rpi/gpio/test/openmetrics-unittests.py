@@ -0,0 +1,127 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    OpenMetrics text exporter unit tests.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import urllib2
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import openmetrics
+from dibase.rpi.gpio import instrument
+
+def pin_stats(**counts):
+    ''' Return an instrument IOStats snapshot with counts given set '''
+    stats = instrument.IOStats()
+    for (counter, count) in counts.items():
+        setattr(stats, counter, count)
+    return stats
+
+class RenderUnitTests(unittest.TestCase):
+    def test_empty_snapshot(self):
+        text = openmetrics.render({'enabled':False, 'pins':{}, 'groups':{}})
+        self.assertEqual( text
+                        , '# TYPE dibase_gpio_open_pins gauge\n'
+                          '# HELP dibase_gpio_open_pins Number of open pins.\n'
+                          'dibase_gpio_open_pins 0\n'
+                          '# EOF\n'
+                        )
+
+    def test_pin_counters_and_open_state(self):
+        stats = pin_stats(writes=12)
+        stats.is_open = True
+        text = openmetrics.render({'enabled':True, 'pins':{4:stats.snapshot()}, 'groups':{}})
+        self.assertIn('# TYPE dibase_gpio_pin_writes counter\n', text)
+        self.assertIn('dibase_gpio_pin_writes_total{pin="4"} 12\n', text)
+        self.assertIn('dibase_gpio_pin_open{pin="4"} 1\n', text)
+        self.assertIn('dibase_gpio_open_pins 1\n', text)
+        self.assertTrue(text.endswith('# EOF\n'))
+
+    def test_group_metrics_labelled_with_pin_ids(self):
+        text = openmetrics.render( { 'enabled':True, 'pins':{}
+                                   , 'groups':{(4,17):pin_stats(reads=3).snapshot()}
+                                   }
+                                 )
+        self.assertIn('dibase_gpio_group_reads_total{pins="4,17"} 3\n', text)
+
+    def test_latency_histogram(self):
+        stats = pin_stats()
+        stats.latency['wait'].observe(0.002)
+        text = openmetrics.render({'enabled':True, 'pins':{4:stats.snapshot()}, 'groups':{}})
+        self.assertIn('# TYPE dibase_gpio_pin_latency_seconds histogram\n', text)
+        self.assertIn( 'dibase_gpio_pin_latency_seconds_bucket{le="0.001",operation="wait",pin="4"} 0\n'
+                     , text )
+        self.assertIn( 'dibase_gpio_pin_latency_seconds_bucket{le="0.0025",operation="wait",pin="4"} 1\n'
+                     , text )
+        self.assertIn( 'dibase_gpio_pin_latency_seconds_bucket{le="+Inf",operation="wait",pin="4"} 1\n'
+                     , text )
+        self.assertIn( 'dibase_gpio_pin_latency_seconds_count{operation="wait",pin="4"} 1\n'
+                     , text )
+        self.assertNotIn('operation="read"', text)
+
+    def test_rates(self):
+        text = openmetrics.render( {'enabled':True, 'pins':{4:pin_stats().snapshot()}, 'groups':{}}
+                                 , {'pins':{4:{'reads':0.0, 'writes':2.5, 'edges':0.0}}}
+                                 )
+        self.assertIn('dibase_gpio_pin_writes_per_second{pin="4"} 2.5\n', text)
+
+    def test_prefix(self):
+        text = openmetrics.render({'enabled':False, 'pins':{}, 'groups':{}}, prefix='gpio')
+        self.assertIn('gpio_open_pins 0\n', text)
+
+class ExporterUnitTests(unittest.TestCase):
+    def setUp(self):
+        instrument.reset()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_file(self):
+        path = os.path.join(self.directory, 'gpio.prom')
+        openmetrics.Exporter().write_file(path)
+        with open(path) as metrics_file:
+            self.assertTrue(metrics_file.read().endswith('# EOF\n'))
+        self.assertEqual(os.listdir(self.directory), ['gpio.prom'])
+
+    def test_write_file_does_not_follow_predictable_temporary_path(self):
+        path = os.path.join(self.directory, 'gpio.prom')
+        target = os.path.join(self.directory, 'target')
+        os.symlink(target, '%s.%d.tmp' % (path, os.getpid()))
+        openmetrics.Exporter().write_file(path)
+        self.assertFalse(os.path.exists(target))
+        self.assertEqual( sorted(os.listdir(self.directory))
+                        , ['gpio.prom', 'gpio.prom.%d.tmp' % os.getpid()]
+                        )
+
+    def test_write_file_render_failure_leaves_no_file(self):
+        exporter = openmetrics.Exporter()
+        def render():
+            raise RuntimeError('render failed')
+        exporter.render = render
+        with self.assertRaises(RuntimeError):
+            exporter.write_file(os.path.join(self.directory, 'gpio.prom'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_serve(self):
+        server = openmetrics.Exporter().serve(port=0)
+        try:
+            response = urllib2.urlopen('http://%s:%d/metrics' % server.server_address)
+            self.assertEqual(response.info()['Content-Type'], openmetrics.CONTENT_TYPE)
+            self.assertTrue(response.read().endswith('# EOF\n'))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
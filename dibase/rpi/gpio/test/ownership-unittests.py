@@ -0,0 +1,233 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Multi-process GPIO pin ownership unit tests.
+
+    Other owning processes are forked children that acquire pins in a table
+    in a temporary file then wait to be told to exit through a pipe.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import os
+import tempfile
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import backends
+from dibase.rpi.gpio import ownership
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pinid
+from dibase.rpi.gpio.gpioerror import PinInUseError
+
+class OwnerProcess(object):
+    '''
+        Child process acquiring pin ids in the table at path, and handing
+        them off to its parent if hand_off is True, and holding them until
+        finish is called.
+    '''
+    def __init__(self, path, pin_ids, shared=False, hand_off=False):
+        (ready_read, ready_write) = os.pipe()
+        (exit_read, self.exit_write) = os.pipe()
+        self.pid = os.fork()
+        if self.pid==0:
+            try:
+                os.close(self.exit_write)
+                owners = ownership.PinOwnershipTable(path)
+                for pin_id in pin_ids:
+                    owners.acquire(pin_id, shared)
+                    if hand_off:
+                        owners.hand_off(pin_id, os.getppid())
+                os.write(ready_write, 'r')
+                os.read(exit_read, 1)
+            finally:
+                os._exit(0)
+        os.read(ready_read, 1)
+        for fd in (ready_read, ready_write, exit_read):
+            os.close(fd)
+
+    def finish(self):
+        os.close(self.exit_write)
+        os.waitpid(self.pid, 0)
+
+class PinOwnershipTableUnitTests(unittest.TestCase):
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp()
+        os.close(fd)
+        self.owners = ownership.PinOwnershipTable(self.path)
+        self.children = []
+
+    def tearDown(self):
+        for child in self.children:
+            child.finish()
+        self.owners.close()
+        os.remove(self.path)
+
+    def owner_process(self, pin_ids, shared=False, hand_off=False):
+        child = OwnerProcess(self.path, pin_ids, shared, hand_off)
+        self.children.append(child)
+        return child
+
+    def test_new_table_has_no_owners(self):
+        self.assertEqual(self.owners.owners(4), (None, []))
+        self.assertEqual(self.owners.owned(), set())
+
+    def test_acquire_and_release(self):
+        self.assertTrue(self.owners.acquire(4))
+        self.assertEqual(self.owners.owners(4), (os.getpid(), []))
+        self.assertEqual(self.owners.owned(), set([4]))
+        self.owners.release(4)
+        self.assertEqual(self.owners.owners(4), (None, []))
+        self.assertEqual(self.owners.owned(), set())
+
+    def test_acquire_is_not_reentrant(self):
+        self.assertTrue(self.owners.acquire(pinid.PinId.any_chip_gpio(4)))
+        self.assertFalse(self.owners.acquire(4))
+
+    def test_pin_owned_by_other_process_not_acquired(self):
+        child = self.owner_process([17])
+        self.assertEqual(self.owners.owners(17), (child.pid, []))
+        self.assertFalse(self.owners.acquire(17))
+        self.assertFalse(self.owners.acquire(17, shared=True))
+        self.assertTrue(self.owners.acquire(18))
+
+    def test_pin_of_exited_owner_reclaimed(self):
+        child = self.owner_process([17])
+        child.finish()
+        self.children.remove(child)
+        self.assertEqual(self.owners.owners(17), (None, []))
+        self.assertTrue(self.owners.acquire(17))
+
+    def test_shared_ownership(self):
+        child = self.owner_process([22], shared=True)
+        self.assertFalse(self.owners.acquire(22))
+        self.assertTrue(self.owners.acquire(22, shared=True))
+        self.assertEqual(self.owners.owners(22), (None, [child.pid, os.getpid()]))
+
+    def test_hand_off(self):
+        self.assertTrue(self.owners.acquire(23))
+        child = self.owner_process([23])
+        self.assertTrue(self.owners.hand_off(23, child.pid))
+        self.assertEqual(self.owners.owned(), set())
+        self.assertEqual(self.owners.owners(23), (child.pid, []))
+        self.assertFalse(self.owners.hand_off(23, os.getpid()))
+
+    def test_handed_off_by_live_process(self):
+        child = self.owner_process([25], hand_off=True)
+        self.assertEqual(self.owners.owners(25), (os.getpid(), []))
+        self.assertTrue(self.owners.acquire(25))
+        self.assertEqual(self.owners.handed_off_by(25), child.pid)
+        child.finish()
+        self.children.remove(child)
+        self.assertEqual(self.owners.handed_off_by(25), None)
+        self.assertEqual(self.owners.owners(25), (os.getpid(), []))
+
+    def test_not_handed_off(self):
+        self.assertTrue(self.owners.acquire(26))
+        self.assertEqual(self.owners.handed_off_by(26), None)
+        self.assertEqual(self.owners.handed_off_by(27), None)
+
+    def test_release_forgets_hand_off(self):
+        child = self.owner_process([25], hand_off=True)
+        self.assertTrue(self.owners.acquire(25))
+        self.owners.release(25)
+        self.assertTrue(self.owners.acquire(25))
+        self.assertEqual(self.owners.handed_off_by(25), None)
+
+    def test_new_table_not_writable_by_others(self):
+        path = self.path+'.new'
+        owners = ownership.PinOwnershipTable(path)
+        try:
+            self.assertEqual(os.stat(path).st_mode&0007, 0)
+        finally:
+            owners.close()
+            os.remove(path)
+
+    def test_handed_off_pin_acquired(self):
+        (fd, path) = tempfile.mkstemp()
+        os.close(fd)
+        other = ownership.PinOwnershipTable(path)
+        try:
+            other._PinOwnershipTable__owned_pid = None # fake another process
+            self.assertTrue(other.acquire(24))
+            other._PinOwnershipTable__owned = {}
+            self.assertTrue(other.acquire(24))
+            self.assertEqual(other.owned(), set([24]))
+        finally:
+            other.close()
+            os.remove(path)
+
+    def test_pin_id_out_of_range(self):
+        with self.assertRaises(ValueError):
+            self.owners.acquire(ownership.MAX_PIN_IDS)
+
+    def test_not_a_table_file(self):
+        with open(self.path, 'r+b') as table_file:
+            table_file.write('NOTATABL')
+        with self.assertRaises(ValueError):
+            ownership.PinOwnershipTable(self.path)
+
+    def test_close_releases_owned_pins(self):
+        self.owners.acquire(4)
+        self.owners.acquire(5, shared=True)
+        self.owners.close()
+        self.owners = ownership.PinOwnershipTable(self.path)
+        self.assertEqual(self.owners.owners(4), (None, []))
+        self.assertEqual(self.owners.owners(5), (None, []))
+
+class PinOwnershipCheckingUnitTests(unittest.TestCase):
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp()
+        os.close(fd)
+        self.owners = ownership.enable(self.path)
+
+    def tearDown(self):
+        ownership.disable()
+        os.remove(self.path)
+
+    def test_enable_returns_table(self):
+        self.assertIs(ownership.table(), self.owners)
+        self.assertEqual(self.owners.path(), self.path)
+
+    def test_pin_owned_by_other_process_is_in_use(self):
+        child = OwnerProcess(self.path, [4])
+        try:
+            p = pin.PinReader.__new__(pin.PinReader)
+            p._PinIOBase__value_file = None
+            with self.assertRaises(PinInUseError):
+                p.cb_validate_init_parameters( pinid.PinId.any_chip_gpio(4)
+                                             , pin.DirectionMode('r')
+                                             , pin.BlockMode('N')
+                                             )
+        finally:
+            child.finish()
+
+    def test_pin_handed_off_by_live_process_adopted(self):
+        child = OwnerProcess(self.path, [4], hand_off=True)
+        try:
+            p = pin.PinReader.__new__(pin.PinReader)
+            p._PinIOBase__value_file = None
+            p.cb_validate_init_parameters( pinid.PinId.any_chip_gpio(4)
+                                         , pin.DirectionMode('r')
+                                         , pin.BlockMode('N')
+                                         )
+            self.assertIs(p._PinIOBase__reclaim(4), backends.ADOPT)
+        finally:
+            child.finish()
+        self.assertIs(p._PinIOBase__reclaim(4), True)
+
+    def test_validation_acquires_ownership(self):
+        p = pin.PinReader.__new__(pin.PinReader)
+        p._PinIOBase__value_file = None
+        p.cb_validate_init_parameters( pinid.PinId.any_chip_gpio(4)
+                                     , pin.DirectionMode('r')
+                                     , pin.BlockMode('N')
+                                     )
+        self.assertEqual(self.owners.owned(), set([4]))
+
+if __name__ == '__main__':
+    unittest.main()
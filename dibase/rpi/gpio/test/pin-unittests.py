@@ -71,6 +71,14 @@ class BlockModeUnitTests(unittest.TestCase):
         with self.assertRaises( pin.PinBlockModeInvalidError ):
             pin.BlockMode(bad_open_mode_str)
 
+    def test_instances_are_interned(self):
+        for mode in pin.BlockMode.all_blocking_open_mode_characters():
+            self.assertIs(pin.BlockMode(mode), pin.BlockMode(mode))
+        self.assertIsNot( pin.BlockMode(pin.BlockMode.non_blocking_open_mode())
+                        , pin.BlockMode(pin.BlockMode.block_on_both_edges_open_mode()) )
+        with self.assertRaises(AttributeError):
+            pin.BlockMode(pin.BlockMode.non_blocking_open_mode()).extra = 1
+
 class DirectionModeUnitTests(unittest.TestCase):
     def test_read_open_mode_is_valid(self):
         self.assertTrue(pin.DirectionMode.is_valid_direction_open_mode(pin.DirectionMode.read_open_mode()))
@@ -118,5 +126,28 @@ class DirectionModeUnitTests(unittest.TestCase):
         with self.assertRaises( pin.PinDirectionModeInvalidError ):
             pin.DirectionMode(bad_open_mode_str)
 
+    def test_instances_are_interned(self):
+        for mode in pin.DirectionMode.all_direction_open_mode_characters():
+            self.assertIs(pin.DirectionMode(mode), pin.DirectionMode(mode))
+
+class ParseOpenModeUnitTests(unittest.TestCase):
+    def test_modes_parsed(self):
+        for (mode, direction, blocking) in ( ('', 'r', 'N'), ('r', 'r', 'N')
+                                           , ('rB', 'r', 'B'), ('w', 'w', 'N') ):
+            (direction_mode, blocking_mode) = pin.parse_open_mode(mode)
+            self.assertEqual(direction_mode.open_mode_value(), direction)
+            self.assertEqual(blocking_mode.open_mode_value(), blocking)
+
+    def test_parsed_modes_are_remembered(self):
+        self.assertIs(pin.parse_open_mode('rR'), pin.parse_open_mode('rR'))
+        self.assertIs(pin.parse_open_mode('rR')[1], pin.BlockMode('R'))
+
+    def test_bad_modes_fail_every_time(self):
+        for mode in ('wR', 'rRN', 'x'):
+            for attempt in range(2):
+                with self.assertRaises(pin.PinOpenModeInvalidError):
+                    pin.parse_open_mode(mode)
+            self.assertNotIn(mode, pin._parsed_open_modes)
+
 if __name__ == '__main__':
     unittest.main()
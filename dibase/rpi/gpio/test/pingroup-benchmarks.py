@@ -0,0 +1,76 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Blocking pin list group read microbenchmarks.
+
+    Times polling reads of an 8 pin PinListBlockingReader, returning a new
+    list and reusing one, against the per pin loop it replaced: a dict
+    lookup of each pin's file descriptor, from a fileno() call, and a read
+    of a new string through the value file object. Groups are made without
+    opening GPIO pins, with ordinary files in a temporary directory as pin
+    value files read through their file descriptors with fastio, as for
+    the sys filesystem backend, so the benchmarks can be run on any system.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import sys
+import tempfile
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import run_benchmarks
+
+NUMBER = 20000
+REPEAT = 3
+PINS = 8
+
+def make_group(value_files, reuse_value):
+    ''' Returns a PinListBlockingReader reading value_files '''
+    pins = []
+    for (pin_number, value_file) in enumerate(value_files):
+        p = pin.PinBlockingReader.__new__(pin.PinBlockingReader)
+        p._PinIOBase__value_file = value_file
+        p._PinIOBase__pin_id = gpio(pin_number)
+        p._raw_fd = value_file.fileno()
+        pins.append(p)
+    group = pingroup.PinListBlockingReader.__new__(pingroup.PinListBlockingReader)
+    group._event_queue = None
+    group._pins = pins
+    group._cached_value = [False]*len(pins)
+    group._reuse_value = reuse_value
+    group._index_fds()
+    return group
+
+def dict_lookup_read(group, fd_to_pin_index):
+    ''' Polling read as made before file descriptor indexing '''
+    value = group._cached_value
+    for p in group._pins:
+        pin_index = fd_to_pin_index[p.fileno()]
+        p._value_file().seek(0)
+        value[pin_index] = p._value_file().read()[0]=='1'
+    return value
+
+if __name__ == '__main__':
+    value_files = [tempfile.TemporaryFile() for i in range(PINS)]
+    for value_file in value_files:
+        value_file.write('1\n')
+        value_file.flush()
+    copying = make_group(value_files, False)
+    reusing = make_group(value_files, True)
+    fd_to_pin_index = dict((p.fileno(), i) for (i, p) in enumerate(copying._pins))
+    run_benchmarks( [ ( 'dict lookup, new strings'
+                      , lambda: dict_lookup_read(copying, fd_to_pin_index) )
+                    , ('fd indexed, new list', lambda: copying.read(0))
+                    , ('fd indexed, reused list', lambda: reusing.read(0)) ]
+                  , NUMBER, REPEAT, calls='polling reads of %d pins' % PINS )
+    for group in (copying, reusing):
+        for p in group._pins:
+            p._PinIOBase__value_file = None # closed without unexporting
+    for value_file in value_files:
+        value_file.close()
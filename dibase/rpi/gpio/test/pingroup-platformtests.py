@@ -9,6 +9,7 @@
     License: dual: GPL or BSD.
 '''
 
+import array
 import collections
 import time
 import unittest
@@ -240,6 +241,42 @@ class PinWordReaderPlatformTests(unittest.TestCase):
         self.assertIsInstance(a_pin_group.read(), (int,long))
         a_pin_group.close()
 
+    def test_read_many_returns_array_of_n_values(self):
+        a_pin_group = pingroup.PinWordReader([23,4,7])
+        values = a_pin_group.read_many(10)
+        self.assertIsInstance(values, array.array)
+        self.assertEqual(len(values), 10)
+        for value in values:
+            self.assertTrue(value>=0 and value<8)
+        a_pin_group.close()
+
+    def test_read_many_fills_passed_buffer(self):
+        a_pin_group = pingroup.PinWordReader([23,4,7])
+        buffer = array.array('H',[0xffff])*5
+        self.assertIs(a_pin_group.read_many(5, out=buffer), buffer)
+        for value in buffer:
+            self.assertTrue(value>=0 and value<8)
+        a_pin_group.close()
+
+    def test_read_many_too_small_buffer_raises_ValueError(self):
+        a_pin_group = pingroup.PinWordReader([23,4,7])
+        with self.assertRaises( ValueError ):
+            a_pin_group.read_many(5, out=array.array('H',[0]))
+        a_pin_group.close()
+
+    def test_read_many_paced_takes_expected_time(self):
+        a_pin_group = pingroup.PinWordReader([23,4,7])
+        start = time.time()
+        a_pin_group.read_many(10, 0.01)
+        self.assertGreaterEqual(time.time()-start, 0.09)
+        a_pin_group.close()
+
+    def test_read_many_closed_group_raises_ValueError(self):
+        a_pin_group = pingroup.PinWordReader([23,4,7])
+        a_pin_group.close()
+        with self.assertRaises( ValueError ):
+            a_pin_group.read_many(1)
+
 class PinListReaderPlatformTests(unittest.TestCase):
     def tearDown(self):
         cleaned_up = []
@@ -333,6 +370,14 @@ class PinListReaderPlatformTests(unittest.TestCase):
         self.assertIsInstance(a_pin_group.read(), collections.Iterable)
         a_pin_group.close()
 
+    def test_read_many_returns_n_values_of_group_length(self):
+        a_pin_group = pingroup.PinListReader([23,4,7])
+        values = a_pin_group.read_many(10)
+        self.assertEqual(len(values), 10)
+        for value in values:
+            self.assertEqual(len(value), 3)
+        a_pin_group.close()
+
 class PinWordBlockingReaderPlatformTests(unittest.TestCase):
     def tearDown(self):
         cleaned_up = []
@@ -668,6 +713,33 @@ class PinWordWriterPlatformTests(unittest.TestCase):
             a_pin_group.write(8)
         a_pin_group.close()
 
+    def test_write_many_accepts_list_and_array(self):
+        a_pin_group = pingroup.PinWordWriter([23,4,7])
+        a_pin_group.write_many([0,1,2,3,4,5,6,7])
+        a_pin_group.write_many(array.array('H',[7,6,5,4,3,2,1,0]))
+        a_pin_group.close()
+
+    def test_write_many_out_of_range_value_raises_ValueError(self):
+        a_pin_group = pingroup.PinWordWriter([23,4,7])
+        with self.assertRaises( ValueError ):
+            a_pin_group.write_many([0,1,8])
+        with self.assertRaises( ValueError ):
+            a_pin_group.write_many([-1,0,1])
+        a_pin_group.close()
+
+    def test_write_many_paced_takes_expected_time(self):
+        a_pin_group = pingroup.PinWordWriter([23,4,7])
+        start = time.time()
+        a_pin_group.write_many([0,7]*5, 0.01)
+        self.assertGreaterEqual(time.time()-start, 0.09)
+        a_pin_group.close()
+
+    def test_write_many_closed_group_raises_ValueError(self):
+        a_pin_group = pingroup.PinWordWriter([23,4,7])
+        a_pin_group.close()
+        with self.assertRaises( ValueError ):
+            a_pin_group.write_many([0])
+
 class PinListWriterPlatformTests(unittest.TestCase):
     def tearDown(self):
         cleaned_up = []
@@ -785,5 +857,16 @@ class PinListWriterPlatformTests(unittest.TestCase):
         a_pin_group.write([False,0,[]])
         a_pin_group.close()
 
+    def test_write_many_wrong_number_of_elements_raises_TypeError(self):
+        a_pin_group = pingroup.PinListWriter([23,4,7])
+        with self.assertRaises( TypeError ):
+            a_pin_group.write_many([[1,1,1],[1,1]])
+        a_pin_group.close()
+
+    def test_write_many_right_number_of_elements_raises_nothing(self):
+        a_pin_group = pingroup.PinListWriter([23,4,7])
+        a_pin_group.write_many([[True,False,True],[False,True,False]])
+        a_pin_group.close()
+
 if __name__ == '__main__':
     unittest.main()
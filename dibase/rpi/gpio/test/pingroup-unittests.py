@@ -12,11 +12,13 @@
 '''
 
 import unittest
+import array
 import sys
 if __name__ == '__main__':
 # Add path to directory containing the dibase package directory
     sys.path.insert(0, './../../../..') 
 from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio.gpioerror import PinOpenModeInvalidError
 
 class FormatModeUnitTests(unittest.TestCase):
     def test_integer_open_mode_is_valid(self):
@@ -53,6 +55,53 @@ class FormatModeUnitTests(unittest.TestCase):
         with self.assertRaises(pingroup.PinGroupFormatModeInvalidError):
             pingroup.FormatMode(bad_open_mode_str)
 
+    def test_instances_are_interned(self):
+        for mode in pingroup.FormatMode.all_format_open_mode_characters():
+            self.assertIs(pingroup.FormatMode(mode), pingroup.FormatMode(mode))
+
+class ParseOpenModeUnitTests(unittest.TestCase):
+    def test_parsed_modes_are_remembered(self):
+        (direction_mode, blocking_mode, format_mode) = pingroup.parse_open_mode('rS')
+        self.assertTrue(direction_mode.is_read())
+        self.assertFalse(blocking_mode.is_blocking())
+        self.assertTrue(format_mode.is_sequence())
+        self.assertIs(pingroup.parse_open_mode('rS'), pingroup.parse_open_mode('rS'))
+
+    def test_bad_modes_fail_every_time(self):
+        for mode in ('wRI', 'rX', 'rNIS'):
+            for attempt in range(2):
+                with self.assertRaises(PinOpenModeInvalidError):
+                    pingroup.parse_open_mode(mode)
+            self.assertNotIn(mode, pingroup._parsed_open_modes)
+
+class WordTypecodeUnitTests(unittest.TestCase):
+    def test_typecode_items_hold_requested_number_of_bits(self):
+        for bits in range(1,33):
+            typecode = pingroup._word_typecode(bits)
+            self.assertGreaterEqual(array.array(typecode).itemsize*8, bits)
+
+    def test_smallest_typecode_selected(self):
+        self.assertEqual(pingroup._word_typecode(8), 'B')
+        self.assertEqual(pingroup._word_typecode(9), 'H')
+        self.assertEqual(pingroup._word_typecode(16), 'H')
+
+    def test_too_many_bits_raises_ValueError(self):
+        with self.assertRaises(ValueError):
+            pingroup._word_typecode(1000)
+
+class AsListUnitTests(unittest.TestCase):
+    def test_lists_and_tuples_returned_as_is(self):
+        a_list = [1,2,3]
+        a_tuple = (1,2,3)
+        self.assertIs(pingroup._as_list(a_list), a_list)
+        self.assertIs(pingroup._as_list(a_tuple), a_tuple)
+
+    def test_array_converted_to_list(self):
+        self.assertEqual(pingroup._as_list(array.array('H',[1,2,3])), [1,2,3])
+
+    def test_iterable_converted_to_list(self):
+        self.assertEqual(pingroup._as_list(iter([3,2,1])), [3,2,1])
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,46 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    GPIO pin id creation rate microbenchmarks.
+
+    Times the PinId factory class methods, which return shared instances,
+    against constructing a new PinId with a validator, as was done by each
+    factory call before instances were shared. The board revision is set
+    explicitly so the benchmarks can be run on any system.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import sys
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..') 
+from dibase.rpi.gpio.test.support import run_benchmarks
+
+NUMBER = 200000
+REPEAT = 3
+
+SETUP = '''
+from dibase.rpi.gpio.pinid import PinId, PinIdValidator, RPiPinIdSet
+PinId._set_rpi_gpio_revision(3)
+PinId.gpio(4)
+valid_ids = RPiPinIdSet.valid_ids(2)
+'''
+
+CASES = [ ('PinId(4, PinIdValidator(...))', 'PinId(4, PinIdValidator(valid_ids))')
+        , ('PinId.gpio(4)', 'PinId.gpio(4)')
+        , ('PinId.gpio("4")', 'PinId.gpio("4")')
+        , ('PinId.any_chip_gpio(40)', 'PinId.any_chip_gpio(40)')
+        , ('PinId.p1_pin(11)', 'PinId.p1_pin(11)')
+        , ('PinId.p1_sda()', 'PinId.p1_sda()')
+        , ('PinId.p5_gpio_gen7() (invalid)', '''
+try:
+    PinId.p5_gpio_gen7()
+except Exception:
+    pass''')
+        ]
+
+if __name__ == '__main__':
+    run_benchmarks(CASES, NUMBER, REPEAT, SETUP)
@@ -13,6 +13,8 @@
 
 import unittest
 
+import os
+import subprocess
 import sys
 if __name__ == '__main__':
 # Add path to directory containing the dibase package directory
@@ -38,6 +40,17 @@ class PinIdValidatorTestCases(unittest.TestCase):
       self.assertFalse( validator(None) )
       self.assertFalse( validator("Nan") )
 
+  def test_with_string_and_float_values(self):
+      validator = pinid.PinIdValidator( frozenset([2,3,4]) )
+      self.assertTrue( validator("3") )
+      self.assertTrue( validator(4.0) )
+      self.assertFalse( validator("5") )
+      self.assertFalse( validator([3]) )
+
+  def test_with_empty_set(self):
+      validator = pinid.PinIdValidator( frozenset() )
+      self.assertFalse( validator(0) )
+
 class AllChipPinIdSetUnitTests(unittest.TestCase):
   def test_all_valid_chip_pin_ids_pass_validation(self):
     for v in pinid.AllChipPinIdSet.valid_ids():
@@ -1016,5 +1029,55 @@ class PinIdRPiRev4UnitTestCases(unittest.TestCase):
     with self.assertRaises( pinid.PinIdInvalidError ):
       pinid.PinId.p5_gpio_gen10()
 
+class PinIdSharedInstanceUnitTestCases(unittest.TestCase):
+  def setUp(self):
+    pinid.PinId._set_rpi_gpio_revision(2)
+
+  def test_gpio_returns_same_instance_for_same_value(self):
+    self.assertIs( pinid.PinId.gpio(4), pinid.PinId.gpio(4) )
+    self.assertIs( pinid.PinId.gpio("4"), pinid.PinId.gpio(4) )
+    self.assertIs( pinid.PinId.gpio(pinid.PinId.gpio(4)), pinid.PinId.gpio(4) )
+
+  def test_gpio_and_any_chip_gpio_share_instances(self):
+    self.assertIs( pinid.PinId.gpio(17), pinid.PinId.any_chip_gpio(17) )
+
+  def test_connector_pin_factories_return_shared_instances(self):
+    self.assertIs( pinid.PinId.p1_sda(), pinid.PinId.gpio(2) )
+    self.assertIs( pinid.PinId.p1_pin("3"), pinid.PinId.p1_sda() )
+    self.assertIs( pinid.PinId.p5_gpio_gen7(), pinid.PinId.gpio(28) )
+
+  def test_shared_instances_are_PinIds(self):
+    self.assertIsInstance( pinid.PinId.gpio(4), pinid.PinId )
+    self.assertIsInstance( pinid.PinId.p1_sda(), pinid.PinId )
+
+  def test_revision_change_updates_connector_mappings(self):
+    self.assertEqual( pinid.PinId.p1_sda(), 2 )
+    pinid.PinId._set_rpi_gpio_revision(1)
+    self.assertEqual( pinid.PinId.p1_sda(), 0 )
+    with self.assertRaises( pinid.PinIdInvalidError ):
+      pinid.PinId.gpio(2)
+    pinid.PinId._set_rpi_gpio_revision(2)
+    self.assertEqual( pinid.PinId.p1_sda(), 2 )
+    with self.assertRaises( pinid.PinIdInvalidError ):
+      pinid.PinId.gpio(0)
+
+  def test_unhashable_value_to_gpio_raises_PinIdInvalidError(self):
+    with self.assertRaises( pinid.PinIdInvalidError ):
+      pinid.PinId.gpio([4])
+
+class PinIdImportUnitTestCases(unittest.TestCase):
+  def test_registry_not_imported_until_used(self):
+      dibase_parent = os.path.normpath( os.path.join( os.path.dirname(pinid.__file__)
+                                                    , '..', '..', '..' ) )
+      statement = ( "import sys; sys.path.insert(0, %r)\n"
+                    "from dibase.rpi.gpio import pinid\n"
+                    "pinid.PinId.any_chip_gpio(4)\n"
+                    "print 'json' in sys.modules, "
+                    "'dibase.rpi.gpio.pinregistry' in sys.modules\n"
+                    "pinid.PinId._set_rpi_gpio_revision(2)\n"
+                    "print 'json' in sys.modules\n" % dibase_parent )
+      output = subprocess.check_output([sys.executable, '-c', statement])
+      self.assertEqual(output.split(), ['False', 'False', 'True'])
+
 if __name__ == '__main__':
   unittest.main()
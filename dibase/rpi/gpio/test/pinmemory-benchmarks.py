@@ -0,0 +1,95 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Pin and pin group per handle memory benchmarks.
+
+    Reports the size of a __slots__ pin object against an object holding
+    the same attributes in an instance __dict__, as pin objects did, and
+    the time taken to look up an attribute of each. Then opens many pins
+    and 8 pin groups with the test support module's in memory backend,
+    all sharing one line, so that only the cost of the pin and group
+    objects is measured, and reports the growth of the process' resident
+    set size per open handle.
+    Resident set sizes are read from /proc/self/statm so are only
+    reported on Linux.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import gc
+import os
+import sys
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio.test.support import best_time
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+from dibase.rpi.gpio.test.support import MemoryLine
+
+HANDLES = 10000
+NUMBER = 1000000
+REPEAT = 3
+GROUP_PINS = 8
+
+class DictPinReader(object):
+    ''' Object with the instance __dict__ attributes of unslotted PinReaders '''
+    def __init__(self, line, pin_id, backend):
+        self._PinIOBase__value_file = line
+        self._PinIOBase__owns_pin = False
+        self._PinIOBase__backend = backend
+        self._PinIOBase__pin_id = pin_id
+        self._raw_fd = None
+        self._samples = 1
+
+def instance_size(obj):
+    ''' Returns the bytes used by obj and any instance __dict__ '''
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def resident_bytes():
+    ''' Returns the process' resident set size in bytes, None if unknown '''
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        return None
+
+def bytes_per_handle(open_handle):
+    ''' Returns the resident set growth per handle of HANDLES open_handle() calls '''
+    gc.collect()
+    before = resident_bytes()
+    handles = [open_handle(i) for i in xrange(HANDLES)]
+    after = resident_bytes()
+    for handle in handles:
+        handle.close()
+    if before==None or after==None:
+        return None
+    return float(after-before)/HANDLES
+
+if __name__ == '__main__':
+    backend = MemoryBackend(MemoryLine())
+    pin_ids = [gpio(i) for i in range(GROUP_PINS)]
+    slotted = pin.PinReader(pin_ids[0], backend)
+    unslotted = DictPinReader(backend.line, pin_ids[0], backend)
+    print 'Pin object sizes and best of', REPEAT, 'runs of', NUMBER, 'attribute lookups:'
+    for (name, obj) in (('instance __dict__ PinReader', unslotted), ('__slots__ PinReader', slotted)):
+        seconds = best_time(lambda: obj._raw_fd, NUMBER, REPEAT)
+        print '%-34s %8d bytes %8.3f us/lookup' % (name, instance_size(obj), seconds*1e6)
+    slotted.close()
+    print 'Resident set growth per open handle of', HANDLES, 'handles:'
+    for (name, open_handle) in \
+            ( ('PinReader', lambda i: pin.PinReader(pin_ids[i%GROUP_PINS], backend))
+            , ( '%d pin PinWordReader' % GROUP_PINS
+              , lambda i: pingroup.PinWordReader(pin_ids, backend) ) ):
+        size = bytes_per_handle(open_handle)
+        if size==None:
+            print '%-34s %8s' % (name, 'unknown')
+        else:
+            print '%-34s %8.0f bytes' % (name, size)
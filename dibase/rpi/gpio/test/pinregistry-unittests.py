@@ -0,0 +1,150 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Connector pin assignment registry unit tests.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import os
+import json
+import tempfile
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pinregistry
+from dibase.rpi.gpio.pinregistry import PinRegistry, BoardPins, ConnectorPin
+from dibase.rpi.gpio import pinid
+from dibase.rpi.gpio.gpioerror import PinIdInvalidError
+
+class BoardPinsUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.board = BoardPins( 9, 'Test board'
+                              , {'J1':['3V3','GPIO2:SDA','GND','GPIO7']}
+                              , {'P1':'J1'}
+                              )
+
+    def test_gpio_pin_ids_maps_pin_numbers_from_1(self):
+        self.assertEqual(self.board.gpio_pin_ids('J1'), (None,None,2,None,7))
+
+    def test_gpio_pin_ids_by_alias(self):
+        self.assertEqual(self.board.gpio_pin_ids('P1'), (None,None,2,None,7))
+
+    def test_missing_connector_maps_no_pins(self):
+        self.assertEqual(self.board.gpio_pin_ids('P5'), (None,))
+        self.assertEqual(self.board.pin_names('P5'), (None,))
+        self.assertFalse(self.board.has_connector('P5'))
+        self.assertTrue(self.board.has_connector('P1'))
+
+    def test_pin_names(self):
+        self.assertEqual(self.board.pin_names('J1'), (None,'3V3','SDA','GND','GPIO7'))
+
+    def test_gpio_pin_id_out_of_range_is_none(self):
+        self.assertIsNone(self.board.gpio_pin_id('J1', 0))
+        self.assertIsNone(self.board.gpio_pin_id('J1', 5))
+        self.assertIsNone(self.board.gpio_pin_id('J1', -1))
+        self.assertIsNone(self.board.gpio_pin_id('J1', '2'))
+        self.assertEqual(self.board.gpio_pin_id('J1', 2), 2)
+
+    def test_valid_ids(self):
+        self.assertEqual(self.board.valid_ids(), frozenset([2,7]))
+
+    def test_connector_pin_reverse_lookup(self):
+        self.assertEqual(self.board.connector_pin(7), ConnectorPin('J1',4))
+        self.assertIsNone(self.board.connector_pin(3))
+        self.assertIsNone(self.board.connector_pin(54))
+        self.assertIsNone(self.board.connector_pin(None))
+
+    def test_function_name(self):
+        self.assertEqual(self.board.function_name(2), 'SDA')
+        self.assertIsNone(self.board.function_name(3))
+
+    def test_describe_connector_pin(self):
+        self.assertEqual(self.board.describe_connector_pin('J1',1), 'J1 pin 1 (3V3)')
+        self.assertEqual(self.board.describe_connector_pin('J1',2), 'J1 pin 2 (GPIO 2 SDA)')
+        self.assertEqual( self.board.describe_connector_pin('J1',9)
+                        , 'J1 pin 9 (no such pin on this board)'
+                        )
+
+    def test_invalid_gpio_pin_id_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            BoardPins(9, 'Bad board', {'J1':['GPIO54']}, {})
+
+class PinRegistryUnitTests(unittest.TestCase):
+    def tearDown(self):
+        PinRegistry.load()
+
+    def test_default_registry_boards(self):
+        self.assertEqual(PinRegistry.gpio_revisions(), (1,2,3,4))
+
+    def test_default_registry_matches_connector_layouts(self):
+        self.assertEqual(PinRegistry.board(0).gpio_pin_id('P1',3), 0)
+        self.assertEqual(PinRegistry.board(1).gpio_pin_id('P1',3), 2)
+        self.assertEqual(PinRegistry.board(1).gpio_pin_ids('P5'), (None,None,None,28,29,30,31,None,None))
+        self.assertEqual(PinRegistry.board(2).gpio_pin_id('J8',40), 21)
+        self.assertEqual(PinRegistry.board(2).gpio_pin_id('P1',40), 21)
+        self.assertEqual(PinRegistry.board(3).valid_ids(), frozenset())
+
+    def test_default_registry_reverse_lookup(self):
+        self.assertEqual(PinRegistry.board(1).connector_pin(28), ConnectorPin('P5',3))
+        self.assertEqual(PinRegistry.board(1).function_name(28), 'GPIO_GEN7')
+        self.assertEqual(PinRegistry.board(2).connector_pin(4), ConnectorPin('J8',7))
+
+    def test_unregistered_board_raises_index_error(self):
+        with self.assertRaises(IndexError):
+            PinRegistry.board(99)
+
+    def test_alt_functions(self):
+        self.assertEqual(PinRegistry.alt_functions(14)[0], 'TXD0')
+        self.assertEqual(len(PinRegistry.alt_functions(14)), 6)
+        self.assertEqual(PinRegistry.alt_functions(99), ())
+
+    def test_load_from_data_file(self):
+        (fd, path) = tempfile.mkstemp(suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as data_file:
+                json.dump( {'boards':[ { 'gpio_revision':7, 'name':'New board'
+                                       , 'connectors':{'J8':['GPIO5']}
+                                       }
+                                     ]
+                           }
+                         , data_file
+                         )
+            PinRegistry.load(path)
+            self.assertEqual(PinRegistry.gpio_revisions(), (7,))
+            self.assertEqual(PinRegistry.board(6).gpio_pin_id('J8',1), 5)
+        finally:
+            os.remove(path)
+
+class PinIdErrorMessageUnitTests(unittest.TestCase):
+    def setUp(self):
+        pinid.PinId._set_rpi_gpio_revision(2)
+
+    def test_p1_non_gpio_pin_message_names_pin(self):
+        try:
+            pinid.PinId.p1_pin(2)
+            self.fail('PinIdInvalidError not raised')
+        except PinIdInvalidError, e:
+            self.assertIn('P1 pin 2 (5V)', str(e))
+
+    def test_p5_pin_message_on_board_without_p5(self):
+        pinid.PinId._set_rpi_gpio_revision(3)
+        try:
+            pinid.PinId.p5_pin(3)
+            self.fail('PinIdInvalidError not raised')
+        except PinIdInvalidError, e:
+            self.assertIn('no P5 connector', str(e))
+
+    def test_error_message_starts_with_class_description(self):
+        try:
+            pinid.PinId.gpio(1)
+            self.fail('PinIdInvalidError not raised')
+        except PinIdInvalidError, e:
+            self.assertTrue(str(e).startswith(PinIdInvalidError.__doc__))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,280 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    GPIO pin server, client and protocol unit tests.
+
+    So that no GPIO hardware is needed the server opens fake pin and pin
+    group objects. Fake blocking readers signal edge events by sending TCP
+    out of band data over a loop back connection, which epoll reports as a
+    priority condition as it does GPIO pin edge events.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import os
+import shutil
+import socket
+import tempfile
+import time
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pinclient
+from dibase.rpi.gpio import pinprotocol
+from dibase.rpi.gpio import pinserver
+from dibase.rpi.gpio.gpioerror import PinInUseError
+from dibase.rpi.gpio.gpioerror import PinBlockModeInvalidError
+
+class FakeIO(object):
+    '''
+        Fake pin or pin group object recording calls. If read_error or
+        notified_error is set read or _read_notified raise it.
+    '''
+    def __init__(self, mode):
+        self.mode = mode
+        self.value = 0
+        self.read_error = None
+        self.notified_error = None
+        self.written = []
+        self.write_many_calls = 0
+        self.is_closed = False
+        self.receiver = None
+        if mode[1]!='N':
+            listener = socket.socket()
+            listener.bind(('127.0.0.1', 0))
+            listener.listen(1)
+            self.sender = socket.create_connection(listener.getsockname())
+            (self.receiver, address) = listener.accept()
+            listener.close()
+
+    def blocking(self):
+        return self.receiver!=None
+
+    def file_descriptors(self):
+        return [self.receiver.fileno()]
+
+    def read(self, timeout=None):
+        if self.read_error!=None:
+            raise self.read_error
+        return self.value
+
+    def _read_notified(self, fds):
+        if self.notified_error!=None:
+            raise self.notified_error
+        try:
+            self.value = ord(self.receiver.recv(1, socket.MSG_OOB))
+        except socket.error:
+            pass # no out of band data
+        return self.value
+
+    def edge(self, value):
+        self.sender.send(chr(value), socket.MSG_OOB)
+
+    def write(self, value):
+        if value>=256:
+            raise ValueError('value out of range')
+        self.written.append(value)
+
+    def write_many(self, values):
+        self.write_many_calls += 1
+        self.written.extend(values)
+
+    def close(self):
+        self.is_closed = True
+        if self.receiver!=None:
+            self.sender.close()
+            self.receiver.close()
+
+def wait_for(predicate, timeout=5.0):
+    ''' Wait until predicate() is True or timeout seconds have passed '''
+    deadline = time.time()+timeout
+    while not predicate() and time.time()<deadline:
+        time.sleep(0.001)
+    return predicate()
+
+class PinProtocolUnitTests(unittest.TestCase):
+    def test_split_messages(self):
+        data = pinprotocol.message(pinprotocol.READ, 3) \
+               + pinprotocol.message(pinprotocol.WRITE, 4, pinprotocol.write_payload([5, 6]))
+        (messages, remaining) = pinprotocol.split_messages(data+data[:5])
+        self.assertEqual( messages
+                        , [ (pinprotocol.READ, 3, '')
+                          , (pinprotocol.WRITE, 4, pinprotocol.write_payload([5, 6]))
+                          ]
+                        )
+        self.assertEqual(remaining, data[:5])
+        self.assertEqual(pinprotocol.parse_write_payload(messages[1][2]), [5, 6])
+
+    def test_payload_too_long(self):
+        data = pinprotocol.HEADER.pack(pinprotocol.WRITE, 1, pinprotocol.MAX_PAYLOAD+1)
+        with self.assertRaises(ValueError):
+            pinprotocol.split_messages(data)
+
+    def test_open_payload(self):
+        payload = pinprotocol.open_payload(True, 'rB', [4, 17])
+        self.assertEqual(pinprotocol.parse_open_payload(payload), (True, 'rB', [4, 17]))
+
+    def test_malformed_open_payload(self):
+        with self.assertRaises(ValueError):
+            pinprotocol.parse_open_payload(pinprotocol.open_payload(False, 'r', [4, 17]))
+
+    def test_error_payload(self):
+        payload = pinprotocol.error_payload(pinprotocol.WRITE, ValueError('bad'))
+        self.assertEqual( pinprotocol.parse_error_payload(payload)
+                        , (pinprotocol.WRITE, 'ValueError', 'bad')
+                        )
+
+class PinServerUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'gpio.sock')
+        self.opened = []
+        self.server = pinserver.PinServer(self.path, self.open)
+        self.server.start()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def open(self, group, mode, pin_ids):
+        if 99 in pin_ids:
+            raise PinInUseError('pin 99')
+        fake = FakeIO(mode)
+        if 98 in pin_ids:
+            fake.read_error = IOError('pin 98 unreadable')
+        self.opened.append((group, mode, pin_ids, fake))
+        return fake
+
+    def client(self):
+        client = pinclient.PinClient(self.path)
+        self.clients.append(client)
+        return client
+
+    def test_second_server_on_same_socket_rejected(self):
+        with self.assertRaises(socket.error):
+            pinserver.PinServer(self.path, self.open)
+
+    def test_open_and_close_pin(self):
+        p = self.client().open_pin(4, 'w')
+        self.assertTrue(p.writable())
+        self.assertEqual(self.opened[0][0:3], (False, 'wN', [4]))
+        p.close()
+        self.assertTrue(p.closed())
+        self.assertTrue(wait_for(lambda: self.opened[0][3].is_closed))
+        self.assertTrue(wait_for(lambda: self.server.stats()['open']==0))
+
+    def test_pin_writes(self):
+        p = self.client().open_pin(4, 'w')
+        p.write(1)
+        p.write('0')
+        self.assertTrue(wait_for(lambda: self.opened[0][3].written==[1, 0]))
+
+    def test_batched_group_writes_use_write_many(self):
+        client = self.client()
+        group = client.open_pingroup([4, 17], 'wS')
+        self.assertEqual(self.opened[0][0:3], (True, 'wN', [4, 17]))
+        with client.batch():
+            group.write([True, False])
+            group.write([False, True])
+            group.write([True, True])
+        fake = self.opened[0][3]
+        self.assertTrue(wait_for(lambda: fake.written==[1, 2, 3]))
+        self.assertEqual(fake.write_many_calls, 1)
+
+    def test_out_of_range_group_value_rejected_by_client(self):
+        group = self.client().open_pingroup([4, 17], 'w')
+        with self.assertRaises(ValueError):
+            group.write(4)
+
+    def test_failed_write_raised_by_next_request(self):
+        client = self.client()
+        writer = client.open_pingroup(range(10), 'w')
+        reader = client.open_pin(4)
+        writer.write(300)
+        with self.assertRaises(ValueError):
+            reader.read()
+        self.assertFalse(reader.read())
+
+    def test_reads(self):
+        client = self.client()
+        p = client.open_pin(4)
+        group = client.open_pingroup([4, 17, 18], 'rS')
+        self.opened[0][3].value = 1
+        self.opened[1][3].value = 5
+        self.assertTrue(p.read())
+        self.assertEqual(group.read(), [True, False, True])
+
+    def test_open_error_raised_by_client(self):
+        with self.assertRaises(PinInUseError) as context:
+            self.client().open_pin(99)
+        self.assertIn('pin 99', str(context.exception))
+
+    def test_invalid_mode_rejected_by_client(self):
+        with self.assertRaises(PinBlockModeInvalidError):
+            self.client().open_pin(4, 'wB')
+        self.assertEqual(self.opened, [])
+
+    def test_events_fanned_out_to_all_clients(self):
+        readers = [self.client().open_pingroup([4, 17], 'rB') for i in range(2)]
+        self.assertEqual(len(self.opened), 1)
+        fake = self.opened[0][3]
+        self.assertEqual(readers[0].read(0.01), None)
+        fake.edge(2)
+        for reader in readers:
+            self.assertEqual(reader.read(5.0), 2)
+        self.assertEqual(self.server.stats()['events'], 1)
+
+    def test_blocking_read_returns_immediately_after_edge(self):
+        reader = self.client().open_pin(4, 'rR')
+        self.opened[0][3].edge(1)
+        self.assertTrue(wait_for(lambda: self.server.stats()['events']==1))
+        time.sleep(0.01)
+        self.assertTrue(reader.read(0.5))
+        self.assertEqual(reader.read(0.01), None)
+
+    def test_pin_closed_if_setting_up_open_pin_fails(self):
+        with self.assertRaises(IOError):
+            self.client().open_pin(98, 'rB')
+        self.assertTrue(self.opened[0][3].is_closed)
+        self.assertEqual(self.server.stats()['open'], 0)
+
+    def test_failed_event_read_closes_reader_not_server(self):
+        clients = [self.client() for i in range(2)]
+        readers = [client.open_pin(4, 'rB') for client in clients]
+        fake = self.opened[0][3]
+        fake.notified_error = IOError('edge read failed')
+        fake.edge(1)
+        for reader in readers:
+            with self.assertRaises(IOError) as context:
+                reader.read(5.0)
+            self.assertIn('edge read failed', str(context.exception))
+        self.assertTrue(fake.is_closed)
+        self.assertEqual(self.server.stats()['open'], 0)
+        with self.assertRaises(IOError):
+            readers[0].read(0)
+        readers[0].close()
+        p = clients[0].open_pin(4, 'rB')
+        self.opened[1][3].edge(1)
+        self.assertTrue(p.read(5.0))
+        readers[1].close()
+        self.assertTrue(wait_for(lambda: self.server.stats()['open']==1))
+
+    def test_shared_object_closed_with_last_client(self):
+        clients = [self.client() for i in range(2)]
+        readers = [client.open_pin(4, 'rB') for client in clients]
+        fake = self.opened[0][3]
+        clients[0].close()
+        self.assertTrue(wait_for(lambda: self.server.stats()['connections']==1))
+        self.assertFalse(fake.is_closed)
+        readers[1].close()
+        self.assertTrue(wait_for(lambda: fake.is_closed))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Fixed rate against adaptive polling benchmarks.
+
+    Waits for a change on a pin of the test support module's in memory
+    backend that changes once, after a period stable, polling at a fixed
+    1ms interval (a back off of 1) and adaptively backing off from 1ms, and
+    reports the polls made and CPU time used while waiting and how late the
+    change was detected.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+import sys
+import threading
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import polling
+from dibase.rpi.gpio import timing
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+
+STABLE_TIME = 2.0
+
+def wait_for_change(backoff, max_interval):
+    '''
+        Returns the polls, CPU seconds and detection latency in seconds of
+        waiting for a change STABLE_TIME seconds away.
+    '''
+    backend = MemoryBackend()
+    reader = pin.PinReader(gpio(4), backend)
+    with polling.PollingReader(reader, 'B', 0.001, max_interval, backoff) as poller:
+        change_time = timing.monotonic()+STABLE_TIME
+        timer = threading.Timer(STABLE_TIME, lambda: setattr(backend.lines[4], 'level', '1'))
+        timer.start()
+        cpu_start = sum(os.times()[0:2])
+        poller.read()
+        latency = timing.monotonic()-change_time
+        cpu = sum(os.times()[0:2])-cpu_start
+        timer.join()
+        return (poller.stats()['polls'], cpu, latency)
+
+if __name__ == '__main__':
+    print 'Waiting', STABLE_TIME, 's for a change:'
+    print '%-34s %8s %8s %12s' % ('', 'polls', 'CPU ms', 'latency ms')
+    for (name, backoff, max_interval) in ( ('fixed 1ms', 1.0, 0.001)
+                                         , ('adaptive 1ms to 10ms', 2.0, 0.01)
+                                         , ('adaptive 1ms to 100ms', 2.0, 0.1) ):
+        (polls, cpu, latency) = wait_for_change(backoff, max_interval)
+        print '%-34s %8d %8.1f %12.1f' % (name, polls, cpu*1e3, latency*1e3)
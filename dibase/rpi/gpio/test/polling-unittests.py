@@ -0,0 +1,145 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Adaptive polling reader unit tests.
+
+    Pins are opened with the test support module's in memory backend,
+    whose line levels the tests change, from timer threads where a change
+    must happen while a read is waiting.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import threading
+import time
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio import polling
+from dibase.rpi.gpio import timing
+from dibase.rpi.gpio.gpioerror import PinBlockModeInvalidError
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+
+class PollingReaderUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.backend = MemoryBackend()
+        self.timers = []
+
+    def tearDown(self):
+        for timer in self.timers:
+            timer.cancel()
+
+    def set_level_after(self, delay, pin_number, level):
+        timer = threading.Timer( delay, lambda: setattr( self.backend.lines[pin_number]
+                                                       , 'level', level ) )
+        self.timers.append(timer)
+        timer.start()
+
+    def polling_pin(self, pin_number, *args, **kwargs):
+        return polling.PollingReader( pin.PinReader(gpio(pin_number), self.backend)
+                                    , *args, **kwargs )
+
+    def test_bad_parameters(self):
+        for (mode, min_interval, max_interval, backoff) in \
+                (('B', 0, 0.1, 2), ('B', 0.1, 0.01, 2), ('B', 0.01, 0.1, 0.5)):
+            with self.assertRaises(ValueError):
+                self.polling_pin(4, mode, min_interval, max_interval, backoff)
+        with self.assertRaises(PinBlockModeInvalidError):
+            self.polling_pin(4, 'N')
+
+    def test_interface(self):
+        with self.polling_pin(4) as reader:
+            self.assertTrue(reader.readable())
+            self.assertFalse(reader.writable())
+            self.assertTrue(reader.blocking())
+            self.assertEqual(reader.file_descriptors(), [])
+            self.assertIsInstance(reader.reader(), pin.PinReader)
+        self.assertTrue(reader.closed())
+        self.assertTrue(reader.reader().closed())
+        with self.assertRaises(ValueError):
+            reader.read(0)
+
+    def test_interval_backs_off_while_stable(self):
+        with self.polling_pin(4, 'B', 0.001, 0.008, 2.0) as reader:
+            self.assertEqual(reader.read(0.05), None)
+            self.assertEqual(reader.interval(), 0.008)
+            stats = reader.stats()
+            # 1, 2, 4 then 8ms intervals: far fewer polls than at 1ms
+            self.assertTrue(4<=stats['polls']<=12)
+            self.assertEqual(stats['changes'], 0)
+            self.assertTrue(0<stats['sample_rate']<1000)
+
+    def test_read_returns_on_change_and_interval_tightens(self):
+        with self.polling_pin(4, 'B', 0.001, 0.02) as reader:
+            self.assertEqual(reader.read(0.05), None)
+            self.set_level_after(0.01, 4, '1')
+            start = timing.monotonic()
+            self.assertIs(reader.read(1.0), True)
+            self.assertTrue(timing.monotonic()-start<0.5)
+            self.assertEqual(reader.interval(), 0.001)
+            self.assertEqual(reader.stats()['changes'], 1)
+
+    def test_edge_modes(self):
+        with self.polling_pin(4, 'R', 0.001, 0.005) as reader:
+            self.backend.lines[4].level = '1'
+            self.assertIs(reader.read(0.05), True)
+            self.backend.lines[4].level = '0'
+            self.assertEqual(reader.read(0.02), None)   # falling edge ignored
+        with self.polling_pin(17, 'F', 0.001, 0.005) as reader:
+            self.backend.lines[17].level = '1'
+            self.assertEqual(reader.read(0.02), None)
+            self.backend.lines[17].level = '0'
+            self.assertIs(reader.read(0.05), False)
+
+    def test_polling_read(self):
+        with self.polling_pin(4) as reader:
+            self.assertIs(reader.read(0), False)
+            self.backend.lines[4].level = '1'
+            self.assertIs(reader.read(0), True)
+            self.assertEqual(reader.stats()['changes'], 1)
+
+    def test_group_changes_recorded_as_events(self):
+        group = pingroup.PinWordReader([gpio(4), gpio(17), gpio(22)], self.backend)
+        with polling.PollingReader(group, 'B', 0.001, 0.005, event_queue_size=8) as reader:
+            self.backend.lines[4].level = '1'
+            self.backend.lines[22].level = '1'
+            self.assertEqual(reader.read(0.05), 5)
+            self.backend.lines[22].level = '0'
+            self.assertEqual(reader.read(0.05), 1)
+            events = reader.event_queue().drain()
+            self.assertEqual( [(event.pin_index, event.level) for event in events]
+                            , [(0, True), (2, True), (2, False)] )
+            self.assertEqual(events[0].time, events[1].time)
+
+    def test_list_reader(self):
+        group = pingroup.PinListReader([gpio(4), gpio(17)], self.backend)
+        with polling.PollingReader(group, 'R', 0.001, 0.005) as reader:
+            self.backend.lines[17].level = '1'
+            self.assertEqual(reader.read(0.05), [False, True])
+
+    def test_event_callbacks(self):
+        calls = []
+        with self.polling_pin(4, 'B', 0.001, 0.005) as reader:
+            handle = reader.add_event_callback(lambda r, value, t: calls.append((r, value)))
+            self.set_level_after(0.01, 4, '1')
+            self.set_level_after(0.05, 4, '0')
+            deadline = timing.monotonic()+2.0
+            while len(calls)<2 and timing.monotonic()<deadline:
+                time.sleep(0.005)
+            reader.remove_event_callback(handle)
+            self.assertEqual(calls, [(reader, True), (reader, False)])
+            self.assertEqual(handle.stats.calls, 2)
+            self.assertTrue(reader.stats()['sample_rate']>0)
+            self.backend.lines[4].level = '1'
+            time.sleep(0.02)
+            self.assertEqual(len(calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
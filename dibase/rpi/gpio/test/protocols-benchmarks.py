@@ -0,0 +1,108 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Sensor protocol decoder benchmarks.
+
+    Times decoding DHT22 and 1-Wire edge traces and reports the proportion
+    decoded correctly as the pulse widths are jittered, as they are when
+    captured by a polling loop that is preempted or slow. Pass the paths
+    of traces recorded with protocols.save_edges as arguments to time
+    decoding those instead: files with 'dht' in their name are decoded as
+    DHT22 responses, others as 1-Wire captures.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import sys
+import os
+import random
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import protocols
+from dibase.rpi.gpio.gpioerror import PinProtocolError
+from dibase.rpi.gpio.test.support import best_time
+
+NUMBER = 200
+TRIALS = 500
+US = 0.000001
+
+DHT22_DATA = [0x02, 0x8c, 0x80, 0x65, 0x73]
+SCRATCHPAD = [0x91, 0x01, 0x4b, 0x46, 0x7f, 0xff, 0x0f, 0x10]
+SCRATCHPAD.append(protocols.crc8(SCRATCHPAD))
+
+def jittered_edges(levels, jitter):
+    '''
+        Returns the edges of a waveform given as (level, duration) pairs,
+        each edge seen up to jitter seconds late
+    '''
+    edges = [(0.0, levels[0][0])]
+    when = 0.0
+    for (level, duration) in levels:
+        if level!=edges[-1][1]:
+            edges.append((max(when+random.uniform(0, jitter), edges[-1][0]), level))
+        when += duration
+    return edges
+
+def dht_levels(data):
+    levels = [(True, 30*US), (False, 80*US), (True, 80*US)]
+    for byte in bytearray(data):
+        for bit_number in range(7, -1, -1):
+            levels.extend([(False, 50*US), (True, 70*US if (byte>>bit_number)&1 else 27*US)])
+    return levels+[(False, 50*US), (True, 100*US)]
+
+def onewire_levels(data):
+    levels = [(True, 10*US), (False, 500*US), (True, 30*US), (False, 100*US), (True, 370*US)]
+    for byte in bytearray(data):
+        for bit_number in range(8):
+            low = 6*US if (byte>>bit_number)&1 else 60*US
+            levels.extend([(False, low), (True, 70*US-low)])
+    return levels
+
+def decode_dht(edges):
+    return protocols.decode_dht(edges)
+
+def decode_ds18b20(edges):
+    transactions = protocols.decode_onewire(edges)
+    if not transactions:
+        raise PinProtocolError('no 1-Wire reset captured')
+    (presence, data) = transactions[0]
+    return protocols.decode_ds18b20_scratchpad(data[2:])
+
+def decode_any(decode, edges):
+    ''' Returns the decoded value of edges or None if they are invalid '''
+    try:
+        return decode(edges)
+    except PinProtocolError:
+        return None
+
+def us_per_call(decode, edges):
+    return best_time(lambda: decode_any(decode, edges), NUMBER, 1)*1e6
+
+if __name__ == '__main__':
+    if len(sys.argv)>1:
+        print 'Decoding recorded traces:'
+        for path in sys.argv[1:]:
+            edges = protocols.load_edges(path)
+            decode = decode_dht if 'dht' in os.path.basename(path) else decode_ds18b20
+            print '%-34s %8.3f us/call -> %s' % ( os.path.basename(path)[-34:]
+                                                , us_per_call(decode, edges)
+                                                , decode_any(decode, edges) )
+        sys.exit()
+    traces = [ ('DHT22', decode_dht, dht_levels(DHT22_DATA))
+             , ( '1-Wire DS18B20 scratchpad', decode_ds18b20
+               , onewire_levels([0xcc, 0xbe]+SCRATCHPAD) )
+             ]
+    print 'Decoding synthesised traces, correct decodes of', TRIALS, 'with jitter:'
+    print '%-34s %17s %8s %8s %8s' % ('', '', '0us', '5us', '15us')
+    for (name, decode, levels) in traces:
+        expected = decode(jittered_edges(levels, 0))
+        rates = []
+        for jitter in (0, 5*US, 15*US):
+            good = sum( 1 for trial in xrange(TRIALS)
+                        if decode_any(decode, jittered_edges(levels, jitter))==expected )
+            rates.append(100.0*good/TRIALS)
+        print '%-34s %8.3f us/call %7.1f%% %7.1f%% %7.1f%%' \
+              % ((name, us_per_call(decode, jittered_edges(levels, 0)))+tuple(rates))
@@ -0,0 +1,268 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Sensor protocol decoder and driver unit tests.
+
+    Decoders are tested with synthesised edge traces. Drivers are tested
+    against simulated devices: lines of a backend that respond, in real
+    time, to the pin being driven low and released, opened with the test
+    support module's in memory backend.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import os
+import tempfile
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import protocols
+from dibase.rpi.gpio import timing
+from dibase.rpi.gpio.gpioerror import PinProtocolError
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+from dibase.rpi.gpio.test.support import MemoryLine
+
+US = 0.000001
+
+def levels_to_edges(start, levels):
+    '''
+        Returns the edges of a waveform given as a sequence of (level,
+        duration) pairs starting at time start.
+    '''
+    edges = [(start, levels[0][0])]
+    when = start
+    for (level, duration) in levels:
+        if level!=edges[-1][1]:
+            edges.append((when, level))
+        when += duration
+    return edges
+
+def dht_waveform(data, zero=27*US, one=70*US):
+    ''' Returns the (level, duration) pairs of a DHT response sending data '''
+    levels = [(True, 30*US), (False, 80*US), (True, 80*US)]
+    for byte in bytearray(data):
+        for bit_number in range(7, -1, -1):
+            levels.append((False, 50*US))
+            levels.append((True, one if (byte>>bit_number)&1 else zero))
+    levels.extend([(False, 50*US), (True, 100*US)])
+    return levels
+
+def onewire_waveform(data, presence=True):
+    ''' Returns the (level, duration) pairs of a reset and data sent '''
+    levels = [(True, 10*US), (False, 500*US), (True, 30*US)]
+    if presence:
+        levels.extend([(False, 100*US), (True, 370*US)])
+    else:
+        levels.append((True, 500*US))
+    for byte in bytearray(data):
+        for bit_number in range(8):
+            low = 6*US if (byte>>bit_number)&1 else 60*US
+            levels.extend([(False, low), (True, 70*US-low)])
+    return levels
+
+DHT22_DATA = [0x02, 0x8c, 0x80, 0x65, 0x73] # 65.2%, -10.1C
+SCRATCHPAD = [0x91, 0x01, 0x4b, 0x46, 0x7f, 0xff, 0x0f, 0x10]
+SCRATCHPAD.append(protocols.crc8(SCRATCHPAD)) # 25.0625C
+
+class DecoderUnitTests(unittest.TestCase):
+    def test_crc8(self):
+        rom = [0x02, 0x1c, 0xb8, 0x01, 0x00, 0x00, 0x00]
+        self.assertEqual(protocols.crc8(rom), 0xa2)
+        self.assertEqual(protocols.crc8(rom+[0xa2]), 0)
+        self.assertEqual(protocols.crc8(SCRATCHPAD), 0)
+
+    def test_pulses(self):
+        edges = levels_to_edges(1.0, [(True, 1), (False, 2), (True, 3), (False, 4)])
+        self.assertEqual(protocols.pulses(edges, False), [(2.0, 2.0)])
+        self.assertEqual(protocols.pulses(edges, True), [(4.0, 3.0)])
+
+    def test_decode_dht22(self):
+        edges = levels_to_edges(5.0, dht_waveform(DHT22_DATA))
+        (humidity, temperature) = protocols.decode_dht(edges)
+        self.assertAlmostEqual(humidity, 65.2)
+        self.assertAlmostEqual(temperature, -10.1)
+
+    def test_decode_dht11(self):
+        edges = levels_to_edges(5.0, dht_waveform([45, 0, 23, 0, 68]))
+        self.assertEqual(protocols.decode_dht(edges, protocols.DHT11), (45, 23))
+
+    def test_decode_dht_errors(self):
+        bad_checksum = DHT22_DATA[0:4]+[0x74]
+        with self.assertRaises(PinProtocolError):
+            protocols.decode_dht(levels_to_edges(0.0, dht_waveform(bad_checksum)))
+        with self.assertRaises(PinProtocolError):
+            protocols.decode_dht(levels_to_edges(0.0, dht_waveform(DHT22_DATA)[0:60]))
+
+    def test_decode_onewire(self):
+        levels = onewire_waveform([0xcc, 0xbe]+SCRATCHPAD) \
+                 + onewire_waveform([0xcc], presence=False)
+        transactions = protocols.decode_onewire(levels_to_edges(0.0, levels))
+        self.assertEqual( transactions
+                        , [ (True, bytearray([0xcc, 0xbe]+SCRATCHPAD))
+                          , (False, bytearray([0xcc])) ] )
+
+    def test_decode_ds18b20_scratchpad(self):
+        self.assertEqual(protocols.decode_ds18b20_scratchpad(SCRATCHPAD), 25.0625)
+        negative = [0x5e, 0xff]+SCRATCHPAD[2:8]
+        self.assertEqual( protocols.decode_ds18b20_scratchpad(negative+[protocols.crc8(negative)])
+                        , -10.125 )
+        with self.assertRaises(PinProtocolError):
+            protocols.decode_ds18b20_scratchpad(SCRATCHPAD[0:8]+[SCRATCHPAD[8]^1])
+        with self.assertRaises(PinProtocolError):
+            protocols.decode_ds18b20_scratchpad(SCRATCHPAD[0:8])
+
+    def test_save_and_load_edges(self):
+        edges = levels_to_edges(1234.5, dht_waveform(DHT22_DATA))
+        (fd, path) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            protocols.save_edges(path, edges)
+            loaded = protocols.load_edges(path)
+        finally:
+            os.remove(path)
+        self.assertEqual([level for (when, level) in loaded], [level for (when, level) in edges])
+        for ((loaded_when, l), (when, l)) in zip(loaded, edges):
+            self.assertAlmostEqual(loaded_when, when, places=8)
+
+class SimulatedLine(MemoryLine):
+    '''
+        Line of a simulated device on an open drain bus with a pull-up: low
+        while the master drives it low or the device does, else high.
+    '''
+    def __init__(self):
+        super(SimulatedLine, self).__init__()
+        self.driven_low = False
+        self.device_edges = [(0.0, True)]
+
+    def level_now(self):
+        if self.driven_low:
+            return False
+        now = timing.monotonic()
+        level = True
+        for (when, edge_level) in self.device_edges:
+            if when>now:
+                break
+            level = edge_level
+        return level
+
+    def read(self, size=-1):
+        return '1\n' if self.level_now() else '0\n'
+
+    def write(self, data):
+        self.driven_low = data[0]=='0'
+
+    def drive(self, value):
+        ''' Master drives the line '''
+        self.driven_low = not value
+        self.low_since = timing.monotonic()
+
+    def release(self):
+        ''' Master releases the line '''
+        self.driven_low = False
+
+class SimulatedDHT22Line(SimulatedLine):
+    ''' DHT22 responding to a start pulse of at least 1ms '''
+    def __init__(self, data):
+        super(SimulatedDHT22Line, self).__init__()
+        self.data = data
+
+    def release(self):
+        now = timing.monotonic()
+        if self.driven_low and now-self.low_since>=0.001:
+            self.device_edges = levels_to_edges(now, dht_waveform(self.data))
+        super(SimulatedDHT22Line, self).release()
+
+class SimulatedDS18B20Line(SimulatedLine):
+    '''
+        DS18B20 that answers reset pulses with presence pulses, decodes the
+        two command bytes the master writes and, if the second is read
+        scratchpad, sends the scratchpad in the master's read slots.
+    '''
+    def __init__(self, scratchpad):
+        super(SimulatedDS18B20Line, self).__init__()
+        self.scratchpad = scratchpad
+        self.written = []
+        self.sending = []
+
+    def drive(self, value):
+        super(SimulatedDS18B20Line, self).drive(value)
+        if self.sending and not value:
+            if self.sending.pop(0)==0:
+                self.device_edges = [(self.low_since, False), (self.low_since+60*US, True)]
+
+    def release(self):
+        now = timing.monotonic()
+        if self.driven_low:
+            width = now-self.low_since
+            if width>=400*US:
+                self.device_edges = [(now+20*US, False), (now+120*US, True)]
+                self.written = []
+                self.sending = []
+            elif len(self.written)<16:
+                self.written.append(1 if width<=protocols.ONEWIRE_SAMPLE else 0)
+                if len(self.written)==16:
+                    function = sum(bit<<n for (n, bit) in enumerate(self.written[8:]))
+                    if function==0xbe:
+                        self.sending = [ (byte>>n)&1 for byte in self.scratchpad
+                                                     for n in range(8) ]
+        super(SimulatedDS18B20Line, self).release()
+
+class SimulatedDeviceBackend(MemoryBackend):
+    ''' In memory backend whose only line is a simulated device's '''
+    def set_line_direction(self, pin_id, line, direction_mode, value=None):
+        if direction_mode.is_write():
+            line.drive(value)
+        else:
+            line.release()
+
+class DriverUnitTests(unittest.TestCase):
+    def open_pin(self, line):
+        return pin.BidirectionalPin(gpio(4), 'r', SimulatedDeviceBackend(line))
+
+    def test_capture_edges(self):
+        line = SimulatedLine()
+        with self.open_pin(line) as bidirectional:
+            now = timing.monotonic()
+            line.device_edges = levels_to_edges(now, [(True, 0.001), (False, 0.001), (True, 0.001)])
+            edges = protocols.capture_edges(bidirectional, 0.005)
+            self.assertEqual([level for (when, level) in edges], [True, False, True])
+            self.assertTrue(abs(edges[1][0]-(now+0.001))<0.0005)
+            self.assertTrue(timing.monotonic()>=now+0.005)
+            self.assertEqual(len(protocols.capture_edges(bidirectional, 1.0, max_edges=0)), 1)
+
+    def test_read_dht(self):
+        with self.open_pin(SimulatedDHT22Line(DHT22_DATA)) as bidirectional:
+            (humidity, temperature) = protocols.read_dht( bidirectional, retries=5
+                                                        , retry_interval=0 )
+        self.assertAlmostEqual(humidity, 65.2)
+        self.assertAlmostEqual(temperature, -10.1)
+
+    def test_read_dht_retries_then_raises(self):
+        with self.open_pin(SimulatedLine()) as bidirectional:
+            with self.assertRaises(PinProtocolError):
+                protocols.read_dht(bidirectional, retries=1, retry_interval=0)
+
+    def test_read_ds18b20(self):
+        conversion_time = protocols.DS18B20_CONVERSION_TIME
+        protocols.DS18B20_CONVERSION_TIME = 0
+        try:
+            with self.open_pin(SimulatedDS18B20Line(SCRATCHPAD)) as bidirectional:
+                bus = protocols.OneWireBus(bidirectional)
+                self.assertTrue(bus.reset())
+                self.assertEqual(protocols.read_ds18b20(bus, retries=5), 25.0625)
+            with self.open_pin(SimulatedLine()) as bidirectional:
+                bus = protocols.OneWireBus(bidirectional)
+                self.assertFalse(bus.reset())
+                with self.assertRaises(PinProtocolError):
+                    protocols.read_ds18b20(bus, retries=0)
+        finally:
+            protocols.DS18B20_CONVERSION_TIME = conversion_time
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Paced waveform playback jitter with and without a real time section.
+
+    Plays a square wave with PinWordWriter.write_many at a fixed interval
+    through the test support module's in memory backend, timestamping each
+    write, and reports how late writes were against their scheduled times,
+    with ordinary scheduling and then with realtime.RealTime settings. Run as root (or
+    with CAP_SYS_NICE and CAP_IPC_LOCK) for the real time runs; run a load
+    such as a kernel build alongside to see the difference it makes.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import sys
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio import realtime
+from dibase.rpi.gpio import timing
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+
+INTERVAL = 0.0005
+COUNT = 4000
+
+class TimestampingBackend(MemoryBackend):
+    ''' In memory backend timestamping each bulk write '''
+    def __init__(self):
+        super(TimestampingBackend, self).__init__()
+        self.times = []
+
+    def write_lines(self, lines, mask, value):
+        self.times.append(timing.monotonic())
+
+def lateness(realtime_option):
+    '''
+        Returns the sorted lateness in microseconds of each write after the
+        first relative to its schedule
+    '''
+    backend = TimestampingBackend()
+    with pingroup.PinWordWriter([gpio(4)], backend) as writer:
+        writer.write_many([index&1 for index in xrange(COUNT)], INTERVAL, realtime_option)
+    # Write index is made on reaching the deadline index intervals after
+    # the first write
+    start = backend.times[0]
+    return sorted( (time-(start+index*INTERVAL))*1e6
+                   for index, time in enumerate(backend.times) if index>0 )
+
+if __name__ == '__main__':
+    cpus = realtime.isolated_cpus() or None
+    runs = [ ('ordinary scheduling', None)
+           , ('SCHED_FIFO', realtime.RealTime(lock_memory=False))
+           , ('SCHED_FIFO, mlockall, prefault', realtime.RealTime())
+           ]
+    if cpus:
+        runs.append(('all, on isolated CPUs %s' % cpus, realtime.RealTime(cpus=cpus)))
+    print COUNT, 'writes at', INTERVAL*1e6, 'us intervals, lateness in us:'
+    print '%-34s %8s %8s %8s %8s' % ('', 'median', '99%', '99.9%', 'max')
+    for (name, realtime_option) in runs:
+        try:
+            late = lateness(realtime_option)
+        except OSError, e:
+            print '%-34s not permitted: %s' % (name, e)
+            continue
+        print '%-34s %8.1f %8.1f %8.1f %8.1f' % ( name, late[len(late)//2]
+                                                , late[int(len(late)*0.99)]
+                                                , late[int(len(late)*0.999)]
+                                                , late[-1] )
@@ -0,0 +1,143 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Real time section unit tests.
+
+    Changing scheduling policy and locking memory need privileges so the
+    tests of them are skipped if not permitted. CPU affinity tests use the
+    CPUs the test process is already allowed to run on.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import os
+import errno
+import tempfile
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio import realtime
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+from dibase.rpi.gpio.test.support import MemoryLine
+
+class AffinityRecordingLine(MemoryLine):
+    ''' In memory line recording the CPU affinity at each read and write '''
+    def __init__(self):
+        super(AffinityRecordingLine, self).__init__()
+        self.affinities = []
+
+    def read(self, size=-1):
+        self.affinities.append(realtime.get_affinity())
+        return super(AffinityRecordingLine, self).read(size)
+
+    def write(self, data):
+        self.affinities.append(realtime.get_affinity())
+        super(AffinityRecordingLine, self).write(data)
+
+def skip_unless_permitted(operation):
+    try:
+        operation()
+    except OSError, e:
+        if e.errno in (errno.EPERM, errno.ENOMEM):
+            raise unittest.SkipTest('not permitted: %s' % e)
+        raise
+
+class RealTimeUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.cpus = realtime.get_affinity()
+
+    def tearDown(self):
+        self.assertEqual(realtime.get_affinity(), self.cpus)
+
+    def test_parse_cpu_list(self):
+        self.assertEqual(realtime.parse_cpu_list('0-2,5\n'), [0,1,2,5])
+        self.assertEqual(realtime.parse_cpu_list('3'), [3])
+        self.assertEqual(realtime.parse_cpu_list('\n'), [])
+
+    def test_isolated_cpus(self):
+        (fd, path) = tempfile.mkstemp()
+        try:
+            os.write(fd, '2-3\n')
+            os.close(fd)
+            self.assertEqual(realtime.isolated_cpus(path), [2,3])
+        finally:
+            os.remove(path)
+        self.assertEqual(realtime.isolated_cpus(path), [])
+
+    def test_get_set_affinity(self):
+        self.assertTrue(len(self.cpus)>0)
+        try:
+            realtime.set_affinity(self.cpus[-1:])
+            self.assertEqual(realtime.get_affinity(), self.cpus[-1:])
+        finally:
+            realtime.set_affinity(self.cpus)
+
+    def test_section_restores_affinity(self):
+        section = realtime.RealTime(priority=None, cpus=self.cpus[0:1], lock_memory=False)
+        with section:
+            self.assertEqual(realtime.get_affinity(), self.cpus[0:1])
+            with section:
+                self.assertEqual(realtime.get_affinity(), self.cpus[0:1])
+            self.assertEqual(realtime.get_affinity(), self.cpus[0:1])
+        self.assertEqual(realtime.get_affinity(), self.cpus)
+
+    def test_section_restores_affinity_on_exception(self):
+        with self.assertRaises(KeyError):
+            with realtime.RealTime(priority=None, cpus=self.cpus[0:1], lock_memory=False):
+                raise KeyError
+
+    def test_failed_start_restores_state(self):
+        scheduler = realtime.get_scheduler()
+        with self.assertRaises(OSError):
+            realtime.RealTime(priority=1000, cpus=self.cpus[0:1], lock_memory=False).start()
+        self.assertEqual(realtime.get_scheduler(), scheduler)
+
+    def test_fifo_scheduling(self):
+        scheduler = realtime.get_scheduler()
+        section = realtime.RealTime(priority=10, lock_memory=False)
+        skip_unless_permitted(section.start)
+        try:
+            self.assertEqual(realtime.get_scheduler(), (realtime.SCHED_FIFO, 10))
+        finally:
+            section.stop()
+        self.assertEqual(realtime.get_scheduler(), scheduler)
+
+    def test_lock_memory(self):
+        skip_unless_permitted(realtime.lock_memory)
+        try:
+            realtime.lock_memory()
+            realtime.unlock_memory()
+        finally:
+            realtime.unlock_memory()
+        with realtime.RealTime(priority=None, prefault_stack_depth=10, prefault_heap_bytes=4096):
+            pass
+
+    def test_section(self):
+        section = realtime.RealTime()
+        self.assertIs(realtime.section(section), section)
+        self.assertIsInstance(realtime.section(True), realtime.RealTime)
+        for not_realtime in (None, False):
+            with realtime.section(not_realtime):
+                pass
+
+    def test_pin_group_write_and_read_many(self):
+        backend = MemoryBackend(line_class=AffinityRecordingLine)
+        section = realtime.RealTime(priority=None, cpus=self.cpus[0:1], lock_memory=False)
+        pin_ids = [gpio(4), gpio(17)]
+        with pingroup.PinWordWriter(pin_ids, backend) as writer:
+            writer.write_many([1,2,3], interval=0.001, realtime=section)
+        with pingroup.PinListReader(pin_ids, backend) as reader:
+            self.assertEqual(reader.read_many(2, realtime=section), [[False,False]]*2)
+        for line in backend.all_lines:
+            self.assertTrue(len(line.affinities)>0)
+            for affinity in line.affinities:
+                self.assertEqual(affinity, self.cpus[0:1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Shared memory GPIO pin state mirror unit tests.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import os
+import socket
+import tempfile
+import time
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import callbacks
+from dibase.rpi.gpio import fastio
+from dibase.rpi.gpio import sharedstate
+from dibase.rpi.gpio.gpiobase import GPIOBlockingReaderBase
+
+class OutOfBandReader(GPIOBlockingReaderBase):
+    '''
+        Blocking reader whose 'edge events' are bytes of out of band data,
+        the value read being the last such byte received, as an integer.
+    '''
+    def __init__(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        self.sender = socket.create_connection(listener.getsockname())
+        (self.receiver, address) = listener.accept()
+        listener.close()
+        self.value = 0
+
+    def close(self):
+        self.sender.close()
+        self.receiver.close()
+        self.receiver = None
+
+    def closed(self):
+        return self.receiver==None
+
+    def file_descriptors(self):
+        return [self.receiver.fileno()]
+
+    def read(self, timeout=None):
+        try:
+            self.value = ord(self.receiver.recv(1, socket.MSG_OOB))
+        except socket.error:
+            pass # no out of band data
+        return self.value
+
+    def _read_notified(self, fds):
+        return self.read(0)
+
+    def edge(self, value):
+        self.sender.send(chr(value), socket.MSG_OOB)
+
+def wait_for(predicate, timeout=5.0):
+    ''' Wait until predicate() is True or timeout seconds have passed '''
+    deadline = time.time()+timeout
+    while not predicate() and time.time()<deadline:
+        time.sleep(0.001)
+    return predicate()
+
+class SharedStateUnitTests(unittest.TestCase):
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp()
+        os.close(fd)
+        self.publisher = sharedstate.StatePublisher(self.path)
+
+    def tearDown(self):
+        self.publisher.close()
+        os.remove(self.path)
+
+    def test_nothing_published_initially(self):
+        reader = sharedstate.SharedStateReader([4, 17], self.path)
+        self.assertEqual(reader.read(), 0)
+        self.assertFalse(reader.published())
+        self.assertEqual(reader.state()[0:2], (0, 0))
+
+    def test_update_and_read(self):
+        self.publisher.update([17, 4], 1)
+        reader = sharedstate.SharedStateReader([4, 17], self.path)
+        self.assertEqual(reader.read(), 2)
+        self.assertTrue(reader.published())
+        self.assertEqual(reader.state()[0:2], (1<<17, (1<<17)|(1<<4)))
+        self.publisher.update([4], 1)
+        self.assertEqual(reader.read(), 3)
+
+    def test_contiguous_pin_ids(self):
+        self.publisher.update([22, 23, 24], 5)
+        reader = sharedstate.SharedStateReader([22, 23, 24], self.path)
+        self.assertEqual(reader.read(), 5)
+
+    def test_only_one_publisher(self):
+        with self.assertRaises(IOError):
+            sharedstate.StatePublisher(self.path)
+
+    def test_closed_reader(self):
+        reader = sharedstate.SharedStateReader([4], self.path)
+        reader.close()
+        self.assertTrue(reader.closed())
+        with self.assertRaises(ValueError):
+            reader.read()
+
+    def test_not_a_state_file(self):
+        (fd, path) = tempfile.mkstemp()
+        os.write(fd, 'NOTSTATE'+'\0'*64)
+        os.close(fd)
+        try:
+            with self.assertRaises(ValueError):
+                sharedstate.SharedStateReader([4], path)
+        finally:
+            os.remove(path)
+
+    def test_publisher_stopped_mid_update_detected(self):
+        reader = sharedstate.SharedStateReader([4], self.path)
+        with open(self.path, 'r+b') as state_file:
+            state_file.seek(sharedstate._SEQUENCE_OFFSET)
+            state_file.write(sharedstate._SEQUENCE.pack(3))
+        with self.assertRaises(IOError):
+            reader.read()
+        reader.close()
+
+    @unittest.skipIf(fastio.seqlock_read==None, 'C extension not built')
+    def test_reads_take_no_lock_with_c_extension(self):
+        self.publisher.update([4], 1)
+        reader = sharedstate.SharedStateReader([4], self.path)
+        def no_lock(fd, operation):
+            raise AssertionError('state locked by reader')
+        lock_state = sharedstate._lock_state
+        sharedstate._lock_state = no_lock
+        try:
+            self.assertEqual(reader.read(), 1)
+        finally:
+            sharedstate._lock_state = lock_state
+            reader.close()
+
+    def test_reader_close_keeps_publisher_exclusive(self):
+        sharedstate.SharedStateReader([4], self.path).close()
+        with self.assertRaises(IOError):
+            sharedstate.StatePublisher(self.path)
+
+    def test_reader_events_published(self):
+        dispatcher = callbacks.EventDispatcher(workers=0)
+        source = OutOfBandReader()
+        try:
+            self.publisher.add_reader(source, [4, 17], dispatcher)
+            reader = sharedstate.SharedStateReader([4, 17], self.path)
+            self.assertTrue(reader.published())
+            source.edge(3)
+            self.assertTrue(wait_for(lambda: reader.read()==3))
+            self.publisher.remove_reader(source)
+            self.assertFalse(reader.published())
+        finally:
+            dispatcher.close()
+            source.close()
+
+    def test_reads_are_consistent_during_updates(self):
+        all_pins = range(54)
+        pid = os.fork()
+        if pid==0:
+            try:
+                deadline = time.time()+0.2
+                while time.time()<deadline:
+                    self.publisher.update(all_pins, 2**54-1)
+                    self.publisher.update(all_pins, 0)
+            finally:
+                os._exit(0)
+        try:
+            reader = sharedstate.SharedStateReader(all_pins, self.path)
+            deadline = time.time()+0.2
+            while time.time()<deadline:
+                self.assertIn(reader.read(), (0, 2**54-1))
+        finally:
+            os.waitpid(pid, 0)
+
+if __name__ == '__main__':
+    unittest.main()
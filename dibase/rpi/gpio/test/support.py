@@ -0,0 +1,111 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Support shared by unit tests and benchmarks: an in memory backend and
+    its lines, so pins and pin groups can be opened on any system, a pin
+    id helper and the benchmark timing loop.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import timeit
+
+from dibase.rpi.gpio import backends
+from dibase.rpi.gpio import pinid
+
+def gpio(pin_id):
+    ''' Returns the PinId for GPIO pin_id of any chip, valid on any system '''
+    return pinid.PinId.any_chip_gpio(pin_id)
+
+class MemoryLine(object):
+    '''
+        In memory line whose level, '0' or '1', is the last character
+        written. It has no file descriptor: fileno returns None.
+    '''
+    def __init__(self):
+        self.level = '0'
+        self.is_closed = False
+
+    def seek(self, offset, whence=0):
+        pass
+
+    def read(self, size=-1):
+        return self.level+'\n'
+
+    def write(self, data):
+        self.level = data[0]
+
+    def fileno(self):
+        return None
+
+    def close(self):
+        self.is_closed = True
+
+class MemoryBackend(backends.GPIOBackend):
+    '''
+        Backend of in memory lines, recording bulk operations.
+
+        lines maps each pin number to the line last opened for it and
+        all_lines lists every line opened. Lines are created by calling
+        line_class, or if line is given every pin is opened with that one
+        line. bulk_writes lists the (mask, value) of each write_lines call
+        and bulk_reads counts read_lines calls. Set is_available False to
+        make the backend unavailable.
+    '''
+    name = 'memory'
+    speed = 10
+    line_class = MemoryLine
+
+    def __init__(self, line=None, line_class=None):
+        self.line = line
+        if line_class!=None:
+            self.line_class = line_class
+        self.is_available = True
+        self.lines = {}
+        self.all_lines = []
+        self.bulk_writes = []
+        self.bulk_reads = 0
+
+    def available(self):
+        return self.is_available
+
+    def open_line(self, pin_id, direction_mode, blocking_mode, reclaim=False):
+        line = self.line if self.line!=None else self.line_class()
+        self.lines[int(pin_id)] = line
+        if self.line==None:
+            self.all_lines.append(line)
+        return line
+
+    def close_line(self, pin_id, line, handed_off=False):
+        if self.line==None:
+            line.close()
+
+    def read_lines(self, lines):
+        self.bulk_reads += 1
+        return super(MemoryBackend, self).read_lines(lines)
+
+    def write_lines(self, lines, mask, value):
+        self.bulk_writes.append((mask, value))
+        super(MemoryBackend, self).write_lines(lines, mask, value)
+
+def best_time(call, number, repeat, setup='pass'):
+    '''
+        Returns the best time in seconds per call of repeat runs of number
+        calls of call, a callable or a statement executed after setup.
+    '''
+    return min(timeit.repeat(call, setup, repeat=repeat, number=number))/number
+
+def report_calls(name, seconds):
+    ''' Print the time per call, seconds, and calls per second of name '''
+    print '%-34s %8.3f us/call %10.0f calls/s' % (name, seconds*1e6, 1/seconds)
+
+def run_benchmarks(cases, number, repeat, setup='pass', calls='calls'):
+    '''
+        Time and report each (name, call) pair of cases, as best_time, after
+        a heading describing the runs made of calls.
+    '''
+    print 'Best of', repeat, 'runs of', number, calls+':'
+    for (name, call) in cases:
+        report_calls(name, best_time(call, number, repeat, setup))
@@ -7,6 +7,12 @@ if __name__ == '__main__':
 from dibase.rpi.gpio import sysfspaths as sysfs
 
 class PinPathsTestCases(unittest.TestCase):
+    def setUp(self):
+        sysfs._soc_chip_lines = (0, None)
+
+    def tearDown(self):
+        sysfs._soc_chip_lines = None
+
     def test_export_path(self):
         path = sysfs.export_path()
         (export_directory,export_filename) = osp.split(path)
@@ -47,5 +53,23 @@ class PinPathsTestCases(unittest.TestCase):
         self.assertEqual( export_directory, sysfs.gpio_path() + '/' + sysfs.pin_dir_base()+str(pinId))
         self.assertEqual( export_filename, sysfs.pin_value_file())
 
+class GpioNumberTestCases(unittest.TestCase):
+    def tearDown(self):
+        sysfs._soc_chip_lines = None
+
+    def test_pins_numbered_from_soc_chip_base(self):
+        sysfs._soc_chip_lines = (512, 54)
+        self.assertEqual(sysfs.gpio_number(4), 516)
+        self.assertEqual(sysfs.pin_path(4), sysfs.gpio_path()+'/'+sysfs.pin_dir_base()+'516')
+        sysfs._soc_chip_lines = (571, 54)
+        self.assertEqual(sysfs.gpio_number(53), 624)
+
+    def test_pins_not_soc_chip_lines_rejected(self):
+        sysfs._soc_chip_lines = (512, 54)
+        self.assertRaises(ValueError, sysfs.gpio_number, 54)
+        self.assertRaises(ValueError, sysfs.value_path, -1)
+        sysfs._soc_chip_lines = (0, None)
+        self.assertEqual(sysfs.gpio_number(54), 54)
+
 if __name__ == '__main__':
     unittest.main()
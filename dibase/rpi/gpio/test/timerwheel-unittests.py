@@ -0,0 +1,174 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Timer wheel scheduled pin write unit tests.
+
+    Pins are opened with the test support module's in memory backend, which
+    records each bulk write, with lines recording when they were written.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+import time
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..')
+from dibase.rpi.gpio import instrument
+from dibase.rpi.gpio import pin
+from dibase.rpi.gpio import pingroup
+from dibase.rpi.gpio import timerwheel
+from dibase.rpi.gpio import timing
+from dibase.rpi.gpio.test.support import gpio
+from dibase.rpi.gpio.test.support import MemoryBackend
+from dibase.rpi.gpio.test.support import MemoryLine
+
+class RecordingLine(MemoryLine):
+    ''' In memory line recording the time and level of each write '''
+    def __init__(self):
+        super(RecordingLine, self).__init__()
+        self.writes = []
+
+    def write(self, data):
+        super(RecordingLine, self).write(data)
+        self.writes.append((timing.monotonic(), self.level))
+
+class TimerWheelUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.backend = MemoryBackend(line_class=RecordingLine)
+        self.wheel = timerwheel.TimerWheel(tick=0.002, slots=4, levels=2)
+
+    def tearDown(self):
+        self.wheel.close()
+
+    def wait_for(self, executed):
+        deadline = timing.monotonic()+2.0
+        while self.wheel.stats()['executed']<executed and timing.monotonic()<deadline:
+            time.sleep(0.001)
+        self.assertEqual(self.wheel.stats()['executed'], executed)
+
+    def test_bad_parameters(self):
+        for (tick, slots, levels) in ((0, 4, 2), (0.001, 1, 2), (0.001, 4, 0)):
+            with self.assertRaises(ValueError):
+                timerwheel.TimerWheel(tick, slots, levels)
+
+    def test_pulse(self):
+        writer = pin.PinWriter(gpio(4), self.backend)
+        start = timing.monotonic()+0.01
+        (on, off) = self.wheel.pulse(writer, start, 0.02)
+        self.assertTrue(on.pending() and off.pending())
+        self.wait_for(2)
+        self.assertFalse(on.pending() or off.pending())
+        writes = writer._value_file().writes
+        self.assertEqual([level for (when, level) in writes], ['1','0'])
+        self.assertTrue(writes[0][0]>=start)
+        self.assertTrue(writes[1][0]>=start+0.02)
+        self.assertEqual(self.wheel.stats()['pending'], 0)
+
+    def test_writes_beyond_lowest_level_cascade(self):
+        writer = pin.PinWriter(gpio(4), self.backend)
+        now = timing.monotonic()
+        # Lowest level spans 8ms, both levels 32ms
+        delays = [0.005, 0.013, 0.021, 0.045, 0.07]
+        for (index, delay) in enumerate(delays):
+            self.wheel.schedule(now+delay, writer, index%2==0)
+        self.wait_for(len(delays))
+        writes = writer._value_file().writes
+        self.assertEqual([level for (when, level) in writes], ['1','0','1','0','1'])
+        for ((when, level), delay) in zip(writes, delays):
+            self.assertTrue(when>=now+delay)
+            self.assertTrue(when<now+delay+0.5)
+
+    def test_past_time_written_on_next_tick(self):
+        writer = pin.PinWriter(gpio(4), self.backend)
+        self.wheel.schedule(timing.monotonic()-1, writer, '1')
+        self.wait_for(1)
+        self.assertEqual(writer._value_file().level, '1')
+
+    def test_cancel(self):
+        writer = pin.PinWriter(gpio(4), self.backend)
+        now = timing.monotonic()
+        cancelled = self.wheel.schedule(now+0.01, writer, 1)
+        self.wheel.schedule(now+0.02, writer, 0)
+        self.assertTrue(cancelled.cancel())
+        self.assertFalse(cancelled.pending())
+        self.assertFalse(cancelled.cancel())
+        self.wait_for(1)
+        self.assertEqual([level for (when, level) in writer._value_file().writes], ['0'])
+
+    def test_pin_writers_coalesced_per_backend(self):
+        writers = [pin.PinWriter(gpio(n), self.backend) for n in (4, 17, 22)]
+        at = timing.monotonic()+0.01
+        for (writer, value) in zip(writers, (1, 0, 1)):
+            self.wheel.schedule(at, writer, value)
+        self.wheel.schedule(at, writers[1], '1') # later action wins
+        self.wheel.schedule(at, writers[2], '0')
+        self.wait_for(5)
+        self.assertEqual(self.backend.bulk_writes, [(0x7, 0x3)])
+        self.assertEqual(self.wheel.stats()['writes'], 1)
+        self.assertEqual([w._value_file().level for w in writers], ['1','1','0'])
+
+    def test_coalesced_pin_writes_instrumented(self):
+        writers = [pin.PinWriter(gpio(n), self.backend) for n in (4, 17)]
+        instrument.reset()
+        instrument.enable()
+        try:
+            at = timing.monotonic()+0.01
+            for writer in writers:
+                self.wheel.schedule(at, writer, 1)
+            self.wait_for(2)
+            pins = instrument.snapshot()['pins']
+        finally:
+            instrument.disable()
+            instrument.reset()
+        self.assertEqual(self.backend.bulk_writes, [(0x3, 0x3)])
+        self.assertEqual([pins[n]['writes'] for n in (4, 17)], [1, 1])
+
+    def test_thread_sleeps_until_slots_with_actions(self):
+        writer = pin.PinWriter(gpio(4), self.backend)
+        self.wheel.schedule_after(0.05, writer, 1) # 25 ticks, 6 cascades
+        self.wait_for(1)
+        self.assertTrue(self.wheel.stats()['wakeups']<=10)
+
+    def test_earlier_action_wakes_thread(self):
+        writer = pin.PinWriter(gpio(4), self.backend)
+        self.wheel.schedule_after(0.06, writer, 0)
+        time.sleep(0.005)
+        at = timing.monotonic()+0.003
+        self.wheel.schedule(at, writer, 1)
+        self.wait_for(1)
+        (when, level) = writer._value_file().writes[0]
+        self.assertEqual(level, '1')
+        self.assertTrue(when<at+0.005)
+
+    def test_word_writer_actions_merged(self):
+        writer = pingroup.PinWordWriter([gpio(n) for n in (4, 17, 22, 27)], self.backend)
+        writer.write(0x8)
+        del self.backend.bulk_writes[:]
+        at = timing.monotonic()+0.01
+        self.wheel.schedule(at, writer, 0x1, mask=0x1)
+        self.wheel.schedule(at, writer, 0x0, mask=0x8)
+        self.wheel.schedule(at, writer, 0x6, mask=0x2)
+        self.wait_for(3)
+        self.assertEqual(self.backend.bulk_writes, [(0xb, 0x3)])
+        self.assertEqual(writer._cached_value, 0x3)
+
+    def test_write_errors_counted(self):
+        writer = pin.PinWriter(gpio(4), self.backend)
+        writer.close()
+        self.wheel.schedule_after(0.005, writer, 1)
+        self.wait_for(1)
+        stats = self.wheel.stats()
+        self.assertEqual(stats['errors'], 1)
+        self.assertIsInstance(stats['last_error'], ValueError)
+
+    def test_schedule_after_close_raises(self):
+        self.wheel.close()
+        with self.assertRaises(ValueError):
+            self.wheel.schedule_after(0.01, pin.PinWriter(gpio(4), self.backend), 1)
+
+if __name__ == '__main__':
+    unittest.main()
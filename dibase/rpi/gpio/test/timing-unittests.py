@@ -0,0 +1,41 @@
+'''
+    Part of the dibase.rpi.gpio.test package.
+
+    Monotonic clock and pacing support unit tests.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import unittest
+import sys
+if __name__ == '__main__':
+# Add path to directory containing the dibase package directory
+    sys.path.insert(0, './../../../..') 
+from dibase.rpi.gpio import timing
+
+class MonotonicUnitTests(unittest.TestCase):
+    def test_monotonic_returns_float(self):
+        self.assertIsInstance(timing.monotonic(), float)
+
+    def test_monotonic_does_not_go_backwards(self):
+        previous = timing.monotonic()
+        for i in range(1000):
+            now = timing.monotonic()
+            self.assertGreaterEqual(now, previous)
+            previous = now
+
+class SleepUntilUnitTests(unittest.TestCase):
+    def test_sleep_until_passed_deadline_returns_immediately(self):
+        start = timing.monotonic()
+        timing.sleep_until(start-10.0)
+        self.assertLess(timing.monotonic()-start, 0.1)
+
+    def test_sleep_until_future_deadline_waits_until_deadline(self):
+        deadline = timing.monotonic()+0.05
+        timing.sleep_until(deadline)
+        self.assertGreaterEqual(timing.monotonic(), deadline)
+
+if __name__ == '__main__':
+    unittest.main()
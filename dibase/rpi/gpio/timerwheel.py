@@ -0,0 +1,380 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Timer wheel scheduling of timed pin writes.
+
+    A TimerWheel runs a single thread that performs pin writes scheduled
+    for given times - set pin X high at T, low at T+d and so on - in place
+    of a thread per action as with threading.Timer. Time is divided into
+    ticks of a fixed length and actions are executed on the first tick at
+    or after their time.
+
+    Scheduled actions are held in a hierarchical timer wheel: levels of
+    slots, each level's slots spanning as many ticks as all the slots of
+    the level below. Actions due within one revolution of the lowest level
+    are in the slot of their tick; those due later are in a higher level
+    slot and are moved down a level (cascaded) as the wheel turns, so
+    scheduling and cancelling take constant time however many actions are
+    pending. The thread sleeps until the next tick with actions in its
+    slot, or the next tick on which actions cascade, rather than waking on
+    every tick, and is woken early if an earlier action is scheduled.
+
+    Actions due on the same tick are coalesced: actions on a
+    pingroup.PinWordWriter are merged into one write of the group, and
+    pin.PinWriters using the same backend are written with one bulk
+    backend write, recorded as a write of each pin by the instrument
+    module. If several actions for a pin are due on the same tick the
+    latest scheduled wins.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import math
+import os
+import select
+import threading
+import itertools
+
+import instrument
+import timing
+from pin import PinWriter
+from pingroup import PinWordWriter
+
+class TimerHandle(object):
+    '''
+        A scheduled pin write, as returned by TimerWheel.schedule.
+    '''
+    def __init__(self, wheel, tick, time, writer, value, mask, sequence):
+        ''' Create for writer to be written with value at time by wheel '''
+        self.wheel = wheel
+        self.time = time
+        self.writer = writer
+        self.value = value
+        self.mask = mask
+        self._tick = tick
+        self._sequence = sequence
+        self._slot = None   # set the handle is in while pending
+
+    def pending(self):
+        ''' Returns True if the write has not been executed or cancelled '''
+        return self._slot!=None
+
+    def cancel(self):
+        '''
+            Cancel the write. Returns True if it was cancelled, False if it
+            had already been executed or cancelled.
+        '''
+        return self.wheel.cancel(self)
+
+class TimerWheel(object):
+    '''
+        Executes pin writes scheduled for given times on a single thread
+        using a hierarchical timer wheel.
+    '''
+    def __init__(self, tick=0.001, slots=256, levels=4):
+        '''
+            Create and start the timer thread.
+
+            tick is the length of a tick in seconds, the resolution to which
+            writes are scheduled. slots is the number of slots in each of
+            the levels levels of the wheel. Writes scheduled further ahead
+            than tick*slots**levels seconds are cascaded from the highest
+            level repeatedly until due.
+        '''
+        if tick<=0 or slots<2 or levels<1:
+            raise ValueError
+        self.__tick_length = float(tick)
+        self.__slots = slots
+        self.__spans = [slots**level for level in range(levels+1)]
+        self.__wheels = [[set() for slot in range(slots)] for level in range(levels)]
+        self.__origin = timing.monotonic()
+        self.__tick = 0 # next tick to process
+        self.__wake_tick = None # tick the sleeping timer thread wakes at
+        self.__pending = 0
+        self.__sequence = itertools.count()
+        self.__closing = False
+        self.__executed = 0
+        self.__wakeups = 0
+        self.__writes = 0
+        self.__errors = 0
+        self.__last_error = None
+        self.__condition = threading.Condition(threading.Lock())
+        (self.__wake_fd, self.__wake_write_fd) = os.pipe()
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __tick_at(self, time):
+        ''' Internal method returning the first tick at or after time '''
+        return int(math.ceil((time-self.__origin)/self.__tick_length))
+
+    def schedule(self, time, writer, value, mask=None):
+        '''
+            Schedule writer to be written with value at time, a
+            timing.monotonic() time. If time has passed the write is made on
+            the next tick.
+
+            writer is a pin.PinWriter, in which case value is a Boolean
+            value, a pingroup.PinWordWriter, in which case value is an
+            integer and only the bits set in mask, if given, are written,
+            the other pins keeping their values, or any other writer whose
+            write method is called with value.
+
+            Returns a TimerHandle. Raises ValueError if the wheel is closed.
+        '''
+        with self.__condition:
+            if self.__closing:
+                raise ValueError('timer wheel is closed')
+            if self.__pending==0:
+                # Wheel is empty so may jump to the present
+                self.__tick = max(self.__tick, self.__tick_at(timing.monotonic()))
+            tick = max(self.__tick_at(time), self.__tick)
+            handle = TimerHandle( self, tick, time, writer, value, mask
+                                , self.__sequence.next() )
+            self.__insert(handle)
+            self.__pending += 1
+            if self.__pending==1:
+                self.__condition.notify()
+            if self.__wake_tick!=None and tick<self.__wake_tick:
+                self.__wake_tick = tick
+                os.write(self.__wake_write_fd, 'x')
+        return handle
+
+    def schedule_after(self, delay, writer, value, mask=None):
+        ''' Schedule a write delay seconds from now, as for schedule '''
+        return self.schedule(timing.monotonic()+delay, writer, value, mask)
+
+    def pulse(self, writer, start, duration, value=True, idle_value=False, mask=None):
+        '''
+            Schedule writer to be written with value at time start and with
+            idle_value duration seconds later, as for schedule. Returns the
+            pair of TimerHandles.
+        '''
+        return ( self.schedule(start, writer, value, mask)
+               , self.schedule(start+duration, writer, idle_value, mask) )
+
+    def cancel(self, handle):
+        '''
+            Cancel a scheduled write. Returns True if it was cancelled, False
+            if it had already been executed or cancelled.
+        '''
+        with self.__condition:
+            if handle._slot==None:
+                return False
+            handle._slot.discard(handle)
+            handle._slot = None
+            self.__pending -= 1
+            return True
+
+    def stats(self):
+        '''
+            Return a dictionary of timer wheel statistics:
+              'pending'    : writes scheduled and not yet due
+              'executed'   : scheduled writes that have become due
+              'wakeups'    : times the timer thread woke to process ticks
+              'writes'     : writes made for them after coalescing
+              'errors'     : writes made that raised an exception
+              'last_error' : the most recent exception raised by a write
+        '''
+        with self.__condition:
+            return { 'pending':self.__pending, 'executed':self.__executed
+                   , 'wakeups':self.__wakeups, 'writes':self.__writes, 'errors':self.__errors
+                   , 'last_error':self.__last_error
+                   }
+
+    def close(self):
+        '''
+            Stop the timer thread, discarding pending writes. The wheel
+            cannot be used afterwards.
+        '''
+        with self.__condition:
+            if self.__closing:
+                return
+            self.__closing = True
+            self.__condition.notify()
+        os.write(self.__wake_write_fd, 'x')
+        self.__thread.join()
+        os.close(self.__wake_fd)
+        os.close(self.__wake_write_fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def __insert(self, handle):
+        '''
+            Internal method putting handle in the slot for its tick relative
+            to the next tick to process. Call with the lock held.
+        '''
+        spans = self.__spans
+        delta = handle._tick-self.__tick
+        level = 0
+        while level<len(self.__wheels)-1 and delta>=spans[level+1]:
+            level += 1
+        # Beyond the top level: place in its furthest slot to be cascaded
+        tick = min(handle._tick, self.__tick+spans[level+1]-1)
+        slot = self.__wheels[level][(tick//spans[level])%self.__slots]
+        slot.add(handle)
+        handle._slot = slot
+
+    def __advance(self):
+        '''
+            Internal method cascading higher level slots reached by the next
+            tick and removing and returning its due handles. Call with the
+            lock held.
+        '''
+        tick = self.__tick
+        spans = self.__spans
+        slots = self.__slots
+        level = 1
+        while level<len(self.__wheels) and tick%spans[level]==0:
+            level += 1
+        for cascade_level in range(level-1, 0, -1):
+            index = (tick//spans[cascade_level])%slots
+            cascading = self.__wheels[cascade_level][index]
+            self.__wheels[cascade_level][index] = set()
+            for handle in cascading:
+                self.__insert(handle)
+        due = self.__wheels[0][tick%slots]
+        self.__wheels[0][tick%slots] = set()
+        self.__tick += 1
+        for handle in due:
+            handle._slot = None
+        self.__pending -= len(due)
+        return due
+
+    def __next_event_tick(self):
+        '''
+            Internal method returning the first tick, from the next to
+            process, whose lowest level slot has handles or on which higher
+            level slots cascade. Call with the lock held.
+        '''
+        tick = self.__tick
+        slots = self.__slots
+        lowest = self.__wheels[0]
+        if len(self.__wheels)==1:
+            end = tick+slots
+        elif tick%slots==0:
+            return tick
+        else:
+            end = tick-tick%slots+slots # next cascade
+        while tick<end:
+            if lowest[tick%slots]:
+                return tick
+            tick += 1
+        return end
+
+    def __sleep_until(self, deadline):
+        '''
+            Internal method sleeping until the monotonic clock reaches
+            deadline or the thread is woken through the wake pipe.
+        '''
+        delay = deadline-timing.monotonic()
+        if delay>0:
+            try:
+                if select.select([self.__wake_fd], [], [], delay)[0]:
+                    os.read(self.__wake_fd, 4096)
+            except select.error:
+                pass # interrupted system call
+
+    def __run(self):
+        ''' Internal timer thread function '''
+        while True:
+            with self.__condition:
+                self.__wake_tick = None
+                while self.__pending==0 and not self.__closing:
+                    self.__condition.wait()
+                if self.__closing:
+                    return
+                self.__wakeups += 1
+                now_tick = int(math.floor( (timing.monotonic()-self.__origin)
+                                         / self.__tick_length ))
+                due = []
+                while self.__tick<=now_tick and self.__pending>0:
+                    due.extend(self.__advance())
+                next_time = None
+                if self.__pending>0:
+                    self.__wake_tick = self.__next_event_tick()
+                    next_time = self.__origin + self.__wake_tick*self.__tick_length
+            if due:
+                self.__execute(due)
+            if next_time!=None:
+                self.__sleep_until(next_time)
+
+    def __execute(self, due):
+        '''
+            Internal method making the writes for due handles, coalescing
+            them per writer and PinWriters per backend.
+        '''
+        values = {}
+        order = []
+        for handle in sorted(due, key=lambda handle: (handle.time, handle._sequence)):
+            writer = handle.writer
+            if writer not in values:
+                order.append(writer)
+            if isinstance(writer, PinWordWriter):
+                (mask, word) = values.get(writer, (0, 0))
+                handle_mask = writer._pin_max_value if handle.mask==None else handle.mask
+                values[writer] = ( mask|handle_mask
+                                 , (word&~handle_mask)|(handle.value&handle_mask) )
+            else:
+                values[writer] = handle.value
+        pin_writers_by_backend = {}
+        writes = []
+        for writer in order:
+            if isinstance(writer, PinWriter) and not writer.closed():
+                pin_writers_by_backend.setdefault(writer._backend(), []).append(writer)
+            elif isinstance(writer, PinWordWriter):
+                writes.append((self.__write_word, writer, values[writer]))
+            else:
+                writes.append((writer.write, values[writer]))
+        for (backend, writers) in pin_writers_by_backend.items():
+            if len(writers)==1:
+                writes.append((writers[0].write, values[writers[0]]))
+            else:
+                writes.append((self.__write_pins, backend, writers, values))
+        errors = 0
+        last_error = None
+        for write in writes:
+            try:
+                write[0](*write[1:])
+            except Exception, e:
+                errors += 1
+                last_error = e
+        with self.__condition:
+            self.__executed += len(due)
+            self.__writes += len(writes)
+            self.__errors += errors
+            if last_error!=None:
+                self.__last_error = last_error
+
+    @staticmethod
+    def __write_word(writer, change):
+        '''
+            Internal method writing the bits in mask of word, change being
+            (mask, word), to writer
+        '''
+        (mask, word) = change
+        current = writer._cached_value
+        if current==None:
+            current = 0
+        writer.write((current&~mask)|(word&mask))
+
+    @staticmethod
+    def __write_pins(backend, writers, values):
+        '''
+            Internal method writing values[writer] to each of writers, all
+            using backend, with one bulk write.
+        '''
+        lines = backend.group_lines([writer._value_file() for writer in writers])
+        word = 0
+        for bit_number, writer in enumerate(writers):
+            if values[writer] and values[writer]!='0':
+                word |= 1<<bit_number
+        start = timing.monotonic()
+        backend.write_lines(lines, (1<<len(writers))-1, word)
+        instrument.record_pin_writes(writers, timing.monotonic()-start)
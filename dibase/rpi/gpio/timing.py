@@ -0,0 +1,89 @@
+'''
+    Part of the dibase.rpi.gpio package.
+
+    Time keeping support for paced GPIO operations.
+
+    Provides a monotonic clock - one that is not affected by changes to the
+    system wall clock time - and functions to wait until a point in time on
+    that clock. Python 2 has no time.monotonic so, if it is not available,
+    the Linux clock_gettime function is called via ctypes using
+    CLOCK_MONOTONIC. If that fails then time.time is used as a last resort.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2012 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import time
+
+def _clock_gettime_monotonic():
+    '''
+        Internal function returning a function that returns the value of
+        the Linux CLOCK_MONOTONIC clock in seconds as a float by calling
+        clock_gettime through ctypes, or None if this is not possible.
+        The usual C library names are tried before resorting to
+        ctypes.util.find_library, which may run external programs.
+    '''
+    try:
+        import ctypes
+    except ImportError:
+        return None
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    def candidate_libraries():
+        for library in ('libc.so.6', 'librt.so.1'):
+            yield library
+        import ctypes.util
+        for name in ('c', 'rt'):
+            library = ctypes.util.find_library(name)
+            if library != None:
+                yield library
+
+    CLOCK_MONOTONIC = 1
+    for library in candidate_libraries():
+        try:
+            clock_gettime = ctypes.CDLL(library, use_errno=True).clock_gettime
+        except (OSError, AttributeError):
+            continue
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        clock_gettime.restype = ctypes.c_int
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(timespec())) != 0:
+            continue
+
+        def monotonic():
+            '''Returns CLOCK_MONOTONIC time in seconds as a float'''
+            now = timespec()
+            clock_gettime(CLOCK_MONOTONIC, ctypes.byref(now))
+            return now.tv_sec + now.tv_nsec*1e-9
+        return monotonic
+    return None
+
+def monotonic():
+    '''
+        Returns the time of a monotonic clock in seconds as a float.
+
+        The clock implementation is selected on first call, rather than at
+        import, so importing this module is cheap. On first call this
+        module's monotonic attribute is replaced by the selected clock
+        function, so call it as timing.monotonic() rather than importing the
+        name to avoid the selection overhead on each call.
+    '''
+    global monotonic
+    try:
+        clock = time.monotonic
+    except AttributeError:
+        clock = _clock_gettime_monotonic() or time.time
+    monotonic = clock
+    return clock()
+
+def sleep_until(deadline):
+    '''
+        Sleeps until the monotonic clock reaches deadline - a time value in
+        seconds as returned by monotonic. Returns immediately if the deadline
+        has already passed.
+    '''
+    delay = deadline - monotonic()
+    if delay > 0:
+        time.sleep(delay)
@@ -5,27 +5,195 @@
     Provides functions to return various Raspberry Pi specific hardware
     values such as board revision values.
 
+    Board revision codes come in two styles: old style codes are small
+    sequential values identifying each board variant (0x2..0x15) while new
+    style codes, flagged by bit 23 being set, are bit fields of board type,
+    processor, memory size, manufacturer and PCB revision. Both are
+    understood. The revision value is read from the device tree
+    (/proc/device-tree/system/linux,revision) if available, otherwise from
+    the Revision line of /proc/cpuinfo. Device tree model and compatible
+    strings and the GPIO chips registered with the kernel are also
+    available. All values are determined at most once per process.
+
+    The raw revision value is cached on disk keyed by the current boot id
+    so that short lived processes do not have to read /proc each time they
+    are run. The cache file path is given by the DIBASE_RPI_HWINFO_CACHE
+    environment variable if set (an empty value disables the cache) and
+    defaults to dibase-rpi-hwinfo-<uid> in the directory named by TMPDIR,
+    or /tmp.
+
     Developed by R.E. McArdell / Dibase Limited.
     Copyright (c) 2012 Dibase Limited
     License: dual: GPL or BSD.
 '''
 
+import os
+import collections
+import struct
+
+GpioChipInfo = collections.namedtuple('GpioChipInfo', 'name label base ngpio')
+
+class RevisionCode(object):
+  '''
+    Decodes a raw Raspberry Pi revision code value, either an old style
+    sequential code or a new style bit field code.
+  '''
+  NEW_STYLE_FLAG = 1<<23
+  OLD_STYLE_WARRANTY_FLAG = 1<<24
+  NEW_STYLE_WARRANTY_FLAG = 1<<25
+
+  __BOARD_TYPE_NAMES = { 0x00:'A', 0x01:'B', 0x02:'A+', 0x03:'B+', 0x04:'2B'
+                       , 0x05:'Alpha', 0x06:'CM1', 0x08:'3B', 0x09:'Zero'
+                       , 0x0a:'CM3', 0x0c:'Zero W', 0x0d:'3B+', 0x0e:'3A+'
+                       , 0x0f:'Internal', 0x10:'CM3+', 0x11:'4B'
+                       , 0x12:'Zero 2 W', 0x13:'400', 0x14:'CM4', 0x15:'CM4S'
+                       , 0x17:'5', 0x18:'CM5', 0x19:'500', 0x1a:'CM5 Lite'
+                       }
+  __COMPUTE_MODULE_TYPES = frozenset([0x06, 0x0a, 0x10, 0x14, 0x15, 0x18, 0x1a])
+  __PROCESSOR_NAMES = ('BCM2835', 'BCM2836', 'BCM2837', 'BCM2711', 'BCM2712')
+  __MANUFACTURER_NAMES = ( 'Sony UK', 'Egoman', 'Embest', 'Sony Japan'
+                         , 'Embest', 'Stadium'
+                         )
+  # Old style codes: (board type, major revision) indexed by code value
+  __OLD_STYLE_BOARDS = { 0x02:(0x01,1), 0x03:(0x01,1), 0x04:(0x01,2)
+                       , 0x05:(0x01,2), 0x06:(0x01,2), 0x07:(0x00,2)
+                       , 0x08:(0x00,2), 0x09:(0x00,2), 0x0d:(0x01,2)
+                       , 0x0e:(0x01,2), 0x0f:(0x01,2), 0x10:(0x03,3)
+                       , 0x11:(0x06,4), 0x12:(0x02,3), 0x13:(0x03,3)
+                       , 0x14:(0x06,4), 0x15:(0x02,3)
+                       }
+
+  def __init__(self, raw_revision):
+    '''
+      Create from a raw revision value - a positive integer such as that
+      returned by HwInfo.raw_revision.
+    '''
+    self.__raw = int(raw_revision)
+
+  def raw(self):
+    ''' Return the raw revision value the instance was created from '''
+    return self.__raw
+
+  def is_new_style(self):
+    ''' Return True if the revision code is a new style bit field code '''
+    return bool(self.__raw & RevisionCode.NEW_STYLE_FLAG)
+
+  def warranty_voided(self):
+    ''' Return True if the revision code has the warranty voided bit set '''
+    if self.is_new_style():
+      return bool(self.__raw & RevisionCode.NEW_STYLE_WARRANTY_FLAG)
+    return bool(self.__raw & RevisionCode.OLD_STYLE_WARRANTY_FLAG)
+
+  def board_type(self):
+    '''
+      Return the new style board type field value - for old style codes
+      the equivalent new style value - or None for unknown old style codes.
+    '''
+    if self.is_new_style():
+      return (self.__raw>>4) & 0xff
+    board = RevisionCode.__OLD_STYLE_BOARDS.get(self.__old_style_code())
+    return board[0] if board else None
+
+  def board_type_name(self):
+    ''' Return the board type name e.g. '3B+' or None if not known '''
+    return RevisionCode.__BOARD_TYPE_NAMES.get(self.board_type())
+
+  def processor(self):
+    '''
+      Return the SoC name, e.g. 'BCM2711', or None if not known. Old style
+      codes are all for BCM2835 boards.
+    '''
+    if not self.is_new_style():
+      return RevisionCode.__PROCESSOR_NAMES[0]
+    index = (self.__raw>>12) & 0xf
+    if index<len(RevisionCode.__PROCESSOR_NAMES):
+      return RevisionCode.__PROCESSOR_NAMES[index]
+    return None
+
+  def manufacturer(self):
+    ''' Return new style code manufacturer name or None if not known '''
+    if not self.is_new_style():
+      return None
+    index = (self.__raw>>16) & 0xf
+    if index<len(RevisionCode.__MANUFACTURER_NAMES):
+      return RevisionCode.__MANUFACTURER_NAMES[index]
+    return None
+
+  def memory_size_mb(self):
+    ''' Return new style code memory size in MB, or None if not known '''
+    if not self.is_new_style():
+      return None
+    return 256<<((self.__raw>>20) & 0x7)
+
+  def pcb_revision(self):
+    ''' Return new style code PCB revision field value or None '''
+    if not self.is_new_style():
+      return None
+    return self.__raw & 0xf
+
+  def is_compute_module(self):
+    ''' Return True if the revision code is for a compute module '''
+    return self.board_type() in RevisionCode.__COMPUTE_MODULE_TYPES
+
+  def major_revision(self):
+    '''
+      Return the major Raspberry Pi board revision number - see
+      HwInfo.major_revision. Unassigned old style codes are mapped by
+      range as for the original model A and B boards.
+    '''
+    if not self.is_new_style():
+      code = self.__old_style_code()
+      board = RevisionCode.__OLD_STYLE_BOARDS.get(code)
+      if board:
+        return board[1]
+      elif code<=3:
+        return 1
+      elif code<=0xf:
+        return 2
+      else:
+        return 5
+    board_type = self.board_type()
+    if self.is_compute_module():
+      return 4
+    elif board_type<=0x01: # A, B with new style code: rev. 2 GPIO
+      return 2
+    elif board_type<=0x03: # A+, B+
+      return 3
+    else:                  # 40 pin J8 boards: Pi 2 B and later
+      return 5
+
+  def __old_style_code(self):
+    ''' Return old style code value without the warranty voided flag '''
+    return self.__raw & ~RevisionCode.OLD_STYLE_WARRANTY_FLAG
+
 class HwInfo(object):
   '''
     Class encapsulating various Raspberry Pi hardware specific properties
   '''
+  DEVICE_TREE_PATH = '/proc/device-tree'
+  SYSFS_GPIO_PATH = '/sys/class/gpio'
+
   @classmethod
   def raw_revision(cls):
     '''
       Return the raw revision value as a positive integer as indicated by the
-      /proc/cpuinfo pseudo file Revision field line.
+      device tree or the /proc/cpuinfo pseudo file Revision field line.
       returns a positive integer greater or equal to 1, or None if there was
-              a problem initialising the raw revision value from /proc/cpuinfo.
+              a problem initialising the raw revision value.
     '''
-    if HwInfo.__raw_revision==None:
+    if not HwInfo.__revision_initialised:
       HwInfo.__init_revision_info()
     return HwInfo.__raw_revision
 
+  @classmethod
+  def revision_code(cls):
+    '''
+      Return a RevisionCode instance for the raw revision value or None if
+      the raw revision value could not be determined.
+    '''
+    raw_rev = HwInfo.raw_revision()
+    return None if raw_rev==None else RevisionCode(raw_rev)
+
   @classmethod
   def major_revision(cls):
     '''
@@ -34,30 +202,19 @@ class HwInfo(object):
       Raspberry Pi boards:
         1 : raw revisions 1..3 inclusive (Original model B & A)
         2 : raw revisions greater than 3 up to and including 15 (B, A rev 2)
-        3 : raw revisions 16, 18, and greater: B+, A+ and R'Pi 2.0 B
-            (raw revision range unknown at time of writing but presumed to be
-             greater than 0x12 and presumed compatible with B+ GPIO)
-        4: raw revision 17 (0x11) : Raspberry Pi compute module - intended to
-           be part of other designs.
-        5 : raw revisions greater than 18 (0x12): R'Pi 2.0 B and beyond
-            (raw revision range unknown at time of writing but presumed to be
-             greater than 0x12 and presumed compatible with B+ GPIO)
+        3 : raw revisions 16, 18, 19 and 21: B+, A+
+        4: raw revisions 17 (0x11) and 20 (0x14) and new style compute module
+           codes : Raspberry Pi compute modules - intended to be part of
+           other designs.
+        5 : other new style revision codes: R'Pi 2.0 B and beyond
+            (presumed compatible with B+ GPIO)
      returns value in range [1,5] or None if the raw revision value is None,
              indicating it could not be determined.
     '''
-    raw_rev = HwInfo.raw_revision()
-    if raw_rev==None:
+    revision_code = HwInfo.revision_code()
+    if revision_code==None:
       return None
-    elif raw_rev<=3:
-      return 1
-    elif version>3 and version<=0xf:
-      return 2
-    elif version==0x10 or version==0x12: # B+, A+
-      return 3
-    elif version==0x11: # compute module
-      return 4
-    else: # Raspberry Pi 2.0 B etc. ?
-      return 5
+    return revision_code.major_revision()
 
   @classmethod
   def gpio_revision(cls):
@@ -81,19 +238,241 @@ class HwInfo(object):
       gpio_version = 3
     return gpio_version
 
+  @classmethod
+  def model(cls):
+    '''
+      Return the board model string from the device tree, e.g.
+      'Raspberry Pi 3 Model B Rev 1.2', or None if not available.
+    '''
+    if not HwInfo.__device_tree_initialised:
+      HwInfo.__init_device_tree_info()
+    return HwInfo.__model
+
+  @classmethod
+  def compatible(cls):
+    '''
+      Return the tuple of device tree compatible strings for the board,
+      e.g. ('raspberrypi,3-model-b', 'brcm,bcm2837'), which will be empty if
+      not available.
+    '''
+    if not HwInfo.__device_tree_initialised:
+      HwInfo.__init_device_tree_info()
+    return HwInfo.__compatible
+
+  @classmethod
+  def gpio_chips(cls):
+    '''
+      Return a tuple of GpioChipInfo named tuples (name, label, base, ngpio)
+      for the GPIO chips registered in the sys filesystem, ordered by base
+      GPIO number. base is the sys filesystem GPIO number of the chip's
+      first line and ngpio the number of lines it has.
+    '''
+    if HwInfo.__gpio_chips==None:
+      HwInfo.__gpio_chips = HwInfo._read_gpio_chips(HwInfo.SYSFS_GPIO_PATH)
+    return HwInfo.__gpio_chips
+
+  @classmethod
+  def soc_gpio_chip(cls):
+    '''
+      Return the GpioChipInfo for the SoC's main GPIO controller - the one
+      providing the GPIO lines identified by pinid.PinId values - or None
+      if it cannot be identified.
+    '''
+    for chip in HwInfo.gpio_chips():
+      if chip.label.startswith(('pinctrl-bcm', 'pinctrl-rp1')):
+        return chip
+    return None
+
+  @classmethod
+  def revision_cache_path(cls):
+    '''
+      Return the path of the on-disk raw revision cache file or None if
+      on-disk caching is disabled.
+    '''
+    path = os.environ.get('DIBASE_RPI_HWINFO_CACHE')
+    if path==None:
+      path = os.path.join( os.environ.get('TMPDIR','/tmp')
+                         , 'dibase-rpi-hwinfo-%d' % os.getuid()
+                         )
+    return path if path else None
+
+  @classmethod
+  def boot_id(cls):
+    '''
+      Return the kernel's boot id string - a value unique to each boot of
+      the system - or None if it could not be read.
+    '''
+    try:
+      with open('/proc/sys/kernel/random/boot_id','r') as boot_id_file:
+        return boot_id_file.read().strip()
+    except (IOError, OSError):
+      return None
+
+  @classmethod
+  def _read_revision_cache(cls, path, boot_id):
+    '''
+      Internal method returning the raw revision value stored in the cache
+      file at path if it was written during the boot identified by boot_id.
+      Returns None if there is no such value or the file is not owned by
+      the current user.
+    '''
+    try:
+      with open(path,'r') as cache_file:
+        if os.fstat(cache_file.fileno()).st_uid!=os.getuid():
+          return None
+        field = cache_file.read().split()
+      if len(field)==2 and field[0]==boot_id:
+        return int(field[1],16)
+    except (IOError, OSError, ValueError):
+      pass
+    return None
+
+  @classmethod
+  def _write_revision_cache(cls, path, boot_id, raw_revision):
+    '''
+      Internal method storing the raw revision value for the boot identified
+      by boot_id in the cache file at path. The file is replaced atomically
+      by renaming a temporary file, created with a unique name in the same
+      directory so that another user cannot substitute a file or symbolic
+      link for it. Failure to write the cache is silently ignored.
+    '''
+    import tempfile # only needed when the cache is written
+    try:
+      (fd, temp_path) = tempfile.mkstemp( prefix=os.path.basename(path)+'.'
+                                        , dir=os.path.dirname(path) or '.'
+                                        )
+    except (IOError, OSError):
+      return
+    try:
+      with os.fdopen(fd,'w') as cache_file:
+        cache_file.write('%s %x\n' % (boot_id, raw_revision))
+      os.rename(temp_path, path)
+    except (IOError, OSError):
+      try:
+        os.remove(temp_path)
+      except OSError:
+        pass
+
+  @classmethod
+  def _parse_cpuinfo_revision(cls, cpuinfo):
+    '''
+      Internal method returning the integer value of the Revision field in
+      the text of /proc/cpuinfo or None if there is no such field. The last
+      line starting with Revision is used, read to its end or end of text.
+    '''
+    start = cpuinfo.rfind('\nRevision')+1
+    if start==0 and not cpuinfo.startswith('Revision'):
+      return None
+    end = cpuinfo.find('\n',start)
+    field = cpuinfo[start:end if end>=0 else len(cpuinfo)].split()
+    if len(field)>=3 and field[1]==':':
+      try:
+        return int(field[2],16)
+      except ValueError:
+        pass
+    return None
+
+  @classmethod
+  def _parse_device_tree_strings(cls, data):
+    '''
+      Internal method returning the tuple of NUL terminated strings in
+      a device tree property value.
+    '''
+    return tuple(data.split('\0')[:-1]) if data.endswith('\0') else tuple(data.split('\0'))
+
+  @classmethod
+  def _read_gpio_chips(cls, path):
+    '''
+      Internal method returning a tuple of GpioChipInfo instances for the
+      gpiochip entries of the sys filesystem GPIO directory at path.
+    '''
+    chips = []
+    try:
+      names = os.listdir(path)
+    except OSError:
+      return ()
+    for name in names:
+      if not name.startswith('gpiochip'):
+        continue
+      try:
+        chip_path = os.path.join(path, name)
+        with open(os.path.join(chip_path,'label'),'r') as label_file:
+          label = label_file.read().strip()
+        with open(os.path.join(chip_path,'base'),'r') as base_file:
+          base = int(base_file.read())
+        with open(os.path.join(chip_path,'ngpio'),'r') as ngpio_file:
+          ngpio = int(ngpio_file.read())
+      except (IOError, OSError, ValueError):
+        continue
+      chips.append(GpioChipInfo(name, label, base, ngpio))
+    chips.sort(key=lambda chip: chip.base)
+    return tuple(chips)
+
+  @classmethod
+  def __read_property(cls, name):
+    '''
+      Internal private method returning the raw value of the device tree
+      property name (a path relative to the device tree root) or None.
+    '''
+    try:
+      with open(os.path.join(HwInfo.DEVICE_TREE_PATH, name),'rb') as property_file:
+        return property_file.read()
+    except (IOError, OSError):
+      return None
+
+  @classmethod
+  def __init_device_tree_info(cls):
+    '''
+      Internal private method to read and cache the device tree model and
+      compatible property values.
+    '''
+    model = HwInfo.__read_property('model')
+    if model!=None:
+      model = (HwInfo._parse_device_tree_strings(model) or (None,))[0]
+    compatible = HwInfo.__read_property('compatible')
+    HwInfo.__compatible = ( HwInfo._parse_device_tree_strings(compatible)
+                            if compatible else ()
+                          )
+    HwInfo.__model = model
+    HwInfo.__device_tree_initialised = True
+
   @classmethod
   def __init_revision_info(cls):
     '''
-      Internal private method to open /proc/cpu info and extract the Revision
-      hexadecimal integer string value and cache it as an int.
+      Internal private method to obtain the raw revision value, from the
+      on-disk cache, the device tree or /proc/cpuinfo, caching it as an int.
+    '''
+    path = HwInfo.revision_cache_path()
+    boot_id = HwInfo.boot_id() if path else None
+    raw_revision = None
+    if boot_id:
+      raw_revision = HwInfo._read_revision_cache(path, boot_id)
+    if raw_revision==None:
+      raw_revision = HwInfo.__read_system_revision()
+      if boot_id and raw_revision!=None:
+        HwInfo._write_revision_cache(path, boot_id, raw_revision)
+    HwInfo.__raw_revision = raw_revision
+    HwInfo.__revision_initialised = True
+
+  @classmethod
+  def __read_system_revision(cls):
+    '''
+      Internal private method returning the raw revision value from the
+      device tree linux,revision property (a 32 bit big endian value) if
+      present, otherwise from the /proc/cpuinfo Revision field, or None.
     '''
-    with open('/proc/cpuinfo','r') as cpuinfo:
-      line = line=cpuinfo.readline()
-      while line!='':
-        field = line.split()
-        if len(field)>=3 and field[0]=='Revision':
-          HwInfo.__raw_revision = int(''.join(['0x',field[2]]),0)
-          break
-        line = line=cpuinfo.readline()
+    revision = HwInfo.__read_property('system/linux,revision')
+    if revision!=None and len(revision)==4:
+      return struct.unpack('>I', revision)[0]
+    try:
+      with open('/proc/cpuinfo','r') as cpuinfo:
+        return HwInfo._parse_cpuinfo_revision(cpuinfo.read())
+    except (IOError, OSError):
+      return None
 
+  __revision_initialised = False
   __raw_revision = None
+  __device_tree_initialised = False
+  __model = None
+  __compatible = ()
+  __gpio_chips = None
@@ -13,6 +13,7 @@ import sys
 if __name__ == '__main__':
     sys.path.insert(0, './../../..')
 from dibase.rpi.hwinfo import HwInfo
+from dibase.rpi.hwinfo import RevisionCode
 
 class HwInfoPlatformTests(unittest.TestCase):
     def test_0010_hw_info_raw_revision_returns_int_value_greater_than_zero(self):
@@ -24,10 +25,17 @@ class HwInfoPlatformTests(unittest.TestCase):
       self.assertTrue(HwInfo.major_revision()>0)
 
     def test_0030_hw_info_major_revision_as_expected_for_raw_revison_value(self):
-      self.assertTrue(  (HwInfo.major_revision()==1 and HwInfo.raw_revision()<=3) 
-                     or (HwInfo.major_revision()==2 and HwInfo.raw_revision()>3 and HwInfo.raw_revision()<=0xf)
-                     or (HwInfo.major_revision()==3 and (HwInfo.raw_revision()==0x10 or HwInfo.raw_revision()==0x12))
-                     or (HwInfo.major_revision()==4 and HwInfo.raw_revision()==0x11)
+      if HwInfo.revision_code().is_new_style():
+        self.assertIn(HwInfo.major_revision(), (2,3,4,5))
+        self.assertEqual( HwInfo.major_revision()==4
+                        , HwInfo.revision_code().is_compute_module()
+                        )
+        return
+      raw_revision = HwInfo.raw_revision() & ~RevisionCode.OLD_STYLE_WARRANTY_FLAG
+      self.assertTrue(  (HwInfo.major_revision()==1 and raw_revision<=3) 
+                     or (HwInfo.major_revision()==2 and raw_revision>3 and raw_revision<=0xf)
+                     or (HwInfo.major_revision()==3 and raw_revision in (0x10,0x12,0x13,0x15))
+                     or (HwInfo.major_revision()==4 and raw_revision in (0x11,0x14))
                      or HwInfo.major_revision()==5
                      )
 
@@ -36,5 +44,12 @@ class HwInfoPlatformTests(unittest.TestCase):
                      or (HwInfo.gpio_revision()==3 and HwInfo.major_revision()==5)
                      )
 
+    def test_0050_hw_info_model_names_a_raspberry_pi(self):
+      self.assertTrue(HwInfo.model().startswith('Raspberry Pi'))
+
+    def test_0060_hw_info_soc_gpio_chip_has_gpio_lines(self):
+      self.assertIsNotNone(HwInfo.soc_gpio_chip())
+      self.assertTrue(HwInfo.soc_gpio_chip().ngpio>=54)
+
 if __name__ == '__main__':
     unittest.main()
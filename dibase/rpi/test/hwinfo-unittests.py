@@ -0,0 +1,186 @@
+'''
+    Part of the dibase.rpi.test package.
+
+    Unit tests on Raspberry Pi hardware information support not requiring
+    Raspberry Pi hardware.
+
+    Developed by R.E. McArdell / Dibase Limited.
+    Copyright (c) 2013 Dibase Limited
+    License: dual: GPL or BSD.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+if __name__ == '__main__':
+    sys.path.insert(0, './../../..')
+from dibase.rpi.hwinfo import HwInfo
+from dibase.rpi.hwinfo import RevisionCode
+
+class HwInfoRevisionCacheUnitTests(unittest.TestCase):
+    def setUp(self):
+      self.directory = tempfile.mkdtemp()
+      self.path = os.path.join(self.directory, 'hwinfo-cache')
+
+    def tearDown(self):
+      shutil.rmtree(self.directory)
+
+    def test_read_of_missing_cache_returns_None(self):
+      self.assertIsNone(HwInfo._read_revision_cache(self.path, 'a-boot-id'))
+
+    def test_written_cache_read_back_for_same_boot_id(self):
+      HwInfo._write_revision_cache(self.path, 'a-boot-id', 0xa02082)
+      self.assertEqual(HwInfo._read_revision_cache(self.path, 'a-boot-id'), 0xa02082)
+
+    def test_written_cache_ignored_for_other_boot_id(self):
+      HwInfo._write_revision_cache(self.path, 'a-boot-id', 0xe)
+      self.assertIsNone(HwInfo._read_revision_cache(self.path, 'another-boot-id'))
+
+    def test_corrupt_cache_ignored(self):
+      with open(self.path, 'w') as cache_file:
+        cache_file.write('a-boot-id not-hex\n')
+      self.assertIsNone(HwInfo._read_revision_cache(self.path, 'a-boot-id'))
+
+    def test_write_to_bad_path_is_ignored(self):
+      bad_path = os.path.join(self.directory, 'no-such-dir', 'hwinfo-cache')
+      HwInfo._write_revision_cache(bad_path, 'a-boot-id', 0xe)
+      self.assertEqual(os.listdir(self.directory), [])
+
+    def test_write_does_not_follow_predictable_temporary_path(self):
+      target = os.path.join(self.directory, 'target')
+      os.symlink(target, '%s.%d' % (self.path, os.getpid()))
+      HwInfo._write_revision_cache(self.path, 'a-boot-id', 0xe)
+      self.assertFalse(os.path.exists(target))
+      self.assertEqual(HwInfo._read_revision_cache(self.path, 'a-boot-id'), 0xe)
+      self.assertEqual( sorted(os.listdir(self.directory))
+                      , sorted(['hwinfo-cache', 'hwinfo-cache.%d' % os.getpid()])
+                      )
+
+    def test_cache_path_from_environment(self):
+      saved = os.environ.get('DIBASE_RPI_HWINFO_CACHE')
+      try:
+        os.environ['DIBASE_RPI_HWINFO_CACHE'] = self.path
+        self.assertEqual(HwInfo.revision_cache_path(), self.path)
+        os.environ['DIBASE_RPI_HWINFO_CACHE'] = ''
+        self.assertIsNone(HwInfo.revision_cache_path())
+      finally:
+        if saved==None:
+          del os.environ['DIBASE_RPI_HWINFO_CACHE']
+        else:
+          os.environ['DIBASE_RPI_HWINFO_CACHE'] = saved
+
+class RevisionCodeUnitTests(unittest.TestCase):
+    def test_old_style_rev1_codes_are_major_revision_1(self):
+      for code in (0x2, 0x3):
+        self.assertFalse(RevisionCode(code).is_new_style())
+        self.assertEqual(RevisionCode(code).major_revision(), 1)
+        self.assertEqual(RevisionCode(code).board_type_name(), 'B')
+
+    def test_old_style_rev2_codes_are_major_revision_2(self):
+      for code in (0x4, 0x5, 0x6, 0x7, 0x8, 0x9, 0xd, 0xe, 0xf):
+        self.assertEqual(RevisionCode(code).major_revision(), 2)
+
+    def test_old_style_plus_codes_are_major_revision_3(self):
+      for code in (0x10, 0x12, 0x13, 0x15):
+        self.assertEqual(RevisionCode(code).major_revision(), 3)
+
+    def test_old_style_compute_module_codes_are_major_revision_4(self):
+      for code in (0x11, 0x14):
+        self.assertEqual(RevisionCode(code).major_revision(), 4)
+        self.assertTrue(RevisionCode(code).is_compute_module())
+
+    def test_old_style_warranty_flag_ignored_for_board_identification(self):
+      code = RevisionCode(0x1000002)
+      self.assertTrue(code.warranty_voided())
+      self.assertEqual(code.major_revision(), 1)
+      self.assertFalse(RevisionCode(0x2).warranty_voided())
+
+    def test_new_style_3b_code_decoded(self):
+      code = RevisionCode(0xa02082)
+      self.assertTrue(code.is_new_style())
+      self.assertEqual(code.board_type_name(), '3B')
+      self.assertEqual(code.processor(), 'BCM2837')
+      self.assertEqual(code.memory_size_mb(), 1024)
+      self.assertEqual(code.manufacturer(), 'Sony UK')
+      self.assertEqual(code.pcb_revision(), 2)
+      self.assertFalse(code.warranty_voided())
+      self.assertEqual(code.major_revision(), 5)
+
+    def test_new_style_4b_code_decoded(self):
+      code = RevisionCode(0xc03111)
+      self.assertEqual(code.board_type_name(), '4B')
+      self.assertEqual(code.processor(), 'BCM2711')
+      self.assertEqual(code.memory_size_mb(), 4096)
+      self.assertEqual(code.major_revision(), 5)
+
+    def test_new_style_plus_code_is_major_revision_3(self):
+      self.assertEqual(RevisionCode(0x900032).board_type_name(), 'B+')
+      self.assertEqual(RevisionCode(0x900032).major_revision(), 3)
+
+    def test_new_style_compute_module_code_is_major_revision_4(self):
+      code = RevisionCode(0xa020a0)
+      self.assertEqual(code.board_type_name(), 'CM3')
+      self.assertTrue(code.is_compute_module())
+      self.assertEqual(code.major_revision(), 4)
+
+    def test_new_style_warranty_flag(self):
+      self.assertTrue(RevisionCode(0x2a02082).warranty_voided())
+
+class HwInfoParsingUnitTests(unittest.TestCase):
+    def test_cpuinfo_revision_parsed(self):
+      cpuinfo = ( 'processor\t: 0\nBogoMIPS\t: 38.40\n\n'
+                  'Hardware\t: BCM2835\nRevision\t: a02082\n'
+                  'Serial\t\t: 00000000deadbeef\n'
+                )
+      self.assertEqual(HwInfo._parse_cpuinfo_revision(cpuinfo), 0xa02082)
+
+    def test_cpuinfo_revision_on_first_or_unterminated_line_parsed(self):
+      self.assertEqual(HwInfo._parse_cpuinfo_revision('Revision\t: 000e\n'), 0xe)
+      self.assertEqual( HwInfo._parse_cpuinfo_revision('processor\t: 0\nRevision\t: c03111')
+                      , 0xc03111
+                      )
+      self.assertEqual(HwInfo._parse_cpuinfo_revision('Revision\t: 10'), 0x10)
+
+    def test_cpuinfo_without_revision_returns_None(self):
+      self.assertIsNone(HwInfo._parse_cpuinfo_revision('processor\t: 0\n'))
+      self.assertIsNone(HwInfo._parse_cpuinfo_revision('model\t: Revision 2\n'))
+
+    def test_device_tree_strings_parsed(self):
+      self.assertEqual( HwInfo._parse_device_tree_strings('raspberrypi,3-model-b\0brcm,bcm2837\0')
+                      , ('raspberrypi,3-model-b', 'brcm,bcm2837')
+                      )
+      self.assertEqual( HwInfo._parse_device_tree_strings('Raspberry Pi 3 Model B Rev 1.2\0')
+                      , ('Raspberry Pi 3 Model B Rev 1.2',)
+                      )
+
+class HwInfoGpioChipsUnitTests(unittest.TestCase):
+    def setUp(self):
+      self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+      shutil.rmtree(self.directory)
+
+    def make_chip(self, name, label, base, ngpio):
+      chip_directory = os.path.join(self.directory, name)
+      os.mkdir(chip_directory)
+      for (attribute, value) in (('label',label), ('base',base), ('ngpio',ngpio)):
+        with open(os.path.join(chip_directory, attribute),'w') as attribute_file:
+          attribute_file.write('%s\n' % value)
+
+    def test_gpio_chips_read_and_ordered_by_base(self):
+      self.make_chip('gpiochip504', 'raspberrypi-exp-gpio', 504, 8)
+      self.make_chip('gpiochip0', 'pinctrl-bcm2835', 0, 54)
+      os.mkdir(os.path.join(self.directory, 'export-not-a-chip'))
+      chips = HwInfo._read_gpio_chips(self.directory)
+      self.assertEqual(len(chips), 2)
+      self.assertEqual(chips[0].label, 'pinctrl-bcm2835')
+      self.assertEqual((chips[0].base, chips[0].ngpio), (0, 54))
+      self.assertEqual(chips[1].name, 'gpiochip504')
+
+    def test_missing_directory_gives_no_chips(self):
+      self.assertEqual(HwInfo._read_gpio_chips(os.path.join(self.directory,'none')), ())
+
+if __name__ == '__main__':
+    unittest.main()